@@ -1,114 +1,303 @@
 # civicsense_backend/ai_module/ai_classifier.py
 
+import hashlib
+import json
 import os
+import threading
+from pathlib import Path
+
 import numpy as np
-from PIL import Image
-import torch
-from transformers import CLIPProcessor, CLIPModel
 from django.conf import settings
 
+from civicsense_backend.ai_module.clip_backends import load_backend, model_slug
+from civicsense_backend.ai_module.embedding_store import EmbeddingStore, content_key
+from civicsense_backend.ai_module.image_ingest import ingest_image
+
+DEFAULT_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+# Category -> CLIP prompts; export_clip_model encodes these for the exported backends
+CATEGORIES = {
+    'road_damage': ['pothole', 'road damage', 'broken road', 'crack in road'],
+    'garbage': ['garbage pile', 'trash', 'waste', 'litter', 'dumping'],
+    'electrical': ['broken streetlight', 'power line', 'electric pole', 'cable'],
+    'water_supply': ['water leak', 'broken pipe', 'sewage', 'drainage'],
+    'other': ['general issue', 'miscellaneous']
+}
+LABELS = [keyword for keywords in CATEGORIES.values() for keyword in keywords]
+
+
 class IssueClassifier:
 
     """
     AI-powered issue classifier using CLIP model from HuggingFace
     Can classify images into civic issue categories
+
+    CLIP scores an image against a text prompt by the cosine similarity of
+    their embeddings, so the two towers are run separately:
+      - the keyword prompts go through the text tower once; the normalised
+        text embeddings are kept in memory and saved next to the image
+        store, keyed by model name + prompt list, so a restart (or another
+        worker) loads them instead of re-encoding
+      - each image goes through the vision tower alone, and its embedding
+        is kept in an on-disk EmbeddingStore keyed by the SHA-256 of the
+        image bytes, so classifying the same photo again, changing the
+        prompts, or duplicate search never re-runs the vision tower
+    Scores are logit_scale * image · text, softmaxed over the prompts,
+    i.e. exactly what the joint CLIPModel forward returns as
+    logits_per_image.
+
+    Torch forward passes run under torch.inference_mode(). classify_batch()
+    encodes every store miss of a batch in one vision-tower pass; the
+    micro-batching service (inference_service.py) feeds it.
+
+    torch and transformers are imported when a classifier is built, not
+    when this module is imported; use the shared `classifier` proxy below
+    so the model is loaded once, on first use.
+
+    The towers themselves run in a selectable backend (CLIP_BACKEND, see
+    clip_backends.py): PyTorch eager, TorchScript, or ONNX Runtime with an
+    INT8-quantized vision tower. Each backend gets its own embedding store,
+    since their embeddings differ slightly.
     """
-    
-    def __init__(self):
-        
-        self.categories = {
-            'road_damage': ['pothole', 'road damage', 'broken road', 'crack in road'],
-            'garbage': ['garbage pile', 'trash', 'waste', 'litter', 'dumping'],
-            'electrical': ['broken streetlight', 'power line', 'electric pole', 'cable'],
-            'water_supply': ['water leak', 'broken pipe', 'sewage', 'drainage'],
-            'other': ['general issue', 'miscellaneous']
+
+    def __init__(self, model_name=None, store_dir=None, backend=None):
+
+        self.categories = CATEGORIES
+
+        # Flattened prompt list, built once instead of on every call
+        self.labels = LABELS
+        self.label_to_category = {
+            keyword: category
+            for category, keywords in self.categories.items()
+            for keyword in keywords
         }
-        
+
+        self.model_name = model_name or getattr(settings, 'CLIP_MODEL_NAME', DEFAULT_MODEL_NAME)
+        self.store_dir = Path(store_dir or getattr(settings, 'CLIP_EMBEDDING_DIR'))
+        self.backend_name = backend or getattr(settings, 'CLIP_BACKEND', 'torch')
+
         # Load CLIP model (runs on CPU, no GPU needed)
-        print("Loading CLIP model...")
-        self.model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        self.processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        print(f"Loading CLIP model ({self.backend_name} backend)...")
+        self.backend = load_backend(self.backend_name, self.model_name)
         print("✅ CLIP model loaded successfully")
-    
+
+        self.embedding_dim = self.backend.embedding_dim
+        self.store = EmbeddingStore(self.store_dir / self._model_slug(), self.embedding_dim)
+
+        self._text_lock = threading.Lock()
+        self._text_embeddings = None
+        self._logit_scale = None
+
+    def _model_slug(self):
+        slug = model_slug(self.model_name)
+        return slug if self.backend_name == 'torch' else f'{slug}--{self.backend_name}'
+
+    # ── Text tower (once per prompt set) ───────────────────────────────────
+
+    def text_embeddings(self):
+        """
+        Return (normalised prompt embeddings, logit scale), computing them at most once
+        """
+        if self._text_embeddings is not None:
+            return self._text_embeddings, self._logit_scale
+        with self._text_lock:
+            if self._text_embeddings is None:
+                prompts_hash = hashlib.sha256(
+                    json.dumps([self.model_name, self.labels]).encode()
+                ).hexdigest()[:16]
+                cache_path = self.store_dir / self._model_slug() / f'text-{prompts_hash}.npz'
+                if cache_path.exists():
+                    cached = np.load(cache_path)
+                    embeddings, logit_scale = cached['embeddings'], float(cached['logit_scale'])
+                else:
+                    embeddings, logit_scale = self._encode_texts(self.labels)
+                    tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+                    with open(tmp_path, 'wb') as f:
+                        np.savez(f, embeddings=embeddings, logit_scale=logit_scale)
+                    os.replace(tmp_path, cache_path)
+                self._logit_scale = logit_scale
+                self._text_embeddings = embeddings
+        return self._text_embeddings, self._logit_scale
+
+    def _encode_texts(self, texts):
+        return self.backend.encode_texts(texts)
+
+    # ── Vision tower (once per distinct image) ─────────────────────────────
+
+    def encode_images(self, images):
+        """
+        Run the vision tower on a list of PIL images; returns normalised (n, dim) float32
+        """
+        return self.backend.encode_images(images)
+
+    def image_embedding(self, image_bytes):
+        """
+        Return (content key, embedding) for raw image bytes, from the store when possible
+        """
+        key, embedding = self.image_embeddings([image_bytes])[0]
+        if isinstance(embedding, Exception):
+            raise embedding
+        return key, embedding
+
+    def image_embeddings(self, images_bytes, images=None):
+        """
+        Return [(content key, embedding or exception), ...] for a batch of raw images
+
+        Store hits are read back; the distinct misses are decoded and encoded
+        in ONE vision-tower pass. `images` may supply already decoded PIL
+        images (None where not available), e.g. from image_ingest, so a miss
+        is not decoded twice; otherwise misses are decoded at reduced
+        resolution by ingest_image(). An image that cannot be decoded gets
+        its exception in place of an embedding instead of failing the batch.
+        """
+        keys = [content_key(data) for data in images_bytes]
+        images = images or [None] * len(keys)
+        found = {}
+        pending = {}
+        for key, data, image in zip(keys, images_bytes, images):
+            if key in found or key in pending:
+                continue
+            embedding = self.store.get(key)
+            if embedding is not None:
+                found[key] = embedding
+                continue
+            try:
+                pending[key] = image if image is not None else ingest_image(data).image
+            except Exception as e:
+                found[key] = e
+
+        if pending:
+            embeddings = self.encode_images(list(pending.values()))
+            for key, embedding in zip(pending, embeddings):
+                self.store.put(key, embedding)
+                found[key] = embedding
+        return [(key, found[key]) for key in keys]
+
+    # ── Scoring ────────────────────────────────────────────────────────────
+
+    def score(self, embedding):
+        """
+        Turn an image embedding into the classification result dict
+        """
+        text_embeddings, logit_scale = self.text_embeddings()
+        logits = logit_scale * (text_embeddings @ embedding)
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+
+        # Top prediction and top 3 detections
+        order = np.argsort(-probs, kind='stable')
+        top = int(order[0])
+        detected_label = self.labels[top]
+        detected_issues = [
+            {
+                'label': self.labels[idx],
+                'confidence': float(probs[idx]),
+                'category': self.label_to_category[self.labels[idx]]
+            }
+            for idx in order[:3]
+        ]
+
+        return {
+            'category': self.label_to_category[detected_label],
+            'confidence': float(probs[top]),
+            'detected_label': detected_label,
+            'all_detections': detected_issues
+        }
+
+    def error_result(self, error):
+        """
+        The result returned for an image that could not be classified
+        """
+        return {
+            'category': 'other',
+            'confidence': 0.0,
+            'detected_label': 'unknown',
+            'all_detections': [],
+            'error': str(error)
+        }
+
+    def classify_batch(self, images_bytes, images=None):
+        """
+        Classify a list of raw images with one vision-tower pass; returns one result dict each
+        """
+        return [
+            self.error_result(embedding) if isinstance(embedding, Exception) else self.score(embedding)
+            for _key, embedding in self.image_embeddings(images_bytes, images)
+        ]
+
     def classify_image(self, image_path):
         """
         Classify an image into one of the civic issue categories
         Returns: (category, confidence_score, detected_issues)
         """
         try:
-            # Load and preprocess image
-            image = Image.open(image_path).convert('RGB')
-            
-            # Prepare all possible labels
-            all_labels = []
-            label_to_category = {}
-            
-            for category, keywords in self.categories.items():
-                for keyword in keywords:
-                    all_labels.append(keyword)
-                    label_to_category[keyword] = category
-            
-            # Process image and text
-            inputs = self.processor(
-                text=all_labels,
-                images=image,
-                return_tensors="pt",
-                padding=True
-            )
-            
-            # Get predictions
-            outputs = self.model(**inputs)
-            logits_per_image = outputs.logits_per_image
-            probs = logits_per_image.softmax(dim=1)
-            
-            # Get top prediction
-            top_prob_idx = probs.argmax().item()
-            confidence = probs[0][top_prob_idx].item()
-            detected_label = all_labels[top_prob_idx]
-            category = label_to_category[detected_label]
-            
-            # Get top 3 detections
-            top_3_indices = probs[0].argsort(descending=True)[:3]
-            detected_issues = [
-                {
-                    'label': all_labels[idx],
-                    'confidence': probs[0][idx].item(),
-                    'category': label_to_category[all_labels[idx]]
-                }
-                for idx in top_3_indices
-            ]
-            
-            return {
-                'category': category,
-                'confidence': confidence,
-                'detected_label': detected_label,
-                'all_detections': detected_issues
-            }
-            
+            with open(image_path, 'rb') as f:
+                image_bytes = f.read()
+            _key, embedding = self.image_embedding(image_bytes)
+            return self.score(embedding)
+
         except Exception as e:
             print(f"Error in image classification: {e}")
-            return {
-                'category': 'other',
-                'confidence': 0.0,
-                'detected_label': 'unknown',
-                'all_detections': [],
-                'error': str(e)
-            }
-    
+            return self.error_result(e)
+
+    def find_similar(self, image_bytes, k=5, min_similarity=0.95):
+        """
+        Return [(content key, similarity), ...] of stored images most similar to this one
+        """
+        key, embedding = self.image_embedding(image_bytes)
+        return [(other, sim) for other, sim in self.store.nearest(embedding, k + 1, min_similarity) if other != key][:k]
+
     def classify_text(self, title, description):
         """
         Classify issue based on text description
         Returns: category
         """
         text = f"{title} {description}".lower()
-        
+
         # Simple keyword matching
         for category, keywords in self.categories.items():
             for keyword in keywords:
                 if keyword in text:
                     return category
-        
+
         return 'other'
     def predict(self, image_path):
         """Alias for classify_image(), used by API endpoint"""
-        return self.classify_image(image_path)
\ No newline at end of file
+        return self.classify_image(image_path)
+
+
+class LazyClassifier:
+    """
+    First-use proxy for a process-wide IssueClassifier
+
+    Nothing heavy happens at import: the model (and torch/transformers) is
+    loaded the first time an attribute is used, or by warm_up(). Loading
+    is guarded by a lock, so concurrent first calls share one instance.
+    """
+
+    def __init__(self, factory=IssueClassifier):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def warm_up(self):
+        """Load the model and the prompt embeddings now"""
+        self.get().text_embeddings()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+classifier = LazyClassifier()
@@ -0,0 +1,282 @@
+# civicsense_backend/ai_module/clip_backends.py
+
+import json
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from django.conf import settings
+
+# CLIP's preprocessing constants; exported models record their own in manifest.json
+CLIP_IMAGE_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_IMAGE_STD = (0.26862954, 0.26130258, 0.27577711)
+
+MANIFEST = 'manifest.json'
+TEXT_EMBEDDINGS = 'text_embeddings.npz'
+TORCHSCRIPT_FILE = 'vision.torchscript.pt'
+ONNX_FILE = 'vision.onnx'
+ONNX_INT8_FILE = 'vision.int8.onnx'
+
+
+def model_slug(model_name):
+    return model_name.replace('/', '--')
+
+
+def artifact_dir(model_name, root=None):
+    """Where `manage.py export_clip_model` writes (and the exported backends read) a model"""
+    return Path(root or settings.CLIP_ARTIFACT_DIR) / model_slug(model_name)
+
+
+def normalise(features):
+    features = np.asarray(features, dtype=np.float32)
+    return features / np.linalg.norm(features, axis=-1, keepdims=True)
+
+
+class ImagePreprocessor:
+    """
+    CLIPImageProcessor's resize / centre-crop / rescale / normalise in numpy
+
+    Resizes the shortest edge to `resize_to` (bicubic), crops the centre
+    `crop_size` square and returns (n, 3, crop, crop) float32, matching
+    transformers' output, so the exported backends need neither
+    transformers nor torch to prepare their input.
+    """
+
+    def __init__(self, crop_size=224, resize_to=None, mean=CLIP_IMAGE_MEAN, std=CLIP_IMAGE_STD):
+        self.crop_size = crop_size
+        self.resize_to = resize_to or crop_size
+        self.mean = np.asarray(mean, dtype=np.float32).reshape(3, 1, 1)
+        self.std = np.asarray(std, dtype=np.float32).reshape(3, 1, 1)
+
+    def __call__(self, images):
+        size = self.crop_size
+        batch = np.empty((len(images), 3, size, size), dtype=np.float32)
+        for i, image in enumerate(images):
+            width, height = image.size
+            if width <= height:
+                resized = (self.resize_to, int(self.resize_to * height / width))
+            else:
+                resized = (int(self.resize_to * width / height), self.resize_to)
+            image = image.resize(resized, Image.BICUBIC)
+            left, top = (image.width - size) // 2, (image.height - size) // 2
+            pixels = np.asarray(image.crop((left, top, left + size, top + size)), dtype=np.float32)
+            batch[i] = (pixels.transpose(2, 0, 1) / 255.0 - self.mean) / self.std
+        return batch
+
+
+# ── Backends ───────────────────────────────────────────────────────────────
+# Each backend exposes embedding_dim, encode_texts(texts) -> (normalised
+# (n, dim) float32, logit scale) and encode_images(pil_images) ->
+# normalised (n, dim) float32.
+
+class TorchBackend:
+    """PyTorch eager FP32, straight from the HuggingFace model (the original behaviour)"""
+
+    name = 'torch'
+
+    def __init__(self, model_name, artifacts=None):
+        from transformers import CLIPProcessor, CLIPModel
+
+        self.model = CLIPModel.from_pretrained(model_name)
+        self.processor = CLIPProcessor.from_pretrained(model_name)
+        self.model.eval()
+        self.embedding_dim = self.model.config.projection_dim
+
+    def encode_texts(self, texts):
+        import torch
+
+        inputs = self.processor(text=texts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            features = self.model.get_text_features(**inputs)
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32), float(self.model.logit_scale.exp().item())
+
+    def encode_images(self, images):
+        import torch
+
+        inputs = self.processor(images=images, return_tensors="pt")
+        with torch.inference_mode():
+            features = self.model.get_image_features(**inputs)
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32)
+
+
+class ExportedBackend:
+    """
+    Base for backends that run the artifacts written by `manage.py export_clip_model`
+
+    Only the vision tower is exported; prompt embeddings are computed at
+    export time and saved next to it, so changing the prompts means
+    re-exporting.
+    """
+
+    name = None
+
+    def __init__(self, model_name, artifacts=None):
+        self.directory = Path(artifacts) if artifacts else artifact_dir(model_name)
+        manifest_path = self.directory / MANIFEST
+        if not manifest_path.exists():
+            raise FileNotFoundError(
+                f'No exported CLIP model in {self.directory}; run `python manage.py export_clip_model` first'
+            )
+        self.manifest = json.loads(manifest_path.read_text())
+        self.embedding_dim = self.manifest['embedding_dim']
+        self.preprocess = ImagePreprocessor(
+            self.manifest['crop_size'], self.manifest['resize_to'],
+            self.manifest['image_mean'], self.manifest['image_std'],
+        )
+        text = np.load(self.directory / TEXT_EMBEDDINGS)
+        self._text = dict(zip(text['prompts'].tolist(), text['embeddings']))
+        self._logit_scale = float(text['logit_scale'])
+
+    def encode_texts(self, texts):
+        missing = [text for text in texts if text not in self._text]
+        if missing:
+            raise KeyError(f'Prompts missing from the exported text embeddings: {missing}; re-run export_clip_model')
+        return np.stack([self._text[text] for text in texts]), self._logit_scale
+
+
+class TorchScriptBackend(ExportedBackend):
+    """Traced and frozen TorchScript vision tower, FP32"""
+
+    name = 'torchscript'
+
+    def __init__(self, model_name, artifacts=None):
+        super().__init__(model_name, artifacts)
+        import torch
+
+        self._torch = torch
+        self.module = torch.jit.load(str(self.directory / TORCHSCRIPT_FILE), map_location='cpu')
+        self.module.eval()
+
+    def encode_images(self, images):
+        torch = self._torch
+        with torch.inference_mode():
+            features = self.module(torch.from_numpy(self.preprocess(images)))
+        return normalise(features.numpy())
+
+
+class OnnxBackend(ExportedBackend):
+    """ONNX Runtime on CPU with the dynamically INT8-quantized vision tower (no torch needed)"""
+
+    name = 'onnx'
+    filename = ONNX_INT8_FILE
+
+    def __init__(self, model_name, artifacts=None):
+        super().__init__(model_name, artifacts)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = getattr(settings, 'CLIP_INTRA_OP_THREADS', None) or 0
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(self.directory / self.filename), options, providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def encode_images(self, images):
+        (features,) = self.session.run(None, {self.input_name: self.preprocess(images)})
+        return normalise(features)
+
+
+class OnnxFP32Backend(OnnxBackend):
+    """ONNX Runtime with the unquantized FP32 export"""
+
+    name = 'onnx-fp32'
+    filename = ONNX_FILE
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, TorchScriptBackend, OnnxBackend, OnnxFP32Backend)}
+
+
+def load_backend(name, model_name, artifacts=None):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown CLIP backend '{name}'; expected one of {', '.join(BACKENDS)}")
+    return backend(model_name, artifacts)
+
+
+# ── Export ─────────────────────────────────────────────────────────────────
+
+def export_model(model_dir, output_dir, model_name, prompts, formats=('torchscript', 'onnx'), quantize=True,
+                 opset=17, log=print):
+    """
+    Export the vision tower of a local CLIP checkpoint for the exported backends
+
+    Writes to `output_dir`: text_embeddings.npz (the prompts, encoded once),
+    vision.torchscript.pt, vision.onnx and vision.int8.onnx (dynamic INT8
+    weight quantization), and finally manifest.json, whose presence marks
+    the export complete. Needs torch and transformers, plus onnx and
+    onnxruntime for the ONNX formats; none are needed at serving time for
+    the onnx backends.
+    """
+    import torch
+    from transformers import CLIPProcessor, CLIPModel
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model = CLIPModel.from_pretrained(model_dir, local_files_only=True).eval()
+    processor = CLIPProcessor.from_pretrained(model_dir, local_files_only=True)
+    image_processor = processor.image_processor
+    crop_size = image_processor.crop_size['height']
+
+    class VisionTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, pixel_values):
+            return self.clip.get_image_features(pixel_values=pixel_values)
+
+    tower = VisionTower(model).eval()
+    example = torch.zeros(1, 3, crop_size, crop_size)
+    files = [TEXT_EMBEDDINGS]
+
+    with torch.no_grad():
+        inputs = processor(text=list(prompts), return_tensors='pt', padding=True)
+        text = model.get_text_features(**inputs)
+        text = (text / text.norm(dim=-1, keepdim=True)).numpy().astype(np.float32)
+        np.savez(
+            output_dir / TEXT_EMBEDDINGS,
+            prompts=np.array(prompts), embeddings=text, logit_scale=model.logit_scale.exp().item(),
+        )
+        log(f'{len(prompts)} prompt embeddings -> {TEXT_EMBEDDINGS}')
+
+        if 'torchscript' in formats:
+            traced = torch.jit.freeze(torch.jit.trace(tower, example))
+            traced.save(str(output_dir / TORCHSCRIPT_FILE))
+            files.append(TORCHSCRIPT_FILE)
+            log(f'TorchScript vision tower -> {TORCHSCRIPT_FILE}')
+
+        if 'onnx' in formats:
+            torch.onnx.export(
+                tower, (example,), str(output_dir / ONNX_FILE),
+                input_names=['pixel_values'], output_names=['image_embeds'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'image_embeds': {0: 'batch'}},
+                opset_version=opset,
+            )
+            files.append(ONNX_FILE)
+            log(f'ONNX vision tower -> {ONNX_FILE}')
+
+    if 'onnx' in formats and quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(output_dir / ONNX_FILE), str(output_dir / ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+        files.append(ONNX_INT8_FILE)
+        log(f'INT8 dynamic quantization -> {ONNX_INT8_FILE}')
+
+    manifest = {
+        'model_name': model_name,
+        'source': str(model_dir),
+        'embedding_dim': model.config.projection_dim,
+        'crop_size': crop_size,
+        'resize_to': image_processor.size['shortest_edge'],
+        'image_mean': list(image_processor.image_mean),
+        'image_std': list(image_processor.image_std),
+        'files': files,
+        'torch_version': torch.__version__,
+    }
+    (output_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
@@ -0,0 +1,152 @@
+# civicsense_backend/ai_module/embedding_store.py
+
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, threads are still serialised
+    fcntl = None
+
+
+def content_key(data):
+    """
+    Content hash used as the embedding key: SHA-256 hex digest of the raw image bytes
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped store of L2-normalised image embeddings
+
+    Layout of `directory`:
+      vectors.f32  - float32 rows of `dim` values, row i at offset i * dim * 4
+      keys.bin     - 32-byte SHA-256 digests, key i belongs to row i
+
+    A row is written before its key, so any key a reader can see always
+    has a complete vector behind it. Readers map vectors.f32 with
+    np.memmap and only read the rows they touch; new rows written by other
+    processes are picked up on the next lookup miss. Writers hold a
+    thread lock plus (on Unix) an flock on keys.bin, so several worker
+    processes can share one store directory.
+    """
+
+    def __init__(self, directory, dim):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = int(dim)
+
+        self._keys_path    = self.directory / 'keys.bin'
+        self._vectors_path = self.directory / 'vectors.f32'
+        self._keys_path.touch(exist_ok=True)
+        self._vectors_path.touch(exist_ok=True)
+
+        self._lock    = threading.Lock()
+        self._index   = {}
+        self._keys    = []
+        self._count   = 0
+        self._vectors = None
+        self._refresh()
+
+    # ── Reading ────────────────────────────────────────────────────────────
+
+    def _refresh(self):
+        """Load keys appended since the last refresh and remap the vectors file."""
+        with open(self._keys_path, 'rb') as f:
+            f.seek(self._count * 32)
+            new_keys = f.read()
+        usable = len(new_keys) // 32
+        if not usable and self._vectors is not None:
+            return
+        count = self._count + usable
+        # Remap before publishing the new keys, so lock-free get() never sees a row past the map
+        if count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(count, self.dim))
+        else:
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        for i in range(usable):
+            digest = new_keys[i * 32:(i + 1) * 32]
+            self._keys.append(digest)
+            self._index[digest] = self._count + i
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        """
+        Return the stored vector for a hex content key, or None
+        """
+        digest = bytes.fromhex(key)
+        row = self._index.get(digest)
+        if row is None:
+            with self._lock:
+                self._refresh()
+            row = self._index.get(digest)
+            if row is None:
+                return None
+        return np.array(self._vectors[row])
+
+    def vectors(self):
+        """
+        Read-only (n, dim) memmap of every stored vector
+        """
+        return self._vectors
+
+    def nearest(self, vector, k=5, min_similarity=None, chunk_rows=65536):
+        """
+        Return [(key, cosine similarity), ...] for the k most similar stored vectors
+
+        Scans the memmap in chunks, so the whole store is never loaded at once.
+        """
+        with self._lock:
+            self._refresh()
+        vector = np.asarray(vector, dtype=np.float32)
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        for start in range(0, self._count, chunk_rows):
+            scores = np.asarray(self._vectors[start:start + chunk_rows]) @ vector
+            rows = np.arange(start, start + len(scores))
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_scores) > k:
+                top = np.argpartition(-best_scores, k)[:k]
+                best_rows, best_scores = best_rows[top], best_scores[top]
+        order = np.argsort(-best_scores, kind='stable')
+        return [
+            (self._keys[int(best_rows[i])].hex(), float(best_scores[i]))
+            for i in order
+            if min_similarity is None or best_scores[i] >= min_similarity
+        ]
+
+    # ── Writing ────────────────────────────────────────────────────────────
+
+    def put(self, key, vector):
+        """
+        Store `vector` under a hex content key (no-op if the key is already stored)
+        """
+        digest = bytes.fromhex(key)
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        with self._lock, open(self._keys_path, 'ab') as keys_file:
+            if fcntl is not None:
+                fcntl.flock(keys_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if digest in self._index:
+                    return
+                with open(self._vectors_path, 'r+b') as vectors_file:
+                    # Seek rather than append: drops a torn row left by a crashed writer
+                    vectors_file.seek(self._count * self.dim * 4)
+                    vectors_file.write(vector.tobytes())
+                keys_file.write(digest)
+                keys_file.flush()
+                self._refresh()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(keys_file, fcntl.LOCK_UN)
@@ -1,14 +1,29 @@
 # civicsense_backend/ai_module/image_analyzer.py
 
-import cv2
-import numpy as np
+import logging
+
 from PIL import Image
 
+from civicsense_backend.ai_module.image_ingest import ingest_image, read_metadata
+
+# Quality thresholds. Resolution is judged on the original size; brightness
+# and blur on the ingest-size image (image_ingest.INGEST_SHORT_SIDE), where
+# a Laplacian variance under BLUR_THRESHOLD means no usable detail.
+MIN_SIDE = 300
+DARK_THRESHOLD = 50
+BRIGHT_THRESHOLD = 200
+BLUR_THRESHOLD = 100
+
+logger = logging.getLogger(__name__)
+
 class ImageAnalyzer:
     """
     Additional image analysis utilities
+
+    Work on an image decoded once by image_ingest.ingest_image(); the
+    path-based helpers are kept for callers that only have a file.
     """
-    
+
     @staticmethod
     def analyze_image_quality(image_path):
         """
@@ -16,112 +31,108 @@ class ImageAnalyzer:
         Returns: (is_good_quality, quality_score, issues)
         """
         try:
-            img = cv2.imread(image_path)
-            
-            if img is None:
-                return False, 0.0, ["Could not read image"]
-            
+            ingested = ingest_image(image_path)
+        except Exception as e:
+            return False, 0.0, [f"Could not read image: {e}"]
+        return ImageAnalyzer.quality_of(ingested)
+
+    @staticmethod
+    def quality_of(ingested):
+        """
+        Quality checks on an IngestedImage
+        Returns: (is_good_quality, quality_score, issues)
+        """
+        import numpy as np
+
+        try:
             issues = []
             quality_scores = []
-            
-            # Check 1: Image size
-            height, width = img.shape[:2]
-            if width < 300 or height < 300:
+
+            # Check 1: Image size (of the upload, not the decoded thumbnail)
+            if ingested.width < MIN_SIDE or ingested.height < MIN_SIDE:
                 issues.append("Image resolution too low")
                 quality_scores.append(0.3)
             else:
                 quality_scores.append(1.0)
-            
+
             # Check 2: Brightness
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            mean_brightness = np.mean(gray)
-            
-            if mean_brightness < 50:
+            gray = np.asarray(ingested.image.convert('L'), dtype=np.float32)
+            mean_brightness = gray.mean()
+
+            if mean_brightness < DARK_THRESHOLD:
                 issues.append("Image too dark")
                 quality_scores.append(0.4)
-            elif mean_brightness > 200:
+            elif mean_brightness > BRIGHT_THRESHOLD:
                 issues.append("Image too bright")
                 quality_scores.append(0.6)
             else:
                 quality_scores.append(1.0)
-            
-            # Check 3: Blur detection (Laplacian variance)
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            
-            if laplacian_var < 100:
+
+            # Check 3: Blur detection (variance of the 4-neighbour Laplacian)
+            laplacian = (
+                gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+                - 4 * gray[1:-1, 1:-1]
+            )
+            laplacian_var = laplacian.var() if laplacian.size else 0.0
+
+            if laplacian_var < BLUR_THRESHOLD:
                 issues.append("Image is blurry")
                 quality_scores.append(0.5)
             else:
                 quality_scores.append(1.0)
-            
+
             # Calculate overall quality score
-            overall_score = np.mean(quality_scores)
+            overall_score = float(np.mean(quality_scores))
             is_good = overall_score > 0.6
-            
+
             return is_good, overall_score, issues
-            
+
         except Exception as e:
             return False, 0.0, [f"Error analyzing image: {str(e)}"]
-    
+
     @staticmethod
     def extract_image_metadata(image_path):
         """
-        Extract useful metadata from image
+        Extract useful metadata from image (headers only, pixels are not decoded)
         """
         try:
-            img = Image.open(image_path)
-            
-            metadata = {
-                'format': img.format,
-                'size': img.size,
-                'mode': img.mode,
-                'width': img.width,
-                'height': img.height,
-            }
-            
-            # Try to get EXIF data
-            exif = img._getexif() if hasattr(img, '_getexif') else None
-            if exif:
-                metadata['has_exif'] = True
-            
-            return metadata
-            
+            with Image.open(image_path) as img:
+                return read_metadata(img)
+
         except Exception as e:
             return {'error': str(e)}
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from civicsense_backend.ai_module.ai_classifier import IssueClassifier
-
-classifier = IssueClassifier()
+from civicsense_backend.ai_module.inference_service import get_inference_client
+from core.uploads import UploadTooLarge, open_upload
 
 @api_view(['POST'])
 def analyze_image(request):
     """
     REST API endpoint — analyze uploaded issue image using AI + quality checks
+
+    The upload is decoded once (reduced-resolution JPEG decode); the same
+    pixels feed the classifier and the quality checks. Size limits are
+    enforced while it streams in (core.uploads); its bytes are then used
+    in place, from the in-memory buffer or the memory-mapped temp file.
     """
     try:
         image = request.FILES.get('image') or request.FILES.get('photo')
         if not image:
             return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save temporarily
-        import tempfile
-        import os
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            for chunk in image.chunks():
-                tmp.write(chunk)
-            temp_path = tmp.name
+        with open_upload(image) as (image_bytes, image_file):
+            try:
+                ingested = ingest_image(image_file)
+            except Exception as e:
+                return Response({'error': f'Could not read image: {e}'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Run AI classification
-        result = classifier.predict(temp_path)
+            # Run AI classification (micro-batched with concurrent requests)
+            result = get_inference_client().classify(image_bytes, image=ingested.image)
 
         # Run quality analysis
-        from civicsense_backend.ai_module.image_analyzer import ImageAnalyzer
-        is_good, quality_score, issues = ImageAnalyzer.analyze_image_quality(temp_path)
-
-        # Clean up temporary file
-        os.remove(temp_path)
+        is_good, quality_score, issues = ImageAnalyzer.quality_of(ingested)
 
         # Merge results
         response_data = {
@@ -129,10 +140,14 @@ def analyze_image(request):
             "ai_confidence": result.get("confidence", 0.0),
             "image_quality_score": quality_score,
             "image_quality_issues": issues,
+            "image_metadata": ingested.metadata,
         }
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+    except UploadTooLarge as e:
+        return Response({'error': str(e.detail)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
     except Exception as e:
-        print("🔥 AI ANALYZE ERROR:", e)
+        logger.exception('Image analysis failed: %s', e)
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
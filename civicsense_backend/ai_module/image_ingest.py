@@ -0,0 +1,116 @@
+# civicsense_backend/ai_module/image_ingest.py
+
+import io
+import math
+
+from PIL import Image
+
+# Shortest side kept after decoding. CLIP looks at a 224x224 centre crop,
+# and the quality checks are computed (and their thresholds set) at this size.
+INGEST_SHORT_SIDE = 256
+
+# EXIF tags
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+ORIENTATION = 0x0112
+DATETIME = 0x0132
+DATETIME_ORIGINAL = 0x9003
+
+
+class IngestedImage:
+    """
+    One upload, decoded once
+
+    `image` is an RGB PIL image whose shortest side is at most the ingest
+    size; `width` and `height` are the original dimensions, and `metadata`
+    holds format, size and EXIF facts (GPS position, capture time).
+    """
+
+    def __init__(self, data, image, width, height, metadata):
+        self.data = data
+        self.image = image
+        self.width = width
+        self.height = height
+        self.metadata = metadata
+
+
+def ingest_image(source, short_side=INGEST_SHORT_SIDE):
+    """
+    Decode an upload once, at reduced resolution where the codec allows
+
+    `source` is raw bytes (or another bytes-like buffer), a path, or a
+    seekable binary file (e.g. the buffer or memory map from
+    core.uploads.open_upload), so an upload need not be copied just to be
+    decoded. `data` of the result is the buffer when one was given, None
+    otherwise.
+
+    JPEGs use draft mode: libjpeg decodes straight to 1/2, 1/4 or 1/8 scale,
+    so a 12MP phone photo never exists in memory at full size. Other
+    formats are decoded and then reduced. Metadata is read from the
+    headers before any pixels are decoded.
+    """
+    data = source if isinstance(source, (bytes, bytearray, memoryview)) else None
+    with Image.open(io.BytesIO(source) if data is not None else source) as img:
+        width, height = img.size
+        metadata = read_metadata(img)
+
+        scale = short_side / min(width, height)
+        if scale < 1:
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+            img.draft('RGB', target)
+            image = img.convert('RGB')
+            if image.size != target:
+                image = image.resize(target, Image.BICUBIC, reducing_gap=2.0)
+        else:
+            image = img.convert('RGB')
+    return IngestedImage(data, image, width, height, metadata)
+
+
+def read_metadata(img):
+    """
+    Format, original size and EXIF facts of an opened (not yet decoded) image
+    """
+    metadata = {
+        'format': img.format,
+        'size': img.size,
+        'mode': img.mode,
+        'width': img.width,
+        'height': img.height,
+        'has_exif': False,
+    }
+    exif = img.getexif()
+    if exif:
+        metadata['has_exif'] = True
+        if ORIENTATION in exif:
+            metadata['orientation'] = int(exif[ORIENTATION])
+        taken_at = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+        if taken_at:
+            metadata['taken_at'] = str(taken_at)
+        gps = gps_coordinates(exif.get_ifd(GPS_IFD))
+        if gps:
+            metadata['gps'] = gps
+    return metadata
+
+
+def _degrees(value, ref):
+    degrees, minutes, seconds = (float(part) for part in value)
+    decimal = degrees + minutes / 60 + seconds / 3600
+    if str(ref).strip().upper()[:1] in ('S', 'W'):
+        decimal = -decimal
+    return decimal
+
+
+def gps_coordinates(gps):
+    """
+    {'latitude', 'longitude'} in decimal degrees from an EXIF GPS IFD, or None
+    """
+    try:
+        latitude = _degrees(gps[2], gps.get(1, 'N'))
+        longitude = _degrees(gps[4], gps.get(3, 'E'))
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        return None
+    if abs(latitude) > 90 or abs(longitude) > 180:
+        return None
+    return {'latitude': round(latitude, 6), 'longitude': round(longitude, 6)}
@@ -0,0 +1,280 @@
+# civicsense_backend/ai_module/inference_service.py
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+# Length prefix of every socket frame: unsigned 32-bit big-endian byte count
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 32 * 1024 * 1024
+
+
+def configure_torch_threads(intra_op_threads=None):
+    """
+    Pin torch's intra-op thread pool (and a single inter-op thread) for CPU inference
+
+    The onnx backends run without torch; they take the same setting in their session options.
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+
+    threads = intra_op_threads or getattr(settings, 'CLIP_INTRA_OP_THREADS', None) or min(4, os.cpu_count() or 1)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # can only be set before the first parallel op in the process
+    return threads
+
+
+class MicroBatcher:
+    """
+    Collects concurrent classification requests into micro-batches
+
+    One daemon worker thread owns the IssueClassifier (loaded on first use,
+    so one copy of the weights per process however many request threads
+    call in). classify() enqueues the image and blocks on a Future; the
+    worker takes the first waiting request, keeps collecting until it has
+    `max_batch` images or `max_wait_ms` has passed since that first one,
+    then classifies the whole batch with one vision-tower pass
+    (IssueClassifier.classify_batch). Under light load a request waits at
+    most max_wait_ms extra; under heavy load batches fill up immediately.
+    """
+
+    def __init__(self, classifier_factory=None, max_batch=None, max_wait_ms=None, intra_op_threads=None):
+        self.classifier_factory = classifier_factory or _default_classifier
+        self.max_batch = max_batch or getattr(settings, 'CLIP_MAX_BATCH', 16)
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else getattr(settings, 'CLIP_MAX_WAIT_MS', 10)) / 1000
+        self.intra_op_threads = intra_op_threads
+
+        self.classifier = None
+        self.batches = 0
+        self.images = 0
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='clip-microbatcher', daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        with self._load_lock:
+            if self.classifier is None:
+                configure_torch_threads(self.intra_op_threads)
+                classifier = self.classifier_factory()
+                classifier.text_embeddings()
+                self.classifier = classifier
+        return self.classifier
+
+    def warm_up(self):
+        """
+        Load the model and prompt embeddings now instead of on the first request
+        """
+        self.start()
+        return self._load()
+
+    def submit(self, image_bytes, image=None):
+        """
+        Queue one image; returns a Future resolving to the classification result dict
+
+        `image` is the already decoded PIL image, if the caller has one.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((image_bytes, image, future))
+        return future
+
+    def classify(self, image_bytes, timeout=None, image=None):
+        return self.submit(image_bytes, image).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self._load().classify_batch(
+                    [image_bytes for image_bytes, _, _ in batch],
+                    [image for _, image, _ in batch],
+                )
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _default_classifier():
+    from civicsense_backend.ai_module.ai_classifier import classifier
+    return classifier.get()
+
+
+# ── Unix socket service ───────────────────────────────────────────────────
+
+def _recv_exact(sock, size):
+    # Received straight into one preallocated buffer (no per-chunk bytes to join)
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], min(size - received, 1 << 20))
+        if not count:
+            raise ConnectionError('Connection closed mid-frame')
+        received += count
+    return buffer
+
+
+def recv_frame(sock):
+    (size,) = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f'Frame of {size} bytes exceeds the {MAX_FRAME_BYTES} byte limit')
+    return _recv_exact(sock, size)
+
+
+def send_frame(sock, payload):
+    # Header and payload go out separately: `payload` may be a memoryview of the upload, not copied
+    sock.sendall(FRAME_HEADER.pack(len(payload)))
+    sock.sendall(payload)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """
+    One client connection: any number of (image frame -> JSON result frame) exchanges
+    """
+
+    def handle(self):
+        while True:
+            try:
+                image_bytes = recv_frame(self.request)
+            except (ConnectionError, ValueError):
+                return
+            try:
+                result = self.server.batcher.classify(image_bytes)
+            except Exception as e:
+                result = {'error': str(e)}
+            send_frame(self.request, json.dumps(result).encode())
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-socket front end to a MicroBatcher, run by `manage.py clip_server`
+
+    Every web worker on the host talks to this one process, so the CLIP
+    weights are loaded once per host instead of once per worker, and
+    requests from all workers are batched together. Each connection gets a
+    thread that blocks on the shared batcher.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, batcher):
+        self.batcher = batcher
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+
+class SocketInferenceClient:
+    """
+    Client for InferenceServer; keeps one connection per thread
+    """
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def classify(self, image_bytes, timeout=None, image=None):
+        # `image` is accepted for interface parity with MicroBatcher; the server decodes the bytes itself
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                send_frame(sock, image_bytes)
+                return json.loads(recv_frame(sock))
+            except (OSError, ConnectionError):
+                # Stale connection (server restarted): reconnect once
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """
+    Process-wide classifier client: the clip_server socket if CLIP_INFERENCE_SOCKET is set,
+    otherwise an in-process MicroBatcher thread
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                socket_path = getattr(settings, 'CLIP_INFERENCE_SOCKET', '')
+                _client = SocketInferenceClient(socket_path) if socket_path else MicroBatcher()
+    return _client
+
+
+def warm_up_in_background():
+    """
+    Load the in-process classifier on a daemon thread if CLIP_WARMUP_ON_BOOT is set
+
+    Called from wsgi/asgi after the application is created, so workers come
+    up immediately and the model is ready by the time traffic arrives. Does
+    nothing when inference is delegated to clip_server.
+    """
+    if not getattr(settings, 'CLIP_WARMUP_ON_BOOT', False):
+        return None
+    client = get_inference_client()
+    if not isinstance(client, MicroBatcher):
+        return None
+    thread = threading.Thread(target=_warm_up, args=(client,), name='clip-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def _warm_up(batcher):
+    try:
+        batcher.warm_up()
+    except Exception as e:
+        print(f"CLIP warm-up failed, the model will load on first use: {e}")
@@ -1,19 +1,45 @@
 # civicsense_backend/ai_module/report_generator.py
 
-from django.db.models import Count, Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
 from datetime import datetime, timedelta
 from django.utils import timezone
 import json
 
+from core.hotspots import find_hotspots, load_points
+from core.models import IssueRollup
+from core.rollups import WEEKLY_REPORT_CACHE_KEY, hour_bucket
+
 class CityHealthReportGenerator:
     """
     Generates AI-powered city health reports
+
+    The report is assembled from the hourly IssueRollup table (kept up to
+    date by core.rollups) rather than by scanning the Issue table, and the
+    finished payload is cached until the next issue write or for
+    WEEKLY_REPORT_CACHE_SECONDS, whichever comes first. Periods are aligned
+    to whole UTC hours.
     """
     
     def __init__(self, issues_model):
         self.Issue = issues_model
     
     def generate_weekly_report(self):
+        """
+        Return the weekly city health report, from cache when fresh
+        """
+        report = cache.get(WEEKLY_REPORT_CACHE_KEY)
+        if report is None:
+            report = self.build_weekly_report()
+            cache.set(
+                WEEKLY_REPORT_CACHE_KEY,
+                report,
+                getattr(settings, 'WEEKLY_REPORT_CACHE_SECONDS', 300)
+            )
+        return report
+    
+    def build_weekly_report(self):
         """
         Generate a comprehensive weekly city health report
         """
@@ -21,26 +47,33 @@ class CityHealthReportGenerator:
         end_date = timezone.now()
         start_date = end_date - timedelta(days=7)
         
-        # Get all issues from last week
-        weekly_issues = self.Issue.objects.filter(
-            created_at__gte=start_date,
-            created_at__lte=end_date
+        # One grouped query over the rollups covers every breakdown below
+        rows = list(
+            IssueRollup.objects.filter(bucket__gte=hour_bucket(start_date))
+            .values('category', 'status')
+            .annotate(n=Sum('count'))
+            .filter(n__gt=0)
         )
         
+        categories = {}
+        statuses = {}
+        for row in rows:
+            categories[row['category']] = categories.get(row['category'], 0) + row['n']
+            statuses[row['status']] = statuses.get(row['status'], 0) + row['n']
+        
         # Category breakdown
-        category_stats = weekly_issues.values('category').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        category_stats = [
+            {'category': category, 'count': count}
+            for category, count in sorted(categories.items(), key=lambda x: x[1], reverse=True)
+        ]
         
         # Status breakdown
-        status_stats = weekly_issues.values('status').annotate(
-            count=Count('id')
-        )
+        status_stats = [{'status': status, 'count': count} for status, count in statuses.items()]
         
         # Calculate health score (0-100)
-        total_issues = weekly_issues.count()
-        resolved_issues = weekly_issues.filter(status='resolved').count()
-        pending_issues = weekly_issues.filter(status='pending').count()
+        total_issues = sum(categories.values())
+        resolved_issues = statuses.get('resolved', 0)
+        pending_issues = statuses.get('pending', 0)
         
         if total_issues > 0:
             resolution_rate = (resolved_issues / total_issues) * 100
@@ -52,10 +85,10 @@ class CityHealthReportGenerator:
             health_score = 100
         
         # Identify hotspots (areas with most issues)
-        hotspots = self._identify_hotspots(weekly_issues)
+        hotspots = self._identify_hotspots(start_date)
         
         # Trend analysis
-        trend = self._analyze_trend()
+        trend = self._analyze_trend(end_date)
         
         # Generate AI insights
         insights = self._generate_insights(
@@ -76,12 +109,12 @@ class CityHealthReportGenerator:
                 'total_issues': total_issues,
                 'resolved': resolved_issues,
                 'pending': pending_issues,
-                'in_progress': weekly_issues.filter(status='in_progress').count(),
+                'in_progress': statuses.get('in_progress', 0),
                 'resolution_rate': round(resolution_rate, 2),
                 'health_score': round(health_score, 2)
             },
-            'category_breakdown': list(category_stats),
-            'status_breakdown': list(status_stats),
+            'category_breakdown': category_stats,
+            'status_breakdown': status_stats,
             'hotspots': hotspots,
             'trend': trend,
             'ai_insights': insights,
@@ -90,67 +123,50 @@ class CityHealthReportGenerator:
         
         return report
     
-    def _identify_hotspots(self, issues):
+    def get_hotspots(self, days=7, radius_m=None, min_issues=None, limit=5):
         """
-        Identify geographical hotspots with clustering
+        Return density-clustered hotspots for the last `days` days, cached briefly
         """
-        # Simple implementation: group by approximate location
-        hotspots = []
-        
-        # Get issues with coordinates
-        issues_with_coords = issues.exclude(
-            Q(latitude__isnull=True) | Q(longitude__isnull=True)
-        )
-        
-        if issues_with_coords.count() > 0:
-            # Group by rounded coordinates (0.01 degree ~ 1km)
-            location_groups = {}
-            
-            for issue in issues_with_coords:
-                lat_rounded = round(issue.latitude, 2)
-                lng_rounded = round(issue.longitude, 2)
-                key = f"{lat_rounded},{lng_rounded}"
-                
-                if key not in location_groups:
-                    location_groups[key] = []
-                location_groups[key].append(issue)
-            
-            # Get top 5 hotspots
-            sorted_hotspots = sorted(
-                location_groups.items(),
-                key=lambda x: len(x[1]),
-                reverse=True
-            )[:5]
-            
-            for location, issues_list in sorted_hotspots:
-                lat, lng = map(float, location.split(','))
-                hotspots.append({
-                    'location': {'lat': lat, 'lng': lng},
-                    'issue_count': len(issues_list),
-                    'categories': list(set(i.category for i in issues_list))
-                })
-        
+        radius_m = radius_m or getattr(settings, 'HOTSPOT_RADIUS_METERS', 500)
+        min_issues = min_issues or getattr(settings, 'HOTSPOT_MIN_ISSUES', 3)
+        key = f'civicsense:hotspots:{days}:{radius_m}:{min_issues}:{limit}'
+        hotspots = cache.get(key)
+        if hotspots is None:
+            hotspots = self._identify_hotspots(
+                timezone.now() - timedelta(days=days), radius_m, min_issues, limit
+            )
+            cache.set(key, hotspots, getattr(settings, 'WEEKLY_REPORT_CACHE_SECONDS', 300))
         return hotspots
     
-    def _analyze_trend(self):
+    def _identify_hotspots(self, start_date, radius_m=None, min_issues=None, limit=5):
+        """
+        Identify geographical hotspots with density clustering (see core.hotspots)
+        """
+        lat, lng, categories = load_points(self.Issue.objects.filter(created_at__gte=start_date))
+        return find_hotspots(
+            lat,
+            lng,
+            categories,
+            radius_m=radius_m or getattr(settings, 'HOTSPOT_RADIUS_METERS', 500),
+            min_issues=min_issues or getattr(settings, 'HOTSPOT_MIN_ISSUES', 3),
+            limit=limit
+        )
+    
+    def _analyze_trend(self, now=None):
         """
         Analyze trend compared to previous week
         """
-        now = timezone.now()
-        
-        # This week
-        this_week_start = now - timedelta(days=7)
-        this_week_count = self.Issue.objects.filter(
-            created_at__gte=this_week_start
-        ).count()
-        
-        # Last week
-        last_week_start = now - timedelta(days=14)
-        last_week_end = now - timedelta(days=7)
-        last_week_count = self.Issue.objects.filter(
-            created_at__gte=last_week_start,
-            created_at__lt=last_week_end
-        ).count()
+        now = now or timezone.now()
+        this_week_start = hour_bucket(now - timedelta(days=7))
+        last_week_start = hour_bucket(now - timedelta(days=14))
+        
+        # Both weeks in a single aggregate over the rollups
+        counts = IssueRollup.objects.filter(bucket__gte=last_week_start).aggregate(
+            this_week=Sum('count', filter=Q(bucket__gte=this_week_start)),
+            last_week=Sum('count', filter=Q(bucket__lt=this_week_start)),
+        )
+        this_week_count = counts['this_week'] or 0
+        last_week_count = counts['last_week'] or 0
         
         if last_week_count > 0:
             change_percent = ((this_week_count - last_week_count) / last_week_count) * 100
@@ -1,3 +1,568 @@
-from django.test import TestCase
+# civicsense_backend/ai_module/tests.py
 
-# Create your tests here.
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image, JpegImagePlugin
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from civicsense_backend.ai_module import ai_classifier
+from civicsense_backend.ai_module.ai_classifier import LABELS, IssueClassifier
+from civicsense_backend.ai_module.clip_backends import (
+    BACKENDS, CLIP_IMAGE_MEAN, CLIP_IMAGE_STD, MANIFEST, TEXT_EMBEDDINGS, ExportedBackend, ImagePreprocessor,
+    load_backend, normalise,
+)
+from civicsense_backend.ai_module.embedding_store import EmbeddingStore, content_key
+from civicsense_backend.ai_module.image_analyzer import ImageAnalyzer, analyze_image
+from civicsense_backend.ai_module.image_ingest import gps_coordinates, ingest_image
+from civicsense_backend.ai_module.inference_service import (
+    InferenceServer, MicroBatcher, SocketInferenceClient, recv_frame, send_frame,
+)
+
+
+def unit_vector(seed, dim):
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def label_image(label, size=(64, 48)):
+    """A flat image the stub backend embeds exactly like the prompt `label`"""
+    return Image.new('RGB', size, (LABELS.index(label) * 10, 0, 0))
+
+
+def image_bytes(image, fmt='PNG', **params):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+class StubBackend:
+    """
+    CLIP stand-in: prompt embeddings are seeded by the prompt text, and an
+    image embeds as the prompt of the label its red channel encodes, so
+    label_image(x) is classified as x. Counts every encoder call.
+    """
+
+    name = 'stub'
+    embedding_dim = 32
+    text_calls = 0
+    image_calls = []
+
+    def __init__(self, model_name, artifacts=None):
+        self.model_name = model_name
+
+    @classmethod
+    def reset(cls):
+        cls.text_calls = 0
+        cls.image_calls = []
+
+    @staticmethod
+    def text_vector(text):
+        return unit_vector(int(hashlib.sha256(text.encode()).hexdigest()[:8], 16), StubBackend.embedding_dim)
+
+    def encode_texts(self, texts):
+        type(self).text_calls += 1
+        return np.stack([self.text_vector(text) for text in texts]), 100.0
+
+    def encode_images(self, images):
+        type(self).image_calls.append(len(images))
+        return np.stack([self.text_vector(LABELS[round(image.getpixel((0, 0))[0] / 10)]) for image in images])
+
+
+class StubBackendMixin:
+    """Registers StubBackend and gives each test a fresh embedding directory"""
+
+    def setUp(self):
+        super().setUp()
+        self.store_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.store_dir, ignore_errors=True)
+        patcher = mock.patch.dict(BACKENDS, {'stub': StubBackend})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        StubBackend.reset()
+
+    def make_classifier(self, model_name='test/clip'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return IssueClassifier(model_name=model_name, store_dir=self.store_dir, backend='stub')
+
+
+# ── Embedding store ────────────────────────────────────────────────────────
+
+class EmbeddingStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_round_trip_through_the_memmap(self):
+        store = EmbeddingStore(self.directory, 8)
+        vectors = {content_key(str(i).encode()): unit_vector(i, 8) for i in range(5)}
+        for key, vector in vectors.items():
+            store.put(key, vector)
+        store.put(next(iter(vectors)), unit_vector(99, 8))  # already stored: ignored
+
+        reopened = EmbeddingStore(self.directory, 8)
+        self.assertEqual(len(reopened), 5)
+        self.assertIsInstance(reopened.vectors(), np.memmap)
+        for key, vector in vectors.items():
+            np.testing.assert_array_equal(reopened.get(key), vector)
+        self.assertIsNone(reopened.get(content_key(b'missing')))
+        self.assertEqual((self.directory / 'vectors.f32').stat().st_size, 5 * 8 * 4)
+
+    def test_rows_written_by_another_instance_are_picked_up(self):
+        reader, writer = EmbeddingStore(self.directory, 8), EmbeddingStore(self.directory, 8)
+        key = content_key(b'photo')
+        self.assertNotIn(key, reader)
+        writer.put(key, unit_vector(1, 8))
+        np.testing.assert_array_equal(reader.get(key), unit_vector(1, 8))
+        self.assertEqual(len(reader), 1)
+
+    def test_torn_row_is_overwritten(self):
+        store = EmbeddingStore(self.directory, 8)
+        store.put(content_key(b'a'), unit_vector(1, 8))
+        with open(self.directory / 'vectors.f32', 'ab') as f:
+            f.write(b'\xff' * 12)  # a writer died mid-row, before its key
+        store.put(content_key(b'b'), unit_vector(2, 8))
+
+        reopened = EmbeddingStore(self.directory, 8)
+        np.testing.assert_array_equal(reopened.get(content_key(b'b')), unit_vector(2, 8))
+        self.assertEqual((self.directory / 'vectors.f32').stat().st_size, 2 * 8 * 4)
+
+    def test_nearest_matches_brute_force(self):
+        store = EmbeddingStore(self.directory, 16)
+        keys = [content_key(str(i).encode()) for i in range(50)]
+        vectors = np.stack([unit_vector(i, 16) for i in range(50)])
+        for key, vector in zip(keys, vectors):
+            store.put(key, vector)
+        query = unit_vector(1000, 16)
+
+        scores = vectors @ query
+        expected = [keys[i] for i in np.argsort(-scores)[:5]]
+        nearest = store.nearest(query, k=5, chunk_rows=7)
+        self.assertEqual([key for key, _ in nearest], expected)
+        self.assertAlmostEqual(nearest[0][1], float(scores.max()), places=5)
+
+        threshold = float(np.sort(scores)[-3])
+        self.assertEqual(len(store.nearest(query, k=5, min_similarity=threshold)), 3)
+
+
+# ── Classifier caches ─────────────────────────────────────────────────────
+
+class ClassifierCacheTests(StubBackendMixin, SimpleTestCase):
+
+    def test_classifies_by_dot_product_with_the_prompts(self):
+        classifier = self.make_classifier()
+        result = classifier.classify_batch([image_bytes(label_image('pothole'))])[0]
+        self.assertEqual(result['category'], 'road_damage')
+        self.assertEqual(result['detected_label'], 'pothole')
+        self.assertGreater(result['confidence'], 0.99)
+        self.assertEqual(len(result['all_detections']), 3)
+
+        garbage = classifier.classify_batch([image_bytes(label_image('litter'))])[0]
+        self.assertEqual((garbage['category'], garbage['detected_label']), ('garbage', 'litter'))
+
+    def test_text_embeddings_are_encoded_once_and_reused_from_disk(self):
+        first = self.make_classifier()
+        embeddings, scale = first.text_embeddings()
+        first.text_embeddings()
+        self.assertEqual(StubBackend.text_calls, 1)
+
+        second = self.make_classifier()
+        reloaded, reloaded_scale = second.text_embeddings()
+        self.assertEqual(StubBackend.text_calls, 1)
+        np.testing.assert_array_equal(reloaded, embeddings)
+        self.assertEqual(reloaded_scale, scale)
+
+    def test_text_embeddings_invalidate_on_model_or_label_change(self):
+        self.make_classifier().text_embeddings()
+        self.make_classifier(model_name='test/other-clip').text_embeddings()
+        self.assertEqual(StubBackend.text_calls, 2)
+
+        with mock.patch.object(ai_classifier, 'LABELS', LABELS + ['fallen tree']):
+            embeddings, _ = self.make_classifier().text_embeddings()
+        self.assertEqual(StubBackend.text_calls, 3)
+        self.assertEqual(len(embeddings), len(LABELS) + 1)
+
+        self.make_classifier().text_embeddings()  # the original prompt set is still cached
+        self.assertEqual(StubBackend.text_calls, 3)
+
+    def test_image_embeddings_are_stored_by_content(self):
+        pothole, litter = image_bytes(label_image('pothole')), image_bytes(label_image('litter'))
+        classifier = self.make_classifier()
+        classifier.classify_batch([pothole, litter, pothole])
+        self.assertEqual(StubBackend.image_calls, [2])  # one pass, duplicates encoded once
+
+        classifier.classify_batch([pothole, litter])
+        self.make_classifier().classify_batch([litter])  # a new process reads the same store
+        self.assertEqual(StubBackend.image_calls, [2])
+
+        key, _ = classifier.image_embedding(pothole)
+        self.assertEqual(key, content_key(pothole))
+        self.assertIn(key, EmbeddingStore(self.store_dir / 'test--clip--stub', StubBackend.embedding_dim))
+
+    def test_undecodable_image_fails_alone(self):
+        results = self.make_classifier().classify_batch([b'not an image', image_bytes(label_image('trash'))])
+        self.assertEqual(results[0]['category'], 'other')
+        self.assertIn('error', results[0])
+        self.assertEqual(results[1]['detected_label'], 'trash')
+
+    def test_find_similar_excludes_the_query_image(self):
+        classifier = self.make_classifier()
+        pothole = image_bytes(label_image('pothole'))
+        same_label = image_bytes(label_image('pothole', size=(80, 60)))
+        classifier.classify_batch([pothole, same_label, image_bytes(label_image('cable'))])
+
+        similar = classifier.find_similar(pothole)
+        self.assertEqual([key for key, _ in similar], [content_key(same_label)])
+        self.assertAlmostEqual(similar[0][1], 1.0, places=5)
+
+
+# ── Micro-batching ─────────────────────────────────────────────────────────
+
+class RecordingClassifier:
+    """classify_batch() stand-in: records batch sizes, echoes each image's bytes back"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+        self.text_loaded = False
+
+    def text_embeddings(self):
+        self.text_loaded = True
+
+    def classify_batch(self, images_bytes, images=None):
+        self.batches.append(len(images_bytes))
+        if self.error:
+            raise self.error
+        return [{'category': 'other', 'echo': data.decode()} for data in images_bytes]
+
+
+class MicroBatcherTests(SimpleTestCase):
+
+    def batcher(self, classifier, **options):
+        factory = mock.Mock(return_value=classifier)
+        return MicroBatcher(classifier_factory=factory, **options), factory
+
+    def test_concurrent_requests_share_one_batch(self):
+        classifier = RecordingClassifier()
+        batcher, factory = self.batcher(classifier, max_batch=8, max_wait_ms=2000)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda i: batcher.classify(f'img-{i}'.encode(), timeout=5), range(8)))
+
+        self.assertEqual(classifier.batches, [8])  # full batch: dispatched without waiting out max_wait
+        self.assertEqual([result['echo'] for result in results], [f'img-{i}' for i in range(8)])
+        self.assertEqual((batcher.batches, batcher.images), (1, 8))
+        factory.assert_called_once_with()
+        self.assertTrue(classifier.text_loaded)
+
+    def test_batches_are_capped_and_flushed_after_max_wait(self):
+        classifier = RecordingClassifier()
+        batcher, _ = self.batcher(classifier, max_batch=3, max_wait_ms=50)
+        futures = [batcher.submit(f'img-{i}'.encode()) for i in range(5)]
+        self.assertEqual([future.result(5)['echo'] for future in futures], [f'img-{i}' for i in range(5)])
+        self.assertEqual(classifier.batches, [3, 2])
+
+        self.assertEqual(batcher.classify(b'late', timeout=5)['echo'], 'late')  # a lone request still goes
+        self.assertEqual(classifier.batches, [3, 2, 1])
+
+    def test_errors_reach_every_future_of_the_batch(self):
+        classifier = RecordingClassifier(error=RuntimeError('out of memory'))
+        batcher, _ = self.batcher(classifier, max_batch=4, max_wait_ms=2000)
+        futures = [batcher.submit(f'img-{i}'.encode()) for i in range(4)]
+        for future in futures:
+            with self.assertRaisesMessage(RuntimeError, 'out of memory'):
+                future.result(5)
+        self.assertEqual((batcher.batches, batcher.images), (0, 0))
+
+        classifier.error = None  # the worker thread survives the failure
+        self.assertEqual(batcher.classify(b'next', timeout=5)['echo'], 'next')
+
+    def test_decoded_images_are_handed_through(self):
+        classifier = mock.Mock()
+        classifier.classify_batch.return_value = [{'category': 'other'}]
+        batcher, _ = self.batcher(classifier, max_batch=1)
+        image = Image.new('RGB', (4, 4))
+        batcher.classify(b'raw', timeout=5, image=image)
+        classifier.classify_batch.assert_called_once_with([b'raw'], [image])
+
+
+# ── Unix socket service ───────────────────────────────────────────────────
+
+class InferenceServerTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.socket_path = os.path.join(directory, 'clip.sock')
+        self.classifier = RecordingClassifier()
+        self.batcher = MicroBatcher(classifier_factory=lambda: self.classifier, max_batch=8, max_wait_ms=5)
+
+    def serve(self):
+        server = InferenceServer(self.socket_path, self.batcher)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_client_round_trip(self):
+        self.serve()
+        client = SocketInferenceClient(self.socket_path, timeout=5)
+        self.assertEqual(client.classify(b'first'), {'category': 'other', 'echo': 'first'})
+        self.assertEqual(client.classify(b'second')['echo'], 'second')  # same connection, next frame
+
+        with ThreadPoolExecutor(4) as pool:
+            echoes = list(pool.map(lambda i: client.classify(f'img-{i}'.encode())['echo'], range(4)))
+        self.assertEqual(echoes, [f'img-{i}' for i in range(4)])
+
+    def test_server_errors_come_back_as_results(self):
+        self.serve()
+        self.classifier.error = RuntimeError('model failed')
+        client = SocketInferenceClient(self.socket_path, timeout=5)
+        self.assertEqual(client.classify(b'photo'), {'error': 'model failed'})
+
+    def test_client_reconnects_after_a_server_restart(self):
+        first = self.serve()
+        client = SocketInferenceClient(self.socket_path, timeout=5)
+        self.assertEqual(client.classify(b'before')['echo'], 'before')
+        first.shutdown()
+        first.server_close()
+
+        self.serve()
+        self.assertEqual(client.classify(b'after')['echo'], 'after')
+
+    def test_frames(self):
+        left, right = socket.socketpair()
+        self.addCleanup(left.close)
+        self.addCleanup(right.close)
+        payload = os.urandom(3 * 1024 * 1024)
+        sender = threading.Thread(target=send_frame, args=(left, memoryview(payload)))
+        sender.start()
+        self.assertEqual(bytes(recv_frame(right)), payload)
+        sender.join()
+
+        left.sendall((64 * 1024 * 1024).to_bytes(4, 'big'))
+        with self.assertRaises(ValueError):
+            recv_frame(right)
+
+
+# ── Backends ───────────────────────────────────────────────────────────────
+
+class ColourProjectionBackend(ExportedBackend):
+    """An exported backend whose "vision tower" is a fixed projection of the mean pixel"""
+
+    name = 'projection'
+
+    def encode_images(self, images):
+        pixels = self.preprocess(images).mean(axis=(2, 3))
+        return normalise(pixels @ np.stack([unit_vector(i, 3) for i in range(self.embedding_dim)], axis=1))
+
+
+def write_export(directory, prompts, dim=8, logit_scale=50.0):
+    """The files export_model() writes, without the model files"""
+    directory.mkdir(parents=True, exist_ok=True)
+    embeddings = np.stack([unit_vector(i, dim) for i in range(len(prompts))])
+    np.savez(directory / TEXT_EMBEDDINGS, prompts=np.array(prompts), embeddings=embeddings, logit_scale=logit_scale)
+    (directory / MANIFEST).write_text(json.dumps({
+        'model_name': 'test/clip', 'embedding_dim': dim, 'crop_size': 224, 'resize_to': 224,
+        'image_mean': list(CLIP_IMAGE_MEAN), 'image_std': list(CLIP_IMAGE_STD), 'files': [TEXT_EMBEDDINGS],
+    }))
+    return embeddings
+
+
+class ClipBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        patcher = mock.patch.dict(BACKENDS, {'projection': ColourProjectionBackend})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unknown_backend(self):
+        with self.assertRaisesMessage(ValueError, "Unknown CLIP backend 'tensorrt'"):
+            load_backend('tensorrt', 'test/clip')
+
+    def test_exported_backend_needs_an_export(self):
+        with self.assertRaisesMessage(FileNotFoundError, 'export_clip_model'):
+            load_backend('projection', 'test/clip', artifacts=self.root)
+
+    def test_preprocessor_resizes_and_centre_crops(self):
+        # 448x224: already 224 on the short side, so only the centre 224 columns survive the crop
+        image = Image.new('RGB', (448, 224), (0, 0, 255))
+        image.paste((255, 128, 0), (112, 0, 336, 224))
+        batch = ImagePreprocessor(224)([image, image.resize((896, 448))])
+
+        self.assertEqual((batch.shape, batch.dtype), ((2, 3, 224, 224), np.float32))
+        expected = (np.array([255, 128, 0]) / 255.0 - np.array(CLIP_IMAGE_MEAN)) / np.array(CLIP_IMAGE_STD)
+        np.testing.assert_allclose(batch[0].mean(axis=(1, 2)), expected, rtol=1e-5)
+        np.testing.assert_allclose(batch[1][:, 16:-16, 16:-16].mean(axis=(1, 2)), expected, atol=1e-2)
+
+    def test_exported_text_embeddings(self):
+        embeddings = write_export(self.root, ['pothole', 'trash', 'cable'])
+        backend = load_backend('projection', 'test/clip', artifacts=self.root)
+
+        texts, scale = backend.encode_texts(['cable', 'pothole'])
+        np.testing.assert_array_equal(texts, embeddings[[2, 0]])
+        self.assertEqual(scale, 50.0)
+        with self.assertRaisesMessage(KeyError, "['graffiti']"):
+            backend.encode_texts(['pothole', 'graffiti'])
+
+    def test_classifier_runs_on_an_exported_backend_with_its_own_store(self):
+        write_export(self.root / 'test--clip', LABELS)
+        with override_settings(CLIP_ARTIFACT_DIR=self.root), contextlib.redirect_stdout(io.StringIO()):
+            classifier = IssueClassifier(model_name='test/clip', store_dir=self.root / 'store', backend='projection')
+        red = image_bytes(Image.new('RGB', (320, 240), 'red'))
+        blue = image_bytes(Image.new('RGB', (320, 240), 'blue'))
+        red_result, blue_result = classifier.classify_batch([red, blue])
+
+        self.assertIn(red_result['detected_label'], LABELS)
+        self.assertNotEqual(red_result['detected_label'], blue_result['detected_label'])
+        self.assertEqual(classifier.store.directory, self.root / 'store' / 'test--clip--projection')
+        self.assertEqual(len(classifier.store), 2)
+
+    def test_torch_backend_keeps_the_unsuffixed_store(self):
+        with mock.patch.dict(BACKENDS, {'torch': StubBackend}), contextlib.redirect_stdout(io.StringIO()):
+            classifier = IssueClassifier(model_name='openai/clip', store_dir=self.root, backend='torch')
+        self.assertEqual(classifier.store.directory, self.root / 'openai--clip')
+
+    def test_export_command(self):
+        with self.assertRaisesMessage(CommandError, 'is not a directory'):
+            call_command('export_clip_model', str(self.root / 'missing'))
+
+        manifest = {'embedding_dim': 512, 'files': [TEXT_EMBEDDINGS, 'vision.onnx']}
+        with override_settings(CLIP_ARTIFACT_DIR=self.root, CLIP_MODEL_NAME='test/clip'), \
+                mock.patch('core.management.commands.export_clip_model.export_model', return_value=manifest) as export:
+            call_command(
+                'export_clip_model', str(self.root), '--formats', 'onnx', '--no-quantize', stdout=io.StringIO(),
+            )
+        args, options = export.call_args
+        self.assertEqual(args, (self.root, self.root / 'test--clip', 'test/clip', LABELS))
+        self.assertEqual((options['formats'], options['quantize']), (['onnx'], False))
+
+        with mock.patch('core.management.commands.export_clip_model.export_model', side_effect=ImportError('torch')):
+            with self.assertRaisesMessage(CommandError, 'Export needs torch'):
+                call_command('export_clip_model', str(self.root))
+
+
+# ── Image ingest ───────────────────────────────────────────────────────────
+
+def photo(size, fmt='JPEG', exif=None, seed=0):
+    """A noisy (so not blurry) photo of `size`"""
+    pixels = np.random.default_rng(seed).integers(40, 200, (size[1], size[0], 3), dtype=np.uint8)
+    params = {'exif': exif} if exif is not None else {}
+    return image_bytes(Image.fromarray(pixels), fmt, **params)
+
+
+class ImageIngestTests(SimpleTestCase):
+
+    def test_jpeg_is_draft_decoded_to_the_target_size(self):
+        draft = JpegImagePlugin.JpegImageFile.draft
+        decoded = []
+
+        def spy(img, mode, size):
+            result = draft(img, mode, size)
+            decoded.append(img.size)
+            return result
+
+        with mock.patch.object(JpegImagePlugin.JpegImageFile, 'draft', autospec=True, side_effect=spy) as called:
+            ingested = ingest_image(photo((4000, 3000)))
+
+        self.assertEqual(called.call_args.args[1:], ('RGB', (341, 256)))
+        self.assertEqual(decoded, [(500, 375)])  # libjpeg decoded at 1/8 scale, never at 12MP
+        self.assertEqual(ingested.image.size, (341, 256))
+        self.assertEqual(ingested.image.mode, 'RGB')
+        self.assertEqual((ingested.width, ingested.height), (4000, 3000))
+        self.assertEqual(ingested.metadata['size'], (4000, 3000))
+
+    def test_other_formats_and_small_images(self):
+        png = ingest_image(photo((1200, 900), 'PNG'))
+        self.assertEqual((png.image.size, png.metadata['format']), ((341, 256), 'PNG'))
+
+        portrait = ingest_image(photo((1500, 3000)))
+        self.assertEqual(portrait.image.size, (256, 512))
+
+        small = ingest_image(photo((200, 100)))
+        self.assertEqual((small.image.size, small.width, small.height), ((200, 100), 200, 100))
+
+    def test_sources(self):
+        data = photo((800, 600))
+        self.assertIs(ingest_image(data).data, data)
+        self.assertEqual(ingest_image(memoryview(data)).image.size, (341, 256))
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'photo.jpg')
+        with open(path, 'wb') as f:
+            f.write(data)
+        from_path = ingest_image(path)
+        self.assertIsNone(from_path.data)
+        with open(path, 'rb') as f:
+            self.assertEqual(ingest_image(f).image.size, from_path.image.size)
+
+    def test_exif_metadata(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x0132] = '2026:10:01 09:30:00'
+        exif[0x8825] = {1: 'N', 2: (12.0, 58.0, 30.0), 3: 'E', 4: (77.0, 35.0, 0.0)}
+        metadata = ingest_image(photo((640, 480), exif=exif)).metadata
+
+        self.assertTrue(metadata['has_exif'])
+        self.assertEqual(metadata['orientation'], 6)
+        self.assertEqual(metadata['taken_at'], '2026:10:01 09:30:00')
+        self.assertEqual(metadata['gps'], {'latitude': 12.975, 'longitude': 77.583333})
+        self.assertFalse(ingest_image(photo((640, 480))).metadata['has_exif'])
+
+    def test_gps_coordinates(self):
+        self.assertEqual(
+            gps_coordinates({1: 'S', 2: (33.0, 52.0, 0.0), 3: 'W', 4: (151.0, 12.0, 36.0)}),
+            {'latitude': -33.866667, 'longitude': -151.21},
+        )
+        self.assertIsNone(gps_coordinates({}))
+        self.assertIsNone(gps_coordinates({2: (95.0, 0.0, 0.0), 4: (10.0, 0.0, 0.0)}))
+        self.assertIsNone(gps_coordinates({2: ('x', 0, 0), 4: (10.0, 0.0, 0.0)}))
+
+    def test_quality_checks_run_on_the_ingested_image(self):
+        good, score, issues = ImageAnalyzer.quality_of(ingest_image(photo((1600, 1200))))
+        self.assertEqual((good, score, issues), (True, 1.0, []))
+
+        dark = ingest_image(image_bytes(Image.new('RGB', (1600, 1200), (10, 10, 10)), 'JPEG'))
+        _, score, issues = ImageAnalyzer.quality_of(dark)
+        self.assertEqual(issues, ['Image too dark', 'Image is blurry'])
+        self.assertAlmostEqual(score, (1.0 + 0.4 + 0.5) / 3)
+
+        _, _, issues = ImageAnalyzer.quality_of(ingest_image(photo((200, 150))))
+        self.assertEqual(issues, ['Image resolution too low'])
+
+    def test_view_decodes_once_and_hands_the_pixels_to_the_classifier(self):
+        client = mock.Mock()
+        client.classify.return_value = {'category': 'road_damage', 'confidence': 0.9}
+        upload = SimpleUploadedFile('photo.jpg', photo((4000, 3000)), content_type='image/jpeg')
+        request = APIRequestFactory().post('/api/ai/analyze/', {'image': upload}, format='multipart')
+
+        with mock.patch('civicsense_backend.ai_module.image_analyzer.get_inference_client', return_value=client):
+            response = analyze_image(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ai_category'], 'road_damage')
+        self.assertNotIn('Image resolution too low', response.data['image_quality_issues'])
+        self.assertEqual(response.data['image_metadata']['size'], (4000, 3000))
+        self.assertEqual(client.classify.call_args.kwargs['image'].size, (341, 256))
+
+        bad = SimpleUploadedFile('photo.jpg', b'not an image', content_type='image/jpeg')
+        response = analyze_image(APIRequestFactory().post('/api/ai/analyze/', {'image': bad}, format='multipart'))
+        self.assertEqual(response.status_code, 400)
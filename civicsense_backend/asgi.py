@@ -1,7 +1,10 @@
 """
 ASGI config for civicsense_backend project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``
+and warms the in-process department routing table (core.routing). With
+CLIP_WARMUP_ON_BOOT the CLIP classifier also starts loading on a background
+thread; otherwise it loads on the first image request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +17,13 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'civicsense_backend.settings')
 
 application = get_asgi_application()
+
+# Load the department routing table before the first request needs it
+from core.routing import department_router  # noqa: E402
+
+department_router.warm()
+
+# Optionally start loading the CLIP model without delaying worker startup
+from civicsense_backend.ai_module.inference_service import warm_up_in_background  # noqa: E402
+
+warm_up_in_background()
@@ -135,14 +135,75 @@ USE_TZ        = True
 
 # ── Static and media files ─────────────────────────────────────────────────
 # MEDIA_ROOT is where Django saves uploaded issue photos.
-# In production, serve /media/ from nginx or a cloud storage bucket.
+# In production, serve /media/ from nginx or a cloud storage bucket. Photo
+# originals (issue_photos/) and derivatives (derivatives/) are named by
+# content hash, so they can be served with
+# "Cache-Control: public, max-age=31536000, immutable".
 STATIC_URL  = "static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 MEDIA_URL   = "/media/"
 MEDIA_ROOT  = os.path.join(BASE_DIR, "media")
 
+# ── Photo derivatives ──────────────────────────────────────────────────────
+# Renditions generated off the request path by the "generate_photo_derivatives"
+# job (core.media), exposed as photos_thumb_url / photos_srcset. Formats the
+# installed Pillow cannot encode are skipped.
+IMAGE_RENDITIONS         = {"thumb": 320, "medium": 1024}   # name -> longest side (px)
+IMAGE_DERIVATIVE_FORMATS = ["avif", "webp"]
+IMAGE_DERIVATIVE_QUALITY = {"avif": 50, "webp": 80}
+
+# ── Duplicate reports ──────────────────────────────────────────────────────
+# core.duplicates flags a submitted photo as a repeat of an unresolved report
+# of the same category within DUPLICATE_WINDOW_DAYS and DUPLICATE_RADIUS_M
+# whose dHash differs in at most DUPLICATE_MAX_DISTANCE bits (3 at most, the
+# banded index guarantees no more). Within DUPLICATE_REUSE_DISTANCE bits the
+# earlier Gemini Vision result is reused instead of calling the API again.
+DUPLICATE_MAX_DISTANCE   = 3
+DUPLICATE_REUSE_DISTANCE = 1
+DUPLICATE_RADIUS_M       = 75
+DUPLICATE_WINDOW_DAYS    = 30
+
+# ── Upload limits ──────────────────────────────────────────────────────────
+# core.uploads.LimitedUploadHandler checks every multipart upload while it
+# streams in and answers 413 as soon as a file passes MAX_UPLOAD_BYTES or
+# its image header reports more than MAX_UPLOAD_PIXELS. Uploads up to
+# FILE_UPLOAD_MAX_MEMORY_SIZE stay in memory; larger ones are spooled to a
+# temp file, which analysis memory-maps and the storage moves into place.
+MAX_UPLOAD_BYTES  = int(os.environ.get("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+MAX_UPLOAD_PIXELS = int(os.environ.get("MAX_UPLOAD_PIXELS", "50000000"))
+FILE_UPLOAD_HANDLERS = [
+    "core.uploads.LimitedUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# ── Cache ──────────────────────────────────────────────────────────────────
+# Rate-limit counters (core.ratelimit) live in the default cache. Set
+# REDIS_URL in production so every worker process shares one set of
+# counters; the LocMem fallback is per-process, so each worker would
+# otherwise enforce its own limit.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND":  "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND":  "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "civicsense",
+        }
+    }
+
+# Reverse proxies (nginx, a load balancer) in front of Django. Rate limits
+# key on the X-Forwarded-For entry appended by the outermost of them; with
+# 0 the header is ignored and REMOTE_ADDR is used, since clients can set it.
+TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT", "0"))
+
 # ── CORS ───────────────────────────────────────────────────────────────────
 # CORS_ALLOW_ALL_ORIGINS is True in DEBUG so the Vite dev server can reach
 # the API regardless of which port it binds to. Set to False in production
@@ -169,6 +230,13 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    # Sliding-window limits enforced by core.ratelimit throttles
+    # (per IP, plus per user when authenticated).
+    "DEFAULT_THROTTLE_RATES": {
+        "issue_create": "30/hour",
+        "login":        "10/min",
+        "register":     "5/hour",
+    },
 }
 
 # ── SimpleJWT ─────────────────────────────────────────────────────────────
@@ -198,6 +266,94 @@ REST_USE_JWT          = True
 JWT_AUTH_COOKIE       = "access"
 JWT_AUTH_REFRESH_COOKIE = "refresh"
 
+# ── Background jobs ───────────────────────────────────────────────────────
+# Gemini Vision analysis runs off the request path through core.jobs.
+# The database backend needs no broker: start one or more workers with
+# `python manage.py run_jobs`. Set CIVICSENSE_JOB_BACKEND to
+# "core.jobs.ImmediateJobBackend" to run jobs in-process after commit
+# (handy for local development without a worker).
+CIVICSENSE_JOB_BACKEND = os.environ.get("CIVICSENSE_JOB_BACKEND", "core.jobs.DatabaseJobBackend")
+JOB_MAX_ATTEMPTS     = 5
+JOB_RETRY_BASE_DELAY = 30      # seconds; doubles on each failed attempt
+JOB_RETRY_MAX_DELAY  = 3600
+JOB_LEASE_SECONDS    = 300     # a running job is re-claimed after this long
+
+# ── Reports ────────────────────────────────────────────────────────────────
+# The weekly city health report is built from the IssueRollup table and
+# cached; any issue write invalidates it sooner.
+WEEKLY_REPORT_CACHE_SECONDS = 300
+
+# Hotspots are density clusters (core.hotspots): issues within
+# HOTSPOT_RADIUS_METERS of each other, at least HOTSPOT_MIN_ISSUES per
+# neighbourhood.
+HOTSPOT_RADIUS_METERS = 500
+HOTSPOT_MIN_ISSUES    = 3
+
+# Department dashboard stats are cached per department; issue changes
+# invalidate them sooner.
+DEPARTMENT_STATS_CACHE_SECONDS = 60
+
+# New issues are routed from an in-process department table (core.routing).
+# Department edits reload it at once in the editing process; other worker
+# processes pick them up within this many seconds.
+DEPARTMENT_ROUTING_REFRESH_SECONDS = 300
+
+# ── Local CLIP classifier ──────────────────────────────────────────────────
+# civicsense_backend.ai_module.ai_classifier. Image embeddings are cached on
+# disk by content hash (plus the prompt text embeddings) under
+# CLIP_EMBEDDING_DIR; share the directory between workers on one host.
+CLIP_MODEL_NAME    = os.environ.get("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
+CLIP_EMBEDDING_DIR = Path(os.environ.get("CLIP_EMBEDDING_DIR", BASE_DIR / "var" / "clip_embeddings"))
+
+# Inference backend: "torch" (eager FP32, default), "torchscript", "onnx"
+# (ONNX Runtime, INT8-quantized) or "onnx-fp32". All but "torch" run the
+# artifacts `manage.py export_clip_model` writes under CLIP_ARTIFACT_DIR;
+# compare them with `manage.py benchmark clip_backends`.
+CLIP_BACKEND      = os.environ.get("CLIP_BACKEND", "torch")
+CLIP_ARTIFACT_DIR = Path(os.environ.get("CLIP_ARTIFACT_DIR", BASE_DIR / "var" / "clip_models"))
+
+# Inference is micro-batched (ai_module/inference_service.py): concurrent
+# requests wait up to CLIP_MAX_WAIT_MS to share one forward pass of at most
+# CLIP_MAX_BATCH images. With CLIP_INFERENCE_SOCKET set, web workers send
+# images to `manage.py clip_server` on that Unix socket (one model copy per
+# host); otherwise each process runs its own batcher thread.
+CLIP_INFERENCE_SOCKET = os.environ.get("CLIP_INFERENCE_SOCKET", "")
+CLIP_MAX_BATCH        = int(os.environ.get("CLIP_MAX_BATCH", "16"))
+CLIP_MAX_WAIT_MS      = float(os.environ.get("CLIP_MAX_WAIT_MS", "10"))
+CLIP_INTRA_OP_THREADS = int(os.environ.get("CLIP_INTRA_OP_THREADS", "0")) or None
+
+# torch/transformers are imported only when the classifier is first used.
+# Set CLIP_WARMUP_ON_BOOT=1 to load it on a background thread as soon as a
+# wsgi/asgi worker starts instead of on the first image request.
+CLIP_WARMUP_ON_BOOT = os.environ.get("CLIP_WARMUP_ON_BOOT", "0") == "1"
+
+# Budget for `manage.py check_import_time` (django.setup() + URLconf load)
+STARTUP_IMPORT_BUDGET_MS = int(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "1500"))
+
 # ── API keys ───────────────────────────────────────────────────────────────
 # Loaded from .env.backend — never hardcode these values.
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+
+# Request budget shared by batch Gemini jobs (analyze_existing_issues).
+# 15 requests/minute matches the free tier; raise it for paid quotas.
+GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "15"))
+
+# Shared model router (core.llm): how often the account's model list is
+# re-discovered, and how long a quota-exhausted (429) model is skipped.
+GEMINI_MODEL_DISCOVERY_TTL = 3600   # seconds
+GEMINI_RATE_LIMIT_COOLDOWN = 60     # seconds
+
+# Gemini Vision result cache (core.analysis_cache): a per-process LRU in
+# front of CachedVisionAnalysis rows, which expire after the TTL and are
+# trimmed to VISION_CACHE_MAX_ENTRIES by least recent use.
+VISION_CACHE_TTL_SECONDS    = 30 * 24 * 3600
+VISION_CACHE_MAX_ENTRIES    = 50000
+VISION_CACHE_MEMORY_ENTRIES = 512
+
+# Chatbot response cache (core.chat_cache): replies to conversations of at
+# most CHAT_CACHE_MAX_MESSAGES messages are reused for the same question,
+# or one whose hashed TF-IDF cosine similarity reaches CHAT_CACHE_SIMILARITY.
+CHAT_CACHE_TTL_SECONDS  = 24 * 3600
+CHAT_CACHE_MAX_ENTRIES  = 2000
+CHAT_CACHE_SIMILARITY   = 0.8
+CHAT_CACHE_MAX_MESSAGES = 3
@@ -8,7 +8,8 @@ URL routing strategy:
   - Department auth uses a separate endpoint (/api/auth/department-login/).
   - Issue CRUD is served by IssueViewSet via DefaultRouter.
   - Department issue management uses a second router (dept_router).
-  - The chatbot proxy lives at /api/chat/.
+  - The chatbot proxy lives at /api/chat/; /api/chat/stream/ is the async
+    server-sent-events variant (serve via civicsense_backend.asgi).
   - Media files are served by Django only in DEBUG mode; use a proper
     file server (nginx, S3) in production.
 
@@ -36,7 +37,7 @@ from core.views import (
     login_user,
     register_user,
 )
-from core.chat_views import ChatView
+from core.chat_views import ChatView, ChatStreamView
 
 # ── Routers ────────────────────────────────────────────────────────────────
 
@@ -70,6 +71,7 @@ urlpatterns = [
 
     # AI chatbot proxy (rate-limited; calls Gemini on the backend)
     path("api/chat/", ChatView.as_view(), name="chat"),
+    path("api/chat/stream/", ChatStreamView.as_view(), name="chat_stream"),
 ]
 
 # Serve uploaded media files during development only.
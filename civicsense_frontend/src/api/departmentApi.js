@@ -21,6 +21,8 @@ async function request(method, path, body) {
 export const deptLoginApi = (username, password) =>
   request("POST", "/auth/department-login/", { username, password });
 
+// Paginated: resolves to { ok, status, data: { next, previous, results } }.
+// Pass the `cursor` query param from data.next to fetch the following page.
 export const fetchDeptIssues = (params = "") =>
   request("GET", `/department/issues/${params ? `?${params}` : ""}`);
 
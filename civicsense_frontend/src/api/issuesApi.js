@@ -8,18 +8,34 @@
 
 import axiosInstance from './axios';
 
+/**
+ * Extracts the opaque `cursor` token from a paginated response's
+ * `next`/`previous` URL, or returns null when there is no further page.
+ *
+ * @param {string|null} url - The `next` or `previous` link from the API
+ * @returns {string|null} Cursor token to pass back to the list call
+ */
+export function cursorFrom(url) {
+  if (!url) return null;
+  return new URL(url, window.location.origin).searchParams.get('cursor');
+}
+
 /**
  * GET /api/issues/
- * Returns the current citizen's issues, optionally filtered.
+ * Returns one page of the current citizen's issues, newest first,
+ * optionally filtered.
  *
- * @param {Object} filters - Optional query params: { category, status, severity }
- * @returns {Array} List of issue objects
+ * @param {Object} filters - Optional query params: { category, status, severity, fields }
+ * @param {string|null} cursor - Cursor of the page to fetch (see cursorFrom); first page if omitted
+ * @returns {{ next: string|null, previous: string|null, results: Array }} Page of issue objects
  */
-export async function fetchMyIssues(filters = {}) {
+export async function fetchMyIssues(filters = {}, cursor = null) {
   const params = new URLSearchParams();
   if (filters.category) params.set('category', filters.category);
   if (filters.status)   params.set('status',   filters.status);
   if (filters.severity) params.set('severity',  filters.severity);
+  if (filters.fields)   params.set('fields',    filters.fields);
+  if (cursor)           params.set('cursor',    cursor);
 
   const qs  = params.toString();
   const res = await axiosInstance.get(`issues/${qs ? `?${qs}` : ''}`);
@@ -51,3 +67,35 @@ export async function submitIssue(formData) {
   });
   return res.data;
 }
+
+/**
+ * GET /api/issues/nearby/
+ * Returns city-wide issue summaries within `radius` metres of a point,
+ * nearest first. Filtering happens server-side on a spatial index.
+ *
+ * @param {number} lat    - Latitude of the centre point
+ * @param {number} lng    - Longitude of the centre point
+ * @param {number} radius - Search radius in metres (default 1000, max 50000)
+ * @returns {Array} Issue summaries, each with a `distance_m` field
+ */
+export async function fetchNearbyIssues(lat, lng, radius = 1000) {
+  const params = new URLSearchParams({ lat, lng, radius });
+  const res = await axiosInstance.get(`issues/nearby/?${params}`);
+  return res.data;
+}
+
+/**
+ * GET /api/issues/bbox/
+ * Returns city-wide issue summaries inside the visible map bounds,
+ * newest first.
+ *
+ * @param {Object} bounds - { minLat, minLng, maxLat, maxLng }
+ * @returns {Array} Issue summaries
+ */
+export async function fetchIssuesInBounds({ minLat, minLng, maxLat, maxLng }) {
+  const params = new URLSearchParams({
+    min_lat: minLat, min_lng: minLng, max_lat: maxLat, max_lng: maxLng,
+  });
+  const res = await axiosInstance.get(`issues/bbox/?${params}`);
+  return res.data;
+}
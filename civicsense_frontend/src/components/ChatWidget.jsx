@@ -2,8 +2,9 @@
  * ChatWidget.jsx
  *
  * Floating AI assistant widget available on every page. Sends citizen
- * messages to POST /api/chat/ (Django proxies to Google Gemini) and renders
- * the replies with light markdown formatting (bold, line breaks).
+ * messages to POST /api/chat/stream/ (Django proxies to Google Gemini) and
+ * renders the reply as it streams in, with light markdown formatting
+ * (bold, line breaks).
  *
  * Key behaviours:
  *   - Slide-up panel, 360 x 480 px, fixed bottom-right
@@ -150,6 +151,7 @@ export default function ChatWidget() {
   const [open, setOpen] = useState(false);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [showChips, setShowChips] = useState(true);
   const [unread, setUnread] = useState(false);
   const [bounced, setBounced] = useState(false);
@@ -208,22 +210,63 @@ export default function ChatWidget() {
       .map(({ role, content }) => ({ role, content }));
 
     try {
-      const res = await fetch("/api/chat/", {
+      const res = await fetch("/api/chat/stream/", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ messages: apiMessages, page_hint: pageHint() }),
       });
+      if (!res.ok || !res.body) throw new Error(`Chat request failed: ${res.status}`);
+
+      // Server-sent events: "delta" frames append text to a live message,
+      // the final "done" frame carries the full reply used for chips/links.
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let partial = "";
+      let finalText = null;
+
+      const applyFrame = (frame) => {
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = frame.match(/^data: (.*)$/m)?.[1];
+        if (!event || !data) return;
+        const payload = JSON.parse(data);
+        if (event === "delta") {
+          if (!partial) setStreaming(true);
+          partial += payload.text;
+          const text = partial;
+          setMessages((prev) =>
+            prev[prev.length - 1]?.streaming
+              ? [...prev.slice(0, -1), { ...prev[prev.length - 1], content: text }]
+              : [...prev, { ...makeMsg("assistant", text), streaming: true }],
+          );
+        } else if (event === "done") {
+          finalText = payload.reply;
+        }
+      };
+
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        frames.forEach(applyFrame);
+      }
 
-      const data = await res.json();
-      const replyText = data.reply || "Something went wrong. Please try again.";
-      setMessages((prev) => [...prev, makeAssistantMsg(replyText)]);
-    } catch {
+      const replyText = finalText || partial || "Something went wrong. Please try again.";
+      setMessages((prev) => [
+        ...prev.filter((m) => !m.streaming),
+        makeAssistantMsg(replyText),
+      ]);
+    } catch (err) {
+      console.error("ChatWidget: streaming chat request failed", err);
       setMessages((prev) => [
-        ...prev,
+        ...prev.filter((m) => !m.streaming),
         makeAssistantMsg("I am having trouble connecting. Please try again in a moment."),
       ]);
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -381,7 +424,7 @@ export default function ChatWidget() {
             )}
 
             {/* Typing indicator */}
-            {loading && (
+            {loading && !streaming && (
               <div className="flex justify-start">
                 <div className="bg-gray-100 px-3 py-2.5 rounded-lg flex items-center gap-1">
                   <div className="w-1.5 h-1.5 bg-gray-400 rounded-full animate-bounce" style={{ animationDelay: "0ms" }} />
@@ -7,21 +7,27 @@
  *
  * Filters are memoised via JSON.stringify so referential equality is not
  * required — callers can pass an inline object literal safely.
+ *
+ * The list endpoint is cursor-paginated: the first page is loaded on mount
+ * and loadMore() appends the next one while hasMore is true.
  */
 
 import { useState, useEffect, useCallback } from 'react';
-import { fetchMyIssues } from '../api/issuesApi';
+import { cursorFrom, fetchMyIssues } from '../api/issuesApi';
 
 /**
  * Fetches and returns the authenticated citizen's issues.
  *
- * @param {Object} filters - Optional server-side filters: { category, status, severity }
- * @returns {{ issues: Array, loading: boolean, error: string|null, refetch: Function }}
+ * @param {Object} filters - Optional server-side filters: { category, status, severity, fields }
+ * @returns {{ issues: Array, loading: boolean, error: string|null, refetch: Function,
+ *             hasMore: boolean, loadingMore: boolean, loadMore: Function }}
  */
 export function useIssues(filters = {}) {
-  const [issues,  setIssues]  = useState([]);
-  const [loading, setLoading] = useState(true);
-  const [error,   setError]   = useState(null);
+  const [issues,      setIssues]      = useState([]);
+  const [loading,     setLoading]     = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [error,       setError]       = useState(null);
+  const [nextCursor,  setNextCursor]  = useState(null);
 
   const load = useCallback(async () => {
     setLoading(true);
@@ -30,6 +36,7 @@ export function useIssues(filters = {}) {
       const data = await fetchMyIssues(filters);
       // The API may return a plain array or a DRF paginated { results: [] } object
       setIssues(Array.isArray(data) ? data : data.results ?? []);
+      setNextCursor(Array.isArray(data) ? null : cursorFrom(data.next));
     } catch (err) {
       setError(err.response?.data?.error ?? 'Failed to load issues.');
     } finally {
@@ -38,7 +45,22 @@ export function useIssues(filters = {}) {
   // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [JSON.stringify(filters)]);
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchMyIssues(filters, nextCursor);
+      setIssues((prev) => [...prev, ...(data.results ?? [])]);
+      setNextCursor(cursorFrom(data.next));
+    } catch (err) {
+      setError(err.response?.data?.error ?? 'Failed to load more issues.');
+    } finally {
+      setLoadingMore(false);
+    }
+  // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [nextCursor, JSON.stringify(filters)]);
+
   useEffect(() => { load(); }, [load]);
 
-  return { issues, loading, error, refetch: load };
+  return { issues, loading, error, refetch: load, hasMore: Boolean(nextCursor), loadingMore, loadMore };
 }
@@ -90,7 +90,8 @@ const Home = () => {
   const fetchIssues = async () => {
     try {
       const response = await axios.get(`${API_BASE_URL}issues/`);
-      setIssues(response.data);
+      // Paginated list: { next, previous, results }
+      setIssues(response.data.results ?? response.data);
     } catch (error) {
       console.error('Error fetching issues:', error);
     }
@@ -72,7 +72,7 @@ function StatusTimeline({ status }) {
 }
 
 // ─── Feature 6: Photo lightbox ───────────────────────────────────────────────
-function PhotoLightbox({ src, category, severity }) {
+function PhotoLightbox({ src, previewSrc, srcSets, category, severity }) {
   const [open, setOpen] = useState(false);
   const cap = (s) => s ? s.charAt(0).toUpperCase() + s.slice(1) : "";
   const label = `${cap(severity)} ${getCategoryLabel(category)} — uploaded by citizen`;
@@ -88,12 +88,19 @@ function PhotoLightbox({ src, category, severity }) {
             Photo Evidence Attached
           </span>
         </div>
-        <img
-          src={src}
-          alt="Submitted photo"
-          className="w-full max-h-80 object-cover rounded-lg border border-gray-100 cursor-zoom-in"
-          onClick={() => setOpen(true)}
-        />
+        {/* Resized AVIF/WebP renditions when available; the lightbox shows the original */}
+        <picture>
+          {Object.entries(srcSets || {}).map(([type, srcSet]) => (
+            <source key={type} type={type} srcSet={srcSet} sizes="(min-width: 1024px) 640px, 100vw" />
+          ))}
+          <img
+            src={previewSrc || src}
+            alt="Submitted photo"
+            loading="lazy"
+            className="w-full max-h-80 object-cover rounded-lg border border-gray-100 cursor-zoom-in"
+            onClick={() => setOpen(true)}
+          />
+        </picture>
         <p className="text-xs text-gray-500 mt-2">{label}</p>
       </div>
 
@@ -263,6 +270,8 @@ export default function IssueDetail() {
           {issue.photos_url ? (
             <PhotoLightbox
               src={issue.photos_url}
+              previewSrc={issue.photos_thumb_url}
+              srcSets={issue.photos_srcset}
               category={issue.category}
               severity={issue.severity}
             />
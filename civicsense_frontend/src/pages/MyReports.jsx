@@ -25,7 +25,7 @@ const SELECT_CLS =
 
 export default function MyReports() {
   const navigate = useNavigate();
-  const { issues, loading, error } = useIssues();
+  const { issues, loading, error, hasMore, loadingMore, loadMore } = useIssues();
 
   const [search,          setSearch]          = useState("");
   const [filterCategory,  setFilterCategory]  = useState("");
@@ -177,6 +177,19 @@ export default function MyReports() {
           ))}
         </div>
       )}
+
+      {!loading && !error && hasMore && (
+        <div className="mt-6 text-center">
+          <button
+            type="button"
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 border border-gray-200 text-sm font-medium text-gray-700 rounded-lg hover:border-gray-400 transition-colors duration-150 disabled:opacity-50"
+          >
+            {loadingMore ? "Loading…" : "Load more"}
+          </button>
+        </div>
+      )}
     </PageWrapper>
   );
 }
@@ -2,9 +2,10 @@
  * DepartmentDashboard.jsx
  *
  * Overview dashboard for department officers. Displays four stat cards
- * (total, pending, in-progress, resolved) fetched from
- * GET /api/department/stats/, and a table of the five most recent pending
- * issues fetched from GET /api/department/issues/?status=pending.
+ * (total, pending, in-progress, resolved) and a resolution-time / pending
+ * backlog summary fetched from GET /api/department/stats/, and a table of
+ * the five most recent pending issues fetched from
+ * GET /api/department/issues/?status=pending.
  *
  * Both requests run in parallel via Promise.all on mount. A "View all"
  * link navigates to the full DepartmentIssues page.
@@ -65,6 +66,10 @@ export default function DepartmentDashboard() {
   }, []);
 
   const recent = issues.slice(0, 5);
+  const resolution = stats?.resolution_hours;
+  const stalePending = (stats?.pending_age ?? [])
+    .filter((b) => b.bucket === "7-30d" || b.bucket === ">30d")
+    .reduce((sum, b) => sum + b.count, 0);
 
   return (
     <div className="min-h-screen bg-[#f9fafb]">
@@ -95,6 +100,15 @@ export default function DepartmentDashboard() {
           </div>
         )}
 
+        {/* Resolution time + backlog age */}
+        {!loading && stats && (
+          <div className="bg-white border border-gray-200 rounded-lg shadow-sm px-5 py-3 mb-6 flex flex-wrap gap-x-8 gap-y-1 text-sm text-gray-600">
+            <span>Median resolution: <strong className="text-gray-900">{resolution?.p50 != null ? `${resolution.p50} h` : "—"}</strong></span>
+            <span>90th percentile: <strong className="text-gray-900">{resolution?.p90 != null ? `${resolution.p90} h` : "—"}</strong></span>
+            <span>Pending over 7 days: <strong className="text-gray-900">{stalePending}</strong></span>
+          </div>
+        )}
+
         {/* Recent pending issues */}
         <div className="bg-white border border-gray-200 rounded-lg shadow-sm">
           <div className="px-5 py-4 border-b border-gray-200 flex items-center justify-between">
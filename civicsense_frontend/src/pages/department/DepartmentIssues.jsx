@@ -26,15 +26,32 @@ export default function DepartmentIssues() {
   const [filter, setFilter]       = useState("");
   const [search, setSearch]       = useState("");
   const [selected, setSelected]   = useState(null);
+  const [nextUrl, setNextUrl]     = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const load = useCallback(async () => {
     setLoading(true);
     const params = filter ? `status=${filter}` : "";
     const { ok, data } = await fetchDeptIssues(params);
-    if (ok) setIssues(data.results ?? data ?? []);
+    if (ok) {
+      setIssues(data.results ?? data ?? []);
+      setNextUrl(data.next ?? null);
+    }
     setLoading(false);
   }, [filter]);
 
+  const loadMore = async () => {
+    if (!nextUrl) return;
+    setLoadingMore(true);
+    // Reuse the server's next link (it carries the filter and cursor)
+    const { ok, data } = await fetchDeptIssues(new URL(nextUrl, window.location.origin).search.slice(1));
+    if (ok) {
+      setIssues((prev) => [...prev, ...(data.results ?? [])]);
+      setNextUrl(data.next ?? null);
+    }
+    setLoadingMore(false);
+  };
+
   useEffect(() => { load(); }, [load]);
 
   const handleUpdated = (updatedIssue) => {
@@ -157,6 +174,18 @@ export default function DepartmentIssues() {
             </div>
           )}
         </div>
+
+        {!loading && nextUrl && (
+          <div className="mt-4 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-4 py-2 border border-gray-200 bg-white text-sm font-medium text-gray-700 rounded-lg hover:border-gray-400 transition-colors duration-150 disabled:opacity-50"
+            >
+              {loadingMore ? "Loading…" : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
 
       {selected && (
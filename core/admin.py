@@ -1,8 +1,9 @@
 """
 Django admin registrations for the CivicSense core application.
 
-Registers Department, DepartmentProfile, and Issue models so they are
-accessible in the Django admin interface at /admin/.
+Registers Department, DepartmentProfile, Issue, BackgroundJob and
+CachedVisionAnalysis models so they are accessible in the Django admin
+interface at /admin/.
 
 Module: core
 Author: Ankitha
@@ -10,7 +11,7 @@ Author: Ankitha
 
 from django.contrib import admin
 
-from .models import Department, DepartmentProfile, Issue
+from .models import BackgroundJob, CachedVisionAnalysis, Department, DepartmentProfile, Issue
 
 
 @admin.register(Department)
@@ -35,10 +36,30 @@ class IssueAdmin(admin.ModelAdmin):
     """Admin view for citizen issue reports."""
 
     list_display  = ("title", "category", "severity", "status", "user", "created_at")
-    list_filter   = ("status", "category", "severity")
+    list_filter   = ("status", "category", "severity", "ai_status")
     search_fields = ("title", "description", "location")
     readonly_fields = (
         "created_at", "updated_at", "resolved_at",
         "ai_detected_category", "ai_confidence", "ai_matches_report",
-        "ai_description", "ai_severity",
+        "ai_description", "ai_severity", "ai_status",
     )
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """Admin view for queued and completed background jobs."""
+
+    list_display    = ("task", "issue", "status", "attempts", "run_after", "updated_at")
+    list_filter     = ("status", "task")
+    readonly_fields = ("created_at", "updated_at", "locked_at", "last_error")
+
+
+@admin.register(CachedVisionAnalysis)
+class CachedVisionAnalysisAdmin(admin.ModelAdmin):
+    """Admin view for cached Gemini Vision results (read-only; see manage.py vision_cache)."""
+
+    list_display    = ("image_sha256", "model", "prompt_version", "hits", "last_used_at", "expires_at")
+    list_filter     = ("model", "prompt_version")
+    search_fields   = ("image_sha256",)
+    readonly_fields = ("key", "image_sha256", "prompt_version", "model", "result", "hits",
+                       "created_at", "last_used_at", "expires_at")
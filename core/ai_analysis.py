@@ -7,41 +7,39 @@ detected category, confidence score, severity assessment, a factual
 description of what is visible, and whether the image matches the
 citizen-reported category.
 
-Model selection uses the same lazy discovery and preference-ordered fallback
-strategy as core.chat_views: available flash models are fetched once on first
-call and cached for the process lifetime. The model that last succeeded is
-tried first on each subsequent request.
+analyze_issue_images_batch() packs several photos into one request with an
+array-of-results response schema; it is used by the analyze_existing_issues
+backfill to stay within the requests-per-minute quota.
+
+Client reuse, model discovery, health tracking and fallback are delegated
+to the shared router in core.llm, which is also used by core.chat_views.
+
+Parsed results are memoised in core.analysis_cache, keyed by image hash,
+prompt version (VISION_PROMPT_VERSION / BATCH_PROMPT_VERSION, derived from
+the templates, so editing a prompt invalidates the old entries), model
+and report text. Photos with a cached result are never sent again.
 
 Module: core
 Author: Ankitha
 """
 
 # Standard library
+import hashlib
 import json
 import logging
 import mimetypes
 import re
-import time
 
 # Third-party
-from google import genai
 from google.genai import types
 from google.genai.errors import ClientError
 from django.conf import settings
 
-logger = logging.getLogger(__name__)
+# Local
+from .analysis_cache import prompt_version, vision_cache
+from .llm import error_code, router
 
-PREFERRED = [
-    "gemini-2.5-flash-lite",
-    "gemini-2.5-flash",
-    "gemini-2.0-flash-lite",
-    "gemini-2.0-flash",
-    "gemini-flash-latest",
-]
-
-# Process-level cache — separate from chat_views to avoid cross-contamination
-_vision_available_models = None
-_vision_working_model = None
+logger = logging.getLogger(__name__)
 
 VISION_PROMPT = (
     "You are analyzing a photo submitted with a civic issue report in India.\n"
@@ -58,78 +56,129 @@ VISION_PROMPT = (
     '}}'
 )
 
+# Batched variant used by the analyze_existing_issues backfill. The per-photo
+# context is interleaved with the images; the output shape is enforced by
+# BATCH_RESPONSE_SCHEMA rather than described in prose.
+BATCH_VISION_PROMPT = (
+    "You are analyzing several photos submitted with civic issue reports in India.\n"
+    "Each photo is preceded by its numbered report. For every photo return one object with:\n"
+    "index (the photo number), detected_category (one of Road Damage, Garbage, Streetlight, "
+    "Water Leak, Encroachment, Other), confidence (integer 0-100 for how clearly the image "
+    "shows this category), matches_report (whether the image matches the reported category), "
+    "description (one factual sentence describing what is visible) and severity_assessment "
+    "(one of Minor, Moderate, Severe, Critical based on what is visible)."
+)
+
+BATCH_ITEM_PROMPT = (
+    "Photo {index}\n"
+    "Reported title: {title}\n"
+    "Reported description: {description}\n"
+    "Reported category: {category}"
+)
 
-def _discover_vision_models(api_key):
-    global _vision_available_models
-    if _vision_available_models is not None:
-        return _vision_available_models
+BATCH_RESPONSE_SCHEMA = types.Schema(
+    type="ARRAY",
+    items=types.Schema(
+        type="OBJECT",
+        properties={
+            "index":               types.Schema(type="INTEGER"),
+            "detected_category":   types.Schema(type="STRING"),
+            "confidence":          types.Schema(type="INTEGER"),
+            "matches_report":      types.Schema(type="BOOLEAN"),
+            "description":         types.Schema(type="STRING"),
+            "severity_assessment": types.Schema(type="STRING"),
+        },
+        required=[
+            "index", "detected_category", "confidence",
+            "matches_report", "description", "severity_assessment",
+        ],
+    ),
+)
+
+VISION_PROMPT_VERSION = prompt_version(VISION_PROMPT)
+BATCH_PROMPT_VERSION  = prompt_version(
+    BATCH_VISION_PROMPT, BATCH_ITEM_PROMPT, BATCH_RESPONSE_SCHEMA.model_dump_json(),
+)
+
+
+def _read_image(image_path):
+    """Return (bytes, mime_type) for an image file, or (None, None) if unreadable."""
     try:
-        client = genai.Client(api_key=api_key)
-        discovered = [
-            m.name.replace("models/", "")
-            for m in client.models.list()
-            if "flash" in m.name.lower()
-            and "generateContent" in (m.supported_actions or [])
-        ]
-        print(f"[CivicSense AI] Available flash models for vision: {discovered}")
-        _vision_available_models = discovered
-    except Exception as exc:
-        logger.warning("[CivicSense AI] Model discovery failed (%s). Falling back to preferred list.", exc)
-        _vision_available_models = list(PREFERRED)
-    return _vision_available_models
-
-
-def _ordered_vision_models(api_key):
-    available = _discover_vision_models(api_key)
-    available_set = set(available)
-    ordered = [m for m in PREFERRED if m in available_set]
-    for m in available:
-        if m not in ordered:
-            ordered.append(m)
-    if _vision_working_model and _vision_working_model in ordered:
-        ordered = [_vision_working_model] + [m for m in ordered if m != _vision_working_model]
-    return ordered
-
-
-def _extract_retry_delay(exc):
-    msg = str(exc)
-    m = re.search(r"retryDelay['\"]:\s*['\"](\d+(?:\.\d+)?)s", msg)
-    if m:
-        return float(m.group(1))
-    m = re.search(r"retry in (\d+(?:\.\d+)?)s", msg, re.IGNORECASE)
-    if m:
-        return float(m.group(1))
-    return None
-
-
-def analyze_issue_image(image_path, title, description, category):
+        with open(image_path, "rb") as fh:
+            image_bytes = fh.read()
+    except OSError as exc:
+        logger.warning("[CivicSense AI] Could not read image file %s: %s", image_path, exc)
+        return None, None
+
+    mime_type, _ = mimetypes.guess_type(str(image_path))
+    if not mime_type or not mime_type.startswith("image/"):
+        mime_type = "image/jpeg"
+    return image_bytes, mime_type
+
+
+def _strip_fences(raw):
+    """Strip markdown fences if the model wraps the JSON anyway."""
+    raw = re.sub(r"^```(?:json)?\s*", "", raw.strip(), flags=re.IGNORECASE)
+    return re.sub(r"\s*```$", "", raw)
+
+
+def _normalize_result(result):
+    """Coerce a raw model JSON object into the analysis dict stored on Issue."""
+    return {
+        "detected_category": str(result.get("detected_category", "Other")),
+        "confidence": int(result.get("confidence", 0)),
+        "matches_report": bool(result.get("matches_report", False)),
+        "description": str(result.get("description", ""))[:255],
+        "severity_assessment": str(result.get("severity_assessment", "")),
+    }
+
+
+def _generate(api_key, contents, config, client=None):
+    """
+    Run generate_content through the shared model router (see core.llm).
+
+    Returns (response_text, model), or (None, None) if all models are exhausted.
+    ClientErrors other than 429/404 propagate to the caller.
+    """
+    def generate(client, model):
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+        return response.text or ""
+
+    return router.call(api_key, generate, client=client, log_prefix="[CivicSense AI]")
+
+
+def analyze_issue_image(image_path, title, description, category, client=None, cache=vision_cache):
     """
     Analyze an uploaded civic issue photo using Gemini Vision.
 
     Returns a dict with keys: detected_category, confidence, matches_report,
     description, severity_assessment — or None on any failure.
 
+    A result cached for the same photo, prompt, model and report text is
+    returned without calling Gemini; `cache=None` bypasses the cache.
+    `client` may be injected (stubs in benchmarks).
+
     Never raises: all errors are caught and logged so callers never crash.
-    Production note: move this call into a Celery task to avoid blocking
-    the HTTP request thread on the API round-trip.
+    Called from the background job queue (core.tasks), never on the
+    request thread.
     """
-    global _vision_available_models, _vision_working_model
-
     api_key = settings.GEMINI_API_KEY
-    if not api_key:
+    if client is None and not api_key:
         logger.warning("[CivicSense AI] GEMINI_API_KEY not configured — skipping analysis.")
         return None
 
-    try:
-        with open(image_path, "rb") as fh:
-            image_bytes = fh.read()
-    except OSError as exc:
-        logger.warning("[CivicSense AI] Could not read image file %s: %s", image_path, exc)
+    image_bytes, mime_type = _read_image(image_path)
+    if image_bytes is None:
         return None
 
-    mime_type, _ = mimetypes.guess_type(str(image_path))
-    if not mime_type or not mime_type.startswith("image/"):
-        mime_type = "image/jpeg"
+    image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+    if cache is not None:
+        cached, _ = cache.get(
+            image_sha256, VISION_PROMPT_VERSION, router.ordered_models(api_key), title, description, category,
+        )
+        if cached:
+            print(f"[CivicSense AI] Cached result: {cached['detected_category']} ({cached['confidence']}%)")
+            return cached
 
     prompt = VISION_PROMPT.format(
         title=title or "(no title)",
@@ -137,82 +186,143 @@ def analyze_issue_image(image_path, title, description, category):
         category=category or "(no category)",
     )
 
-    client = genai.Client(api_key=api_key)
     raw = ""
+    model = None
 
-    for model in _ordered_vision_models(api_key):
-        for attempt in range(2):
-            try:
-                response = client.models.generate_content(
-                    model=model,
-                    contents=[
-                        types.Content(
-                            role="user",
-                            parts=[
-                                types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
-                                types.Part(text=prompt),
-                            ],
-                        )
+    try:
+        raw, model = _generate(
+            api_key,
+            contents=[
+                types.Content(
+                    role="user",
+                    parts=[
+                        types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+                        types.Part(text=prompt),
                     ],
-                    config=types.GenerateContentConfig(max_output_tokens=256),
                 )
-                raw = response.text.strip()
-                # Strip markdown fences if the model wraps the JSON anyway
-                raw = re.sub(r"^```(?:json)?\s*", "", raw, flags=re.IGNORECASE)
-                raw = re.sub(r"\s*```$", "", raw)
-
-                result = json.loads(raw)
-                _vision_working_model = model
-
-                detected = str(result.get("detected_category", "Other"))
-                confidence = int(result.get("confidence", 0))
-                print(f"[CivicSense AI] Image analyzed: {detected} ({confidence}%)")
-
-                return {
-                    "detected_category": detected,
-                    "confidence": confidence,
-                    "matches_report": bool(result.get("matches_report", False)),
-                    "description": str(result.get("description", ""))[:255],
-                    "severity_assessment": str(result.get("severity_assessment", "")),
-                }
-
-            except (json.JSONDecodeError, ValueError) as exc:
-                logger.warning(
-                    "[CivicSense AI] JSON parse failed for model %s: %s. Raw: %.200s",
-                    model, exc, raw,
-                )
-                return None
-
-            except ClientError as exc:
-                code = getattr(exc, "status_code", 500)
-
-                if code == 429:
-                    if attempt == 0:
-                        delay = _extract_retry_delay(exc)
-                        if delay is not None and delay <= 10:
-                            logger.info(
-                                "[CivicSense AI] Model %s rate-limited, sleeping %.1fs.", model, delay
-                            )
-                            time.sleep(delay)
-                            continue
-                    logger.warning("[CivicSense AI] Model %s quota exhausted, trying next.", model)
-                    break
-
-                elif code == 404:
-                    logger.warning("[CivicSense AI] Model %s not found, pruning.", model)
-                    if _vision_available_models and model in _vision_available_models:
-                        _vision_available_models.remove(model)
-                    if _vision_working_model == model:
-                        _vision_working_model = None
-                    break
-
-                else:
-                    logger.exception("[CivicSense AI] ClientError %s on model %s", code, model)
-                    return None
-
-            except Exception as exc:
-                logger.exception("[CivicSense AI] Unexpected error on model %s: %s", model, exc)
-                return None
-
-    logger.warning("[CivicSense AI] All models exhausted — analysis skipped.")
-    return None
+            ],
+            config=types.GenerateContentConfig(max_output_tokens=256),
+            client=client,
+        )
+        if raw is None:
+            return None
+
+        result = _normalize_result(json.loads(_strip_fences(raw)))
+        print(f"[CivicSense AI] Image analyzed: {result['detected_category']} ({result['confidence']}%)")
+        if cache is not None:
+            cache.put(image_sha256, VISION_PROMPT_VERSION, model, title, description, category, result)
+        return result
+
+    except (json.JSONDecodeError, ValueError, AttributeError) as exc:
+        logger.warning(
+            "[CivicSense AI] JSON parse failed for model %s: %s. Raw: %.200s",
+            model, exc, raw,
+        )
+        return None
+
+    except ClientError as exc:
+        logger.exception("[CivicSense AI] ClientError %s", error_code(exc))
+        return None
+
+    except Exception as exc:
+        logger.exception("[CivicSense AI] Unexpected error: %s", exc)
+        return None
+
+
+def analyze_issue_images_batch(items, client=None, cache=vision_cache):
+    """
+    Analyze several issue photos with a single Gemini Vision request.
+
+    `items` is a sequence of dicts with keys: image_path, title, description,
+    category. Every photo is sent as an inline Part preceded by its numbered
+    report context, and the model is constrained to a JSON array (one object
+    per photo, keyed by its 1-based "index") through response_schema.
+
+    Returns a list aligned with `items`: each entry is the same dict that
+    analyze_issue_image() returns, or None when that photo could not be read
+    or the model omitted it. Returns None if the whole request failed.
+
+    `client` may be injected (e.g. a stub in benchmarks); by default the
+    pooled client for GEMINI_API_KEY is used. Photos with a cached result
+    are filled in from the cache and left out of the request (no request
+    at all if every photo is cached); `cache=None` bypasses it. Never raises.
+    """
+    api_key = settings.GEMINI_API_KEY
+    if client is None and not api_key:
+        logger.warning("[CivicSense AI] GEMINI_API_KEY not configured — skipping analysis.")
+        return None
+
+    models = router.ordered_models(api_key) if cache is not None else []
+    results = [None] * len(items)
+    parts = [types.Part(text=BATCH_VISION_PROMPT)]
+    sent = []
+    hashes = {}
+    for position, item in enumerate(items):
+        image_bytes, mime_type = _read_image(item["image_path"])
+        if image_bytes is None:
+            continue
+        hashes[position] = hashlib.sha256(image_bytes).hexdigest()
+        if cache is not None:
+            results[position], _ = cache.get(
+                hashes[position], BATCH_PROMPT_VERSION, models,
+                item.get("title"), item.get("description"), item.get("category"),
+            )
+            if results[position]:
+                continue
+        sent.append(position)
+        parts.append(types.Part(text=BATCH_ITEM_PROMPT.format(
+            index=len(sent),
+            title=item.get("title") or "(no title)",
+            description=item.get("description") or "(no description)",
+            category=item.get("category") or "(no category)",
+        )))
+        parts.append(types.Part.from_bytes(data=image_bytes, mime_type=mime_type))
+
+    if not sent:
+        return results
+
+    raw = ""
+    model = None
+    try:
+        raw, model = _generate(
+            api_key,
+            contents=[types.Content(role="user", parts=parts)],
+            config=types.GenerateContentConfig(
+                max_output_tokens=256 * len(sent),
+                response_mime_type="application/json",
+                response_schema=BATCH_RESPONSE_SCHEMA,
+            ),
+            client=client,
+        )
+        if raw is None:
+            return None
+
+        for entry in json.loads(_strip_fences(raw)):
+            index = int(entry.get("index", 0))
+            if 1 <= index <= len(sent):
+                position = sent[index - 1]
+                results[position] = _normalize_result(entry)
+                if cache is not None:
+                    item = items[position]
+                    cache.put(
+                        hashes[position], BATCH_PROMPT_VERSION, model,
+                        item.get("title"), item.get("description"), item.get("category"), results[position],
+                    )
+
+        print(f"[CivicSense AI] Batch analyzed: {sum(r is not None for r in results)}/{len(items)} photos")
+        return results
+
+    except (json.JSONDecodeError, ValueError, AttributeError, TypeError) as exc:
+        logger.warning(
+            "[CivicSense AI] Batch JSON parse failed for model %s: %s. Raw: %.200s",
+            model, exc, raw,
+        )
+        return None
+
+    except ClientError as exc:
+        logger.exception("[CivicSense AI] ClientError %s", error_code(exc))
+        return None
+
+    except Exception as exc:
+        logger.exception("[CivicSense AI] Unexpected error in batch analysis: %s", exc)
+        return None
@@ -0,0 +1,249 @@
+"""
+Two-tier result cache for Gemini Vision analyses.
+
+Analysing the same photo with the same report text again (re-running
+analyze_existing_issues, a job retried after a crash, a photo uploaded
+twice) returns the stored result instead of making another paid call.
+
+An entry is keyed by the SHA-256 of:
+  - the image's SHA-256
+  - the prompt version, a hash of the prompt template(s) and response
+    schema, so editing VISION_PROMPT invalidates every older entry
+  - the Gemini model that produced the result
+  - the report title, description and category, lower-cased with
+    whitespace collapsed
+
+Lookups pass every model the router may currently use and take the
+best-ranked one that has an entry, so a result from a model that has been
+retired is never served. Only successfully parsed results are stored;
+failures are always retried.
+
+Tiers:
+  - memory: a per-process LRU of VISION_CACHE_MEMORY_ENTRIES entries
+  - database: CachedVisionAnalysis rows shared by every process, expiring
+    after VISION_CACHE_TTL_SECONDS and trimmed to VISION_CACHE_MAX_ENTRIES
+    by least recent use (every PRUNE_EVERY stores, or `manage.py
+    vision_cache --prune`)
+A database hit is promoted to the memory tier. Database errors degrade to
+a cache miss and are logged.
+
+stats() reports this process's hits per tier, misses and hit rate; each
+hit is one Gemini analysis saved. The rows' `hits` counters accumulate the
+saving across processes (`manage.py vision_cache`).
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+# Third-party
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+# Local
+from .models import CachedVisionAnalysis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS    = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES    = 50_000
+DEFAULT_MEMORY_ENTRIES = 512
+
+# Database tier is trimmed after every this many stores per process
+PRUNE_EVERY = 200
+
+
+def prompt_version(*templates):
+    """Short, stable version tag for a set of prompt templates / schemas."""
+    return hashlib.sha256("\x00".join(templates).encode()).hexdigest()[:16]
+
+
+def normalize_text(value):
+    """Lower-case and collapse whitespace, so trivially re-typed reports share an entry."""
+    return " ".join(str(value or "").lower().split())
+
+
+def cache_key(image_sha256, version, model, title, description, category):
+    parts = [image_sha256, version, model, normalize_text(title), normalize_text(description), normalize_text(category)]
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Memory + database cache of parsed Gemini Vision results.
+
+    `persistent=False` keeps the memory tier only (benchmarks, tests).
+    Limits default to the VISION_CACHE_* settings. Thread-safe.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None, memory_entries=None, persistent=True):
+        self.ttl_seconds    = ttl_seconds
+        self.max_entries    = max_entries
+        self.memory_entries = memory_entries
+        self.persistent     = persistent
+        self._memory        = OrderedDict()   # key -> (expires_at monotonic, result, model)
+        self._lock          = threading.Lock()
+        self._stores        = 0
+        self.reset_stats()
+
+    def _setting(self, value, name, default):
+        return value if value is not None else getattr(settings, name, default)
+
+    def _ttl(self):
+        return self._setting(self.ttl_seconds, "VISION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+
+    # ── Statistics ─────────────────────────────────────────────────────────
+
+    def reset_stats(self):
+        self.memory_hits = self.db_hits = self.misses = 0
+
+    def stats(self):
+        """This process's counters: hits per tier, misses, hit rate and analyses saved."""
+        hits    = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits":     self.db_hits,
+            "misses":      self.misses,
+            "hit_rate":    round(hits / lookups, 4) if lookups else 0.0,
+            "saved_calls": hits,
+        }
+
+    def describe(self):
+        stats = self.stats()
+        return (
+            f"{stats['saved_calls']} hit(s) ({stats['memory_hits']} memory, {stats['db_hits']} database), "
+            f"{stats['misses']} miss(es), hit rate {stats['hit_rate']:.0%}, "
+            f"{stats['saved_calls']} Gemini analyses saved"
+        )
+
+    # ── Lookup ─────────────────────────────────────────────────────────────
+
+    def get(self, image_sha256, version, models, title, description, category):
+        """
+        Return (result, model) for the first of `models` with a live entry, or (None, None).
+
+        `models` is the router's current order (core.llm.router.ordered_models).
+        """
+        keys = {model: cache_key(image_sha256, version, model, title, description, category) for model in models}
+        if not keys:
+            return None, None
+
+        now = time.monotonic()
+        with self._lock:
+            for model, key in keys.items():
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._memory[key]
+                    continue
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return dict(entry[1]), model
+
+        found = self._db_get(keys) if self.persistent else None
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None, None
+            self.db_hits += 1
+        result, model = found
+        self._remember(keys[model], result, model)
+        return dict(result), model
+
+    def _db_get(self, keys):
+        try:
+            rows = {
+                row.key: row
+                for row in CachedVisionAnalysis.objects.filter(key__in=keys.values(), expires_at__gt=timezone.now())
+            }
+            for model, key in keys.items():
+                row = rows.get(key)
+                if row is not None:
+                    CachedVisionAnalysis.objects.filter(pk=row.pk).update(
+                        hits=F("hits") + 1, last_used_at=timezone.now(),
+                    )
+                    return row.result, model
+        except DatabaseError as exc:
+            logger.warning("[CivicSense AI Cache] Lookup failed: %s", exc)
+        return None
+
+    # ── Storing ────────────────────────────────────────────────────────────
+
+    def put(self, image_sha256, version, model, title, description, category, result):
+        """Store a parsed result in both tiers."""
+        key = cache_key(image_sha256, version, model, title, description, category)
+        self._remember(key, result, model)
+        if not self.persistent:
+            return
+        now = timezone.now()
+        try:
+            CachedVisionAnalysis.objects.update_or_create(
+                key=key,
+                defaults={
+                    "image_sha256":   image_sha256,
+                    "prompt_version": version,
+                    "model":          model,
+                    "result":         result,
+                    "last_used_at":   now,
+                    "expires_at":     now + timedelta(seconds=self._ttl()),
+                },
+            )
+        except DatabaseError as exc:
+            logger.warning("[CivicSense AI Cache] Store failed: %s", exc)
+            return
+
+        with self._lock:
+            self._stores += 1
+            due = self._stores % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def _remember(self, key, result, model):
+        limit = self._setting(self.memory_entries, "VISION_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self._ttl(), dict(result), model)
+            self._memory.move_to_end(key)
+            while len(self._memory) > limit:
+                self._memory.popitem(last=False)
+
+    # ── Maintenance ────────────────────────────────────────────────────────
+
+    def prune(self):
+        """Delete expired rows, then the least recently used beyond the size limit. Returns rows deleted."""
+        limit = self._setting(self.max_entries, "VISION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        try:
+            deleted, _ = CachedVisionAnalysis.objects.filter(expires_at__lte=timezone.now()).delete()
+            cutoff = (
+                CachedVisionAnalysis.objects.order_by("-last_used_at", "-id")
+                .values_list("last_used_at", "id")[limit:limit + 1]
+            )
+            for last_used_at, pk in cutoff:
+                evicted, _ = CachedVisionAnalysis.objects.filter(last_used_at__lte=last_used_at).exclude(
+                    last_used_at=last_used_at, id__gt=pk,
+                ).delete()
+                deleted += evicted
+            return deleted
+        except DatabaseError as exc:
+            logger.warning("[CivicSense AI Cache] Prune failed: %s", exc)
+            return 0
+
+    def clear(self):
+        """Empty both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.persistent:
+            CachedVisionAnalysis.objects.all().delete()
+
+
+vision_cache = AnalysisCache()
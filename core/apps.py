@@ -2,7 +2,11 @@
 AppConfig for the CivicSense core application.
 
 Registers the 'core' app with Django and sets BigAutoField as the
-default primary key type for all models in this module.
+default primary key type for all models in this module. ready() imports
+core.tasks so background task handlers are registered in every process
+(web workers enqueue them, `run_jobs` workers execute them), plus
+core.rollups and core.stats so their Issue signal handlers (rollup
+counts, cache invalidation) are connected.
 
 Module: core
 Author: Ankitha
@@ -16,3 +20,7 @@ class CoreConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        """Register background task handlers and the Issue signal handlers."""
+        from . import rollups, stats, tasks  # noqa: F401
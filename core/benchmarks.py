@@ -0,0 +1,1082 @@
+"""
+Performance benchmarks for the CivicSense backend.
+
+Each benchmark is a function registered with @benchmark(name). It receives
+a `write` callable for progress/output lines plus any `--param key=value`
+options given on the command line (as strings), and must not touch the
+real database or external APIs — stubs and synthetic data only. Benchmarks
+that need tables run inside scratch_database(), a throwaway test database.
+
+Run them with the `benchmark` management command:
+    python manage.py benchmark --list
+    python manage.py benchmark vision_backfill --param photos=64
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import hashlib
+import io
+import json
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# name -> (callable(write, **params), one-line description)
+BENCHMARKS = {}
+
+
+def benchmark(name, description=""):
+    """Register the decorated function as the benchmark called `name`."""
+    def decorator(func):
+        BENCHMARKS[name] = (func, description or (func.__doc__ or "").strip().splitlines()[0])
+        return func
+    return decorator
+
+
+def _timed(func, *args, **kwargs):
+    """Return (result, seconds) for one call."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+@contextmanager
+def scratch_database():
+    """
+    Create and migrate a throwaway test database for the duration of the block.
+
+    The test client's "testserver" host is allowed inside the block, so
+    endpoints can be called through Client / APIClient as in a TestCase.
+    """
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+# ---------------------------------------------------------------------------
+# Gemini Vision backfill
+# ---------------------------------------------------------------------------
+
+class _StubVisionModels:
+    """Stand-in for genai.Client().models with a fixed per-request and per-image latency."""
+
+    def __init__(self, request_latency, image_latency):
+        self.request_latency = request_latency
+        self.image_latency   = image_latency
+        self.calls           = 0
+
+    def generate_content(self, model, contents, config):
+        self.calls += 1
+        images = sum(1 for part in contents[0].parts if part.inline_data is not None)
+        time.sleep(self.request_latency + self.image_latency * images)
+        results = [
+            {
+                "index": i + 1, "detected_category": "Road Damage", "confidence": 90,
+                "matches_report": True, "description": "A pothole.", "severity_assessment": "Moderate",
+            }
+            for i in range(images)
+        ]
+        # Batched requests are constrained to an array; single-photo prompts answer with one object
+        return SimpleNamespace(text=json.dumps(results if config.response_schema else results[0]))
+
+
+@benchmark("vision_backfill")
+def bench_vision_backfill(write, photos="32", rpm="600", latency="0.2", per_image="0.02"):
+    """Backfill throughput: one photo per request vs batched + concurrent requests (stubbed Gemini)."""
+    from PIL import Image
+
+    from core.ai_analysis import analyze_issue_images_batch
+    from core.management.commands.analyze_existing_issues import TokenBucket
+
+    photos, rpm = int(photos), float(rpm)
+    client = SimpleNamespace(models=_StubVisionModels(float(latency), float(per_image)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        buf = io.BytesIO()
+        Image.new("RGB", (64, 64), (90, 90, 90)).save(buf, "JPEG")
+        items = []
+        for i in range(photos):
+            path = os.path.join(tmp, f"{i}.jpg")
+            with open(path, "wb") as fh:
+                fh.write(buf.getvalue())
+            items.append({"image_path": path, "title": "Pothole", "description": "Large pothole", "category": "infrastructure"})
+
+        def run(batch_size, concurrency):
+            bucket  = TokenBucket(rpm, capacity=concurrency)
+            batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+            def one(batch):
+                bucket.acquire()
+                return analyze_issue_images_batch(batch, client=client, cache=None)
+
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = [r for batch in pool.map(one, batches) for r in (batch or [])]
+            return sum(r is not None for r in results)
+
+        write(f"{photos} photos, {rpm:g} req/min budget, {float(latency) * 1000:.0f} ms/request stub latency")
+        for batch_size, concurrency in [(1, 1), (8, 1), (8, 4)]:
+            analyzed, seconds = _timed(run, batch_size, concurrency)
+            write(
+                f"  batch={batch_size:<2} concurrency={concurrency}: {analyzed} analyzed in {seconds:6.2f}s "
+                f"-> {analyzed / seconds * 60:8.0f} photos/min"
+            )
+
+
+@benchmark("vision_cache")
+def bench_vision_cache(write, photos="48", batch="8", latency="0.05", per_image="0.005"):
+    """Gemini calls and lookup latency with the Vision result cache (stubbed Gemini, throwaway DB)."""
+    from PIL import Image
+
+    from core.ai_analysis import VISION_PROMPT_VERSION, analyze_issue_image, analyze_issue_images_batch
+    from core.analysis_cache import AnalysisCache
+    from core.llm import router
+
+    photos, batch = int(photos), int(batch)
+    client = SimpleNamespace(models=_StubVisionModels(float(latency), float(per_image)))
+
+    def single_pass(items, cache):
+        before = client.models.calls
+        for item in items:
+            analyze_issue_image(item["image_path"], item["title"], item["description"], item["category"],
+                                client=client, cache=cache)
+        return client.models.calls - before
+
+    def batch_pass(items, cache):
+        before = client.models.calls
+        for i in range(0, len(items), batch):
+            analyze_issue_images_batch(items[i:i + batch], client=client, cache=cache)
+        return client.models.calls - before
+
+    with tempfile.TemporaryDirectory() as tmp, scratch_database():
+        items, reuploads = [], []
+        for i in range(photos):
+            buf = io.BytesIO()
+            Image.new("RGB", (64, 64), (i * 5 % 256, 90, 255 - i * 5 % 256)).save(buf, "JPEG")
+            for bucket, name in [(items, f"{i}.jpg"), (reuploads, f"again-{i}.jpg")]:
+                path = os.path.join(tmp, name)
+                with open(path, "wb") as fh:
+                    fh.write(buf.getvalue())
+                bucket.append({"image_path": path, "title": f"Pothole {i}", "description": "Large pothole",
+                               "category": "infrastructure"})
+        # Re-uploads: the same photos under new names, report re-typed with different case/spacing
+        for item in reuploads:
+            item["title"] = f"  {item['title'].upper()} "
+            item["description"] = "large   pothole"
+
+        write(f"{photos} distinct photos, single-photo path and batches of {batch}, stubbed Gemini")
+        write(f"  no cache, two passes:   {single_pass(items, None) + single_pass(items, None):4d} Gemini calls")
+
+        cache = AnalysisCache()
+        cold  = single_pass(items, cache)
+        warm  = single_pass(items, cache)
+        again = single_pass(reuploads, cache)
+        write(f"  cached, cold pass:      {cold:4d} Gemini calls")
+        write(f"  cached, second pass:    {warm:4d} Gemini calls")
+        write(f"  cached, re-uploads:     {again:4d} Gemini calls")
+
+        other = AnalysisCache()   # another worker process: empty memory tier, shared rows
+        write(f"  fresh process (DB tier):{single_pass(items, other):4d} Gemini calls")
+
+        batches = AnalysisCache()
+        cold = batch_pass(items, batches)
+        warm = batch_pass(items, batches)
+        write(f"  batched, cold / second: {cold:4d} / {warm} Gemini calls")
+
+        for label, stats in [("single", cache.stats()), ("fresh process", other.stats()), ("batched", batches.stats())]:
+            write(f"  {label:<14} hit rate {stats['hit_rate']:.0%} ({stats['memory_hits']} memory, "
+                  f"{stats['db_hits']} database, {stats['misses']} misses)")
+
+        item   = items[0]
+        with open(item["image_path"], "rb") as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()
+        ranked = router.ordered_models("")
+        args   = (item["title"], item["description"], item["category"])
+        _, seconds = _timed(lambda: [cache.get(digest, VISION_PROMPT_VERSION, ranked, *args) for _ in range(1000)])
+        write(f"  memory hit   {seconds:8.3f} ms/lookup")
+        cold_tier = AnalysisCache(memory_entries=0)
+        _, seconds = _timed(lambda: [cold_tier.get(digest, VISION_PROMPT_VERSION, ranked, *args) for _ in range(100)])
+        write(f"  database hit {seconds * 10:8.3f} ms/lookup")
+        stale, _ = cache.get(digest, "edited-prompt", ranked, *args)
+        write(f"  after a prompt edit: {'hit (WRONG)' if stale else 'miss'}")
+
+
+# ---------------------------------------------------------------------------
+# Weekly city health report
+# ---------------------------------------------------------------------------
+
+@benchmark("weekly_report")
+def bench_weekly_report(write, issues="20000", runs="5"):
+    """Weekly report build time: rollup-backed vs a full scan of the Issue table."""
+    import random
+    from datetime import timedelta
+
+    from django.contrib.auth.models import User
+    from django.db.models import Count
+    from django.utils import timezone
+
+    from civicsense_backend.ai_module.report_generator import CityHealthReportGenerator
+    from core.models import Issue
+    from core.rollups import rebuild_rollups
+
+    issues, runs = int(issues), int(runs)
+    rng = random.Random(7)
+    categories = [c for c, _ in Issue.CATEGORY_CHOICES]
+    statuses   = [s for s, _ in Issue.STATUS_CHOICES]
+    now        = timezone.now()
+
+    with scratch_database():
+        user = User.objects.create_user("bench", password="bench")
+        created = Issue.objects.bulk_create(
+            [
+                Issue(
+                    user=user, title="Bench", description="Synthetic", category=rng.choice(categories),
+                    status=rng.choice(statuses), latitude=12.9 + rng.random() * 0.2,
+                    longitude=77.5 + rng.random() * 0.2,
+                )
+                for _ in range(issues)
+            ],
+            batch_size=2000,
+        )
+        # auto_now_add stamps every row with "now"; spread them over two weeks instead
+        for issue in created:
+            issue.created_at = now - timedelta(hours=rng.randrange(14 * 24))
+        Issue.objects.bulk_update(created, ["created_at"], batch_size=2000)
+        rebuild_rollups()
+
+        def full_scan():
+            week = Issue.objects.filter(created_at__gte=now - timedelta(days=7))
+            list(week.values("category").annotate(count=Count("id")))
+            list(week.values("status").annotate(count=Count("id")))
+            cells = {}
+            for issue in week:
+                cells.setdefault((round(issue.latitude, 2), round(issue.longitude, 2)), []).append(issue)
+            return len(cells)
+
+        generator = CityHealthReportGenerator(Issue)
+        write(f"{issues} issues over 14 days, best of {runs} runs")
+        for label, func in [("full scan", full_scan), ("rollups", generator.build_weekly_report)]:
+            best = min(_timed(func)[1] for _ in range(runs))
+            write(f"  {label:<10} {best * 1000:8.1f} ms")
+
+
+# ---------------------------------------------------------------------------
+# Hotspot clustering
+# ---------------------------------------------------------------------------
+
+@benchmark("hotspots")
+def bench_hotspots(write, points="1000000", radius="300", min_issues="500"):
+    """Hotspot clustering throughput on synthetic city-scale points (NumPy engine)."""
+    import numpy as np
+
+    from core.hotspots import find_hotspots
+
+    n, radius, min_issues = int(points), float(radius), int(min_issues)
+    rng = np.random.default_rng(7)
+
+    # Background noise across a ~30 km city plus a few dense clusters
+    centres = rng.uniform([12.85, 77.45], [13.10, 77.75], size=(20, 2))
+    share   = n // 2 // len(centres)
+    lat = np.concatenate([rng.uniform(12.85, 13.10, n - share * len(centres))] +
+                         [rng.normal(c[0], 0.002, share) for c in centres])
+    lng = np.concatenate([rng.uniform(77.45, 77.75, n - share * len(centres))] +
+                         [rng.normal(c[1], 0.002, share) for c in centres])
+    categories = rng.choice(np.array(["garbage", "road_damage", "streetlight", "water_supply"], dtype=object), n)
+
+    write(f"{n} points, radius {radius:g} m, min_issues {min_issues}")
+    hotspots, seconds = _timed(find_hotspots, lat, lng, categories, radius_m=radius, min_issues=min_issues, limit=5)
+    write(f"  with categories:    {seconds:6.2f}s -> {len(hotspots)} hotspots, largest {hotspots[0]['issue_count'] if hotspots else 0}")
+    _, seconds = _timed(find_hotspots, lat, lng, radius_m=radius, min_issues=min_issues)
+    write(f"  coordinates only:   {seconds:6.2f}s")
+
+
+# ---------------------------------------------------------------------------
+# Spatial lookups (geohash index)
+# ---------------------------------------------------------------------------
+
+@benchmark("nearby")
+def bench_nearby(write, rows="1000000", radius="1000", queries="20"):
+    """Radius and bbox lookups: geohash-pruned vs full table scan (throwaway DB)."""
+    import random
+
+    import numpy as np
+    from django.contrib.auth.models import User
+    from django.db.models import FloatField
+    from django.db.models.functions import Cast
+
+    from core.geo import geohash_encode, nearest_ids, within_bbox
+    from core.hotspots import haversine_m
+    from core.models import Issue
+
+    rows, radius, queries = int(rows), float(radius), int(queries)
+    rng = random.Random(7)
+
+    with scratch_database():
+        user  = User.objects.create_user("bench", password="bench")
+        batch = []
+        for _ in range(rows):
+            lat, lng = round(12.8 + rng.random() * 0.4, 6), round(77.4 + rng.random() * 0.4, 6)
+            batch.append(Issue(
+                user=user, title="Bench", description="Synthetic", category="other",
+                latitude=lat, longitude=lng, geohash=geohash_encode(lat, lng),
+            ))
+            if len(batch) == 10000:
+                Issue.objects.bulk_create(batch)
+                batch = []
+        Issue.objects.bulk_create(batch)
+        points = [(12.85 + rng.random() * 0.3, 77.45 + rng.random() * 0.3) for _ in range(queries)]
+
+        def full_scan_radius():
+            for lat, lng in points:
+                data = np.array(
+                    Issue.objects.annotate(a=Cast("latitude", FloatField()), b=Cast("longitude", FloatField()))
+                    .values_list("pk", "a", "b")
+                )
+                d = haversine_m(lat, lng, data[:, 1], data[:, 2])
+                sorted(data[d <= radius, 0])
+
+        def indexed_radius():
+            for lat, lng in points:
+                nearest_ids(Issue.objects.all(), lat, lng, radius, 500)
+
+        span = radius / 111_000
+
+        def full_scan_bbox():
+            for lat, lng in points:
+                list(Issue.objects.filter(
+                    latitude__gte=lat - span, latitude__lte=lat + span,
+                    longitude__gte=lng - span, longitude__lte=lng + span,
+                ).values_list("pk", flat=True))
+
+        def indexed_bbox():
+            for lat, lng in points:
+                list(within_bbox(Issue.objects.all(), lat - span, lng - span, lat + span, lng + span)
+                     .values_list("pk", flat=True))
+
+        write(f"{rows} issues, {queries} queries, radius {radius:g} m")
+        for label, func in [
+            ("radius: full scan", full_scan_radius), ("radius: geohash", indexed_radius),
+            ("bbox: full scan", full_scan_bbox), ("bbox: geohash", indexed_bbox),
+        ]:
+            _, seconds = _timed(func)
+            write(f"  {label:<18} {seconds / queries * 1000:9.1f} ms/query")
+
+
+# ---------------------------------------------------------------------------
+# Department routing
+# ---------------------------------------------------------------------------
+
+@benchmark("routing")
+def bench_routing(write, issues="5000", departments="3"):
+    """Department routing: query per issue vs the in-memory table, plus bulk_create_routed (throwaway DB)."""
+    import random
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from core.models import Department, Issue
+    from core.routing import department_router
+
+    issues, departments = int(issues), int(departments)
+    rng = random.Random(7)
+    categories = [value for value, _ in Issue.CATEGORY_CHOICES]
+
+    with scratch_database():
+        for category in categories:
+            for i in range(departments):
+                Department.objects.create(
+                    name=f"{category} {i}", slug=f"{category}-{i}", assigned_category=category, email="d@example.com",
+                )
+        user = User.objects.create(username="bench")
+        batch = [
+            Issue(
+                user=user, title="Bench", description="Synthetic", category=rng.choice(categories),
+                latitude=round(12.8 + rng.random() * 0.4, 6), longitude=round(77.4 + rng.random() * 0.4, 6),
+            )
+            for _ in range(issues)
+        ]
+
+        def query_per_issue():
+            for issue in batch:
+                Department.objects.filter(assigned_category=issue.category).first()
+
+        def routing_table():
+            for issue in batch:
+                department_router.route(issue.category, issue.latitude, issue.longitude)
+
+        department_router.invalidate()
+        department_router.warm()
+        write(f"{issues} issues, {len(categories) * departments} departments")
+        for label, func in [("query per issue", query_per_issue), ("routing table", routing_table)]:
+            _, seconds = _timed(func)
+            write(f"  {label:<18} {seconds / issues * 1e6:9.1f} µs/issue")
+
+        with CaptureQueriesContext(connection) as captured:
+            _, seconds = _timed(Issue.objects.bulk_create_routed, batch)
+        routing_queries = sum('FROM "core_department"' in q["sql"] for q in captured.captured_queries)
+        write(f"  bulk_create_routed {seconds:9.2f} s total, {routing_queries} routing queries")
+
+
+# ---------------------------------------------------------------------------
+# Streaming export
+# ---------------------------------------------------------------------------
+
+def _current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@benchmark("export")
+def bench_export(write, rows="1000000", max_growth_mb="32"):
+    """Stream a department export through the endpoint and check RSS stays flat (throwaway DB)."""
+    import random
+
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+
+    from core.models import Department, DepartmentProfile, Issue
+
+    rows, max_growth = int(rows), float(max_growth_mb)
+    rng = random.Random(7)
+
+    with scratch_database():
+        dept = Department.objects.create(
+            name="Sanitation", slug="sanitation", assigned_category="sanitation", email="d@example.com",
+        )
+        citizen = User.objects.create(username="citizen")
+        officer = User.objects.create(username="officer")
+        DepartmentProfile.objects.create(user=officer, department=dept)
+
+        batch = []
+        for i in range(rows):
+            batch.append(Issue(
+                user=citizen, title=f"Synthetic issue {i}", description="Seeded for the export benchmark",
+                location="Ward 12", category="sanitation", assigned_department=dept,
+                latitude=round(12.8 + rng.random() * 0.4, 6), longitude=round(77.4 + rng.random() * 0.4, 6),
+            ))
+            if len(batch) == 10000:
+                Issue.objects.bulk_create(batch)
+                batch = []
+        Issue.objects.bulk_create(batch)
+
+        client = APIClient()
+        client.force_authenticate(officer)
+        write(f"{rows} issues")
+        for fmt in ("csv", "ndjson", "parquet"):
+            response = client.get(f"/api/department/issues/export/?output={fmt}")
+            if response.status_code != 200:
+                # 501: the format's optional dependency (pyarrow for parquet) is not installed
+                is_json = response.get("Content-Type", "").startswith("application/json")
+                reason  = response.json().get("error") if is_json else response.reason_phrase
+                write(f"  {fmt:<8} skipped (HTTP {response.status_code}): {reason}")
+                continue
+            started, size, samples = time.perf_counter(), 0, []
+            for n, chunk in enumerate(response.streaming_content):
+                size += len(chunk)
+                if n % 50 == 0:
+                    samples.append(_current_rss_mb())
+            seconds = time.perf_counter() - started
+            samples.append(_current_rss_mb())
+            # Compare against the RSS once streaming is underway (buffers allocated)
+            baseline = samples[min(1, len(samples) - 1)]
+            growth = max(samples) - baseline
+            verdict = "flat" if growth <= max_growth else "GROWING"
+            write(
+                f"  {fmt:<8} {size / 2**20:8.1f} MB in {seconds:6.1f} s "
+                f"({rows / seconds:,.0f} rows/s), RSS {baseline:.0f} -> {max(samples):.0f} MB: {verdict}"
+            )
+
+
+# ---------------------------------------------------------------------------
+# Local CLIP classifier
+# ---------------------------------------------------------------------------
+
+@benchmark("clip_classify")
+def bench_clip_classify(write, images="16", model=""):
+    """Per-image CLIP latency on CPU: joint text+image forward vs cached text and embedding store."""
+    try:
+        import torch
+        from PIL import Image
+        from civicsense_backend.ai_module.ai_classifier import IssueClassifier
+    except ImportError as exc:
+        write(f"skipped: {exc} (torch and transformers are needed, plus the model weights)")
+        return
+
+    import numpy as np
+
+    images = int(images)
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(images):
+            path = os.path.join(tmp, f"photo{i}.jpg")
+            Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)).save(path, quality=85)
+            paths.append(path)
+
+        classifier = IssueClassifier(model_name=model or None, store_dir=os.path.join(tmp, "store"), backend="torch")
+        backend = classifier.backend
+
+        def joint_forward():
+            # What classify_image() did before: every prompt through the text tower per image
+            for path in paths:
+                image = Image.open(path).convert("RGB")
+                inputs = backend.processor(text=classifier.labels, images=image, return_tensors="pt", padding=True)
+                backend.model(**inputs).logits_per_image.softmax(dim=1)
+
+        def classify_all():
+            for path in paths:
+                classifier.classify_image(path)
+
+        _, text_seconds = _timed(classifier.text_embeddings)
+        write(f"{images} images, {len(classifier.labels)} prompts, torch threads {torch.get_num_threads()}")
+        write(f"  prompt embeddings (once)   {text_seconds * 1000:9.1f} ms")
+        for label, func in [
+            ("joint forward (before)", joint_forward),
+            ("vision tower only (miss)", classify_all),
+            ("embedding store hit", classify_all),
+        ]:
+            _, seconds = _timed(func)
+            write(f"  {label:<26} {seconds / images * 1000:9.1f} ms/image")
+
+
+FIXTURE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+
+@benchmark("clip_backends")
+def bench_clip_backends(write, fixtures="", backends="onnx,onnx-fp32,torchscript,torch", model=""):
+    """Accuracy vs latency of the CLIP inference backends on a labelled fixture set."""
+    # fixtures: directory of <category>/<photo>.jpg, category names as in
+    # ai_classifier.CATEGORIES. Each backend classifies every photo one at a
+    # time with an empty embedding store, so latency is decode + vision
+    # tower. "agree" is the share of predictions equal to the first backend
+    # in the list. RSS growth is measured in one process, so later backends
+    # reuse libraries already loaded; run one backend per process for
+    # absolute numbers.
+    if not fixtures:
+        write("skipped: pass --param fixtures=DIR with DIR/<category>/*.jpg")
+        return
+
+    from pathlib import Path
+
+    import numpy as np
+    from PIL import Image
+    from civicsense_backend.ai_module.ai_classifier import CATEGORIES, IssueClassifier
+
+    samples = [
+        (path.parent.name, path.read_bytes())
+        for path in sorted(Path(fixtures).glob("*/*"))
+        if path.suffix.lower() in FIXTURE_SUFFIXES
+    ]
+    unknown = sorted({category for category, _ in samples} - set(CATEGORIES))
+    if not samples:
+        write(f"skipped: no images under {fixtures}/<category>/")
+        return
+    if unknown:
+        write(f"note: fixture folders {unknown} are not classifier categories and always count as misses")
+
+    write(f"{len(samples)} photos in {len({category for category, _ in samples})} categories")
+    write(f"  {'backend':<12} {'accuracy':>8} {'agree':>6} {'p50 ms':>8} {'p95 ms':>8} {'load s':>7} {'RSS +MB':>8}")
+    reference = None
+    for name in backends.split(","):
+        rss_before = _current_rss_mb()
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                classifier, load_seconds = _timed(IssueClassifier, model_name=model or None, store_dir=tmp, backend=name)
+                classifier.text_embeddings()
+            except (ImportError, OSError, KeyError, ValueError) as exc:
+                write(f"  {name:<12} skipped: {exc}")
+                continue
+            rss_growth = _current_rss_mb() - rss_before
+            # Warm-up (first-call allocations) without putting anything in the store
+            classifier.encode_images([Image.open(io.BytesIO(samples[0][1])).convert("RGB")])
+
+            predictions, latencies = [], []
+            for _, data in samples:
+                (result,), seconds = _timed(classifier.classify_batch, [data])
+                predictions.append(result["category"])
+                latencies.append(seconds * 1000)
+
+        accuracy = np.mean([predicted == expected for predicted, (expected, _) in zip(predictions, samples)])
+        if reference is None:
+            reference = predictions
+        agreement = np.mean([a == b for a, b in zip(predictions, reference)])
+        write(
+            f"  {name:<12} {accuracy:8.1%} {agreement:6.1%} {np.percentile(latencies, 50):8.1f} "
+            f"{np.percentile(latencies, 95):8.1f} {load_seconds:7.1f} {rss_growth:8.0f}"
+        )
+
+
+# ---------------------------------------------------------------------------
+# Image ingest
+# ---------------------------------------------------------------------------
+
+def _synthetic_photo(width, height, seed=0):
+    """JPEG bytes of a noisy gradient the size of a phone photo, with EXIF GPS."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    gradient = np.add.outer(np.linspace(0, 120, height), np.linspace(0, 100, width))[..., None]
+    pixels = (gradient + rng.integers(0, 40, (height, width, 3))).astype(np.uint8)
+    exif = Image.Exif()
+    exif[0x8825] = {1: "N", 2: (12.0, 58.0, 17.5), 3: "E", 4: (77.0, 35.0, 40.0)}
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90, exif=exif)
+    return buffer.getvalue()
+
+
+def _full_resolution_pipeline(data):
+    """The previous per-upload work: three opens, two full-size decodes, float64 Laplacian."""
+    import numpy as np
+    from PIL import Image
+    from civicsense_backend.ai_module.clip_backends import ImagePreprocessor
+
+    # Quality check (was cv2.imread + cvtColor + Laplacian(CV_64F) at native size)
+    gray = np.asarray(Image.open(io.BytesIO(data)).convert("L"), dtype=np.float64)
+    laplacian = gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:] - 4 * gray[1:-1, 1:-1]
+    gray.mean(), laplacian.var()
+    # Metadata (second open)
+    Image.open(io.BytesIO(data)).getexif()
+    # Classifier (third open, full decode)
+    ImagePreprocessor()([Image.open(io.BytesIO(data)).convert("RGB")])
+
+
+def _single_decode_pipeline(data):
+    """image_ingest: one reduced-resolution decode shared by quality, metadata and classifier."""
+    from civicsense_backend.ai_module.clip_backends import ImagePreprocessor
+    from civicsense_backend.ai_module.image_analyzer import ImageAnalyzer
+    from civicsense_backend.ai_module.image_ingest import ingest_image
+
+    ingested = ingest_image(data)
+    ImageAnalyzer.quality_of(ingested)
+    ImagePreprocessor()([ingested.image])
+
+
+def _measure_in_child(func, data, runs, results):
+    import resource
+
+    baseline = _current_rss_mb()
+    started = time.perf_counter()
+    for _ in range(runs):
+        func(data)
+    seconds = (time.perf_counter() - started) / runs
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((seconds, peak - baseline))
+
+
+@benchmark("image_ingest")
+def bench_image_ingest(write, width="4032", height="3024", runs="5"):
+    """Per-upload CPU time and peak memory: full-resolution decodes vs the single-decode ingest stage."""
+    import multiprocessing
+
+    data = _synthetic_photo(int(width), int(height))
+    write(f"{width}x{height} JPEG, {len(data) / 2**20:.1f} MB, {runs} runs per pipeline")
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        context = None
+
+    for label, func in [
+        ("full resolution (before)", _full_resolution_pipeline),
+        ("single decode (ingest)", _single_decode_pipeline),
+    ]:
+        if context is None:
+            _, seconds = _timed(func, data)
+            write(f"  {label:<26} {seconds * 1000:8.1f} ms/upload, peak memory n/a (no fork)")
+            continue
+        # Each pipeline runs in a fresh child so the peak RSS is its own
+        results = context.Queue()
+        child = context.Process(target=_measure_in_child, args=(func, data, int(runs), results))
+        child.start()
+        seconds, peak_growth = results.get()
+        child.join()
+        write(f"  {label:<26} {seconds * 1000:8.1f} ms/upload, peak RSS +{peak_growth:6.1f} MB")
+
+
+# ---------------------------------------------------------------------------
+# Upload handling
+# ---------------------------------------------------------------------------
+
+def _joined_upload_pipeline(uploaded, sock):
+    """The previous analyze_image: join the chunks, then concatenate the socket frame."""
+    from civicsense_backend.ai_module.embedding_store import content_key
+    from civicsense_backend.ai_module.image_ingest import ingest_image
+    from civicsense_backend.ai_module.inference_service import FRAME_HEADER
+
+    image_bytes = b"".join(uploaded.chunks())
+    ingest_image(image_bytes)
+    content_key(image_bytes)
+    sock.sendall(FRAME_HEADER.pack(len(image_bytes)) + image_bytes)
+
+
+def _in_place_upload_pipeline(uploaded, sock):
+    """core.uploads.open_upload: the upload's own buffer (or its memory-mapped temp file) throughout."""
+    from civicsense_backend.ai_module.embedding_store import content_key
+    from civicsense_backend.ai_module.image_ingest import ingest_image
+    from civicsense_backend.ai_module.inference_service import send_frame
+    from core.uploads import open_upload
+
+    with open_upload(uploaded) as (view, file):
+        ingest_image(file)
+        content_key(view)
+        send_frame(sock, view)
+
+
+def _drain(sock, frames):
+    """Read and discard `frames` length-prefixed frames into one reused buffer."""
+    from civicsense_backend.ai_module.inference_service import FRAME_HEADER
+
+    sink = bytearray(1 << 20)
+    for _ in range(frames):
+        header = sock.recv(FRAME_HEADER.size, socket.MSG_WAITALL)
+        (remaining,) = FRAME_HEADER.unpack(header)
+        while remaining:
+            remaining -= sock.recv_into(sink, min(remaining, len(sink)))
+
+
+def _bytes_read_before_rejection(data, chunk_size=64 * 2**10):
+    """Stream `data` through LimitedUploadHandler in upload-sized chunks; bytes read when it objects."""
+    from core.uploads import LimitedUploadHandler, UploadTooLarge
+
+    handler = LimitedUploadHandler()
+    handler.new_file("image", "upload.jpg", "image/jpeg", len(data))
+    for start in range(0, len(data), chunk_size):
+        try:
+            handler.receive_data_chunk(data[start:start + chunk_size], start)
+        except UploadTooLarge:
+            return min(start + chunk_size, len(data))
+    return None
+
+
+@benchmark("upload_copies")
+def bench_upload_copies(write, width="4032", height="3024", runs="5"):
+    """Python buffer bytes allocated per analyze_image upload: joined copies vs in-place buffers."""
+    import threading
+    import tracemalloc
+
+    from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+
+    data = _synthetic_photo(int(width), int(height))
+    size = len(data)
+    write(f"{width}x{height} JPEG, {size / 2**20:.1f} MB, {runs} runs per pipeline")
+
+    def in_memory():
+        # Filled by write() like MemoryFileUploadHandler (BytesIO(data) would share `data` until exported)
+        buffer = io.BytesIO()
+        buffer.write(data)
+        return InMemoryUploadedFile(buffer, "image", "photo.jpg", "image/jpeg", size, None)
+
+    def temporary():
+        uploaded = TemporaryUploadedFile("photo.jpg", "image/jpeg", size, None)
+        uploaded.write(data)
+        uploaded.seek(0)
+        return uploaded
+
+    for storage, make_upload in [("in memory", in_memory), ("temp file", temporary)]:
+        for label, pipeline in [
+            ("joined (before)", _joined_upload_pipeline),
+            ("in place", _in_place_upload_pipeline),
+        ]:
+            client, server = socket.socketpair()
+            drainer = threading.Thread(target=_drain, args=(server, int(runs)), daemon=True)
+            drainer.start()
+            peaks, seconds = [], 0.0
+            for _ in range(int(runs)):
+                uploaded = make_upload()
+                tracemalloc.start()
+                _, elapsed = _timed(pipeline, uploaded, client)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                uploaded.close()
+                seconds += elapsed
+            drainer.join()
+            client.close()
+            server.close()
+            peak = max(peaks)
+            write(
+                f"  {storage:<9}  {label:<16} {seconds / int(runs) * 1000:7.1f} ms/upload, "
+                f"peak Python buffers {peak / 2**20:6.2f} MB ({peak / size:4.2f}x the upload)"
+            )
+
+    # Early rejection: a header claiming 100 MP, padded to a 12 MB body
+    bomb = bytearray(_synthetic_photo(64, 64))
+    sof = bomb.index(b"\xff\xc0")
+    bomb[sof + 5:sof + 9] = (10000).to_bytes(2, "big") * 2
+    bomb += bytes(12 * 2**20)
+    read = _bytes_read_before_rejection(bytes(bomb))
+    write(f"  100 MP header in a {len(bomb) / 2**20:.0f} MB upload: rejected after {read / 2**10:.0f} KB streamed")
+
+
+# ---------------------------------------------------------------------------
+# Duplicate detection
+# ---------------------------------------------------------------------------
+
+def _scene_photo(seed, width=4032, height=3024):
+    """JPEG bytes of a blocky random scene with sensor noise (distinct per seed, unlike _synthetic_photo)."""
+    import numpy as np
+    from PIL import Image
+
+    rng    = np.random.default_rng(seed)
+    blocks = Image.fromarray(rng.integers(0, 256, (9, 12, 3), dtype=np.uint8)).resize((width, height), Image.BILINEAR)
+    pixels = np.asarray(blocks, dtype=np.int16) + rng.integers(-20, 20, (height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@benchmark("duplicates")
+def bench_duplicates(write, rows="200000", lookups="200"):
+    """dHash duplicate lookups: banded index probes vs scanning every hash (throwaway DB)."""
+    import random
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from PIL import Image
+
+    from core.duplicates import BAND_FIELDS, find_duplicate, hamming, join_bands, photo_dhash, split_bands
+    from core.models import Issue
+
+    value, seconds = _timed(photo_dhash, io.BytesIO(_synthetic_photo(4032, 3024)))
+    write(f"dHash of a 4032x3024 JPEG: {seconds * 1000:.1f} ms")
+
+    # Robustness: a scene against a smaller recompressed copy, a re-framed crop and another scene
+    original = _scene_photo(1)
+    value    = photo_dhash(io.BytesIO(original))
+    with Image.open(io.BytesIO(original)) as img:
+        copy, crop = io.BytesIO(), io.BytesIO()
+        img.resize((1008, 756)).save(copy, "JPEG", quality=60)
+        img.crop((400, 300, 4032, 3024)).save(crop, "JPEG", quality=85)
+    for label, other in [
+        ("1008x756 q60 copy", copy.getvalue()),
+        ("cropped copy", crop.getvalue()),
+        ("different scene", _scene_photo(2)),
+    ]:
+        write(f"  distance to a {label:<18} {hamming(value, photo_dhash(io.BytesIO(other))):2d} bits")
+
+    rng = random.Random(3)
+    rows = int(rows)
+    with scratch_database():
+        user = User.objects.create(username="bench")
+        hashes = [rng.getrandbits(64) for _ in range(rows)]
+        batch = []
+        for value in hashes:
+            issue = Issue(
+                user=user, title="t", description="d", location="l", category="road",
+                latitude=round(12.9 + rng.random() * 0.1, 6), longitude=round(77.5 + rng.random() * 0.1, 6),
+            )
+            for field, band in zip(BAND_FIELDS, split_bands(value)):
+                setattr(issue, field, band)
+            batch.append(issue)
+        Issue.objects.bulk_create(batch, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        write(f"{rows} issues seeded")
+
+        probes = []
+        for _ in range(int(lookups)):
+            stored = Issue.objects.only("latitude", "longitude", *BAND_FIELDS).get(pk=rng.randint(1, rows))
+            near = join_bands([getattr(stored, f) for f in BAND_FIELDS]) ^ (1 << rng.randrange(64))
+            probes.append((Issue(pk=0, category="road", latitude=stored.latitude, longitude=stored.longitude), near))
+
+        found, seconds = _timed(lambda: sum(find_duplicate(issue, value) is not None for issue, value in probes))
+        write(f"  banded index  {seconds / len(probes) * 1000:8.3f} ms/lookup, {found}/{len(probes)} found")
+
+        def scan():
+            matches = 0
+            for _, value in probes[:10]:
+                for bands in Issue.objects.values_list(*BAND_FIELDS).iterator(chunk_size=5000):
+                    if hamming(value, join_bands(bands)) <= 3:
+                        matches += 1
+                        break
+            return matches
+
+        found, seconds = _timed(scan)
+        write(f"  full scan     {seconds / 10 * 1000:8.3f} ms/lookup, {found}/10 found")
+
+
+# ---------------------------------------------------------------------------
+# Chatbot response cache
+# ---------------------------------------------------------------------------
+
+# Sample chat traffic: FAQ intents and the phrasings citizens use for them.
+# Neighbouring intents (pothole / garbage, pending / in progress) share most
+# of their words, so a hit on the wrong one shows up as a wrong answer.
+_SAMPLE_CHAT_INTENTS = {
+    "track": [
+        "How do I track my report?", "how can i track my report", "Where can I see my reports?",
+        "how do I check the status of my report", "track my report", "How can I track my complaint?",
+    ],
+    "in_progress": [
+        "What does In Progress mean?", "what does in progress mean", "What does the In Progress status mean?",
+        "my report says in progress what does that mean", "meaning of in progress status",
+    ],
+    "pending": [
+        "What does Pending mean?", "what does the pending status mean", "Why is my report still pending?",
+        "my report says pending what does that mean", "meaning of pending status",
+    ],
+    "report_pothole": [
+        "How do I report a pothole?", "how to report a pothole", "How can I report a pothole on my road?",
+        "i want to report a pothole",
+    ],
+    "report_garbage": [
+        "How do I report garbage?", "how to report garbage", "How can I report garbage on my road?",
+        "i want to report garbage dumping",
+    ],
+    "streetlight_department": [
+        "Which department handles streetlights?", "which department handles streetlight complaints",
+        "Who fixes broken streetlights?", "who repairs street lights",
+    ],
+    "water_department": [
+        "Which department handles water leaks?", "which department handles water leak complaints",
+        "Who fixes water leaks?", "who repairs a leaking water pipe",
+    ],
+    "severity": [
+        "What severity should I choose?", "what are the severity levels", "How do I choose the severity?",
+        "difference between severe and critical",
+    ],
+    "resolution_time": [
+        "How long does it take to resolve an issue?", "how long does it take to resolve my complaint",
+        "When will my issue be fixed?", "how long until my report is resolved",
+    ],
+    "photo": ["Do I need to upload a photo?", "is a photo required", "What kind of photo should I upload?"],
+    "officer_login": [
+        "How do department officers log in?", "where is the department portal",
+        "I am a department officer, how do I log in?",
+    ],
+    "categories": ["What can I report?", "what issue categories are there", "Which categories can I report?"],
+}
+
+_SAMPLE_CHAT_FOLLOW_UPS = ["What happens next?", "How long will that take?", "Thanks!", "Can I add more photos later?"]
+
+_SAMPLE_CHAT_PLACES = ["MG Road", "Jayanagar 4th Block", "the Indiranagar bus stop", "Koramangala market", "my street"]
+_SAMPLE_CHAT_PROBLEMS = [
+    "a huge pothole", "garbage piling up", "a broken streetlight", "water leaking from a pipe",
+    "a shop encroaching on the footpath", "an open manhole",
+]
+
+
+def _sample_chat_log(sessions, seed=7):
+    """
+    Synthetic chat log: a list of {"turns": [user messages], "intents": [labels]}.
+
+    Intents are drawn with Zipf-like popularity, phrasings uniformly, with
+    random case and punctuation changes; a fifth of the sessions describe a
+    specific problem (unique, should never hit) and a sixth ask a follow-up.
+    """
+    import random
+
+    rng     = random.Random(seed)
+    intents = list(_SAMPLE_CHAT_INTENTS)
+    weights = [1 / (rank + 1) for rank in range(len(intents))]
+    log     = []
+    for n in range(sessions):
+        if rng.random() < 0.2:
+            question = (
+                f"There is {rng.choice(_SAMPLE_CHAT_PROBLEMS)} near {rng.choice(_SAMPLE_CHAT_PLACES)} "
+                f"for {rng.randint(2, 40)} days, what should I do?"
+            )
+            intent = f"problem-{n}"
+        else:
+            intent   = rng.choices(intents, weights)[0]
+            question = rng.choice(_SAMPLE_CHAT_INTENTS[intent])
+            if rng.random() < 0.3:
+                question = question.lower().rstrip("?") if rng.random() < 0.5 else f"  {question.upper()}  "
+        turns, labels = [question], [intent]
+        if rng.random() < 0.17:
+            follow_up = rng.choice(_SAMPLE_CHAT_FOLLOW_UPS)
+            turns.append(follow_up)
+            labels.append(f"{intent} / {follow_up}")
+        log.append({"turns": turns, "intents": labels})
+    return log
+
+
+class _StubChats:
+    """Stand-in for genai.Client().chats: a fixed latency and a distinct reply per call."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls   = 0
+
+    def create(self, model, config, history):
+        def send_message(text):
+            self.calls += 1
+            time.sleep(self.latency)
+            return SimpleNamespace(text=f"Reply {self.calls} to: {text}")
+        return SimpleNamespace(send_message=send_message)
+
+
+@benchmark("chat_cache")
+def bench_chat_cache(write, log="", sessions="400", latency="0.05", similarity=""):
+    """Replay a chat log with and without the response cache: Gemini calls, hit rate, p50/p95 latency (stubbed Gemini)."""
+    # log: JSONL of {"turns": [user messages, ...]} with optional "intents"
+    # (one label per turn); without it a synthetic sample log is replayed.
+    from core.chat_cache import ChatResponseCache
+    from core.chat_views import _call_gemini, _to_gemini_history
+
+    if log:
+        with open(log, encoding="utf-8") as fh:
+            sessions_log = [json.loads(line) for line in fh if line.strip()]
+    else:
+        sessions_log = _sample_chat_log(int(sessions))
+    client = SimpleNamespace(chats=_StubChats(float(latency)))
+    welcome = {"role": "assistant", "content": "Hello! I am the CivicSense assistant. How can I help you today?"}
+
+    def replay(cache):
+        latencies, labels, wrong = [], {}, 0
+        before = client.chats.calls
+        for session in sessions_log:
+            messages = [welcome]
+            for turn, intent in zip(session["turns"], session.get("intents") or [None] * len(session["turns"])):
+                messages.append({"role": "user", "content": turn})
+                started = time.perf_counter()
+                reply = cache.get(messages) if cache else None
+                hit = reply is not None
+                if not hit:
+                    reply = _call_gemini("", _to_gemini_history(messages), turn, client=client)
+                    if cache:
+                        cache.put(messages, reply)
+                latencies.append(time.perf_counter() - started)
+                if hit and intent is not None and labels.get(reply) != intent:
+                    wrong += 1
+                labels.setdefault(reply, intent)
+                messages.append({"role": "assistant", "content": reply})
+        latencies.sort()
+        return client.chats.calls - before, latencies, wrong
+
+    def pct(values, q):
+        return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+    turns = sum(len(s["turns"]) for s in sessions_log)
+    write(f"{len(sessions_log)} sessions, {turns} user turns, {float(latency) * 1000:.0f} ms stub Gemini latency")
+    calls, latencies, _ = replay(None)
+    write(f"  no cache:  {calls:4d} Gemini calls, p50 {pct(latencies, 0.5):7.2f} ms, p95 {pct(latencies, 0.95):7.2f} ms")
+
+    cache = ChatResponseCache(similarity=float(similarity) if similarity else None)
+    calls, latencies, wrong = replay(cache)
+    stats = cache.stats()
+    write(f"  cached:    {calls:4d} Gemini calls, p50 {pct(latencies, 0.5):7.2f} ms, p95 {pct(latencies, 0.95):7.2f} ms")
+    write(
+        f"  hit rate {stats['hit_rate']:.0%} ({stats['exact_hits']} exact, {stats['similar_hits']} similar, "
+        f"{stats['misses']} misses), {stats['entries']} entries, {wrong} hit(s) answered a different question"
+    )
+    for question, hits in cache.top(5):
+        write(f"    {hits:4d} hits  {question}")
@@ -0,0 +1,251 @@
+"""
+Response cache for common chatbot questions.
+
+Much of the chat traffic is the same handful of FAQs ("how do I track my
+report", "what does In Progress mean") answered from SYSTEM_PROMPT
+knowledge alone. ChatView and ChatStreamView look a conversation up here
+before calling Gemini and store every successful reply.
+
+Only short conversations are cached: after dropping the widget's leading
+welcome message, at most CHAT_CACHE_MAX_MESSAGES messages (by default a
+question, or question / reply / follow-up). Earlier messages form the
+entry's context and must match exactly; the last user message is matched
+in two steps:
+  - exact: lower-cased, punctuation stripped, whitespace collapsed
+  - similar: cosine similarity of hashed TF-IDF vectors (word unigrams and
+    bigrams hashed into 2**20 buckets, IDF taken from the cached questions)
+    of at least CHAT_CACHE_SIMILARITY, for questions of MIN_SIMILAR_TOKENS
+    words or more that contain the same numbers (report ids, days, ...).
+    Candidates come from an inverted index over the buckets, so a lookup
+    only scores entries sharing a word.
+
+Entries expire after CHAT_CACHE_TTL_SECONDS and the least recently used
+are evicted beyond CHAT_CACHE_MAX_ENTRIES. Each entry counts its hits.
+
+The cache is per process and in memory: a deploy that edits SYSTEM_PROMPT
+restarts the workers and so starts from an empty cache.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+
+# Third-party
+from django.conf import settings
+
+DEFAULT_TTL_SECONDS  = 24 * 3600
+DEFAULT_MAX_ENTRIES  = 2000
+DEFAULT_SIMILARITY   = 0.8
+DEFAULT_MAX_MESSAGES = 3
+
+HASH_BITS = 20
+
+# Shorter questions ("thanks", "hi there") only match exactly
+MIN_SIMILAR_TOKENS = 3
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_question(text):
+    """Lower-case, strip punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", str(text or "").lower()).split())
+
+
+def features(normalized):
+    """Hashed unigram + bigram term counts of a normalized question."""
+    words = normalized.split()
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return Counter(zlib.crc32(term.encode()) & ((1 << HASH_BITS) - 1) for term in terms)
+
+
+def conversation_key(messages):
+    """
+    Return (context, question) for a cacheable conversation, or None.
+
+    `messages` are cleaned chat messages ({"role", "content"}) ending with
+    the user's turn. Leading assistant messages (the widget's greeting) are
+    ignored; longer conversations than CHAT_CACHE_MAX_MESSAGES are not cached.
+    """
+    start = 0
+    while start < len(messages) and messages[start]["role"] == "assistant":
+        start += 1
+    messages = messages[start:]
+    if not messages or len(messages) > getattr(settings, "CHAT_CACHE_MAX_MESSAGES", DEFAULT_MAX_MESSAGES):
+        return None
+    question = normalize_question(messages[-1]["content"])
+    if not question:
+        return None
+    context = "\n".join(f"{m['role']}: {normalize_question(m['content'])}" for m in messages[:-1])
+    return context, question
+
+
+def numbers(normalized):
+    """The numbers in a normalized question, in order."""
+    return [word for word in normalized.split() if word.isdigit()]
+
+
+class _Entry:
+    __slots__ = ("context", "question", "reply", "terms", "numbers", "expires_at", "hits")
+
+    def __init__(self, context, question, reply, expires_at):
+        self.context    = context
+        self.question   = question
+        self.reply      = reply
+        self.terms      = features(question)
+        self.numbers    = numbers(question)
+        self.expires_at = expires_at
+        self.hits       = 0
+
+
+class ChatResponseCache:
+    """
+    In-memory LRU of chatbot replies with exact and similar-question lookup.
+
+    Limits default to the CHAT_CACHE_* settings. Thread-safe.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None, similarity=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity  = similarity
+        self._entries    = OrderedDict()       # (context, question) -> _Entry
+        self._index      = defaultdict(set)    # (context, bucket) -> keys
+        self._df         = Counter()           # bucket -> cached questions containing it
+        self._lock       = threading.Lock()
+        self.reset_stats()
+
+    def _setting(self, value, name, default):
+        return value if value is not None else getattr(settings, name, default)
+
+    # ── Statistics ─────────────────────────────────────────────────────────
+
+    def reset_stats(self):
+        self.exact_hits = self.similar_hits = self.misses = 0
+
+    def stats(self):
+        """This process's counters: hits by kind, misses, hit rate, Gemini calls saved and size."""
+        hits    = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits":   self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses":       self.misses,
+            "hit_rate":     round(hits / lookups, 4) if lookups else 0.0,
+            "saved_calls":  hits,
+            "entries":      len(self._entries),
+        }
+
+    def top(self, limit=10):
+        """The most-hit cached questions as (question, hits), most hits first."""
+        with self._lock:
+            ranked = sorted(self._entries.values(), key=lambda e: e.hits, reverse=True)
+            return [(entry.question, entry.hits) for entry in ranked[:limit]]
+
+    # ── Lookup ─────────────────────────────────────────────────────────────
+
+    def get(self, messages):
+        """Return a cached reply for the conversation, or None."""
+        key = conversation_key(messages)
+        if key is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < now:
+                self._evict(key)
+                entry = None
+            if entry is not None:
+                self.exact_hits += 1
+            else:
+                entry = self._most_similar(key, now)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self.similar_hits += 1
+            entry.hits += 1
+            self._entries.move_to_end((entry.context, entry.question))
+            return entry.reply
+
+    def _most_similar(self, key, now):
+        context, question = key
+        if len(question.split()) < MIN_SIMILAR_TOKENS:
+            return None
+        terms  = features(question)
+        digits = numbers(question)
+
+        candidates = set()
+        for bucket in terms:
+            candidates.update(self._index.get((context, bucket), ()))
+        if not candidates:
+            return None
+
+        total  = len(self._entries)
+        idf    = {bucket: math.log((1 + total) / (1 + self._df[bucket])) + 1 for bucket in terms}
+        query  = {bucket: (1 + math.log(count)) * idf[bucket] for bucket, count in terms.items()}
+        q_norm = math.sqrt(sum(w * w for w in query.values()))
+
+        threshold = self._setting(self.similarity, "CHAT_CACHE_SIMILARITY", DEFAULT_SIMILARITY)
+        best, best_score = None, threshold
+        for candidate in candidates:
+            entry = self._entries[candidate]
+            if entry.expires_at < now or entry.numbers != digits:
+                continue
+            dot = norm = 0.0
+            for bucket, count in entry.terms.items():
+                weight = (1 + math.log(count)) * (
+                    idf[bucket] if bucket in idf else math.log((1 + total) / (1 + self._df[bucket])) + 1
+                )
+                norm += weight * weight
+                dot  += weight * query.get(bucket, 0.0)
+            score = dot / (q_norm * math.sqrt(norm))
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    # ── Storing ────────────────────────────────────────────────────────────
+
+    def put(self, messages, reply):
+        """Store Gemini's reply to a cacheable conversation."""
+        key = conversation_key(messages)
+        if key is None or not reply:
+            return
+        ttl   = self._setting(self.ttl_seconds, "CHAT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+        limit = self._setting(self.max_entries, "CHAT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        entry = _Entry(key[0], key[1], reply, time.monotonic() + ttl)
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = entry
+            for bucket in entry.terms:
+                self._index[(entry.context, bucket)].add(key)
+                self._df[bucket] += 1
+            while len(self._entries) > limit:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        entry = self._entries.pop(key)
+        for bucket in entry.terms:
+            keys = self._index[(entry.context, bucket)]
+            keys.discard(key)
+            if not keys:
+                del self._index[(entry.context, bucket)]
+            self._df[bucket] -= 1
+            if not self._df[bucket]:
+                del self._df[bucket]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._df.clear()
+
+
+chat_cache = ChatResponseCache()
@@ -1,21 +1,27 @@
 """
 Gemini-powered AI chatbot endpoint for the CivicSense platform.
 
-Exposes a single POST endpoint at /api/chat/ that proxies citizen messages
-to the Google Gemini API and returns a structured reply. The chatbot is
+Exposes POST /api/chat/, which proxies citizen messages to the Google
+Gemini API and returns a structured reply, and POST /api/chat/stream/, an
+async variant that streams the reply token by token as server-sent events. The chatbot is
 aware of CivicSense-specific knowledge: issue categories, department routing,
 severity levels, and the report submission workflow.
 
 Key behaviours:
-  - Rate-limited to 20 requests per IP per hour (Django cache-backed).
-  - Model selection is lazy and preference-ordered: available flash models
-    are discovered on first request and cached for the process lifetime.
-    The last successful model is tried first on all subsequent calls.
-  - 429 quota exhaustion triggers a short sleep-and-retry (once, if the
-    retry delay is 10 s or less), then falls through to the next model.
-  - 404 model-not-found errors prune the model from the available list.
+  - Rate-limited to 20 requests per hour per IP (and per user when
+    authenticated) with the atomic sliding-window limiter in core.ratelimit.
+  - Model selection, client reuse and failure handling go through the
+    shared router in core.llm: the fastest healthy flash model is tried
+    first, 429 quota exhaustion triggers a short sleep-and-retry (once, if
+    the retry delay is 10 s or less) and then a cooldown, and 404
+    model-not-found errors prune the model.
   - All error paths return HTTP 200 with a user-friendly reply string so
     the frontend never needs to handle non-2xx chat responses.
+  - The streaming view uses the router's async client surface, so under
+    ASGI a slow Gemini reply holds a coroutine, not a worker thread.
+  - Short conversations are answered from core.chat_cache when the same or
+    a similar question was answered recently; every successful Gemini
+    reply to one is stored there.
 
 Module: core
 Author: Ankitha
@@ -24,70 +30,22 @@ Author: Ankitha
 # Standard library
 import json
 import logging
-import re
-import time
 
 # Third-party
-from google import genai
 from google.genai import types
 from google.genai.errors import ClientError
 from django.conf import settings
-from django.core.cache import cache
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-logger = logging.getLogger(__name__)
+# Local
+from .chat_cache import chat_cache
+from .llm import error_code, router
+from .ratelimit import SlidingWindowLimiter
 
-# Preference order — models are skipped if not available on the account
-PREFERRED = [
-    "gemini-2.5-flash-lite",
-    "gemini-2.5-flash",
-    "gemini-2.0-flash-lite",
-    "gemini-2.0-flash",
-    "gemini-flash-latest",
-]
-
-# Populated lazily on first request; mutated when 404s are encountered
-_available_models = None
-# Cached after the first successful call — tried first on every subsequent request
-_working_model = None
-
-
-def _discover_models(api_key):
-    """Fetch the account's flash models that support generateContent (cached)."""
-    global _available_models
-    if _available_models is not None:
-        return _available_models
-    try:
-        client = genai.Client(api_key=api_key)
-        discovered = [
-            m.name.replace("models/", "")
-            for m in client.models.list()
-            if "flash" in m.name.lower()
-            and "generateContent" in (m.supported_actions or [])
-        ]
-        print(f"[CivicSense Chat] Available flash models: {discovered}")
-        _available_models = discovered
-    except Exception as exc:
-        logger.warning("[CivicSense Chat] Model discovery failed (%s). Falling back to preferred list.", exc)
-        _available_models = list(PREFERRED)
-    return _available_models
-
-
-def _ordered_models(api_key):
-    """PREFERRED models that exist in the available list, then any remaining flash models."""
-    available = _discover_models(api_key)
-    available_set = set(available)
-    ordered = [m for m in PREFERRED if m in available_set]
-    for m in available:
-        if m not in ordered:
-            ordered.append(m)
-    # Put the cached working model first so it is always tried before the others
-    if _working_model and _working_model in ordered:
-        ordered = [_working_model] + [m for m in ordered if m != _working_model]
-    return ordered
+logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = """You are the official AI assistant for CivicSense, a Smart City civic issue reporting platform for Indian citizens.
 
@@ -123,10 +81,13 @@ BEHAVIOR:
 RATE_LIMIT = 20
 RATE_WINDOW = 3600
 
+chat_limiter = SlidingWindowLimiter("chat", RATE_LIMIT, RATE_WINDOW)
 
-def _get_client_ip(request):
-    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
-    return forwarded.split(",")[0].strip() if forwarded else request.META.get("REMOTE_ADDR", "unknown")
+BUSY_REPLY        = "I am receiving a lot of questions right now. Please try again in about a minute."
+INVALID_REPLY     = "I could not understand that request. Please try again."
+EMPTY_REPLY       = "Please send a message and I will help you."
+UNAVAILABLE_REPLY = "The assistant is temporarily unavailable."
+ERROR_REPLY       = "Something went wrong on my end. Please try again."
 
 
 def _to_gemini_history(messages):
@@ -137,129 +98,196 @@ def _to_gemini_history(messages):
     return history
 
 
-def _extract_retry_delay(exc):
-    """Parse retry delay seconds from a 429 ClientError string, or return None."""
-    msg = str(exc)
-    m = re.search(r"retryDelay['\"]:\s*['\"](\d+(?:\.\d+)?)s", msg)
-    if m:
-        return float(m.group(1))
-    m = re.search(r"retry in (\d+(?:\.\d+)?)s", msg, re.IGNORECASE)
-    if m:
-        return float(m.group(1))
-    return None
-
+def _call_gemini(api_key, history, last_message, client=None):
+    """
+    Send the conversation through the shared model router (see core.llm).
 
-def _call_gemini(api_key, history, last_message):
+    The router tries the fastest healthy model first, sleeps once on a short
+    429, cools down quota-exhausted models and prunes 404s.
+    Returns reply text, or None if all models are exhausted. `client` may be
+    injected (stubs in benchmarks).
     """
-    Try models in preference order (working model first).
-    - 429 with short delay: sleep once and retry, then move on.
-    - 404: prune from available list and move on.
-    Returns reply text, or None if all models are exhausted.
+    def send(client, model):
+        chat = client.chats.create(
+            model=model,
+            config=types.GenerateContentConfig(
+                system_instruction=SYSTEM_PROMPT,
+                max_output_tokens=400,
+            ),
+            history=history,
+        )
+        return chat.send_message(last_message).text
+
+    reply, model = router.call(api_key, send, client=client, log_prefix="[CivicSense Chat]")
+    if model:
+        print(f"[CivicSense Chat] Using model: {model}")
+    return reply
+
+
+def _clean_messages(raw_body):
+    """
+    Parse and sanitise a chat request body.
+
+    Returns (clean_messages, None) on success, or (None, reply_text) with the
+    user-facing reply to send back when the request cannot be answered.
     """
-    global _available_models, _working_model
-
-    client = genai.Client(api_key=api_key)
-
-    for model in _ordered_models(api_key):
-        for attempt in range(2):
-            try:
-                chat = client.chats.create(
-                    model=model,
-                    config=types.GenerateContentConfig(
-                        system_instruction=SYSTEM_PROMPT,
-                        max_output_tokens=400,
-                    ),
-                    history=history,
-                )
-                response = chat.send_message(last_message)
-                _working_model = model
-                print(f"[CivicSense Chat] Using model: {model}")
-                return response.text
-
-            except ClientError as exc:
-                code = getattr(exc, "status_code", 500)
-
-                if code == 429:
-                    if attempt == 0:
-                        delay = _extract_retry_delay(exc)
-                        if delay is not None and delay <= 10:
-                            logger.info(
-                                "[CivicSense Chat] Model %s rate-limited, sleeping %.1fs then retrying.",
-                                model, delay,
-                            )
-                            time.sleep(delay)
-                            continue
-                    logger.warning("[CivicSense Chat] Model %s quota exhausted, trying next.", model)
-                    break
-
-                elif code == 404:
-                    logger.warning("[CivicSense Chat] Model %s not found, pruning from list.", model)
-                    if _available_models and model in _available_models:
-                        _available_models.remove(model)
-                    if _working_model == model:
-                        _working_model = None
-                    break
-
-                else:
-                    raise
-
-    return None
+    try:
+        body = json.loads(raw_body)
+    except (json.JSONDecodeError, ValueError):
+        return None, INVALID_REPLY
+
+    messages = body.get("messages", []) if isinstance(body, dict) else []
+    if not messages:
+        return None, EMPTY_REPLY
+
+    clean = [
+        {"role": m["role"], "content": str(m["content"])[:2000]}
+        for m in messages
+        if isinstance(m, dict)
+        and m.get("role") in ("user", "assistant")
+        and str(m.get("content", "")).strip()
+    ][-20:]
+
+    if not clean or clean[-1]["role"] != "user":
+        return None, EMPTY_REPLY
+    return clean, None
+
+
+def _api_key():
+    """Return the configured Gemini key, or None (logged) if it is missing."""
+    api_key = settings.GEMINI_API_KEY
+    if not api_key or api_key == "your_AIza_key_here":
+        logger.error("[CivicSense Chat] GEMINI_API_KEY is not configured.")
+        return None
+    return api_key
+
+
+def _error_reply(exc):
+    """Map an exception from the Gemini call to a user-facing reply."""
+    if isinstance(exc, ClientError):
+        code = error_code(exc)
+        logger.exception("[CivicSense Chat] ClientError %s", code)
+        if code in (401, 403):
+            return UNAVAILABLE_REPLY
+        return ERROR_REPLY
+    logger.exception("[CivicSense Chat] Unexpected error")
+    return ERROR_REPLY
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class ChatView(View):
+    """Synchronous chat endpoint: POST /api/chat/ returns the whole reply as JSON."""
+
     def post(self, request):
-        ip = _get_client_ip(request)
-        cache_key = f"chat_rate_{ip}"
-        count = cache.get(cache_key, 0)
-        if count >= RATE_LIMIT:
-            return JsonResponse(
-                {"reply": "I am receiving a lot of questions right now. Please try again in about a minute."}
-            )
-        cache.set(cache_key, count + 1, RATE_WINDOW)
+        allowed, _retry_after = chat_limiter.check(request)
+        if not allowed:
+            return JsonResponse({"reply": BUSY_REPLY})
 
-        try:
-            body = json.loads(request.body)
-        except (json.JSONDecodeError, ValueError):
-            return JsonResponse({"reply": "I could not understand that request. Please try again."})
-
-        messages = body.get("messages", [])
-        if not messages:
-            return JsonResponse({"reply": "Please send a message and I will help you."})
-
-        clean = [
-            {"role": m["role"], "content": str(m["content"])[:2000]}
-            for m in messages
-            if isinstance(m, dict)
-            and m.get("role") in ("user", "assistant")
-            and m.get("content", "").strip()
-        ][-20:]
-
-        if not clean or clean[-1]["role"] != "user":
-            return JsonResponse({"reply": "Please send a message and I will help you."})
-
-        api_key = settings.GEMINI_API_KEY
-        if not api_key or api_key == "your_AIza_key_here":
-            logger.error("[CivicSense Chat] GEMINI_API_KEY is not configured.")
-            return JsonResponse({"reply": "The assistant is temporarily unavailable."})
+        clean, reply = _clean_messages(request.body)
+        if reply:
+            return JsonResponse({"reply": reply})
+
+        reply = chat_cache.get(clean)
+        if reply:
+            return JsonResponse({"reply": reply})
+
+        api_key = _api_key()
+        if not api_key:
+            return JsonResponse({"reply": UNAVAILABLE_REPLY})
 
         history = _to_gemini_history(clean)
 
         try:
             reply = _call_gemini(api_key, history, clean[-1]["content"])
-            if reply is None:
-                return JsonResponse(
-                    {"reply": "I am receiving a lot of questions right now. Please try again in about a minute."}
-                )
-            return JsonResponse({"reply": reply})
+            chat_cache.put(clean, reply)
+            return JsonResponse({"reply": BUSY_REPLY if reply is None else reply})
+        except Exception as exc:
+            return JsonResponse({"reply": _error_reply(exc)})
 
-        except ClientError as exc:
-            code = getattr(exc, "status_code", 500)
-            logger.exception("[CivicSense Chat] ClientError %s", code)
-            if code in (401, 403):
-                return JsonResponse({"reply": "The assistant is temporarily unavailable."})
-            return JsonResponse({"reply": "Something went wrong on my end. Please try again."})
 
-        except Exception:
-            logger.exception("[CivicSense Chat] Unexpected error")
-            return JsonResponse({"reply": "Something went wrong on my end. Please try again."})
+# ---------------------------------------------------------------------------
+# Streaming (ASGI) variant
+# ---------------------------------------------------------------------------
+
+def _sse(event, payload):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _stream_events(api_key, messages):
+    """
+    Yield SSE frames for a streamed Gemini reply to the cleaned `messages`.
+
+    Emits one `delta` event per chunk ({"text": ...}) and a final `done`
+    event carrying the full reply, which the widget uses to build its
+    follow-up chips. If the stream fails, the exception is logged and an
+    `error` event ({"error": ...}) precedes a `done` event carrying the
+    partial reply, or the error reply when nothing was streamed. Only a
+    complete reply is stored in the chat cache.
+    """
+    history  = _to_gemini_history(messages)
+    contents = history + [types.Content(role="user", parts=[types.Part(text=messages[-1]["content"])])]
+    config = types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT, max_output_tokens=400)
+
+    async def open_stream(aio, model):
+        return await aio.models.generate_content_stream(model=model, contents=contents, config=config)
+
+    parts = []
+    try:
+        async for chunk in router.astream(api_key, open_stream, log_prefix="[CivicSense Chat]"):
+            text = chunk.text or ""
+            if text:
+                parts.append(text)
+                yield _sse("delta", {"text": text})
+    except Exception as exc:
+        error = _error_reply(exc)  # logs, including after partial output
+        yield _sse("error", {"error": error})
+        yield _sse("done", {"reply": "".join(parts) or error})
+        return
+
+    chat_cache.put(messages, "".join(parts))
+    yield _sse("done", {"reply": "".join(parts) or BUSY_REPLY})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class ChatStreamView(View):
+    """
+    Async chat endpoint: POST /api/chat/stream/ streams the reply as server-sent events.
+
+    Accepts the same body as ChatView. Tokens are forwarded as soon as
+    Gemini produces them, so time-to-first-token replaces time-to-full-reply
+    in perceived latency. Served under ASGI (civicsense_backend.asgi), each
+    open chat is a coroutine waiting on the network rather than a blocked
+    worker thread, so one process can hold hundreds of concurrent streams.
+    Requests that cannot be answered, and replies served from the chat
+    cache, get a single `done` event.
+    """
+
+    async def post(self, request):
+        allowed, _retry_after = await chat_limiter.acheck(request)
+        if not allowed:
+            return self._single(BUSY_REPLY)
+
+        clean, reply = _clean_messages(request.body)
+        if reply:
+            return self._single(reply)
+
+        reply = chat_cache.get(clean)
+        if reply:
+            return self._single(reply)
+
+        api_key = _api_key()
+        if not api_key:
+            return self._single(UNAVAILABLE_REPLY)
+
+        response = StreamingHttpResponse(
+            _stream_events(api_key, clean),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+        return response
+
+    @staticmethod
+    def _single(reply):
+        return HttpResponse(_sse("done", {"reply": reply}), content_type="text/event-stream")
@@ -0,0 +1,204 @@
+"""
+Perceptual-hash duplicate detection for issue photos.
+
+Citizens often report the same pothole several times. When an issue with
+a photo is submitted, flag_duplicate() computes a 64-bit difference hash
+(dHash) of the photo: the image is shrunk to 9x8 grey pixels and each bit
+records whether a pixel is brighter than its right-hand neighbour, so a
+re-encoded, resized or recompressed copy of a photo lands within a few
+bits of the original while different scenes differ in dozens.
+
+The hash is stored as four 16-bit bands (Issue.photo_dhash0..3), each with
+its own index. Two hashes within Hamming distance 3 agree exactly on at
+least one band (pigeonhole), so find_duplicate() gathers its candidates
+with four indexed equality lookups OR-ed together instead of comparing
+against every row, then checks the full hash distance, the ground distance
+(DUPLICATE_RADIUS_M) and the age (DUPLICATE_WINDOW_DAYS) of the few rows
+that come back. Only unresolved issues of the same category are matched.
+
+A match sets Issue.duplicate_of to the earliest report of the chain. When
+the two photos are near-identical (DUPLICATE_REUSE_DISTANCE) and the
+matched issue has already been analysed, enqueue_issue_analysis() copies
+its Gemini Vision result instead of queuing another call.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import logging
+import math
+from datetime import timedelta
+
+# Third-party
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+# Local
+from .models import Issue
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE   = 8   # 8x8 neighbour comparisons -> 64 bits
+BAND_BITS   = 16
+BAND_FIELDS = ["photo_dhash0", "photo_dhash1", "photo_dhash2", "photo_dhash3"]
+
+# Candidates are only guaranteed for distances below the number of bands
+MAX_INDEXED_DISTANCE = len(BAND_FIELDS) - 1
+
+# Hashes with fewer set (or clear) bits than this come from flat, featureless
+# photos (a dark frame, a wall) and would match each other; they are stored
+# but never used to flag a duplicate.
+MIN_HASH_BITS = 8
+
+# Upper bound on candidate rows fetched per lookup
+CANDIDATE_LIMIT = 200
+
+EARTH_RADIUS_M = 6_371_008.8
+
+DEFAULT_MAX_DISTANCE   = 3
+DEFAULT_REUSE_DISTANCE = 1
+DEFAULT_RADIUS_M       = 75
+DEFAULT_WINDOW_DAYS    = 30
+
+
+def max_distance():
+    return min(getattr(settings, "DUPLICATE_MAX_DISTANCE", DEFAULT_MAX_DISTANCE), MAX_INDEXED_DISTANCE)
+
+
+def reuse_distance():
+    return min(getattr(settings, "DUPLICATE_REUSE_DISTANCE", DEFAULT_REUSE_DISTANCE), max_distance())
+
+
+# ---------------------------------------------------------------------------
+# Hashing
+# ---------------------------------------------------------------------------
+
+def dhash(image):
+    """64-bit difference hash of a PIL image, as an int."""
+    small  = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = small.tobytes()
+    value  = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def photo_dhash(file):
+    """
+    dHash of a photo given as a path or binary file.
+
+    JPEGs are decoded in draft mode (1/8 scale, greyscale), which skips
+    most of the pixel work; what remains for a 12 MP photo is mostly
+    entropy decoding. EXIF orientation is applied first so a rotated copy
+    hashes like the original.
+    """
+    with Image.open(file) as img:
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        return dhash(ImageOps.exif_transpose(img))
+
+
+def split_bands(value):
+    """The four 16-bit bands of a 64-bit hash, most significant first."""
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (BAND_BITS * (len(BAND_FIELDS) - 1 - i))) & mask for i in range(len(BAND_FIELDS))]
+
+
+def join_bands(bands):
+    value = 0
+    for band in bands:
+        value = (value << BAND_BITS) | band
+    return value
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def is_distinctive(value):
+    bits = value.bit_count()
+    return MIN_HASH_BITS <= bits <= HASH_SIZE * HASH_SIZE - MIN_HASH_BITS
+
+
+def _distance_m(lat1, lng1, lat2, lng2):
+    """Haversine distance in metres between two coordinates (degrees, scalar)."""
+    lat1, lng1, lat2, lng2 = (math.radians(float(v)) for v in (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+def find_duplicate(issue, value):
+    """
+    Return (pk, duplicate_of_id, photo distance in bits, metres or None) of
+    the closest earlier report the issue repeats, or None.
+
+    Candidates share at least one hash band with `value`; a candidate
+    matches when the full hash is within DUPLICATE_MAX_DISTANCE bits and
+    both issues lie within DUPLICATE_RADIUS_M of each other. If either has
+    no coordinates, only a near-identical photo (DUPLICATE_REUSE_DISTANCE)
+    counts.
+    """
+    limit   = max_distance()
+    radius  = getattr(settings, "DUPLICATE_RADIUS_M", DEFAULT_RADIUS_M)
+    since   = timezone.now() - timedelta(days=getattr(settings, "DUPLICATE_WINDOW_DAYS", DEFAULT_WINDOW_DAYS))
+    bands_q = Q()
+    for field, band in zip(BAND_FIELDS, split_bands(value)):
+        bands_q |= Q(**{field: band})
+
+    candidates = (
+        Issue.objects.filter(bands_q, category=issue.category, created_at__gte=since)
+        .exclude(pk=issue.pk)
+        .exclude(status="resolved")
+        .values_list("pk", *BAND_FIELDS, "latitude", "longitude", "duplicate_of_id")
+        [:CANDIDATE_LIMIT]
+    )
+
+    best = None
+    for pk, *bands, latitude, longitude, duplicate_of_id in candidates:
+        distance = hamming(value, join_bands(bands))
+        if distance > limit:
+            continue
+        located = None not in (issue.latitude, issue.longitude, latitude, longitude)
+        metres  = _distance_m(issue.latitude, issue.longitude, latitude, longitude) if located else None
+        if metres is None and distance > reuse_distance():
+            continue
+        if metres is not None and metres > radius:
+            continue
+        key = (distance, metres or 0.0, pk)
+        if best is None or key < best[0]:
+            best = (key, (pk, duplicate_of_id, distance, metres))
+    return best[1] if best else None
+
+
+def flag_duplicate(issue):
+    """
+    Hash a freshly saved issue's photo and flag it if it repeats a report.
+
+    Stores the hash bands, sets duplicate_of to the original report of a
+    match and returns find_duplicate()'s tuple, or None. Never raises: an
+    unreadable photo is logged and skipped so submission is unaffected.
+    """
+    if not issue.photos:
+        return None
+    try:
+        with issue.photos.open("rb") as photo:
+            value = photo_dhash(photo)
+    except Exception as exc:
+        logger.warning("[CivicSense Duplicates] Could not hash photo of issue #%s: %s", issue.pk, exc)
+        return None
+
+    for field, band in zip(BAND_FIELDS, split_bands(value)):
+        setattr(issue, field, band)
+    match = find_duplicate(issue, value) if is_distinctive(value) else None
+    if match:
+        issue.duplicate_of_id = match[1] or match[0]
+    issue.save(update_fields=BAND_FIELDS + ["duplicate_of"])
+    return match
@@ -0,0 +1,248 @@
+"""
+Streaming issue export (CSV, NDJSON, Parquet) for departments and analysts.
+
+Used by GET /api/department/issues/export/ and `manage.py export_issues`.
+Rows are read with values_list(...).iterator(chunk_size=...), so no Issue
+instances are built and at most one chunk of tuples is in memory, and
+each format is produced by a generator that a StreamingHttpResponse (or
+the command) drains piece by piece. Exporting millions of issues
+therefore uses memory bounded by the chunk size, not the result size.
+
+  - csv:     header row, then one line per issue
+  - ndjson:  one JSON object per line
+  - parquet: one row group per chunk (requires the optional pyarrow
+             package); the footer is written when the stream ends
+
+filter_issues() applies the same filters as the department issue list
+(?status=, ?duplicates=hide) plus an optional created_at range.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import csv
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+# Third-party
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (column name, ORM lookup) in output order
+EXPORT_COLUMNS = [
+    ("id",                   "id"),
+    ("title",                "title"),
+    ("description",          "description"),
+    ("location",             "location"),
+    ("category",             "category"),
+    ("severity",             "severity"),
+    ("status",               "status"),
+    ("contact",              "contact"),
+    ("email",                "email"),
+    ("phone",                "phone"),
+    ("latitude",             "latitude"),
+    ("longitude",            "longitude"),
+    ("department",           "assigned_department__name"),
+    ("reporter",             "user__username"),
+    ("ai_category",          "ai_category"),
+    ("ai_confidence",        "ai_confidence"),
+    ("ai_detected_category", "ai_detected_category"),
+    ("ai_severity",          "ai_severity"),
+    ("department_notes",     "department_notes"),
+    ("created_at",           "created_at"),
+    ("updated_at",           "updated_at"),
+    ("resolved_at",          "resolved_at"),
+]
+COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+
+# ---------------------------------------------------------------------------
+# Filtering and reading
+# ---------------------------------------------------------------------------
+
+def parse_bound(value, end=False):
+    """
+    Parse an ISO date or datetime filter bound into an aware datetime.
+
+    A bare date means the start of that day, or with end=True the start of
+    the next day, so created_before=2026-01-31 includes all of the 31st.
+    Raises ValueError for anything else.
+    """
+    # Dates first: parse_datetime() also accepts a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"'{value}' is not an ISO date or datetime.")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_issues(queryset, status=None, duplicates=None, created_after=None, created_before=None):
+    """
+    Apply the export filters; date bounds are strings as accepted by
+    parse_bound(). duplicates="hide" leaves out reports flagged as repeats.
+    """
+    if status:
+        queryset = queryset.filter(status=status.lower())
+    if (duplicates or "").lower() == "hide":
+        queryset = queryset.filter(duplicate_of__isnull=True)
+    if created_after:
+        queryset = queryset.filter(created_at__gte=parse_bound(created_after))
+    if created_before:
+        queryset = queryset.filter(created_at__lt=parse_bound(created_before, end=True))
+    return queryset
+
+
+def iter_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one tuple per issue (EXPORT_COLUMNS order), newest first, chunk by chunk."""
+    return (
+        queryset.order_by("-created_at", "-id")
+        .values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Formats
+# ---------------------------------------------------------------------------
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class _Echo:
+    """File-like object whose write() returns the data, for csv.writer in a generator."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield CSV text: the header, then lines batched `chunk_size` at a time."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMN_NAMES)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_plain(v) if v is not None else "" for v in row]))
+        if len(batch) >= chunk_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def stream_ndjson(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield NDJSON text, `chunk_size` objects at a time."""
+    batch = []
+    for row in rows:
+        batch.append(json.dumps({name: _plain(v) for name, v in zip(COLUMN_NAMES, row)}, ensure_ascii=False))
+        if len(batch) >= chunk_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+class _Sink:
+    """Write-only binary sink that hands back what was written since the last drain()."""
+
+    def __init__(self):
+        self.parts    = []
+        self.position = 0
+        self.closed   = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def stream_parquet(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a generator of Parquet bytes, one row group per chunk.
+
+    Requires pyarrow; the import happens here, before any output, so a
+    missing package is reported instead of truncating a started stream.
+    """
+    # Third-party (optional)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs the 'pyarrow' package (pip install pyarrow).")
+
+    types = {
+        "id":            pa.int64(),
+        "latitude":      pa.float64(),
+        "longitude":     pa.float64(),
+        "ai_confidence": pa.float64(),
+        "created_at":    pa.timestamp("us", tz="UTC"),
+        "updated_at":    pa.timestamp("us", tz="UTC"),
+        "resolved_at":   pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, types.get(name, pa.string())) for name in COLUMN_NAMES])
+
+    def chunks():
+        sink   = _Sink()
+        writer = pq.ParquetWriter(sink, schema)
+
+        def write(batch):
+            columns = [
+                pa.array([float(v) if isinstance(v, Decimal) else v for v in column], type=field.type)
+                for column, field in zip(zip(*batch), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                write(batch)
+                batch = []
+                yield sink.drain()
+        if batch:
+            write(batch)
+        writer.close()
+        yield sink.drain()
+
+    return chunks()
+
+
+# format -> (generator, content type, file extension)
+FORMATS = {
+    "csv":     (stream_csv,     "text/csv; charset=utf-8",            "csv"),
+    "ndjson":  (stream_ndjson,  "application/x-ndjson; charset=utf-8", "ndjson"),
+    "parquet": (stream_parquet, "application/vnd.apache.parquet",      "parquet"),
+}
+
+
+def export_stream(queryset, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return the generator producing `queryset` in `fmt` (a FORMATS key)."""
+    generator = FORMATS[fmt][0]
+    return generator(iter_rows(queryset, chunk_size), chunk_size)
@@ -0,0 +1,179 @@
+"""
+Geohash helpers for spatial lookups on Issue coordinates.
+
+Issue.geohash stores the standard base-32 geohash of the issue's
+coordinates (GEOHASH_PRECISION characters, ~5 m cells) and is indexed.
+Because the geohash alphabet is in ASCII order, every geohash cell is a
+contiguous string range, so a spatial query becomes a handful of indexed
+`geohash >= lo AND geohash < hi` range scans. Range scans (unlike LIKE
+'prefix%') use a plain B-tree index on both SQLite and PostgreSQL.
+
+cover_ranges() picks the finest prefix length at which a bounding box is
+covered by at most `max_cells` cells, then merges adjacent cells into
+ranges. The ranges over-approximate the box; callers apply the exact
+bounding-box or haversine filter to the surviving candidates.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import math
+
+# Third-party
+from django.db.models import Q
+
+BASE32            = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+METERS_PER_DEG    = math.pi * 6_371_008.8 / 180
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a coordinate pair, or "" if either is missing."""
+    if latitude is None or longitude is None:
+        return ""
+    lat_bits, lng_bits = _bit_split(precision)
+    lat_index = _cell_index(float(latitude), -90.0, 90.0, lat_bits)
+    lng_index = _cell_index(float(longitude), -180.0, 180.0, lng_bits)
+    return _to_string(_interleave(lat_index, lng_index, lat_bits, lng_bits), precision)
+
+
+def _bit_split(precision):
+    """(latitude bits, longitude bits) of a geohash of `precision` characters."""
+    bits = 5 * precision
+    return bits // 2, (bits + 1) // 2
+
+
+def _cell_index(value, low, high, bits):
+    """Index of the 2**bits equal slice of [low, high] containing `value` (clamped)."""
+    n = 1 << bits
+    return min(max(int((value - low) / (high - low) * n), 0), n - 1)
+
+
+def _interleave(lat_index, lng_index, lat_bits, lng_bits):
+    """Interleave longitude (even) and latitude (odd) bits into one integer code."""
+    code = 0
+    for i in range(lat_bits + lng_bits):
+        if i % 2 == 0:
+            bit = (lng_index >> (lng_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_index >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+    return code
+
+
+def _to_string(code, precision):
+    chars = []
+    for _ in range(precision):
+        chars.append(BASE32[code & 31])
+        code >>= 5
+    return "".join(reversed(chars))
+
+
+def _cells_in_box(min_lat, min_lng, max_lat, max_lng, precision):
+    lat_bits, lng_bits = _bit_split(precision)
+    lat0, lat1 = _cell_index(min_lat, -90.0, 90.0, lat_bits), _cell_index(max_lat, -90.0, 90.0, lat_bits)
+    lng0, lng1 = _cell_index(min_lng, -180.0, 180.0, lng_bits), _cell_index(max_lng, -180.0, 180.0, lng_bits)
+    return lat_bits, lng_bits, range(lat0, lat1 + 1), range(lng0, lng1 + 1)
+
+
+def cover_ranges(min_lat, min_lng, max_lat, max_lng, max_cells=32):
+    """
+    Return [(lo, hi), ...] geohash string ranges covering the bounding box.
+
+    Each range means `lo <= geohash < hi`; hi is None for a range that runs
+    to the end of the keyspace. Boxes crossing the antimeridian
+    (min_lng > max_lng) are split in two.
+    """
+    if min_lng > max_lng:
+        return (
+            cover_ranges(min_lat, min_lng, max_lat, 180.0, max_cells)
+            + cover_ranges(min_lat, -180.0, max_lat, max_lng, max_cells)
+        )
+
+    precision = 1
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        _, _, lats, lngs = _cells_in_box(min_lat, min_lng, max_lat, max_lng, p)
+        if len(lats) * len(lngs) <= max_cells:
+            precision = p
+            break
+
+    lat_bits, lng_bits, lats, lngs = _cells_in_box(min_lat, min_lng, max_lat, max_lng, precision)
+    codes = sorted(_interleave(a, b, lat_bits, lng_bits) for a in lats for b in lngs)
+
+    # Merge runs of consecutive cell codes into single ranges.
+    runs = []
+    for code in codes:
+        if runs and runs[-1][1] == code:
+            runs[-1][1] = code + 1
+        else:
+            runs.append([code, code + 1])
+
+    last = 1 << (5 * precision)
+    return [
+        (_to_string(lo, precision), _to_string(hi, precision) if hi < last else None)
+        for lo, hi in runs
+    ]
+
+
+def cover_q(min_lat, min_lng, max_lat, max_lng, field="geohash", max_cells=32):
+    """Q object selecting rows whose `field` falls in the box's covering geohash ranges."""
+    q = Q()
+    for lo, hi in cover_ranges(min_lat, min_lng, max_lat, max_lng, max_cells):
+        term = Q(**{f"{field}__gte": lo})
+        if hi is not None:
+            term &= Q(**{f"{field}__lt": hi})
+        q |= term
+    return q
+
+
+def radius_bbox(latitude, longitude, radius_m):
+    """Bounding box (min_lat, min_lng, max_lat, max_lng) of a circle, in degrees."""
+    dlat = radius_m / METERS_PER_DEG
+    cos_lat = math.cos(math.radians(latitude))
+    dlng = 180.0 if cos_lat < 1e-6 else min(dlat / cos_lat, 180.0)
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if dlng >= 180.0 or min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lng = (longitude - dlng + 180.0) % 360.0 - 180.0
+    max_lng = (longitude + dlng + 180.0) % 360.0 - 180.0
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def within_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """Filter `queryset` to issues inside the box: geohash range pruning, then exact bounds."""
+    exact = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lng <= max_lng:
+        exact &= Q(longitude__gte=min_lng, longitude__lte=max_lng)
+    else:
+        exact &= Q(longitude__gte=min_lng) | Q(longitude__lte=max_lng)
+    return queryset.filter(cover_q(min_lat, min_lng, max_lat, max_lng)).filter(exact)
+
+
+def nearest_ids(queryset, latitude, longitude, radius_m, limit):
+    """
+    Return [(pk, distance_m), ...] for issues within `radius_m`, nearest first.
+
+    Candidates come from the geohash ranges covering the circle's bounding
+    box; only (pk, lat, lng) is fetched for them and the exact haversine
+    filter runs vectorised in NumPy.
+    """
+    # Third-party (deferred: models imports this module at startup)
+    import numpy as np
+    from django.db.models import FloatField
+    from django.db.models.functions import Cast
+
+    from .hotspots import haversine_m
+
+    candidates = list(
+        within_bbox(queryset, *radius_bbox(latitude, longitude, radius_m))
+        .annotate(lat_f=Cast("latitude", FloatField()), lng_f=Cast("longitude", FloatField()))
+        .values_list("pk", "lat_f", "lng_f")
+    )
+    if not candidates:
+        return []
+    pks, lats, lngs = (np.asarray(col) for col in zip(*candidates))
+    distance = haversine_m(np.float64(latitude), np.float64(longitude), lats.astype(float), lngs.astype(float))
+    inside = np.flatnonzero(distance <= radius_m)
+    order = inside[np.argsort(distance[inside], kind="stable")][:limit]
+    return [(int(pks[i]), float(distance[i])) for i in order]
@@ -0,0 +1,224 @@
+"""
+Vectorised geospatial hotspot detection for CivicSense.
+
+find_hotspots() clusters issue locations with a grid-accelerated variant
+of DBSCAN, entirely in NumPy:
+
+  1. Points are projected onto a local equirectangular plane and binned
+     into square cells of side radius/√2, so any two points sharing a cell
+     are within `radius_m` of each other. Each occupied cell becomes one
+     weighted point at the centroid of its members.
+  2. Neighbouring cells (up to two cells away) whose centroids are within
+     `radius_m` by the haversine formula are linked. A cell is a core cell
+     when its own weight plus its linked neighbours' reaches `min_issues`.
+  3. Linked core cells are merged into clusters by label propagation with
+     pointer jumping (a vectorised union-find); non-core cells linked to a
+     core cell join it as border cells, and everything else is noise.
+  4. Cluster centroids, extents and per-category counts are aggregated
+     with np.bincount.
+
+Work is O(n log n) in the number of points (one sort in np.unique) and
+linear in the number of occupied cells afterwards, so a few million
+points cluster in about a second. Cell-level density is an approximation
+of point-level DBSCAN that is exact to within one cell (radius/√2); the
+local projection assumes city-scale extents.
+
+load_points() pulls only (latitude, longitude, category) for a queryset,
+cast to floats in the database, so no Issue instances or Decimals are
+built.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import math
+
+# Third-party
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+EARTH_RADIUS_M  = 6_371_008.8
+METERS_PER_DEG  = math.pi * EARTH_RADIUS_M / 180
+NEIGHBOUR_RANGE = 2     # cells of side radius/√2 needed to cover one radius
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between coordinate arrays (degrees)."""
+    lat1, lng1, lat2, lng2 = (np.radians(a) for a in (lat1, lng1, lat2, lng2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def load_points(queryset):
+    """
+    Return (lat, lng, categories) NumPy arrays for the geotagged issues in `queryset`.
+
+    Coordinates are cast to floats by the database; rows without
+    coordinates are excluded.
+    """
+    rows = list(
+        queryset.filter(latitude__isnull=False, longitude__isnull=False)
+        .annotate(lat_f=Cast("latitude", FloatField()), lng_f=Cast("longitude", FloatField()))
+        .values_list("lat_f", "lng_f", "category")
+        .iterator(chunk_size=20000)
+    )
+    if not rows:
+        empty = np.empty(0)
+        return empty, empty, np.empty(0, dtype=object)
+    lat, lng, categories = zip(*rows)
+    return (
+        np.fromiter(lat, dtype=np.float64, count=len(rows)),
+        np.fromiter(lng, dtype=np.float64, count=len(rows)),
+        np.array(categories, dtype=object),
+    )
+
+
+def _components(n, src, dst):
+    """Connected-component labels for `n` nodes joined by edges src[i]–dst[i]."""
+    labels = np.arange(n)
+    if not len(src):
+        return labels
+    while True:
+        low = np.minimum(labels[src], labels[dst])
+        updated = labels.copy()
+        np.minimum.at(updated, src, low)
+        np.minimum.at(updated, dst, low)
+        # Pointer jumping: follow labels to their current roots.
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def find_hotspots(lat, lng, categories=None, weights=None, radius_m=500.0, min_issues=3, limit=None):
+    """
+    Cluster points into hotspots; see the module docstring for the algorithm.
+
+    Args:
+        lat, lng:   Array-likes of coordinates in degrees.
+        categories: Optional array-like of category labels, one per point.
+        weights:    Optional per-point counts (e.g. pre-aggregated rows).
+        radius_m:   Neighbourhood radius (DBSCAN eps) in metres.
+        min_issues: Weight a neighbourhood needs for its cell to be a core cell.
+        limit:      Return at most this many hotspots.
+
+    Returns:
+        List of dicts, largest first:
+        {'location': {'lat', 'lng'}, 'issue_count', 'radius_m',
+         'categories': [...most frequent first], 'category_counts': {category: n}}
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    w   = np.ones(lat.shape) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    valid = np.isfinite(lat) & np.isfinite(lng) & (w > 0)
+    lat, lng, w = lat[valid], lng[valid], w[valid]
+    if not len(lat):
+        return []
+
+    # ── 1. Grid binning ──────────────────────────────────────────────────
+    cell   = radius_m / math.sqrt(2)
+    x_unit = METERS_PER_DEG * math.cos(math.radians(float(np.mean(lat))))
+    cx = np.floor(lng * x_unit / cell).astype(np.int64)
+    cy = np.floor(lat * METERS_PER_DEG / cell).astype(np.int64)
+    cx -= cx.min()
+    cy -= cy.min() - NEIGHBOUR_RANGE            # pad so neighbour offsets never wrap a column
+    span = int(cy.max()) + NEIGHBOUR_RANGE + 1
+    keys = cx * span + cy
+
+    cells, point_cell = np.unique(keys, return_inverse=True)
+    n_cells     = len(cells)
+    cell_weight = np.bincount(point_cell, weights=w, minlength=n_cells)
+    cell_lat    = np.bincount(point_cell, weights=w * lat, minlength=n_cells) / cell_weight
+    cell_lng    = np.bincount(point_cell, weights=w * lng, minlength=n_cells) / cell_weight
+
+    # ── 2. Neighbour links (half the offsets; links are symmetric) ────────
+    src_parts, dst_parts = [], []
+    for dx in range(0, NEIGHBOUR_RANGE + 1):
+        for dy in range(-NEIGHBOUR_RANGE, NEIGHBOUR_RANGE + 1):
+            if dx == 0 and dy <= 0:
+                continue
+            target = cells + dx * span + dy
+            idx    = np.minimum(np.searchsorted(cells, target), n_cells - 1)
+            hit    = np.flatnonzero(cells[idx] == target)
+            if not len(hit):
+                continue
+            near = haversine_m(cell_lat[hit], cell_lng[hit], cell_lat[idx[hit]], cell_lng[idx[hit]]) <= radius_m
+            src_parts.append(hit[near])
+            dst_parts.append(idx[hit][near])
+    src = np.concatenate(src_parts) if src_parts else np.empty(0, dtype=np.int64)
+    dst = np.concatenate(dst_parts) if dst_parts else np.empty(0, dtype=np.int64)
+
+    density = (
+        cell_weight
+        + np.bincount(src, weights=cell_weight[dst], minlength=n_cells)
+        + np.bincount(dst, weights=cell_weight[src], minlength=n_cells)
+    )
+    core = density >= min_issues
+    if not core.any():
+        return []
+
+    # ── 3. Clusters of core cells, then border cells ──────────────────────
+    both = core[src] & core[dst]
+    labels = _components(n_cells, src[both], dst[both])
+
+    cluster = np.where(core, labels, n_cells)
+    for a, b in ((src, dst), (dst, src)):
+        border = ~core[a] & core[b]
+        np.minimum.at(cluster, a[border], labels[b[border]])
+    member = cluster < n_cells
+
+    _, cluster_id = np.unique(cluster[member], return_inverse=True)
+    n_clusters = int(cluster_id.max()) + 1
+    cell_cluster = np.full(n_cells, -1)
+    cell_cluster[member] = cluster_id
+
+    # ── 4. Aggregate per cluster ──────────────────────────────────────────
+    m_weight = cell_weight[member]
+    totals   = np.bincount(cluster_id, weights=m_weight, minlength=n_clusters)
+    c_lat    = np.bincount(cluster_id, weights=m_weight * cell_lat[member], minlength=n_clusters) / totals
+    c_lng    = np.bincount(cluster_id, weights=m_weight * cell_lng[member], minlength=n_clusters) / totals
+
+    spread = haversine_m(cell_lat[member], cell_lng[member], c_lat[cluster_id], c_lng[cluster_id])
+    extent = np.zeros(n_clusters)
+    np.maximum.at(extent, cluster_id, spread)
+
+    cat_names, cat_counts = np.empty(0, dtype=object), None
+    if categories is not None:
+        cats = np.asarray(categories, dtype=object)[valid]
+        point_cluster = cell_cluster[point_cell]
+        in_cluster = point_cluster >= 0
+        cat_names, cat_codes = np.unique(cats[in_cluster].astype(str), return_inverse=True)
+        cat_counts = np.bincount(
+            point_cluster[in_cluster] * len(cat_names) + cat_codes,
+            weights=w[in_cluster],
+            minlength=n_clusters * len(cat_names),
+        ).reshape(n_clusters, len(cat_names))
+
+    order = np.argsort(-totals, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+
+    hotspots = []
+    for c in order:
+        counts = {}
+        if cat_counts is not None:
+            row = cat_counts[c]
+            counts = {str(cat_names[i]): int(row[i]) for i in np.argsort(-row, kind="stable") if row[i] > 0}
+        hotspots.append({
+            "location": {"lat": round(float(c_lat[c]), 6), "lng": round(float(c_lng[c]), 6)},
+            "issue_count": int(round(totals[c])),
+            "radius_m": round(float(extent[c]) + cell / 2, 1),
+            "categories": list(counts),
+            "category_counts": counts,
+        })
+    return hotspots
@@ -0,0 +1,126 @@
+"""
+Bulk issue ingestion for partner systems and call-center imports.
+
+Used by POST /api/issues/bulk/ and `manage.py import_issues`. Input is a
+stream of NDJSON lines (one issue object per line) or CSV with a header
+row, read incrementally from the request body or file, so memory stays
+bounded by one chunk no matter how large the upload is:
+
+  1. read_rows() decodes the byte stream line by line into
+     (row_number, row, parsed) triples; malformed lines become per-row
+     errors.
+  2. Every row is validated by ONE shared IssueSerializer instance via
+     run_validation(), i.e. exactly the rules of the single-issue
+     endpoint, without building a serializer per row.
+  3. Valid rows are buffered into chunks of `chunk_size` Issue objects and
+     inserted with Issue.objects.bulk_create_routed() (departments from
+     the in-memory routing table, geohash, rollups) inside one
+     transaction per chunk. A chunk either commits whole or not at all.
+
+Rejected rows are reported as {"row": n, "errors": {...}}; only the first
+MAX_REPORTED_ERRORS are kept, the rest are counted. Imported issues carry
+no photo, so no AI analysis is queued for them.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import codecs
+import csv
+import json
+
+# Third-party
+from django.db import transaction
+from rest_framework import serializers
+
+# Local
+from .models import Issue
+from .serializers import IssueSerializer
+
+FORMATS             = ("ndjson", "csv")
+DEFAULT_CHUNK_SIZE  = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# Request Content-Types accepted by the bulk endpoint
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson":   "ndjson",
+    "application/jsonl":    "ndjson",
+    "text/csv":             "csv",
+}
+
+
+def read_rows(lines, fmt):
+    """
+    Yield (row_number, row, parsed) from an iterable of byte lines.
+
+    `row` is a dict of field values, or (parsed=False) an error dict when
+    the line itself could not be parsed. Blank lines and CSV cells left
+    empty are skipped, so optional fields can be omitted either way.
+    """
+    text = codecs.iterdecode(lines, "utf-8-sig")
+    if fmt == "ndjson":
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, {"non_field_errors": [f"Invalid JSON: {exc}"]}, False
+                continue
+            if not isinstance(row, dict):
+                yield number, {"non_field_errors": ["Expected a JSON object."]}, False
+                continue
+            yield number, row, True
+    elif fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Row numbers count the header as row 1, like a spreadsheet
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}, True
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'; expected one of {', '.join(FORMATS)}.")
+
+
+def import_issues(rows, user, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Validate and bulk-insert the (row_number, row, parsed) triples from read_rows().
+
+    Returns {"received", "valid", "created", "failed", "errors", "errors_truncated"}.
+    With dry_run=True rows are validated but nothing is written.
+    """
+    validator = IssueSerializer(context={})
+    result = {"received": 0, "valid": 0, "created": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    chunk = []
+
+    def reject(number, errors):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"row": number, "errors": errors})
+        else:
+            result["errors_truncated"] = True
+
+    def flush():
+        result["valid"] += len(chunk)
+        if not dry_run:
+            with transaction.atomic():
+                Issue.objects.bulk_create_routed(chunk, batch_size=chunk_size)
+            result["created"] += len(chunk)
+        chunk.clear()
+
+    for number, row, parsed in rows:
+        result["received"] += 1
+        if not parsed:
+            reject(number, row)
+            continue
+        try:
+            validated = validator.run_validation(row)
+        except serializers.ValidationError as exc:
+            reject(number, exc.detail)
+            continue
+        chunk.append(Issue(user=user, **validated))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
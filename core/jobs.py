@@ -0,0 +1,234 @@
+"""
+Background job queue for the CivicSense core application.
+
+Slow work that must not hold a request thread (Gemini Vision analysis in
+particular) is recorded as a BackgroundJob row and executed later by the
+`run_jobs` management command. The queue is pluggable through the
+CIVICSENSE_JOB_BACKEND setting:
+
+  - DatabaseJobBackend (default): jobs are rows in core_backgroundjob and
+    are picked up by one or more `run_jobs` worker processes. No broker.
+  - ImmediateJobBackend: jobs are still recorded, then executed in-process
+    straight after the enqueuing transaction commits. Useful for local
+    development and tests that want the full pipeline without a worker.
+
+Delivery is at-least-once: a worker claims a job with a conditional UPDATE
+and holds a lease for JOB_LEASE_SECONDS. If the worker dies mid-job, the
+lease expires and another worker re-claims it, so tasks must be idempotent.
+Failures are retried with exponential backoff up to the job's max_attempts;
+a job whose lease expires on its last attempt (one that keeps crashing the
+worker, e.g. out of memory) is marked failed instead of being re-claimed.
+
+Tasks are plain functions taking the BackgroundJob, registered by name with
+@register_task (see core.tasks).
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import logging
+import random
+from datetime import timedelta
+
+# Third-party
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Local
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# name -> callable(job); populated by @register_task at import time
+TASKS = {}
+
+_backend = None
+
+
+def register_task(name):
+    """Register the decorated function as the handler for jobs named `name`."""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before retrying a job that has failed `attempts` times.
+
+    Doubles from JOB_RETRY_BASE_DELAY up to JOB_RETRY_MAX_DELAY, with up to
+    10% jitter so a burst of failures does not retry in lockstep.
+    """
+    base    = _setting("JOB_RETRY_BASE_DELAY", 30)
+    ceiling = _setting("JOB_RETRY_MAX_DELAY", 3600)
+    delay   = min(base * (2 ** max(attempts - 1, 0)), ceiling)
+    return delay + random.uniform(0, delay * 0.1)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class BaseJobBackend:
+    """Interface for job queue backends."""
+
+    def enqueue(self, task, issue=None):
+        """Persist a new job and return it."""
+        return BackgroundJob.objects.create(
+            task=task,
+            issue=issue,
+            max_attempts=_setting("JOB_MAX_ATTEMPTS", 5),
+        )
+
+
+class DatabaseJobBackend(BaseJobBackend):
+    """Default backend: the job row is the queue entry; `run_jobs` consumes it."""
+
+
+class ImmediateJobBackend(BaseJobBackend):
+    """Record the job, then run it in the current process straight away."""
+
+    def enqueue(self, task, issue=None):
+        job = super().enqueue(task, issue)
+        claimed = _claim(job.pk, "queued", None)
+        if claimed:
+            run_job(claimed)
+        return job
+
+
+def get_backend():
+    """Return the configured backend instance (created once per process)."""
+    global _backend
+    if _backend is None:
+        path = _setting("CIVICSENSE_JOB_BACKEND", "core.jobs.DatabaseJobBackend")
+        _backend = import_string(path)()
+    return _backend
+
+
+def enqueue(task, issue=None):
+    """
+    Schedule `task` for background execution once the current transaction commits.
+
+    Deferring to on_commit guarantees the worker never sees a job for an
+    issue row that was rolled back or is not yet visible to other connections.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown background task: {task}")
+    transaction.on_commit(lambda: get_backend().enqueue(task, issue))
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def _claim(pk, status, locked_at):
+    """
+    Atomically move one job to 'running' if it is still in the observed state.
+
+    The WHERE clause acts as a compare-and-swap, so two workers racing for
+    the same row cannot both succeed — on SQLite and Postgres alike.
+    """
+    now = timezone.now()
+    updated = BackgroundJob.objects.filter(pk=pk, status=status, locked_at=locked_at).update(
+        status="running", locked_at=now, attempts=F("attempts") + 1, updated_at=now,
+    )
+    if not updated:
+        return None
+    return BackgroundJob.objects.select_related("issue").get(pk=pk)
+
+
+def _fail_abandoned(pk, locked_at, attempts):
+    """Mark a job whose lease expired on its last attempt as failed (same compare-and-swap as _claim)."""
+    now = timezone.now()
+    updated = BackgroundJob.objects.filter(pk=pk, status="running", locked_at=locked_at).update(
+        status="failed", locked_at=None, updated_at=now,
+        last_error=f"Lease expired on attempt {attempts}; the worker was lost.",
+    )
+    if updated:
+        logger.error("[CivicSense Jobs] #%s failed permanently: lease expired on attempt %d", pk, attempts)
+
+
+def claim_next_job():
+    """
+    Claim the oldest runnable job (due, or running with an expired lease), or None.
+
+    Expired leases with no attempts left are failed along the way.
+    """
+    now   = timezone.now()
+    stale = now - timedelta(seconds=_setting("JOB_LEASE_SECONDS", 300))
+    candidates = (
+        BackgroundJob.objects
+        .filter(Q(status="queued", run_after__lte=now) | Q(status="running", locked_at__lt=stale))
+        .order_by("run_after", "id")
+        .values_list("pk", "status", "locked_at", "attempts", "max_attempts")[:10]
+    )
+    abandoned = False
+    for pk, status, locked_at, attempts, max_attempts in candidates:
+        if status == "running" and attempts >= max_attempts:
+            _fail_abandoned(pk, locked_at, attempts)
+            abandoned = True
+            continue
+        job = _claim(pk, status, locked_at)
+        if job:
+            return job
+    # Failed rows no longer match, so a runnable job behind them is found next
+    return claim_next_job() if abandoned else None
+
+
+def run_job(job):
+    """
+    Execute a claimed job and record the outcome.
+
+    A raised exception schedules a retry with backoff, or marks the job
+    'failed' once its attempts are used up. Never raises.
+    """
+    handler = TASKS.get(job.task)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task '{job.task}'")
+        handler(job)
+    except Exception as exc:
+        job.last_error = f"{type(exc).__name__}: {exc}"
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            logger.error("[CivicSense Jobs] %s #%s failed permanently: %s", job.task, job.pk, exc)
+        else:
+            job.status    = "queued"
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning(
+                "[CivicSense Jobs] %s #%s attempt %d failed, retrying: %s", job.task, job.pk, job.attempts, exc,
+            )
+    else:
+        job.status = "done"
+        job.last_error = ""
+
+    job.locked_at = None
+    job.save(update_fields=["status", "run_after", "locked_at", "last_error", "updated_at"])
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """
+    Drain runnable jobs in the current process and return how many ran.
+
+    This is the in-process worker for tests and one-off scripts; the
+    `run_jobs` command is the long-running equivalent.
+    Jobs scheduled for a future retry are left alone.
+    """
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
@@ -0,0 +1,326 @@
+"""
+Shared Gemini client pool and model router for CivicSense.
+
+Both the chatbot (core.chat_views) and Gemini Vision analysis
+(core.ai_analysis) go through the process-wide `router` defined here
+instead of building a genai.Client per request and keeping their own
+unsynchronised model caches.
+
+ModelRouter responsibilities:
+  - Client pool: one genai.Client per API key per process, reused across
+    requests and threads so its HTTP connection pool (keep-alive) is
+    shared instead of re-handshaking TLS on every call.
+  - Model discovery: the account's flash models that support
+    generateContent are listed under a lock and refreshed every
+    GEMINI_MODEL_DISCOVERY_TTL seconds. A refresh also forgets 404 prunes.
+  - Per-model health: latency EWMA of successful calls, a cooldown window
+    after 429 quota exhaustion, and pruning on 404.
+  - Selection: healthy models with measured latency are tried fastest
+    first, then unmeasured models in PREFERRED order, then models still
+    cooling down (soonest-available first) as a last resort.
+
+All shared state is guarded by locks; call() is safe from any thread and
+astream() from any event loop (it uses the client's async `aio` surface).
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import asyncio
+import logging
+import re
+import threading
+import time
+
+# Third-party
+from google import genai
+from google.genai.errors import ClientError
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Preference order — models are skipped if not available on the account
+PREFERRED = [
+    "gemini-2.5-flash-lite",
+    "gemini-2.5-flash",
+    "gemini-2.0-flash-lite",
+    "gemini-2.0-flash",
+    "gemini-flash-latest",
+]
+
+# Retry a failed discovery sooner than a successful one is refreshed
+DISCOVERY_RETRY_SECONDS = 60
+
+
+def extract_retry_delay(exc):
+    """Parse retry delay seconds from a 429 ClientError string, or return None."""
+    msg = str(exc)
+    m = re.search(r"retryDelay['\"]:\s*['\"](\d+(?:\.\d+)?)s", msg)
+    if m:
+        return float(m.group(1))
+    m = re.search(r"retry in (\d+(?:\.\d+)?)s", msg, re.IGNORECASE)
+    if m:
+        return float(m.group(1))
+    return None
+
+
+def error_code(exc):
+    """HTTP status of a google-genai APIError (`code` in current SDKs, `status_code` in older ones)."""
+    return getattr(exc, "code", None) or getattr(exc, "status_code", 500)
+
+
+class ModelHealth:
+    """Rolling health record for one model."""
+
+    __slots__ = ("latency_ewma", "cooldown_until", "successes", "rate_limits")
+
+    def __init__(self):
+        self.latency_ewma   = None
+        self.cooldown_until = 0.0
+        self.successes      = 0
+        self.rate_limits    = 0
+
+
+class ModelRouter:
+    """Thread-safe Gemini client pool, model discovery and health-based model selection."""
+
+    def __init__(self, preferred=None, discovery_ttl=None, cooldown=None, alpha=0.3):
+        self.preferred     = list(preferred or PREFERRED)
+        self.discovery_ttl = discovery_ttl
+        self.cooldown      = cooldown
+        self.alpha         = alpha
+
+        self._lock            = threading.Lock()
+        self._discovery_lock  = threading.Lock()
+        self._clients         = {}
+        self._models          = None
+        self._refresh_at      = 0.0
+        self._pruned          = set()
+        self._health          = {}
+
+    # ── Settings (read lazily so tests can override them) ──────────────────
+
+    def _discovery_ttl(self):
+        if self.discovery_ttl is not None:
+            return self.discovery_ttl
+        return getattr(settings, "GEMINI_MODEL_DISCOVERY_TTL", 3600)
+
+    def _cooldown(self):
+        if self.cooldown is not None:
+            return self.cooldown
+        return getattr(settings, "GEMINI_RATE_LIMIT_COOLDOWN", 60)
+
+    # ── Client pool ────────────────────────────────────────────────────────
+
+    def client(self, api_key):
+        """Return the pooled genai.Client for `api_key`, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = genai.Client(api_key=api_key)
+                self._clients[api_key] = client
+            return client
+
+    # ── Discovery ──────────────────────────────────────────────────────────
+
+    def available_models(self, api_key):
+        """Return the account's flash models, discovering or refreshing them if stale."""
+        if not api_key:
+            return list(self.preferred)
+        if self._models is not None and time.monotonic() < self._refresh_at:
+            return self._models
+
+        # Only one thread performs the network call; the rest wait and reuse it.
+        with self._discovery_lock:
+            if self._models is not None and time.monotonic() < self._refresh_at:
+                return self._models
+            try:
+                discovered = [
+                    m.name.replace("models/", "")
+                    for m in self.client(api_key).models.list()
+                    if "flash" in m.name.lower()
+                    and "generateContent" in (m.supported_actions or [])
+                ]
+                ttl = self._discovery_ttl()
+                print(f"[CivicSense LLM] Available flash models: {discovered}")
+            except Exception as exc:
+                logger.warning("[CivicSense LLM] Model discovery failed (%s). Falling back to preferred list.", exc)
+                discovered = list(self.preferred)
+                ttl = DISCOVERY_RETRY_SECONDS
+
+            with self._lock:
+                self._models     = discovered
+                self._refresh_at = time.monotonic() + ttl
+                self._pruned.clear()
+            return discovered
+
+    # ── Health bookkeeping ─────────────────────────────────────────────────
+
+    def _health_for(self, model):
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = ModelHealth()
+        return health
+
+    def record_success(self, model, latency):
+        """Fold a successful call's latency into the model's EWMA and end any cooldown."""
+        with self._lock:
+            health = self._health_for(model)
+            if health.latency_ewma is None:
+                health.latency_ewma = latency
+            else:
+                health.latency_ewma = self.alpha * latency + (1 - self.alpha) * health.latency_ewma
+            health.cooldown_until = 0.0
+            health.successes += 1
+
+    def record_rate_limit(self, model, retry_delay=None):
+        """Put a quota-exhausted model into cooldown for at least the server's retry delay."""
+        with self._lock:
+            health = self._health_for(model)
+            health.cooldown_until = time.monotonic() + max(retry_delay or 0, self._cooldown())
+            health.rate_limits += 1
+
+    def record_not_found(self, model):
+        """Prune a model that returned 404 until the next discovery refresh."""
+        with self._lock:
+            self._pruned.add(model)
+
+    def ordered_models(self, api_key):
+        """Models to try, best first (see module docstring for the ordering rules)."""
+        available = self.available_models(api_key)
+        now = time.monotonic()
+        rank = {m: i for i, m in enumerate(self.preferred)}
+
+        with self._lock:
+            candidates = [m for m in dict.fromkeys(available) if m not in self._pruned]
+            health = {m: self._health.get(m) for m in candidates}
+
+        cooling  = [m for m in candidates if health[m] and health[m].cooldown_until > now]
+        ready    = [m for m in candidates if m not in cooling]
+        measured = sorted(
+            (m for m in ready if health[m] and health[m].latency_ewma is not None),
+            key=lambda m: health[m].latency_ewma,
+        )
+        unmeasured = sorted(
+            (m for m in ready if m not in measured),
+            key=lambda m: rank.get(m, len(rank)),
+        )
+        cooling.sort(key=lambda m: health[m].cooldown_until)
+        return measured + unmeasured + cooling
+
+    def snapshot(self):
+        """Return a JSON-friendly view of per-model health (for logging and admin tooling)."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "latency_ewma_ms": round(h.latency_ewma * 1000, 1) if h.latency_ewma is not None else None,
+                    "cooldown_remaining_s": round(max(h.cooldown_until - now, 0), 1),
+                    "successes": h.successes,
+                    "rate_limits": h.rate_limits,
+                    "pruned": model in self._pruned,
+                }
+                for model, h in self._health.items()
+            }
+
+    # ── Calling ────────────────────────────────────────────────────────────
+
+    def _handle_client_error(self, model, exc, attempt, log_prefix):
+        """
+        Apply the fallback policy to a ClientError raised by `model`.
+
+        - 429 with a short retry delay (<= 10 s) on the first attempt:
+          return the delay so the caller sleeps and retries the same model.
+        - 429 otherwise: put the model in cooldown and return None (next model).
+        - 404: prune the model and return None (next model).
+        - Anything else is re-raised.
+        """
+        code = error_code(exc)
+
+        if code == 429:
+            delay = extract_retry_delay(exc)
+            if attempt == 0 and delay is not None and delay <= 10:
+                logger.info("%s Model %s rate-limited, sleeping %.1fs then retrying.", log_prefix, model, delay)
+                return delay
+            logger.warning("%s Model %s quota exhausted, trying next.", log_prefix, model)
+            self.record_rate_limit(model, delay)
+            return None
+
+        if code == 404:
+            logger.warning("%s Model %s not found, pruning from list.", log_prefix, model)
+            self.record_not_found(model)
+            return None
+
+        raise exc
+
+    def call(self, api_key, func, client=None, log_prefix="[CivicSense LLM]"):
+        """
+        Run `func(client, model)` against the best available model, falling back in order.
+
+        429s and 404s are handled as described in _handle_client_error; any
+        other ClientError, or any other exception, propagates.
+
+        Returns (result, model), or (None, None) if every model is exhausted.
+        `client` may be injected (stubs in benchmarks); by default the pooled
+        client for `api_key` is used.
+        """
+        client = client or self.client(api_key)
+
+        for model in self.ordered_models(api_key):
+            for attempt in range(2):
+                started = time.monotonic()
+                try:
+                    result = func(client, model)
+                except ClientError as exc:
+                    delay = self._handle_client_error(model, exc, attempt, log_prefix)
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+                    continue
+
+                self.record_success(model, time.monotonic() - started)
+                return result, model
+
+        logger.warning("%s All models exhausted.", log_prefix)
+        return None, None
+
+    async def astream(self, api_key, open_stream, client=None, log_prefix="[CivicSense LLM]"):
+        """
+        Async generator over a streamed response, with the same model fallback as call().
+
+        `open_stream(aio_client, model)` must be a coroutine returning an
+        async iterator of response chunks (e.g. aio.models.generate_content_stream).
+        Fallback is only possible until the first chunk arrives; after that,
+        errors propagate to the consumer. Yields nothing if every model is exhausted.
+        """
+        client = client or self.client(api_key)
+        # Discovery is a blocking network call on first use / TTL expiry.
+        models = await asyncio.to_thread(self.ordered_models, api_key)
+
+        for model in models:
+            for attempt in range(2):
+                started = time.monotonic()
+                try:
+                    stream = await open_stream(client.aio, model)
+                    first = await anext(stream, None)
+                except ClientError as exc:
+                    delay = self._handle_client_error(model, exc, attempt, log_prefix)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+                    continue
+
+                print(f"{log_prefix} Streaming from model: {model}")
+                if first is not None:
+                    yield first
+                async for chunk in stream:
+                    yield chunk
+                self.record_success(model, time.monotonic() - started)
+                return
+
+        logger.warning("%s All models exhausted.", log_prefix)
+
+
+# Process-wide router shared by chat and vision
+router = ModelRouter()
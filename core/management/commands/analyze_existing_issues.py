@@ -7,23 +7,75 @@ Django server was restarted after the feature was deployed).
 
 Usage:
     python manage.py analyze_existing_issues
+    python manage.py analyze_existing_issues --batch-size 8 --concurrency 4
+    python manage.py analyze_existing_issues --checkpoint backfill.json
 
-A 5-second delay between each API call respects the Gemini free-tier
-rate limit of 15 requests per minute.
+Photos are packed --batch-size at a time into a single Gemini request
+(core.ai_analysis.analyze_issue_images_batch), and up to --concurrency
+requests are in flight at once. Every request first takes a token from a
+token bucket refilled at --rpm requests per minute (default:
+GEMINI_REQUESTS_PER_MINUTE), so the free-tier quota is respected no matter
+how many workers run. With --batch-size 1 each photo uses the single-image
+analyze_issue_image() path.
+
+With --checkpoint, the id of the last fully processed issue is written to
+the given JSON file after every batch, and a later run with the same file
+resumes after that id — including issues that returned no result.
+
+Photos already analysed with the same prompt, model and report text are
+answered from the Gemini Vision result cache (core.analysis_cache), so a
+re-run after a crash only pays for what is new; the cache hit rate is
+reported at the end.
 
 Module: core.management.commands
 Author: Ankitha
 """
 
 # Standard library
+import json
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
 
 # Third-party
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
 # Local
 from core.models import Issue
-from core.ai_analysis import analyze_issue_image
+from core.ai_analysis import analyze_issue_image, analyze_issue_images_batch
+from core.analysis_cache import vision_cache
+from core.tasks import AI_RESULT_FIELDS, apply_ai_result
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate_per_minute` tokens per minute, bursting to `capacity`.
+
+    acquire() blocks until a token is available, so any number of worker
+    threads share one requests-per-minute budget.
+    """
+
+    def __init__(self, rate_per_minute, capacity=1):
+        self.rate     = rate_per_minute / 60.0
+        self.capacity = float(capacity)
+        self.tokens   = float(capacity)
+        self.updated  = time.monotonic()
+        self.lock     = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one has been refilled if necessary."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
 
 
 class Command(BaseCommand):
@@ -31,45 +83,151 @@ class Command(BaseCommand):
 
     help = "Run Gemini Vision analysis on issues that have photos but no AI analysis yet."
 
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=8, help="Photos per Gemini request (1 = one request per photo).")
+        parser.add_argument("--concurrency", type=int, default=1, help="Maximum Gemini requests in flight.")
+        parser.add_argument("--rpm", type=float, default=None, help="Requests-per-minute budget (default: GEMINI_REQUESTS_PER_MINUTE).")
+        parser.add_argument("--checkpoint", type=str, default=None, help="JSON file recording the last processed issue id.")
+
     def handle(self, *args, **options):
+        batch_size  = max(1, options["batch_size"])
+        concurrency = max(1, options["concurrency"])
+        rpm         = options["rpm"] or getattr(settings, "GEMINI_REQUESTS_PER_MINUTE", 15)
+        checkpoint  = Path(options["checkpoint"]) if options["checkpoint"] else None
+
+        after_id = self._load_checkpoint(checkpoint)
         qs = (
             Issue.objects
-            .filter(photos__isnull=False)
+            .filter(photos__isnull=False, id__gt=after_id)
             .exclude(photos="")
             .filter(ai_detected_category="")
             .order_by("id")
         )
         total = qs.count()
-        self.stdout.write(f"Found {total} issues with unanalyzed photos.")
-
-        for i, issue in enumerate(qs, 1):
-            self.stdout.write(f"[{i}/{total}] Issue #{issue.id}: {issue.title[:60]}")
-            try:
-                result = analyze_issue_image(
-                    image_path=issue.photos.path,
-                    title=issue.title,
-                    description=issue.description,
-                    category=issue.category,
-                )
-                if result:
-                    issue.ai_detected_category = result["detected_category"]
-                    issue.ai_confidence = result["confidence"]
-                    issue.ai_matches_report = result["matches_report"]
-                    issue.ai_description = result["description"]
-                    issue.ai_severity = result["severity_assessment"]
-                    issue.save(update_fields=[
-                        "ai_detected_category", "ai_confidence",
-                        "ai_matches_report", "ai_description", "ai_severity",
-                    ])
-                    self.stdout.write(self.style.SUCCESS(
-                        f"  -> {result['detected_category']} ({result['confidence']}%)"
-                    ))
-                else:
-                    self.stdout.write("  -> No result returned, skipping.")
-            except Exception as exc:
-                self.stdout.write(self.style.ERROR(f"  -> Error: {exc}"))
-
-            if i < total:
-                time.sleep(5)  # Respect free-tier rate limits between requests
-
-        self.stdout.write(self.style.SUCCESS("Done."))
+        self.stdout.write(
+            f"Found {total} issues with unanalyzed photos"
+            + (f" after #{after_id}" if after_id else "")
+            + f" (batch {batch_size}, concurrency {concurrency}, {rpm:g} req/min)."
+        )
+
+        bucket  = TokenBucket(rpm, capacity=concurrency)
+        batches = self._batches(qs, batch_size)
+        started = time.monotonic()
+        vision_cache.reset_stats()
+        done    = 0
+
+        # Batches finish out of order; the checkpoint only advances past a
+        # batch once every batch before it has finished as well.
+        finished_seq = set()
+        next_seq     = 0
+        last_ids     = {}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = {}
+            exhausted = False
+            seq = 0
+            while pending or not exhausted:
+                while not exhausted and len(pending) < concurrency * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    future = pool.submit(self._analyze, bucket, batch)
+                    pending[future] = (seq, batch)
+                    last_ids[seq] = batch[-1].id
+                    seq += 1
+
+                if not pending:
+                    break
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    batch_seq, batch = pending.pop(future)
+                    done += self._save(batch, future)
+                    finished_seq.add(batch_seq)
+
+                while next_seq in finished_seq:
+                    finished_seq.discard(next_seq)
+                    self._write_checkpoint(checkpoint, last_ids.pop(next_seq))
+                    next_seq += 1
+
+        elapsed = time.monotonic() - started
+        rate = (done / elapsed * 60) if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Analyzed {done}/{total} issues in {elapsed:.1f}s ({rate:.1f} issues/min)."
+        ))
+        self.stdout.write(f"Result cache: {vision_cache.describe()}.")
+
+    # ── Helpers ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _batches(qs, batch_size):
+        """Yield lists of issues in id order without loading the whole queryset."""
+        batch = []
+        for issue in qs.iterator(chunk_size=max(batch_size * 10, 100)):
+            batch.append(issue)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _analyze(bucket, batch):
+        """Worker thread: call Gemini for one batch. Touches no database state."""
+        bucket.acquire()
+        if len(batch) == 1:
+            issue = batch[0]
+            return [analyze_issue_image(
+                image_path=issue.photos.path,
+                title=issue.title,
+                description=issue.description,
+                category=issue.category,
+            )]
+        return analyze_issue_images_batch([
+            {
+                "image_path":  issue.photos.path,
+                "title":       issue.title,
+                "description": issue.description,
+                "category":    issue.category,
+            }
+            for issue in batch
+        ])
+
+    def _save(self, batch, future):
+        """Persist one batch's results on the main thread; return how many were saved."""
+        try:
+            results = future.result() or [None] * len(batch)
+        except Exception as exc:
+            self.stdout.write(self.style.ERROR(f"  Issues #{batch[0].id}-#{batch[-1].id} -> Error: {exc}"))
+            return 0
+
+        saved = 0
+        for issue, result in zip(batch, results):
+            if not result:
+                self.stdout.write(f"  Issue #{issue.id}: no result returned, skipping.")
+                continue
+            apply_ai_result(issue, result)
+            issue.ai_status = "done"
+            issue.save(update_fields=AI_RESULT_FIELDS + ["ai_status"])
+            saved += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"  Issue #{issue.id}: {result['detected_category']} ({result['confidence']}%)"
+            ))
+        return saved
+
+    @staticmethod
+    def _load_checkpoint(path):
+        if not path or not path.exists():
+            return 0
+        try:
+            return int(json.loads(path.read_text()).get("last_id", 0))
+        except (ValueError, OSError):
+            return 0
+
+    @staticmethod
+    def _write_checkpoint(path, last_id):
+        if not path:
+            return
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"last_id": last_id}))
+        tmp.replace(path)
@@ -0,0 +1,64 @@
+"""
+Management command: benchmark
+
+Runs the performance benchmarks registered in core.benchmarks. Benchmarks
+use stubs and synthetic data only, so they are safe to run anywhere.
+
+Usage:
+    python manage.py benchmark --list
+    python manage.py benchmark vision_backfill
+    python manage.py benchmark vision_backfill --param photos=64 --param rpm=120
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Standard library
+import inspect
+
+# Third-party
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from core.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """Run one or more registered performance benchmarks."""
+
+    help = "Run performance benchmarks (stubbed services, synthetic data)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Benchmarks to run (default: all).")
+        parser.add_argument("--list", action="store_true", help="List available benchmarks and exit.")
+        parser.add_argument(
+            "--param", action="append", default=[], metavar="KEY=VALUE",
+            help="Benchmark parameter; may be given several times.",
+        )
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name, (_func, description) in sorted(BENCHMARKS.items()):
+                self.stdout.write(f"{name:<24} {description}")
+            return
+
+        params = {}
+        for item in options["param"]:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"--param expects KEY=VALUE, got '{item}'")
+            params[key.strip()] = value.strip()
+
+        names = options["names"] or sorted(BENCHMARKS)
+        unknown = [n for n in names if n not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(unknown)}. Use --list.")
+
+        for name in names:
+            func, _description = BENCHMARKS[name]
+            try:
+                inspect.signature(func).bind(self.stdout.write, **params)
+            except TypeError as exc:
+                raise CommandError(f"{name}: {exc}")
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name} =="))
+            func(self.stdout.write, **params)
@@ -0,0 +1,120 @@
+"""
+Management command: check_import_time
+
+Startup budget check. Runs `django.setup()` plus a full URLconf load in a
+fresh interpreter under `python -X importtime`, then fails if
+
+  - the total import time exceeds --max-ms (default STARTUP_IMPORT_BUDGET_MS), or
+  - any heavy AI dependency (torch, transformers, cv2 by default) was
+    imported; those must only load on first use of the classifier.
+
+The slowest top-level imports are listed so a regression is easy to trace.
+Run it in CI next to `manage.py test`.
+
+Usage:
+    python manage.py check_import_time
+    python manage.py check_import_time --max-ms 800 --top 25
+    python manage.py check_import_time --forbid google.generativeai
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Standard library
+import os
+import subprocess
+import sys
+import time
+
+# Third-party
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ["torch", "transformers", "cv2"]
+
+STARTUP_SCRIPT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into [(depth, module, self_us, cumulative_us), ...].
+
+    Entries are in completion order: a module comes after everything it
+    imported, and depth 0 marks an import made directly by the script.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), self_us, cumulative_us))
+    return entries
+
+
+def _root_import(entries, index):
+    """The depth-0 import that (transitively) pulled in entries[index]."""
+    for depth, name, _, _ in entries[index:]:
+        if depth == 0:
+            return name
+    return entries[index][1]
+
+
+class Command(BaseCommand):
+    """Fail if Django startup is slow or imports heavy AI dependencies."""
+
+    help = "Measure django.setup() + URLconf import time and forbid eager torch/transformers/cv2 imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-ms", type=float, default=None, help="Import budget (default: STARTUP_IMPORT_BUDGET_MS).")
+        parser.add_argument("--forbid", nargs="*", default=[], help="Extra modules that must not be imported at startup.")
+        parser.add_argument("--top", type=int, default=15, help="How many of the slowest top-level imports to list.")
+
+    def handle(self, *args, **options):
+        budget_ms = options["max_ms"] if options["max_ms"] is not None else settings.STARTUP_IMPORT_BUDGET_MS
+        forbidden = HEAVY_MODULES + options["forbid"]
+
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        entries = parse_importtime(proc.stderr)
+        if proc.returncode != 0:
+            errors = "\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:"))
+            raise CommandError(f"Startup failed:\n{errors}")
+
+        top_level = [(name, cumulative) for depth, name, _, cumulative in entries if depth == 0]
+        total_ms = sum(cumulative for _, cumulative in top_level) / 1000
+
+        self.stdout.write(f"Slowest top-level imports ({len(entries)} modules imported):")
+        for name, cumulative in sorted(top_level, key=lambda item: -item[1])[:options["top"]]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
+        self.stdout.write(f"Import time {total_ms:.1f} ms (budget {budget_ms:g} ms), process wall time {wall_ms:.1f} ms.")
+
+        failures = []
+        for module in forbidden:
+            for index, (_, name, _, _) in enumerate(entries):
+                if name == module or name.startswith(module + "."):
+                    failures.append(f"'{module}' imported at startup (via {_root_import(entries, index)})")
+                    break
+        if total_ms > budget_ms:
+            failures.append(f"import time {total_ms:.1f} ms exceeds the {budget_ms:g} ms budget")
+
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f"FAIL  {failure}"))
+            raise CommandError(f"{len(failures)} startup check(s) failed.")
+        self.stdout.write(self.style.SUCCESS("Startup is within budget and imports no heavy AI modules."))
@@ -0,0 +1,182 @@
+"""
+Management command: check_query_plans
+
+Query-plan regression check for the Issue hot paths. Seeds a throwaway
+test database with a synthetic dataset, calls each hot endpoint through
+the DRF test client while recording its SQL, and EXPLAINs each distinct
+statement that reads a watched table (repeated N+1 statements once). Any full table scan (SQLite "SCAN
+<table>" without an index, PostgreSQL "Seq Scan on <table>") is reported
+and the command exits with an error, so it can run in CI.
+
+The real database is never touched. core.tests.QueryPlanTests runs the
+same check on a smaller dataset as part of `manage.py test`.
+
+Usage:
+    python manage.py check_query_plans
+    python manage.py check_query_plans --rows 100000 --verbose
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Standard library
+import random
+import re
+from datetime import timedelta
+
+# Third-party
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+# Local
+from core.benchmarks import scratch_database
+from core.geo import geohash_encode
+from core.models import Department, DepartmentProfile, Issue
+from core.rollups import rebuild_rollups
+
+# Tables whose queries must be index-backed
+WATCHED_TABLES = ("core_issue", "core_issuerollup", "core_backgroundjob")
+
+# (label, client, path): client is "citizen", "officer" or "anonymous"
+HOT_ENDPOINTS = [
+    ("my issues",                "citizen",   "/api/issues/"),
+    ("my issues by status",      "citizen",   "/api/issues/?status=pending"),
+    ("department queue",         "officer",   "/api/department/issues/"),
+    ("department queue by status", "officer", "/api/department/issues/?status=in_progress"),
+    ("department stats",         "officer",   "/api/department/stats/"),
+    ("weekly report",            "anonymous", "/api/issues/weekly_report/"),
+    ("hotspots",                 "anonymous", "/api/issues/hotspots/?days=7"),
+    ("nearby",                   "citizen",   "/api/issues/nearby/?lat=12.97&lng=77.59&radius=1000"),
+    ("bbox",                     "citizen",   "/api/issues/bbox/?min_lat=12.95&min_lng=77.57&max_lat=12.99&max_lng=77.61"),
+]
+
+
+def table_scans(vendor, plan_lines):
+    """Return the plan lines that are full scans of a watched table."""
+    scans = []
+    for line in plan_lines:
+        for table in WATCHED_TABLES:
+            if vendor == "sqlite":
+                hit = re.search(rf"\bSCAN {table}\b", line) and "USING" not in line
+            else:
+                hit = re.search(rf"Seq Scan on {table}\b", line)
+            if hit:
+                scans.append(line.strip())
+    return scans
+
+
+def seed_dataset(rows):
+    """
+    Seed departments, 200 citizens, an officer and `rows` issues spread
+    over six months, then rebuild the rollups. Returns (citizen, officer).
+    """
+    rng = random.Random(7)
+    now = timezone.now()
+
+    departments = [
+        Department.objects.create(name=label, slug=value, assigned_category=value, email=f"{value}@example.com")
+        for value, label in Department.CATEGORY_CHOICES
+    ]
+    # No password hashing: clients authenticate with force_authenticate()
+    citizens = User.objects.bulk_create([User(username=f"citizen{i}") for i in range(200)])
+    officer  = User.objects.create(username="officer")
+    DepartmentProfile.objects.create(user=officer, department=departments[0])
+
+    statuses = [value for value, _ in Issue.STATUS_CHOICES]
+    issues = []
+    for _ in range(rows):
+        dept = rng.choice(departments)
+        lat, lng = round(12.8 + rng.random() * 0.4, 6), round(77.4 + rng.random() * 0.4, 6)
+        issues.append(Issue(
+            user=rng.choice(citizens), title="Synthetic issue", description="Seeded for plan checks",
+            category=dept.assigned_category, assigned_department=dept, status=rng.choice(statuses),
+            latitude=lat, longitude=lng, geohash=geohash_encode(lat, lng),
+        ))
+    issues = Issue.objects.bulk_create(issues, batch_size=5000)
+    # auto_now_add stamps every row with "now"; spread them over six months
+    for issue in issues:
+        issue.created_at = now - timedelta(minutes=rng.randrange(180 * 24 * 60))
+    Issue.objects.bulk_update(issues, ["created_at"], batch_size=5000)
+    rebuild_rollups()
+    return citizens[0], officer
+
+
+def api_clients(citizen, officer):
+    """The "anonymous", "citizen" and "officer" clients HOT_ENDPOINTS refers to."""
+    clients = {"anonymous": APIClient(), "citizen": APIClient(), "officer": APIClient()}
+    clients["citizen"].force_authenticate(citizen)
+    clients["officer"].force_authenticate(officer)
+    return clients
+
+
+def endpoint_plans(connection, client, path):
+    """
+    GET `path` and EXPLAIN each distinct SELECT it ran against a watched table.
+
+    Returns (status_code, [(sql, plan lines, table scans)]).
+    """
+    explain  = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    recorded = {}
+
+    def record(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith("SELECT") and any(t in sql for t in WATCHED_TABLES):
+            recorded.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+    cache.clear()
+    with connection.execute_wrapper(record):
+        response = client.get(path)
+
+    plans = []
+    for sql, params in recorded.items():
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            plan = [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+        plans.append((sql, plan, table_scans(connection.vendor, plan)))
+    return response.status_code, plans
+
+
+class Command(BaseCommand):
+    """Fail if any hot endpoint query falls back to a full table scan."""
+
+    help = "EXPLAIN the Issue hot-path queries on a synthetic dataset and fail on table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Synthetic issues to seed (default 20000).")
+        parser.add_argument("--verbose", action="store_true", help="Print every query plan.")
+
+    def handle(self, *args, **options):
+        with scratch_database() as connection:
+            if connection.vendor not in ("sqlite", "postgresql"):
+                raise CommandError(f"Unsupported database vendor '{connection.vendor}'.")
+            clients = api_clients(*seed_dataset(options["rows"]))
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            failures = self._check(connection, clients, options["verbose"])
+
+        if failures:
+            raise CommandError(f"{failures} hot-path quer{'y' if failures == 1 else 'ies'} use a table scan.")
+        self.stdout.write(self.style.SUCCESS("All hot-path queries are index-backed."))
+
+    def _check(self, connection, clients, verbose):
+        failures = 0
+        for label, who, path in HOT_ENDPOINTS:
+            status, plans = endpoint_plans(connection, clients[who], path)
+            if status != 200:
+                raise CommandError(f"{label}: GET {path} returned {status}")
+
+            if verbose:
+                for sql, plan, _ in plans:
+                    self.stdout.write(f"  {sql}\n    " + "\n    ".join(plan))
+            problems = [(sql, scans) for sql, _, scans in plans if scans]
+            if problems:
+                failures += len(problems)
+                self.stdout.write(self.style.ERROR(f"SCAN  {label} ({path})"))
+                for sql, scans in problems:
+                    self.stdout.write(f"      {sql}\n      -> {'; '.join(scans)}")
+            else:
+                self.stdout.write(f"ok    {label}")
+        return failures
@@ -0,0 +1,70 @@
+"""
+Management command: clip_server
+
+Runs the local CLIP classifier as a micro-batching inference service on a
+Unix socket. Web workers started with CLIP_INFERENCE_SOCKET pointing at the
+same path send their images here instead of loading the model themselves,
+so one host keeps one copy of the weights and concurrent requests from all
+workers share forward passes.
+
+Usage:
+    python manage.py clip_server                              # socket from CLIP_INFERENCE_SOCKET
+    python manage.py clip_server --socket /run/civicsense/clip.sock
+    python manage.py clip_server --max-batch 32 --max-wait-ms 20 --threads 4
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Standard library
+import os
+
+# Third-party
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from civicsense_backend.ai_module.inference_service import InferenceServer, MicroBatcher
+
+
+class Command(BaseCommand):
+    """Serve CLIP classification over a Unix socket."""
+
+    help = "Run the micro-batching CLIP inference server on a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=None, help="Socket path (default: CLIP_INFERENCE_SOCKET).")
+        parser.add_argument("--max-batch", type=int, default=None, help="Images per forward pass (default: CLIP_MAX_BATCH).")
+        parser.add_argument("--max-wait-ms", type=float, default=None, help="Batch collection deadline (default: CLIP_MAX_WAIT_MS).")
+        parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads (default: CLIP_INTRA_OP_THREADS).")
+
+    def handle(self, *args, **options):
+        socket_path = options["socket"] or settings.CLIP_INFERENCE_SOCKET
+        if not socket_path:
+            raise CommandError("No socket path: pass --socket or set CLIP_INFERENCE_SOCKET.")
+
+        batcher = MicroBatcher(
+            max_batch        = options["max_batch"],
+            max_wait_ms      = options["max_wait_ms"],
+            intra_op_threads = options["threads"],
+        )
+        self.stdout.write("Loading CLIP model...")
+        batcher.warm_up()
+        server = InferenceServer(socket_path, batcher)
+        self.stdout.write(
+            f"CLIP inference server on {socket_path} "
+            f"(max batch {batcher.max_batch}, max wait {batcher.max_wait * 1000:g} ms)."
+        )
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Classified {batcher.images} image(s) in {batcher.batches} batch(es)."
+        ))
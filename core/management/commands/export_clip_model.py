@@ -0,0 +1,76 @@
+"""
+Management command: export_clip_model
+
+Offline export of the local CLIP classifier for the faster CPU backends.
+Reads a CLIP checkpoint from a local directory (no hub download) and
+writes, under CLIP_ARTIFACT_DIR/<model name>/:
+
+  - text_embeddings.npz  the classifier prompts, encoded once
+  - vision.torchscript.pt  traced + frozen vision tower   (CLIP_BACKEND=torchscript)
+  - vision.onnx            FP32 ONNX vision tower         (CLIP_BACKEND=onnx-fp32)
+  - vision.int8.onnx       dynamic INT8 quantization      (CLIP_BACKEND=onnx)
+  - manifest.json          preprocessing config; written last
+
+Needs torch and transformers (plus onnx and onnxruntime for the ONNX
+formats) on the machine that exports; the onnx backends only need
+onnxruntime at serving time. Re-run after changing the model or the
+classifier prompts, then compare backends with
+`python manage.py benchmark clip_backends --param fixtures=DIR`.
+
+Usage:
+    python manage.py export_clip_model /models/clip-vit-base-patch32
+    python manage.py export_clip_model /models/clip --formats onnx --no-quantize
+    python manage.py export_clip_model /models/clip --output /srv/clip --name openai/clip-vit-base-patch32
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Standard library
+from pathlib import Path
+
+# Third-party
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from civicsense_backend.ai_module.ai_classifier import LABELS
+from civicsense_backend.ai_module.clip_backends import artifact_dir, export_model
+
+EXPORT_FORMATS = ("torchscript", "onnx")
+
+
+class Command(BaseCommand):
+    """Export the CLIP vision tower to TorchScript / ONNX (+ INT8) artifacts."""
+
+    help = "Export a local CLIP checkpoint for the torchscript and onnx classifier backends."
+
+    def add_arguments(self, parser):
+        parser.add_argument("model_dir", help="Local directory with the CLIP checkpoint (config, weights, processor).")
+        parser.add_argument("--name", default=None, help="Model name the classifier uses (default: CLIP_MODEL_NAME).")
+        parser.add_argument("--output", default=None, help="Output directory (default: CLIP_ARTIFACT_DIR/<name>).")
+        parser.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS))
+        parser.add_argument("--no-quantize", action="store_true", help="Skip the INT8 ONNX model.")
+        parser.add_argument("--opset", type=int, default=17, help="ONNX opset version.")
+
+    def handle(self, *args, **options):
+        model_dir = Path(options["model_dir"])
+        if not model_dir.is_dir():
+            raise CommandError(f"'{model_dir}' is not a directory.")
+        name   = options["name"] or settings.CLIP_MODEL_NAME
+        output = Path(options["output"]) if options["output"] else artifact_dir(name)
+
+        try:
+            manifest = export_model(
+                model_dir, output, name, LABELS,
+                formats  = options["formats"],
+                quantize = not options["no_quantize"],
+                opset    = options["opset"],
+                log      = lambda line: self.stdout.write(f"  {line}"),
+            )
+        except ImportError as exc:
+            raise CommandError(f"Export needs torch and transformers (and onnx/onnxruntime for ONNX): {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {name} ({manifest['embedding_dim']}-d) to {output}: {', '.join(manifest['files'])}."
+        ))
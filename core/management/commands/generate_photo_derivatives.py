@@ -0,0 +1,68 @@
+"""
+Management command: generate_photo_derivatives
+
+Backfills the thumbnail and medium AVIF/WebP renditions (core.media) for
+issues whose photo has none yet, e.g. rows uploaded before derivatives
+existed. New uploads get them from the "generate_photo_derivatives"
+background job. Derivatives are content-addressed, so photos shared by
+several issues are encoded once and re-running the command is cheap.
+
+Usage:
+    python manage.py generate_photo_derivatives              # missing only, in this process
+    python manage.py generate_photo_derivatives --force      # rebuild the records of every photo
+    python manage.py generate_photo_derivatives --enqueue    # hand the work to run_jobs workers
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Third-party
+from django.core.management.base import BaseCommand
+
+# Local
+from core.jobs import enqueue
+from core.media import store_derivatives
+from core.models import Issue
+
+
+class Command(BaseCommand):
+    """Generate photo renditions for existing issues."""
+
+    help = "Generate thumbnail/medium AVIF and WebP renditions for existing issue photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Also process issues that already have renditions.")
+        parser.add_argument("--enqueue", action="store_true", help="Queue background jobs instead of working inline.")
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many issues.")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        issues = Issue.objects.exclude(photos="").exclude(photos__isnull=True).order_by("id")
+        if not options["force"]:
+            issues = issues.filter(photo_renditions__isnull=True)
+        if options["limit"]:
+            issues = issues[:options["limit"]]
+
+        processed = written = failed = 0
+        for issue in issues.iterator(chunk_size=options["chunk_size"]):
+            if options["enqueue"]:
+                enqueue("generate_photo_derivatives", issue)
+                processed += 1
+                continue
+            try:
+                written += store_derivatives(issue)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"  issue #{issue.pk}: {exc}"))
+                continue
+            processed += 1
+            if processed % 100 == 0:
+                self.stdout.write(f"  {processed} photos, {written} files written")
+
+        if options["enqueue"]:
+            self.stdout.write(self.style.SUCCESS(f"Done. Queued {processed} job(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Done. {processed} photo(s) processed, {written} file(s) written "
+                f"(the rest already existed), {failed} failed."
+            ))
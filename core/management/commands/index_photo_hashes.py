@@ -0,0 +1,68 @@
+"""
+Management command: index_photo_hashes
+
+Computes the photo dHash bands (core.duplicates) for issues that have a
+photo but no hash yet, e.g. rows reported before duplicate detection
+existed, so new submissions can be matched against them. Existing issues
+are only indexed, never flagged as duplicates of each other.
+
+Usage:
+    python manage.py index_photo_hashes               # missing only
+    python manage.py index_photo_hashes --force       # re-hash every photo
+    python manage.py index_photo_hashes --limit 1000
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Third-party
+from django.core.management.base import BaseCommand
+
+# Local
+from core.duplicates import BAND_FIELDS, photo_dhash, split_bands
+from core.models import Issue
+
+
+class Command(BaseCommand):
+    """Backfill the photo hash bands used for duplicate detection."""
+
+    help = "Compute dHash bands for existing issue photos (duplicate detection index)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Also re-hash issues that already have a hash.")
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many issues.")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Rows fetched and updated per round trip.")
+
+    def handle(self, *args, **options):
+        issues = Issue.objects.exclude(photos="").exclude(photos__isnull=True).order_by("id").only("id", "photos")
+        if not options["force"]:
+            issues = issues.filter(photo_dhash0__isnull=True)
+        if options["limit"]:
+            issues = issues[:options["limit"]]
+
+        pending = []
+        hashed = failed = 0
+        for issue in issues.iterator(chunk_size=options["chunk_size"]):
+            try:
+                with issue.photos.open("rb") as photo:
+                    value = photo_dhash(photo)
+            except Exception as exc:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"  issue #{issue.pk}: {exc}"))
+                continue
+            for field, band in zip(BAND_FIELDS, split_bands(value)):
+                setattr(issue, field, band)
+            pending.append(issue)
+            if len(pending) >= options["chunk_size"]:
+                hashed += self._flush(pending)
+
+        hashed += self._flush(pending)
+        self.stdout.write(self.style.SUCCESS(f"Done. {hashed} photo(s) hashed, {failed} failed."))
+
+    def _flush(self, pending):
+        count = len(pending)
+        if pending:
+            Issue.objects.bulk_update(pending, BAND_FIELDS)
+            pending.clear()
+            self.stdout.write(f"  ... {count} hashed")
+        return count
@@ -0,0 +1,29 @@
+"""
+Management command: rebuild_issue_rollups
+
+Recomputes the IssueRollup table from scratch. The rollups are normally
+maintained incrementally by signal handlers (core.rollups); run this after
+bulk queryset.update()/raw SQL maintenance on issues, which bypasses them.
+
+Usage:
+    python manage.py rebuild_issue_rollups
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Third-party
+from django.core.management.base import BaseCommand
+
+# Local
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    """Rebuild the hourly issue rollups used by the weekly report."""
+
+    help = "Recompute IssueRollup rows from the Issue table."
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup row(s)."))
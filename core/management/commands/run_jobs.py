@@ -0,0 +1,58 @@
+"""
+Management command: run_jobs
+
+Background job worker. Claims queued BackgroundJob rows (Gemini Vision
+analysis and other deferred work) and executes them, retrying failures
+with exponential backoff. Run as many copies as needed; workers coordinate
+through the database, so no broker is required.
+
+Usage:
+    python manage.py run_jobs                 # poll forever
+    python manage.py run_jobs --once          # drain runnable jobs, then exit
+    python manage.py run_jobs --sleep 5       # poll interval when idle
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Standard library
+import time
+
+# Third-party
+from django.core.management.base import BaseCommand
+
+# Local
+from core.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    """Database-backed background job worker."""
+
+    help = "Process queued background jobs (Gemini Vision analysis, etc.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once no runnable jobs remain.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--max-jobs", type=int, default=None, help="Exit after processing this many jobs.")
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write("Job worker started.")
+
+        try:
+            while options["max_jobs"] is None or processed < options["max_jobs"]:
+                job = claim_next_job()
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["sleep"])
+                    continue
+
+                job = run_job(job)
+                processed += 1
+                style = self.style.SUCCESS if job.status == "done" else self.style.WARNING
+                self.stdout.write(style(f"  {job.task} #{job.pk} -> {job.status} (attempt {job.attempts})"))
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Processed {processed} job(s)."))
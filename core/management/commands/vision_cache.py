@@ -0,0 +1,67 @@
+"""
+Management command: vision_cache
+
+Reports on and maintains the Gemini Vision result cache
+(core.analysis_cache): live entries per prompt version and model, how
+many analyses they have served (Gemini calls saved across all
+processes), and expired rows.
+
+Usage:
+    python manage.py vision_cache             # statistics
+    python manage.py vision_cache --prune     # drop expired / least recently used rows
+    python manage.py vision_cache --clear     # drop every entry
+
+Module: core.management.commands
+Author: Ankitha
+"""
+
+# Third-party
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+# Local
+from core.analysis_cache import vision_cache
+from core.models import CachedVisionAnalysis
+
+
+class Command(BaseCommand):
+    """Show or maintain the Gemini Vision result cache."""
+
+    help = "Show Gemini Vision result cache statistics, or prune / clear it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help="Delete expired and least recently used entries.")
+        parser.add_argument("--clear", action="store_true", help="Delete every entry.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            count = CachedVisionAnalysis.objects.count()
+            vision_cache.clear()
+            self.stdout.write(self.style.SUCCESS(f"Cleared {count} entr{'y' if count == 1 else 'ies'}."))
+            return
+        if options["prune"]:
+            deleted = vision_cache.prune()
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} entr{'y' if deleted == 1 else 'ies'}."))
+
+        now    = timezone.now()
+        totals = CachedVisionAnalysis.objects.aggregate(
+            entries = Count("id"),
+            expired = Count("id", filter=Q(expires_at__lte=now)),
+            hits    = Sum("hits"),
+        )
+        self.stdout.write(
+            f"{totals['entries']} entries ({totals['expired']} expired), "
+            f"{totals['hits'] or 0} Gemini analyses served from the cache."
+        )
+        groups = (
+            CachedVisionAnalysis.objects.filter(expires_at__gt=now)
+            .values("prompt_version", "model")
+            .annotate(entries=Count("id"), hits=Sum("hits"))
+            .order_by("prompt_version", "model")
+        )
+        for group in groups:
+            self.stdout.write(
+                f"  prompt {group['prompt_version']}  {group['model']:<24} "
+                f"{group['entries']:>7} entries {group['hits']:>8} hits"
+            )
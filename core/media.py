@@ -0,0 +1,238 @@
+"""
+Content-addressed photo storage and resized renditions (derivatives).
+
+Originals: Issue.photos is stored through ContentAddressedStorage, which
+names every upload after the SHA-256 of its bytes
+(issue_photos/ab/ab12…ef.jpg). Saving identical bytes again reuses the
+existing file, so a photo uploaded twice is stored once.
+
+Derivatives: generate_derivatives() decodes an original once (JPEG draft
+mode at the largest rendition's size, EXIF orientation applied) and
+writes every rendition in IMAGE_RENDITIONS in every format of
+IMAGE_DERIVATIVE_FORMATS to derivatives/<sha[:2]>/<sha>-<rendition>.<ext>.
+The names depend only on the content, so issues sharing a photo share its
+derivatives and a file that already exists is never re-encoded. It runs
+off the request path, in the "generate_photo_derivatives" background job
+(core.tasks) and in `manage.py generate_photo_derivatives` for existing
+rows.
+
+Since every name is a content hash, /media/issue_photos/ and
+/media/derivatives/ can be served with far-future immutable caching.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import hashlib
+import io
+import os
+import posixpath
+
+# Third-party
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from PIL import Image, ImageOps, features
+
+DEFAULT_RENDITIONS = {"thumb": 320, "medium": 1024}   # name -> longest side in px
+DEFAULT_FORMATS    = ["avif", "webp"]
+DEFAULT_QUALITY    = {"avif": 50, "webp": 80, "jpeg": 82}
+
+DERIVATIVES_DIR = "derivatives"
+
+# format -> (PIL format name, file extension, MIME type)
+FORMAT_INFO = {
+    "avif": ("AVIF", "avif", "image/avif"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg",  "image/jpeg"),
+}
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def file_sha256(file):
+    """
+    SHA-256 hex digest of a Django File (or any object with chunks()).
+
+    In-memory uploads are hashed in place from their BytesIO buffer and
+    files on disk through one reused read buffer (hashlib.file_digest);
+    anything else is read in chunks.
+    """
+    inner = getattr(file, "file", None)
+    if hasattr(inner, "getbuffer") or hasattr(inner, "readinto"):
+        file.seek(0)
+        return hashlib.file_digest(inner, "sha256").hexdigest()
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files after the SHA-256 of their content.
+
+    The upload_to directory is kept and the extension lower-cased; the base
+    name becomes <sha[:2]>/<sha>. A file whose content is already stored is
+    not written again.
+    """
+
+    def _save(self, name, content):
+        digest    = file_sha256(content)
+        extension = os.path.splitext(name)[1].lower()
+        name      = posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+photo_storage = ContentAddressedStorage()
+
+
+# ---------------------------------------------------------------------------
+# Derivatives
+# ---------------------------------------------------------------------------
+
+def renditions_config():
+    return getattr(settings, "IMAGE_RENDITIONS", DEFAULT_RENDITIONS)
+
+
+def output_formats():
+    """Configured derivative formats this Pillow build can encode (AVIF needs Pillow 11.3+ or a plugin)."""
+    configured = getattr(settings, "IMAGE_DERIVATIVE_FORMATS", DEFAULT_FORMATS)
+    return [fmt for fmt in configured if fmt in FORMAT_INFO and features.check(FORMAT_INFO[fmt][1])]
+
+
+def derivative_name(digest, rendition, fmt):
+    return posixpath.join(DERIVATIVES_DIR, digest[:2], f"{digest}-{rendition}.{FORMAT_INFO[fmt][1]}")
+
+
+def _fit(size, longest_side):
+    """Scale (width, height) down so the longer side is at most `longest_side` (never up)."""
+    width, height = size
+    scale = min(1.0, longest_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _encode(image, fmt):
+    quality = getattr(settings, "IMAGE_DERIVATIVE_QUALITY", DEFAULT_QUALITY).get(fmt, 80)
+    options = {"quality": quality}
+    if fmt == "webp":
+        options["method"] = 4
+    elif fmt == "avif":
+        options["speed"] = 8
+    elif fmt == "jpeg":
+        options.update(optimize=True, progressive=True)
+    buffer = io.BytesIO()
+    image.save(buffer, FORMAT_INFO[fmt][0], **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(data, storage=None):
+    """
+    Write the renditions of one original image and describe them.
+
+    Returns (digest, renditions, written): the SHA-256 of `data`,
+    {rendition: {"width", "height", <format>: storage name, ...}} from the
+    smallest rendition up, and how many files were actually encoded (0 when
+    every derivative already existed). Renditions that would come out the
+    same size as a smaller one (small originals are never upscaled) are
+    left out.
+    """
+    storage = storage or default_storage
+    digest  = hashlib.sha256(data).hexdigest()
+    formats = output_formats()
+
+    with Image.open(io.BytesIO(data)) as img:
+        size = img.size
+        if img.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+            size = size[::-1]
+
+        renditions = {}
+        seen_sizes = set()
+        for rendition, longest_side in sorted(renditions_config().items(), key=lambda item: item[1]):
+            target = _fit(size, longest_side)
+            if target in seen_sizes:
+                continue
+            seen_sizes.add(target)
+            renditions[rendition] = {"width": target[0], "height": target[1]}
+            for fmt in formats:
+                renditions[rendition][fmt] = derivative_name(digest, rendition, fmt)
+
+        missing = [
+            (rendition, fmt)
+            for rendition, info in renditions.items()
+            for fmt in formats
+            if not storage.exists(info[fmt])
+        ]
+        if not missing:
+            return digest, renditions, 0
+
+        # One decode, at no more than the largest rendition needs
+        largest = max((info["width"], info["height"]) for info in renditions.values())
+        img.draft("RGB", largest if size == img.size else largest[::-1])
+        image = ImageOps.exif_transpose(img).convert("RGB")
+
+    written = 0
+    for rendition in reversed(list(renditions)):
+        info  = renditions[rendition]
+        image = image.resize((info["width"], info["height"]), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            if (rendition, fmt) not in missing:
+                continue
+            # A concurrent writer may have stored it meanwhile; keep whichever name the storage returns
+            info[fmt] = storage.save(info[fmt], ContentFile(_encode(image, fmt)))
+            written += 1
+    return digest, renditions, written
+
+
+def store_derivatives(issue, storage=None):
+    """
+    Generate the issue photo's derivatives and save them on the issue.
+
+    Sets photo_sha256 and photo_renditions; returns the number of files
+    written. Issues without a photo are left unchanged.
+    """
+    if not issue.photos:
+        return 0
+    with issue.photos.open("rb") as photo:
+        data = photo.read()
+    digest, renditions, written = generate_derivatives(data, storage)
+    issue.photo_sha256     = digest
+    issue.photo_renditions = renditions
+    issue.save(update_fields=["photo_sha256", "photo_renditions"])
+    return written
+
+
+# ---------------------------------------------------------------------------
+# URLs for serializers
+# ---------------------------------------------------------------------------
+
+def thumb_name(issue):
+    """Storage name of the smallest rendition (WebP preferred), or None before generation."""
+    renditions = issue.photo_renditions or {}
+    for info in renditions.values():
+        for fmt in ["webp", *FORMAT_INFO]:
+            if fmt in info:
+                return info[fmt]
+    return None
+
+
+def srcsets(issue, url):
+    """
+    {MIME type: "url 320w, url 1024w"} per derivative format, for <picture><source> tags.
+
+    `url` turns a storage name into a URL. Empty before the derivatives exist.
+    """
+    result = {}
+    for fmt, (_, _, mime) in FORMAT_INFO.items():
+        entries = [
+            f"{url(info[fmt])} {info['width']}w"
+            for info in (issue.photo_renditions or {}).values()
+            if fmt in info
+        ]
+        if entries:
+            result[mime] = ", ".join(entries)
+    return result
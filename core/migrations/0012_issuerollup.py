@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:08
+
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Count existing issues into hourly rollup rows (same keys as core.rollups)."""
+    Issue = apps.get_model("core", "Issue")
+    IssueRollup = apps.get_model("core", "IssueRollup")
+
+    totals = {}
+    rows = Issue.objects.values_list("created_at", "category", "status", "latitude", "longitude")
+    for created_at, category, status, lat, lng in rows.iterator(chunk_size=5000):
+        bucket = created_at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+        cell = "" if lat is None or lng is None else f"{round(float(lat) * 100)},{round(float(lng) * 100)}"
+        key = (bucket, category or "", status or "", cell)
+        totals[key] = totals.get(key, 0) + 1
+
+    IssueRollup.objects.bulk_create(
+        [IssueRollup(bucket=b, category=c, status=s, geo_cell=g, count=n) for (b, c, s, g), n in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_issue_ai_status_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('category', models.CharField(max_length=100)),
+                ('status', models.CharField(max_length=20)),
+                ('geo_cell', models.CharField(blank=True, default='', max_length=32)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'category', 'status', 'geo_cell'), name='issue_rollup_unique_key')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude, longitude, precision=9):
+    """Frozen copy of core.geo.geohash_encode() as of this migration."""
+    if latitude is None or longitude is None:
+        return ""
+    bits = 5 * precision
+    lat_bits, lng_bits = bits // 2, (bits + 1) // 2
+
+    def cell_index(value, low, high, bits):
+        n = 1 << bits
+        return min(max(int((value - low) / (high - low) * n), 0), n - 1)
+
+    lat_index = cell_index(float(latitude), -90.0, 90.0, lat_bits)
+    lng_index = cell_index(float(longitude), -180.0, 180.0, lng_bits)
+    code = 0
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (lng_index >> (lng_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_index >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+    chars = []
+    for _ in range(precision):
+        chars.append(BASE32[code & 31])
+        code >>= 5
+    return "".join(reversed(chars))
+
+
+def backfill_geohash(apps, schema_editor):
+    """Compute geohashes for existing geotagged issues."""
+    Issue = apps.get_model("core", "Issue")
+    rows = Issue.objects.filter(latitude__isnull=False, longitude__isnull=False).only("id", "latitude", "longitude")
+    batch = []
+    for issue in rows.iterator(chunk_size=2000):
+        issue.geohash = geohash_encode(issue.latitude, issue.longitude)
+        batch.append(issue)
+        if len(batch) >= 2000:
+            Issue.objects.bulk_update(batch, ["geohash"])
+            batch = []
+    if batch:
+        Issue.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_issuerollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['geohash', 'created_at'], name='issue_geohash_created_idx'),
+        ),
+    ]
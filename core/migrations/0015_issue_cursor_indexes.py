@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_issue_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='issue',
+            name='issue_user_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='issue',
+            name='issue_dept_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='issue',
+            name='issue_dept_status_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='issue_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['assigned_department', '-created_at', '-id'], name='issue_dept_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['assigned_department', 'status', '-created_at', '-id'], name='issue_dept_status_created_idx'),
+        ),
+    ]
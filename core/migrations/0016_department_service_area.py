@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_issue_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='service_area',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:50
+
+import core.media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_department_service_area'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='photo_renditions',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='photo_sha256',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='photos',
+            field=models.ImageField(blank=True, null=True, storage=core.media.ContentAddressedStorage(), upload_to='issue_photos/'),
+        ),
+    ]
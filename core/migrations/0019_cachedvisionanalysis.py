@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_issue_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedVisionAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('image_sha256', models.CharField(max_length=64)),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('model', models.CharField(max_length=100)),
+                ('result', models.JSONField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='vision_cache_last_used_idx'), models.Index(fields=['expires_at'], name='vision_cache_expires_idx')],
+            },
+        ),
+    ]
@@ -1,10 +1,14 @@
 """
 Data models for the CivicSense core application.
 
-Defines the three primary domain objects:
+Defines the primary domain objects:
   - Department: a city department that owns a category of civic issues
   - DepartmentProfile: links a Django User to a Department as an officer
   - Issue: a civic problem report submitted by a citizen
+  - BackgroundJob: a queued unit of deferred work (e.g. Gemini Vision
+    analysis) consumed by the `run_jobs` worker command
+  - IssueRollup: hourly issue counts per category/status/geo cell,
+    maintained incrementally for the weekly city health report
 
 Module: core
 Author: Ankitha
@@ -16,6 +20,13 @@ Author: Ankitha
 # Django
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+# Local
+from .geo import geohash_encode
+from .media import photo_storage
+from .routing import department_router
 
 
 class Department(models.Model):
@@ -24,7 +35,9 @@ class Department(models.Model):
 
     Each department is assigned exactly one category (e.g. 'sanitation'),
     and incoming issues are automatically routed to the matching department
-    when the issue is saved.
+    when the issue is saved (see core.routing). An optional `service_area`
+    polygon restricts the department to issues reported inside it; several
+    departments of one category share its issues round-robin.
     """
 
     CATEGORY_CHOICES = [
@@ -42,9 +55,27 @@ class Department(models.Model):
     email            = models.EmailField()
     created_at       = models.DateTimeField(auto_now_add=True)
 
+    # Geo-fence as a [[lat, lng], ...] polygon ring; null routes city-wide.
+    service_area = models.JSONField(null=True, blank=True)
+
     class Meta:
         ordering = ["name"]
 
+    def clean(self):
+        """Reject a service_area that is not a ring of at least three valid [lat, lng] points."""
+        area = self.service_area
+        if not area:
+            return
+        try:
+            valid = len(area) >= 3 and all(
+                len(point) == 2 and -90 <= float(point[0]) <= 90 and -180 <= float(point[1]) <= 180
+                for point in area
+            )
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise ValidationError({"service_area": "Expected a list of at least three [lat, lng] points."})
+
     def __str__(self):
         return self.name
 
@@ -66,6 +97,33 @@ class DepartmentProfile(models.Model):
         return f"{self.user.username} — {self.department.name}"
 
 
+class IssueManager(models.Manager):
+    """Default Issue manager with a routed bulk insert."""
+
+    def bulk_create_routed(self, issues, batch_size=1000):
+        """
+        bulk_create() that does what save() and the Issue signals would.
+
+        Departments are assigned from the in-memory routing table and
+        geohashes are computed in Python, so routing adds no queries; the
+        rollup rows are then adjusted once per distinct rollup key and the
+        affected report/stats caches dropped.
+        """
+        # Deferred: both modules import this one
+        from .rollups import record_created
+        from .stats import invalidate_department_stats
+
+        department_router.route_issues(issues)
+        for issue in issues:
+            issue.geohash = geohash_encode(issue.latitude, issue.longitude)
+        created = self.bulk_create(issues, batch_size=batch_size)
+
+        record_created(created)
+        for department_id in {issue.assigned_department_id for issue in created}:
+            invalidate_department_stats(department_id)
+        return created
+
+
 class Issue(models.Model):
     """
     A civic issue report submitted by a citizen.
@@ -73,7 +131,8 @@ class Issue(models.Model):
     Captures the full lifecycle of a report: submission details, media,
     AI analysis results, department assignment, and status progression.
     On creation the `save()` override automatically assigns the issue to
-    the department matching its category.
+    the department matching its category; Issue.objects.bulk_create_routed()
+    does the same for batches.
     """
 
     CATEGORY_CHOICES = [
@@ -98,6 +157,13 @@ class Issue(models.Model):
         ("resolved",    "Resolved"),
     ]
 
+    AI_STATUS_CHOICES = [
+        ("queued",  "Queued"),
+        ("running", "Running"),
+        ("done",    "Done"),
+        ("failed",  "Failed"),
+    ]
+
     # ── Core report fields ──────────────────────────────────────────────────
     user        = models.ForeignKey(User, on_delete=models.CASCADE)
     title       = models.CharField(max_length=255)
@@ -112,7 +178,24 @@ class Issue(models.Model):
     phone   = models.CharField(max_length=15, blank=True, null=True)
 
     # ── Media ───────────────────────────────────────────────────────────────
-    photos = models.ImageField(upload_to="issue_photos/", blank=True, null=True)
+    # Stored under the SHA-256 of the bytes (core.media), so identical
+    # uploads share one file. photo_renditions describes the thumbnail and
+    # medium AVIF/WebP derivatives once the background job has made them:
+    # {rendition: {"width", "height", <format>: storage name}}.
+    photos           = models.ImageField(upload_to="issue_photos/", storage=photo_storage, blank=True, null=True)
+    photo_sha256     = models.CharField(max_length=64, blank=True, default="", editable=False)
+    photo_renditions = models.JSONField(null=True, blank=True, editable=False)
+
+    # ── Duplicate detection (core.duplicates) ───────────────────────────────
+    # 64-bit dHash of the photo split into four indexed 16-bit bands, and the
+    # earlier report this issue repeats (flagged at submission).
+    photo_dhash0 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_dhash1 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_dhash2 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_dhash3 = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        "self", on_delete=models.SET_NULL, null=True, blank=True, related_name="duplicates"
+    )
 
     # ── Status tracking ─────────────────────────────────────────────────────
     status     = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
@@ -130,6 +213,10 @@ class Issue(models.Model):
     ai_description       = models.CharField(max_length=255, blank=True, default="")
     ai_severity          = models.CharField(max_length=20, blank=True, default="")
 
+    # Progress of the background Gemini Vision job; blank when no photo was
+    # uploaded and therefore no analysis was ever queued.
+    ai_status = models.CharField(max_length=20, choices=AI_STATUS_CHOICES, blank=True, default="")
+
     # ── Department assignment and resolution ────────────────────────────────
     assigned_department = models.ForeignKey(
         Department, on_delete=models.SET_NULL, null=True, blank=True, related_name="issues"
@@ -142,13 +229,141 @@ class Issue(models.Model):
     latitude  = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
+    # Geohash of (latitude, longitude), kept in sync by save(); indexed for
+    # the nearby/bbox lookups in core.geo. Blank when there are no coordinates.
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
+
+    objects = IssueManager()
+
+    class Meta:
+        indexes = [
+            # Citizen "my issues" list: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            # (id is the cursor pagination tie-breaker)
+            models.Index(fields=["user", "-created_at", "-id"], name="issue_user_created_idx"),
+            # Department queue, with and without a status filter, and department_stats
+            models.Index(fields=["assigned_department", "-created_at", "-id"], name="issue_dept_created_idx"),
+            models.Index(
+                fields=["assigned_department", "status", "-created_at", "-id"], name="issue_dept_status_created_idx",
+            ),
+            # Time-window scans (hotspots, reports, exports)
+            models.Index(fields=["created_at"], name="issue_created_idx"),
+            models.Index(fields=["geohash", "created_at"], name="issue_geohash_created_idx"),
+            # Duplicate photo lookup: one equality probe per dHash band (core.duplicates)
+            models.Index(fields=["photo_dhash0"], name="issue_dhash0_idx"),
+            models.Index(fields=["photo_dhash1"], name="issue_dhash1_idx"),
+            models.Index(fields=["photo_dhash2"], name="issue_dhash2_idx"),
+            models.Index(fields=["photo_dhash3"], name="issue_dhash3_idx"),
+        ]
+
     def save(self, *args, **kwargs):
-        """Auto-assign the matching department when a new issue is created."""
+        """Auto-assign the matching department on create and keep geohash in sync."""
         if not self.pk and not self.assigned_department_id and self.category:
-            dept = Department.objects.filter(assigned_category=self.category).first()
-            if dept:
-                self.assigned_department = dept
+            self.assigned_department_id = department_router.route(self.category, self.latitude, self.longitude)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"latitude", "longitude"} & set(update_fields):
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "geohash"}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} ({self.category})"
+
+
+class BackgroundJob(models.Model):
+    """
+    A unit of deferred work processed by the `run_jobs` worker command.
+
+    Rows are the queue itself for the default database backend, so no
+    message broker is required. Workers claim a job with a conditional
+    UPDATE (queued -> running); a job whose worker dies is re-claimed once
+    its lease expires, which gives at-least-once execution. Failed attempts
+    are rescheduled with exponential backoff until `max_attempts` is reached.
+    """
+
+    STATUS_CHOICES = [
+        ("queued",  "Queued"),
+        ("running", "Running"),
+        ("done",    "Done"),
+        ("failed",  "Failed"),
+    ]
+
+    task         = models.CharField(max_length=100)
+    issue        = models.ForeignKey(Issue, on_delete=models.CASCADE, null=True, blank=True, related_name="jobs")
+    status       = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts     = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after    = models.DateTimeField(default=timezone.now)
+    locked_at    = models.DateTimeField(null=True, blank=True)
+    last_error   = models.TextField(blank=True, default="")
+    created_at   = models.DateTimeField(auto_now_add=True)
+    updated_at   = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["run_after", "id"]
+        indexes = [models.Index(fields=["status", "run_after"], name="job_status_run_after_idx")]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class IssueRollup(models.Model):
+    """
+    Materialized issue counts for one hour × category × status × geo cell.
+
+    Maintained incrementally by the Issue signal handlers in core.rollups
+    (+1 on create, -1/+1 when category or status changes, -1 on delete) so
+    the public weekly report is assembled from a few hundred rollup rows
+    instead of scanning every issue. `geo_cell` is the issue location
+    rounded to 0.01° (~1 km) as "lat_cell,lng_cell" in hundredths of a
+    degree, or "" for issues without coordinates.
+
+    Bulk queryset.update() calls bypass the signals; run
+    `manage.py rebuild_issue_rollups` after any such maintenance.
+    """
+
+    bucket   = models.DateTimeField()
+    category = models.CharField(max_length=100)
+    status   = models.CharField(max_length=20)
+    geo_cell = models.CharField(max_length=32, blank=True, default="")
+    count    = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bucket", "category", "status", "geo_cell"], name="issue_rollup_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.category}/{self.status} [{self.geo_cell}] = {self.count}"
+
+
+class CachedVisionAnalysis(models.Model):
+    """
+    Database tier of the Gemini Vision result cache (core.analysis_cache).
+
+    `key` hashes the image SHA-256, prompt version, model and normalised
+    report text. `hits` counts lookups served from the row (Gemini calls
+    saved); `last_used_at` drives least-recently-used eviction.
+    """
+
+    key            = models.CharField(max_length=64, unique=True)
+    image_sha256   = models.CharField(max_length=64)
+    prompt_version = models.CharField(max_length=16)
+    model          = models.CharField(max_length=100)
+    result         = models.JSONField()
+    hits           = models.PositiveIntegerField(default=0)
+    created_at     = models.DateTimeField(auto_now_add=True)
+    last_used_at   = models.DateTimeField(default=timezone.now)
+    expires_at     = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["last_used_at"], name="vision_cache_last_used_idx"),
+            models.Index(fields=["expires_at"], name="vision_cache_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.image_sha256[:12]} {self.model} v{self.prompt_version} ({self.hits} hits)"
@@ -0,0 +1,61 @@
+"""
+Pagination and sparse-fieldset helpers for the CivicSense issue APIs.
+
+IssueCursorPagination pages by keyset on (created_at, id), newest first,
+so fetching page N costs the same as page 1: each request resumes from an
+opaque cursor with an indexed `created_at <` comparison instead of an
+OFFSET the database has to walk past. Responses look like
+    {"next": <url|null>, "previous": <url|null>, "results": [...]}
+
+SparseFieldsetMixin lets list/detail clients request a subset of
+serializer fields with `?fields=id,title,status`; the viewsets also defer
+the matching heavy model columns so they are not read from the database.
+
+Module: core
+Author: Ankitha
+"""
+
+# Third-party
+from rest_framework.pagination import CursorPagination
+
+# Large columns that list views rarely need; deferred unless requested
+HEAVY_FIELDS = ("description", "ai_analysis", "department_notes")
+
+
+class IssueCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id), newest first."""
+
+    ordering              = ("-created_at", "-id")
+    page_size             = 50
+    page_size_query_param = "page_size"
+    max_page_size         = 200
+
+
+def requested_fields(request):
+    """Return the set of field names in `?fields=`, or None when absent."""
+    if request is None or request.method != "GET":
+        return None
+    raw = request.query_params.get("fields")
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(",") if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin: drop fields not listed in the request's `?fields=`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get("request"))
+        if wanted:
+            for name in set(self.fields) - wanted - {"id"}:
+                self.fields.pop(name)
+
+
+def defer_unrequested(queryset, request):
+    """Defer HEAVY_FIELDS that a `?fields=` request did not ask for."""
+    wanted = requested_fields(request)
+    if not wanted:
+        return queryset
+    skipped = [name for name in HEAVY_FIELDS if name not in wanted]
+    return queryset.defer(*skipped) if skipped else queryset
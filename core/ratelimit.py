@@ -0,0 +1,215 @@
+"""
+Atomic sliding-window rate limiting for CivicSense.
+
+SlidingWindowLimiter approximates a true sliding window with two fixed
+windows: the current window's counter plus the previous window's counter
+weighted by how much of it still overlaps the sliding window. Counters are
+bumped with cache.add + cache.incr, which are atomic on the LocMem, Redis
+and Memcached backends, so concurrent requests can never both slip under
+the limit the way a get-then-set counter can. Rejected hits are rolled
+back, so a client hammering a closed limiter does not extend its own
+lockout, and an idle window simply expires rather than being reset on
+every hit.
+
+For the limit to be shared across gunicorn/uvicorn workers the default
+cache must be shared too (set REDIS_URL; see CACHES in settings). With the
+per-process LocMem fallback each worker enforces the limit on its own.
+
+Two entry points:
+  - SlidingWindowLimiter.check(request) / acheck(request) for plain Django
+    views (used by the chatbot).
+  - SlidingWindowThrottle subclasses for DRF views, configured through
+    REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] like DRF's own throttles.
+
+Requests are keyed per IP and, when authenticated, per user as well; a
+request is allowed only if every key is under its limit. The IP is
+REMOTE_ADDR unless TRUSTED_PROXY_COUNT says the app runs behind reverse
+proxies, so clients cannot dodge a limit by rotating X-Forwarded-For.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import math
+import time
+
+# Third-party
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF-style rate string into (limit, window_seconds).
+
+    Accepts "20/hour", "10/min", "5/s" and an optional multiplier such as
+    "100/10m". Returns (None, None) for an empty rate (no limit).
+    """
+    if not rate:
+        return None, None
+    count, _, period = rate.partition("/")
+    digits = "".join(ch for ch in period if ch.isdigit())
+    unit = period[len(digits):][:1].lower()
+    if unit not in DURATIONS:
+        raise ValueError(f"Invalid rate '{rate}'")
+    return int(count), int(digits or 1) * DURATIONS[unit]
+
+
+def client_ip(request):
+    """
+    Return the originating client IP.
+
+    X-Forwarded-For is only read behind TRUSTED_PROXY_COUNT reverse proxies,
+    and then only the entry the outermost trusted proxy appended: anything
+    to its left was supplied by the client and may be forged.
+    """
+    remote    = request.META.get("REMOTE_ADDR", "unknown")
+    proxies   = getattr(settings, "TRUSTED_PROXY_COUNT", 0)
+    forwarded = [a.strip() for a in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if a.strip()]
+    if not proxies or not forwarded:
+        return remote
+    return forwarded[-min(proxies, len(forwarded))]
+
+
+def client_keys(request, ip=None, user=None):
+    """Keys a request is limited under: its IP, plus its user id when authenticated."""
+    keys = [f"ip:{ip or client_ip(request)}"]
+    if user is None:
+        user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        keys.append(f"user:{user.pk}")
+    return keys
+
+
+class SlidingWindowLimiter:
+    """Sliding-window counter limiter backed by the default Django cache."""
+
+    def __init__(self, scope, limit, window):
+        self.scope  = scope
+        self.limit  = limit
+        self.window = window
+
+    def _keys(self, key, now):
+        bucket = int(now // self.window)
+        prefix = f"rl:{self.scope}:{key}"
+        return f"{prefix}:{bucket}", f"{prefix}:{bucket - 1}"
+
+    def _decide(self, current, previous, now):
+        """Return seconds to wait (0.0 if allowed) for the given window counts."""
+        elapsed  = (now % self.window) / self.window
+        weighted = previous * (1 - elapsed) + current
+        if weighted <= self.limit:
+            return 0.0
+        if current > self.limit or not previous:
+            return self.window * (1 - elapsed)
+        # Wait until enough of the previous window has slid out of view.
+        needed = 1 - (self.limit - current) / previous
+        return max((needed - elapsed) * self.window, 1.0)
+
+    def hit(self, key):
+        """
+        Record one request for `key` and return (allowed, retry_after_seconds).
+
+        The increment and the limit check use the value returned by the atomic
+        incr, so N concurrent callers observe N distinct counts.
+        """
+        now = time.time()
+        current_key, previous_key = self._keys(key, now)
+        cache.add(current_key, 0, timeout=self.window * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Key expired or was evicted between add() and incr(); start it again.
+            cache.add(current_key, 0, timeout=self.window * 2)
+            current = cache.incr(current_key)
+        previous = cache.get(previous_key, 0)
+
+        wait = self._decide(current, previous, now)
+        if wait:
+            try:
+                cache.decr(current_key)
+            except ValueError:
+                pass
+            return False, wait
+        return True, 0.0
+
+    async def ahit(self, key):
+        """Async variant of hit() using the cache's async API."""
+        now = time.time()
+        current_key, previous_key = self._keys(key, now)
+        await cache.aadd(current_key, 0, timeout=self.window * 2)
+        try:
+            current = await cache.aincr(current_key)
+        except ValueError:
+            await cache.aadd(current_key, 0, timeout=self.window * 2)
+            current = await cache.aincr(current_key)
+        previous = await cache.aget(previous_key, 0)
+
+        wait = self._decide(current, previous, now)
+        if wait:
+            try:
+                await cache.adecr(current_key)
+            except ValueError:
+                pass
+            return False, wait
+        return True, 0.0
+
+    def check(self, request, ip=None):
+        """Hit every key for `request`; return (allowed, retry_after) for the strictest one."""
+        results = [self.hit(key) for key in client_keys(request, ip)]
+        return all(ok for ok, _ in results), max(wait for _, wait in results)
+
+    async def acheck(self, request, ip=None):
+        """Async variant of check(); resolves the session user without blocking the loop."""
+        user = await request.auser() if hasattr(request, "auser") else None
+        results = [await self.ahit(key) for key in client_keys(request, ip, user)]
+        return all(ok for ok, _ in results), max(wait for _, wait in results)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle backed by SlidingWindowLimiter.
+
+    Subclasses set `scope`; the rate comes from
+    REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"][scope]. A missing rate disables
+    the throttle.
+    """
+
+    scope = None
+
+    def __init__(self):
+        rates = getattr(settings, "REST_FRAMEWORK", {}).get("DEFAULT_THROTTLE_RATES", {})
+        limit, window = parse_rate(rates.get(self.scope))
+        self.limiter = SlidingWindowLimiter(self.scope, limit, window) if limit else None
+        self.retry_after = None
+
+    def allow_request(self, request, view):
+        if self.limiter is None:
+            return True
+        allowed, self.retry_after = self.limiter.check(request)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self.retry_after) if self.retry_after else None
+
+
+class IssueCreateThrottle(SlidingWindowThrottle):
+    """Limits issue submissions per user and per IP."""
+
+    scope = "issue_create"
+
+
+class LoginThrottle(SlidingWindowThrottle):
+    """Limits login attempts per IP (credential stuffing / brute force)."""
+
+    scope = "login"
+
+
+class RegisterThrottle(SlidingWindowThrottle):
+    """Limits account registrations per IP."""
+
+    scope = "register"
@@ -0,0 +1,221 @@
+"""
+Incremental maintenance of the IssueRollup table and the cached weekly report.
+
+Every Issue create, category/status change and delete adjusts the matching
+hourly rollup row by ±1 through the signal handlers below, then drops the
+cached weekly report so the next request rebuilds it from the rollups.
+
+Each instance carries a snapshot of its rollup key taken when it was
+loaded (post_init), so detecting a category/status change on save costs
+no extra query; instances loaded with only()/defer() read it back once.
+Saves restricted to unrelated update_fields (e.g. the AI worker writing
+ai_status) skip the rollup entirely.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+from datetime import timezone as dt_timezone
+
+# Third-party
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+# Local
+from .models import Issue, IssueRollup
+
+# Fields whose change moves an issue to a different rollup row
+ROLLUP_FIELDS = {"category", "status", "created_at", "latitude", "longitude"}
+
+WEEKLY_REPORT_CACHE_KEY = "civicsense:weekly_report"
+
+
+def hour_bucket(dt):
+    """Truncate an aware datetime to the start of its UTC hour."""
+    return dt.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def geo_cell(latitude, longitude):
+    """Return the ~1 km grid cell for a coordinate pair as "lat,lng" in 0.01° units, or ""."""
+    if latitude is None or longitude is None:
+        return ""
+    return f"{round(float(latitude) * 100)},{round(float(longitude) * 100)}"
+
+
+def parse_geo_cell(cell):
+    """Inverse of geo_cell(): return the cell's (lat, lng) in degrees."""
+    lat, lng = cell.split(",")
+    return int(lat) / 100, int(lng) / 100
+
+
+def rollup_key(issue):
+    """Return the (bucket, category, status, geo_cell) an issue is counted under, or None."""
+    if issue.created_at is None:
+        return None
+    return (
+        hour_bucket(issue.created_at),
+        issue.category or "",
+        issue.status or "",
+        geo_cell(issue.latitude, issue.longitude),
+    )
+
+
+def apply_delta(key, delta):
+    """Atomically add `delta` to the rollup row for `key`, creating it if needed."""
+    bucket, category, status, cell = key
+    lookup = {"bucket": bucket, "category": category, "status": status, "geo_cell": cell}
+    with transaction.atomic():
+        if IssueRollup.objects.filter(**lookup).update(count=F("count") + delta):
+            return
+        try:
+            with transaction.atomic():
+                IssueRollup.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Another writer created the row between our UPDATE and INSERT.
+            IssueRollup.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def record_created(issues):
+    """
+    Count bulk-created issues, which fire no post_save.
+
+    Existing rollup rows are incremented with one bulk UPDATE of
+    F("count") + delta and missing rows inserted with one bulk INSERT; if
+    a concurrent writer inserts one of those rows first, the batch falls
+    back to apply_delta() per key.
+    """
+    deltas = {}
+    for issue in issues:
+        key = rollup_key(issue)
+        if key is not None:
+            deltas[key] = deltas.get(key, 0) + 1
+    if not deltas:
+        return
+
+    try:
+        with transaction.atomic():
+            rows = IssueRollup.objects.filter(bucket__in={bucket for bucket, _, _, _ in deltas}).only(
+                "id", "bucket", "category", "status", "geo_cell",
+            )
+            missing = dict(deltas)
+            updated = []
+            for row in rows:
+                key = (row.bucket, row.category, row.status, row.geo_cell)
+                if key in missing:
+                    row.count = F("count") + missing.pop(key)
+                    updated.append(row)
+            IssueRollup.objects.bulk_update(updated, ["count"], batch_size=500)
+            IssueRollup.objects.bulk_create(
+                [
+                    IssueRollup(bucket=b, category=c, status=st, geo_cell=g, count=n)
+                    for (b, c, st, g), n in missing.items()
+                ],
+                batch_size=1000,
+            )
+    except IntegrityError:
+        # A concurrent writer created one of the new rows; nothing was
+        # applied, so fall back to per-key upserts.
+        for key, delta in deltas.items():
+            apply_delta(key, delta)
+    invalidate_reports()
+
+
+def invalidate_reports():
+    """Drop cached report payloads derived from issue data."""
+    cache.delete(WEEKLY_REPORT_CACHE_KEY)
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the Issue table. Returns the number of rows written."""
+    totals = {}
+    rows = Issue.objects.values_list("created_at", "category", "status", "latitude", "longitude")
+    for created_at, category, status, lat, lng in rows.iterator(chunk_size=5000):
+        key = (hour_bucket(created_at), category or "", status or "", geo_cell(lat, lng))
+        totals[key] = totals.get(key, 0) + 1
+
+    with transaction.atomic():
+        IssueRollup.objects.all().delete()
+        IssueRollup.objects.bulk_create(
+            [
+                IssueRollup(bucket=b, category=c, status=s, geo_cell=g, count=n)
+                for (b, c, s, g), n in totals.items()
+            ],
+            batch_size=1000,
+        )
+    invalidate_reports()
+    return len(totals)
+
+
+# ---------------------------------------------------------------------------
+# Signal handlers
+# ---------------------------------------------------------------------------
+
+@receiver(post_init, sender=Issue)
+def _snapshot_rollup_key(sender, instance, **kwargs):
+    """Remember the key the row was counted under when it was loaded."""
+    deferred = instance.get_deferred_fields() if instance.pk else ()
+    if ROLLUP_FIELDS & set(deferred):
+        # Partially loaded (only()/defer()); resolved from the DB on save/delete.
+        instance._rollup_key = None
+        instance._rollup_key_unknown = True
+    else:
+        instance._rollup_key = rollup_key(instance) if instance.pk else None
+        instance._rollup_key_unknown = False
+
+
+def _resolve_stored_key(instance):
+    """Read the stored rollup key of a partially loaded instance (one query)."""
+    if not instance._rollup_key_unknown or not instance.pk:
+        return
+    row = (
+        Issue.objects.filter(pk=instance.pk)
+        .values_list("created_at", "category", "status", "latitude", "longitude")
+        .first()
+    )
+    if row:
+        created_at, category, status, lat, lng = row
+        instance._rollup_key = (hour_bucket(created_at), category or "", status or "", geo_cell(lat, lng))
+    instance._rollup_key_unknown = False
+
+
+@receiver(pre_save, sender=Issue)
+def _resolve_key_before_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or ROLLUP_FIELDS & set(update_fields):
+        _resolve_stored_key(instance)
+
+
+@receiver(pre_delete, sender=Issue)
+def _resolve_key_before_delete(sender, instance, **kwargs):
+    _resolve_stored_key(instance)
+
+
+@receiver(post_save, sender=Issue)
+def _update_rollups_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not (ROLLUP_FIELDS & set(update_fields)):
+        return
+
+    new_key = rollup_key(instance)
+    if created:
+        apply_delta(new_key, 1)
+    else:
+        old_key = instance._rollup_key
+        if old_key != new_key:
+            if old_key is not None:
+                apply_delta(old_key, -1)
+            apply_delta(new_key, 1)
+
+    instance._rollup_key = new_key
+    instance._rollup_key_unknown = False
+    invalidate_reports()
+
+
+@receiver(post_delete, sender=Issue)
+def _update_rollups_on_delete(sender, instance, **kwargs):
+    key = instance._rollup_key
+    if key is not None:
+        apply_delta(key, -1)
+    invalidate_reports()
@@ -0,0 +1,196 @@
+"""
+In-process department routing for new issues.
+
+Issue.save() used to run a Department query for every new issue. The
+process-wide `department_router` keeps the whole routing table in memory
+instead (there are a handful of departments), so routing an issue costs
+no query once the table is loaded:
+
+  - The table maps category -> departments of that category, in the same
+    (name, id) order the old `.first()` lookup used. It is loaded by one
+    query on first use (or by warm() at startup, see wsgi.py/asgi.py).
+  - Department post_save/post_delete signals drop the table once the
+    surrounding transaction commits; the next route() reloads it. Other
+    processes notice a change within DEPARTMENT_ROUTING_REFRESH_SECONDS.
+  - Geo-fences: a department with a `service_area` polygon only receives
+    issues whose coordinates fall inside it (bounding-box check, then ray
+    casting). Issues inside no fence go to the category's unfenced
+    departments, and if there are none, to any department of the category.
+  - Load balancing: when several departments qualify, they take turns
+    (round-robin per candidate set). A single candidate always wins, so a
+    one-department-per-category setup routes exactly as before.
+
+route() is O(1) in the number of issues: a dict lookup plus a fence test
+per fenced department of the category. Issue.objects.bulk_create_routed()
+routes a whole batch against the same table with no extra queries.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import itertools
+import logging
+import threading
+import time
+
+# Third-party
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def point_in_polygon(latitude, longitude, polygon):
+    """Ray-casting test: is (latitude, longitude) inside the [[lat, lng], ...] ring?"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > latitude) != (lat_j > latitude):
+            crossing = lng_i + (latitude - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if longitude < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+class GeoFence:
+    """A department's service area polygon with its bounding box precomputed."""
+
+    __slots__ = ("department_id", "polygon", "min_lat", "min_lng", "max_lat", "max_lng")
+
+    def __init__(self, department_id, polygon):
+        self.department_id = department_id
+        self.polygon       = [(float(lat), float(lng)) for lat, lng in polygon]
+        lats = [lat for lat, _ in self.polygon]
+        lngs = [lng for _, lng in self.polygon]
+        self.min_lat, self.max_lat = min(lats), max(lats)
+        self.min_lng, self.max_lng = min(lngs), max(lngs)
+
+    def contains(self, latitude, longitude):
+        if not (self.min_lat <= latitude <= self.max_lat and self.min_lng <= longitude <= self.max_lng):
+            return False
+        return point_in_polygon(latitude, longitude, self.polygon)
+
+
+class CategoryRoutes:
+    """Routing candidates for one category."""
+
+    __slots__ = ("fences", "unfenced", "everyone")
+
+    def __init__(self):
+        self.fences   = []   # GeoFence per fenced department
+        self.unfenced = ()   # department ids without a service area
+        self.everyone = ()   # every department id of the category
+
+
+class DepartmentRouter:
+    """Thread-safe, lazily loaded category -> department routing table."""
+
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = refresh_seconds
+
+        self._lock      = threading.Lock()
+        self._table     = None
+        self._loaded_at = 0.0
+        self._turns     = {}   # candidate tuple -> itertools.count()
+
+    def _refresh_seconds(self):
+        if self.refresh_seconds is not None:
+            return self.refresh_seconds
+        return getattr(settings, "DEPARTMENT_ROUTING_REFRESH_SECONDS", 300)
+
+    # ── Table lifecycle ────────────────────────────────────────────────────
+
+    def _load(self):
+        Department = apps.get_model("core", "Department")
+        grouped = {}
+        rows = Department.objects.order_by("name", "id").values_list("id", "assigned_category", "service_area")
+        for dept_id, category, service_area in rows:
+            grouped.setdefault(category, []).append((dept_id, service_area))
+
+        table = {}
+        for category, departments in grouped.items():
+            routes = table[category] = CategoryRoutes()
+            routes.everyone = tuple(dept_id for dept_id, _ in departments)
+            routes.unfenced = tuple(dept_id for dept_id, area in departments if not area)
+            routes.fences   = [GeoFence(dept_id, area) for dept_id, area in departments if area]
+        return table
+
+    def table(self):
+        """Return the routing table, loading it if it is missing or stale."""
+        table = self._table
+        if table is not None and time.monotonic() - self._loaded_at < self._refresh_seconds():
+            return table
+        with self._lock:
+            if self._table is None or time.monotonic() - self._loaded_at >= self._refresh_seconds():
+                self._table     = self._load()
+                self._loaded_at = time.monotonic()
+            return self._table
+
+    def warm(self):
+        """Load the table now (startup); a missing or unmigrated database is not fatal."""
+        try:
+            self.table()
+        except DatabaseError as exc:
+            logger.warning("[CivicSense Routing] Could not warm the routing table (%s); loading lazily.", exc)
+
+    def invalidate(self):
+        """Drop the table; the next route() reloads it."""
+        with self._lock:
+            self._table = None
+            self._turns.clear()
+
+    # ── Routing ────────────────────────────────────────────────────────────
+
+    def _take_turn(self, candidates):
+        if len(candidates) == 1:
+            return candidates[0]
+        turns = self._turns.get(candidates)
+        if turns is None:
+            turns = self._turns.setdefault(candidates, itertools.count())
+        return candidates[next(turns) % len(candidates)]
+
+    def _pick(self, routes, latitude, longitude):
+        if routes.fences and latitude is not None and longitude is not None:
+            lat, lng = float(latitude), float(longitude)
+            inside = tuple(f.department_id for f in routes.fences if f.contains(lat, lng))
+            if inside:
+                return self._take_turn(inside)
+        return self._take_turn(routes.unfenced or routes.everyone)
+
+    def route(self, category, latitude=None, longitude=None):
+        """Return the id of the department a new issue should go to, or None."""
+        routes = self.table().get(category)
+        return self._pick(routes, latitude, longitude) if routes else None
+
+    def route_issues(self, issues):
+        """Assign a department to every unassigned issue in `issues` against one table snapshot."""
+        table = self.table()
+        for issue in issues:
+            if issue.assigned_department_id or not issue.category:
+                continue
+            routes = table.get(issue.category)
+            if routes:
+                issue.assigned_department_id = self._pick(routes, issue.latitude, issue.longitude)
+        return issues
+
+
+# Process-wide router used by Issue.save() and bulk_create_routed()
+department_router = DepartmentRouter()
+
+
+# ---------------------------------------------------------------------------
+# Signal handlers
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender="core.Department")
+@receiver(post_delete, sender="core.Department")
+def _invalidate_on_department_change(sender, **kwargs):
+    # After commit, so no thread reloads the table from uncommitted rows
+    transaction.on_commit(department_router.invalidate)
@@ -13,7 +13,44 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 
 # Local
+from .media import srcsets, thumb_name
 from .models import Issue, Department
+from .pagination import SparseFieldsetMixin
+
+
+def related_department_name(issue):
+    """
+    Department name for an issue without an extra query when possible.
+
+    List/detail querysets annotate `dept_name` (see the viewsets); issues
+    loaded elsewhere fall back to the relation.
+    """
+    if hasattr(issue, "dept_name"):
+        return issue.dept_name
+    if issue.assigned_department_id:
+        return issue.assigned_department.name
+    return None
+
+
+def photo_thumb_url(issue, request):
+    """
+    Absolute URL of the photo thumbnail; the original until the derivatives exist.
+    """
+    if not issue.photos or not request:
+        return None
+    name = thumb_name(issue)
+    url = issue.photos.storage.url(name) if name else issue.photos.url
+    return request.build_absolute_uri(url)
+
+
+def photo_srcsets(issue, request):
+    """
+    {MIME type: srcset} of the photo renditions for <picture> sources, or None before generation.
+    """
+    if not issue.photos or not request:
+        return None
+    storage = issue.photos.storage
+    return srcsets(issue, lambda name: request.build_absolute_uri(storage.url(name))) or None
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -32,7 +69,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug", "assigned_category", "email"]
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class IssueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for citizen-facing Issue read and write operations.
 
@@ -41,6 +78,7 @@ class IssueSerializer(serializers.ModelSerializer):
     read-only so citizens cannot tamper with them.
 
     Custom validation enforces minimum title and description lengths.
+    GET requests may ask for a subset of fields with `?fields=`.
     """
 
     user        = UserSerializer(read_only=True)
@@ -49,6 +87,8 @@ class IssueSerializer(serializers.ModelSerializer):
     status      = serializers.CharField(required=False)
     photos      = serializers.ImageField(required=False, allow_null=True)
     photos_url  = serializers.SerializerMethodField()
+    photos_thumb_url = serializers.SerializerMethodField()
+    photos_srcset    = serializers.SerializerMethodField()
     assigned_department_name = serializers.SerializerMethodField()
 
     class Meta:
@@ -56,16 +96,20 @@ class IssueSerializer(serializers.ModelSerializer):
         fields = [
             "id", "user", "title", "description", "location",
             "category", "severity", "status", "contact", "email", "phone",
-            "photos", "photos_url", "ai_category", "ai_confidence",
+            "photos", "photos_url", "photos_thumb_url", "photos_srcset",
+            "ai_category", "ai_confidence",
             "ai_analysis", "created_at", "assigned_department_name",
             "department_notes", "resolved_at", "updated_at",
             "latitude", "longitude",
             "ai_detected_category", "ai_matches_report", "ai_description", "ai_severity",
+            "ai_status", "duplicate_of",
         ]
         read_only_fields = [
             "ai_category", "ai_confidence", "ai_analysis", "created_at",
-            "photos_url", "assigned_department_name", "resolved_at", "updated_at",
+            "photos_url", "photos_thumb_url", "photos_srcset",
+            "assigned_department_name", "resolved_at", "updated_at",
             "ai_detected_category", "ai_matches_report", "ai_description", "ai_severity",
+            "ai_status", "duplicate_of",
         ]
 
     def get_photos_url(self, obj):
@@ -75,11 +119,17 @@ class IssueSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.photos.url)
         return None
 
+    def get_photos_thumb_url(self, obj):
+        """Return the absolute thumbnail URL (the original until derivatives exist)."""
+        return photo_thumb_url(obj, self.context.get("request"))
+
+    def get_photos_srcset(self, obj):
+        """Return {MIME type: srcset} for the photo renditions, or None."""
+        return photo_srcsets(obj, self.context.get("request"))
+
     def get_assigned_department_name(self, obj):
         """Return the human-readable department name, or None if unassigned."""
-        if obj.assigned_department:
-            return obj.assigned_department.name
-        return None
+        return related_department_name(obj)
 
     def validate_title(self, value):
         """Ensure the title is present and meets the minimum length."""
@@ -112,16 +162,42 @@ class IssueSerializer(serializers.ModelSerializer):
         return Issue.objects.create(**validated_data)
 
 
-class DepartmentIssueSerializer(serializers.ModelSerializer):
+class IssueMapSerializer(serializers.ModelSerializer):
+    """
+    Public, read-only summary of an issue for map lookups (nearby / bbox).
+
+    Omits the reporter and their contact details. `distance_m` is filled
+    from the serializer context for radius queries.
+    """
+
+    distance_m = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Issue
+        fields = [
+            "id", "title", "location", "category", "severity", "status",
+            "latitude", "longitude", "created_at", "distance_m",
+        ]
+        read_only_fields = fields
+
+    def get_distance_m(self, obj):
+        """Return the distance from the query point in metres, if known."""
+        distance = self.context.get("distances", {}).get(obj.pk)
+        return round(distance, 1) if distance is not None else None
+
+
+class DepartmentIssueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Read-only serializer for department officers viewing assigned issues.
 
     Exposes the reporter's username and the absolute photo URL without
     exposing sensitive citizen contact details beyond what is explicitly
-    listed in `fields`.
+    listed in `fields`. GET requests may narrow the fields with `?fields=`.
     """
 
     photos_url               = serializers.SerializerMethodField()
+    photos_thumb_url         = serializers.SerializerMethodField()
+    photos_srcset            = serializers.SerializerMethodField()
     assigned_department_name = serializers.SerializerMethodField()
     reporter_name            = serializers.SerializerMethodField()
 
@@ -130,14 +206,16 @@ class DepartmentIssueSerializer(serializers.ModelSerializer):
         fields = [
             "id", "title", "description", "location", "category", "severity",
             "status", "contact", "email", "phone", "photos_url",
+            "photos_thumb_url", "photos_srcset",
             "ai_category", "ai_confidence", "created_at", "updated_at",
             "assigned_department_name", "department_notes", "resolved_at",
-            "reporter_name",
+            "reporter_name", "duplicate_of",
         ]
         read_only_fields = [
             "id", "title", "description", "location", "category", "severity",
-            "contact", "email", "phone", "photos_url", "ai_category",
-            "ai_confidence", "created_at", "assigned_department_name", "reporter_name",
+            "contact", "email", "phone", "photos_url", "photos_thumb_url", "photos_srcset",
+            "ai_category", "ai_confidence", "created_at", "assigned_department_name", "reporter_name",
+            "duplicate_of",
         ]
 
     def get_photos_url(self, obj):
@@ -147,14 +225,22 @@ class DepartmentIssueSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.photos.url)
         return None
 
+    def get_photos_thumb_url(self, obj):
+        """Return the absolute thumbnail URL (the original until derivatives exist)."""
+        return photo_thumb_url(obj, self.context.get("request"))
+
+    def get_photos_srcset(self, obj):
+        """Return {MIME type: srcset} for the photo renditions, or None."""
+        return photo_srcsets(obj, self.context.get("request"))
+
     def get_assigned_department_name(self, obj):
         """Return the human-readable department name, or None if unassigned."""
-        if obj.assigned_department:
-            return obj.assigned_department.name
-        return None
+        return related_department_name(obj)
 
     def get_reporter_name(self, obj):
         """Return the citizen's username who filed the report."""
+        if hasattr(obj, "reporter_username"):
+            return obj.reporter_username
         return obj.user.username if obj.user else None
 
 
@@ -0,0 +1,191 @@
+"""
+Department dashboard statistics for CivicSense.
+
+compute_department_stats() builds the whole /api/department/stats/
+payload from ONE conditional-aggregation query over the department's
+issues (served by the (assigned_department, status, ...) index):
+
+  - counts by status, by severity, by category and by status × severity
+  - resolution time: average, plus a histogram of (resolved_at -
+    created_at) over fixed hour buckets from which p50/p90 are
+    interpolated. Percentiles from a histogram are approximate (exact at
+    bucket edges), but portable: SQLite has no percentile aggregate.
+  - pending-age histogram: how long pending issues have been waiting
+
+get_department_stats() caches the payload per department for
+DEPARTMENT_STATS_CACHE_SECONDS. The Issue post_save/post_delete handlers
+below drop it whenever one of the department's issues changes, so a
+status update from update_status shows up on the next dashboard load.
+Like the rollup key (core.rollups), the department an instance was loaded
+with is snapshotted on post_init, so reassigning an issue drops the
+payloads of both the old and the new department.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+from datetime import timedelta
+
+# Third-party
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+# Local
+from .models import Issue
+
+# Upper edges (hours) of the resolution-time histogram; a final open bucket follows
+RESOLUTION_BUCKETS_HOURS = [1, 4, 12, 24, 48, 72, 168, 336, 720]
+
+# (label, min age, max age) buckets for issues still pending
+PENDING_AGE_BUCKETS = [
+    ("<1d",   timedelta(0),       timedelta(days=1)),
+    ("1-3d",  timedelta(days=1),  timedelta(days=3)),
+    ("3-7d",  timedelta(days=3),  timedelta(days=7)),
+    ("7-30d", timedelta(days=7),  timedelta(days=30)),
+    (">30d",  timedelta(days=30), None),
+]
+
+STATUSES   = [value for value, _ in Issue.STATUS_CHOICES]
+SEVERITIES = [value for value, _ in Issue.SEVERITY_CHOICES]
+CATEGORIES = [value for value, _ in Issue.CATEGORY_CHOICES]
+
+
+def stats_cache_key(department_id):
+    return f"civicsense:dept_stats:{department_id}"
+
+
+def invalidate_department_stats(department_id):
+    """Drop the cached stats payload for a department."""
+    if department_id:
+        cache.delete(stats_cache_key(department_id))
+
+
+def _percentile(histogram, total, q):
+    """Interpolate the q-quantile (hours) from cumulative bucket counts."""
+    if not total:
+        return None
+    target, cumulative, lower = q * total, 0, 0.0
+    for upper, count in histogram:
+        if count and cumulative + count >= target:
+            if upper is None:
+                return lower  # open-ended last bucket: report its lower bound
+            return round(lower + (upper - lower) * (target - cumulative) / count, 1)
+        cumulative += count
+        lower = upper if upper is not None else lower
+    return lower
+
+
+def compute_department_stats(department):
+    """Return the stats payload for `department` using a single aggregate query."""
+    now = timezone.now()
+    resolved = Q(status="resolved", resolved_at__isnull=False)
+    duration = ExpressionWrapper(F("resolved_at") - F("created_at"), output_field=DurationField())
+
+    aggregates = {
+        "total": Count("id"),
+        "avg_resolution": Avg(duration, filter=resolved),
+    }
+    for status in STATUSES:
+        aggregates[f"status__{status}"] = Count("id", filter=Q(status=status))
+        for severity in SEVERITIES:
+            aggregates[f"cell__{status}__{severity}"] = Count("id", filter=Q(status=status, severity=severity))
+    for severity in SEVERITIES:
+        aggregates[f"severity__{severity}"] = Count("id", filter=Q(severity=severity))
+    for category in CATEGORIES:
+        aggregates[f"category__{category}"] = Count("id", filter=Q(category=category))
+    for i, hours in enumerate(RESOLUTION_BUCKETS_HOURS):
+        aggregates[f"resolved_within__{i}"] = Count(
+            "id", filter=resolved & Q(resolved_at__lte=F("created_at") + timedelta(hours=hours)),
+        )
+    aggregates["resolved_count"] = Count("id", filter=resolved)
+    for i, (_label, min_age, max_age) in enumerate(PENDING_AGE_BUCKETS):
+        age = Q(status="pending", created_at__lte=now - min_age)
+        if max_age is not None:
+            age &= Q(created_at__gt=now - max_age)
+        aggregates[f"pending_age__{i}"] = Count("id", filter=age)
+
+    row = Issue.objects.filter(assigned_department=department).aggregate(**aggregates)
+
+    # Cumulative "resolved within" counts -> per-bucket counts
+    histogram, previous = [], 0
+    for i, hours in enumerate(RESOLUTION_BUCKETS_HOURS):
+        within = row[f"resolved_within__{i}"]
+        histogram.append((hours, within - previous))
+        previous = within
+    histogram.append((None, row["resolved_count"] - previous))
+
+    avg = row["avg_resolution"]
+    return {
+        "department":  department.name,
+        "total":       row["total"],
+        "pending":     row["status__pending"],
+        "in_progress": row["status__in_progress"],
+        "resolved":    row["status__resolved"],
+        "by_severity": {severity: row[f"severity__{severity}"] for severity in SEVERITIES},
+        "by_category": {category: row[f"category__{category}"] for category in CATEGORIES},
+        "by_status_severity": {
+            status: {severity: row[f"cell__{status}__{severity}"] for severity in SEVERITIES}
+            for status in STATUSES
+        },
+        "resolution_hours": {
+            "count": row["resolved_count"],
+            "avg":   round(avg.total_seconds() / 3600, 1) if avg is not None else None,
+            "p50":   _percentile(histogram, row["resolved_count"], 0.5),
+            "p90":   _percentile(histogram, row["resolved_count"], 0.9),
+            "histogram": [{"le_hours": upper, "count": count} for upper, count in histogram],
+        },
+        "pending_age": [
+            {"bucket": label, "count": row[f"pending_age__{i}"]}
+            for i, (label, _min, _max) in enumerate(PENDING_AGE_BUCKETS)
+        ],
+        "generated_at": now.isoformat(),
+    }
+
+
+def get_department_stats(department):
+    """Cached compute_department_stats()."""
+    key = stats_cache_key(department.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_department_stats(department)
+        cache.set(key, stats, getattr(settings, "DEPARTMENT_STATS_CACHE_SECONDS", 60))
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Signal handlers
+# ---------------------------------------------------------------------------
+
+@receiver(post_init, sender=Issue)
+def _snapshot_department(sender, instance, **kwargs):
+    """Remember the department the issue was assigned to when it was loaded."""
+    deferred = instance.get_deferred_fields() if instance.pk else ()
+    instance._stats_department_unknown = "assigned_department_id" in deferred
+    instance._stats_department_id = None if instance._stats_department_unknown else instance.assigned_department_id
+
+
+@receiver(pre_save, sender=Issue)
+def _resolve_department_before_save(sender, instance, update_fields=None, **kwargs):
+    """Read the stored department of a partially loaded instance (one query) before it is overwritten."""
+    if not instance._stats_department_unknown or not instance.pk:
+        return
+    if update_fields is not None and not {"assigned_department", "assigned_department_id"} & set(update_fields):
+        return
+    instance._stats_department_id = (
+        Issue.objects.filter(pk=instance.pk).values_list("assigned_department_id", flat=True).first()
+    )
+    instance._stats_department_unknown = False
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def _invalidate_on_issue_change(sender, instance, **kwargs):
+    for department_id in {instance._stats_department_id, instance.assigned_department_id}:
+        invalidate_department_stats(department_id)
+    instance._stats_department_id = instance.assigned_department_id
+    instance._stats_department_unknown = False
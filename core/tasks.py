@@ -0,0 +1,115 @@
+"""
+Background task handlers for the CivicSense core application.
+
+Each handler is registered with core.jobs.register_task and receives the
+claimed BackgroundJob. Handlers must be idempotent because the queue
+delivers at least once.
+
+Module: core
+Author: Ankitha
+"""
+
+# Local
+from .jobs import enqueue, register_task
+from .ai_analysis import analyze_issue_image
+from .duplicates import flag_duplicate, reuse_distance
+from .media import store_derivatives
+from .models import Issue
+
+AI_RESULT_FIELDS = [
+    "ai_detected_category", "ai_confidence",
+    "ai_matches_report", "ai_description", "ai_severity",
+]
+
+
+def apply_ai_result(issue, result):
+    """Copy a Gemini Vision result dict onto the issue (does not save)."""
+    issue.ai_detected_category = result["detected_category"]
+    issue.ai_confidence        = result["confidence"]
+    issue.ai_matches_report    = result["matches_report"]
+    issue.ai_description       = result["description"]
+    issue.ai_severity          = result["severity_assessment"]
+
+
+def enqueue_issue_analysis(issue):
+    """
+    Queue Gemini Vision analysis for a freshly saved issue.
+
+    Issues without a photo are left untouched (ai_status stays blank).
+    The photo is first checked for duplicates (core.duplicates); a
+    near-identical copy of an already analysed report takes over that
+    result and nothing is queued. The in-memory instance is updated too,
+    so a response serialized right after this call already reports
+    ai_status='queued' (or 'done').
+    """
+    if not issue.photos:
+        return
+    match = flag_duplicate(issue)
+    if match and match[2] <= reuse_distance() and reuse_ai_result(issue, match[0]):
+        return
+    issue.ai_status = "queued"
+    issue.save(update_fields=["ai_status"])
+    enqueue("analyze_issue", issue)
+
+
+def reuse_ai_result(issue, source_pk):
+    """Copy the finished analysis of issue `source_pk` onto `issue`; False if it has none."""
+    source = Issue.objects.filter(pk=source_pk, ai_status="done").only(*AI_RESULT_FIELDS).first()
+    if source is None:
+        return False
+    for field in AI_RESULT_FIELDS:
+        setattr(issue, field, getattr(source, field))
+    issue.ai_status = "done"
+    issue.save(update_fields=AI_RESULT_FIELDS + ["ai_status"])
+    return True
+
+
+@register_task("analyze_issue")
+def analyze_issue(job):
+    """
+    Run Gemini Vision on the job's issue photo and persist the results.
+
+    analyze_issue_image() returns None on any failure (quota, network,
+    unparseable reply), which is raised here so the queue retries with backoff.
+    """
+    issue = job.issue
+    if issue is None or not issue.photos:
+        return
+
+    issue.ai_status = "running"
+    issue.save(update_fields=["ai_status"])
+
+    result = analyze_issue_image(
+        image_path  = issue.photos.path,
+        title       = issue.title,
+        description = issue.description,
+        category    = issue.category,
+    )
+    if not result:
+        issue.ai_status = "failed" if job.attempts >= job.max_attempts else "queued"
+        issue.save(update_fields=["ai_status"])
+        raise RuntimeError(f"Gemini Vision analysis returned no result for issue #{issue.pk}")
+
+    apply_ai_result(issue, result)
+    issue.ai_status = "done"
+    issue.save(update_fields=AI_RESULT_FIELDS + ["ai_status"])
+
+
+def enqueue_photo_derivatives(issue):
+    """Queue thumbnail/medium rendition generation for a freshly saved issue with a photo."""
+    if issue.photos:
+        enqueue("generate_photo_derivatives", issue)
+
+
+@register_task("generate_photo_derivatives")
+def generate_photo_derivatives(job):
+    """
+    Write the AVIF/WebP renditions of the issue photo (core.media).
+
+    Idempotent: derivatives are content-addressed, so a retry or a photo
+    shared with another issue only re-records the existing files.
+    """
+    issue = job.issue
+    if issue is None or not issue.photos:
+        return
+    store_derivatives(issue)
@@ -1,3 +1,2031 @@
-from django.test import TestCase
+"""
+Tests for the CivicSense core application.
 
-# Create your tests here.
+Run with:
+    python manage.py test core
+
+External services are never called: Gemini is replaced by stubs and
+datasets are seeded per test.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import math
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+# Third-party
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APITestCase
+
+# Local
+from .ai_analysis import VISION_PROMPT_VERSION, analyze_issue_image, analyze_issue_images_batch
+from .analysis_cache import AnalysisCache, prompt_version
+from .chat_cache import ChatResponseCache, chat_cache
+from .chat_views import EMPTY_REPLY, ERROR_REPLY
+from .duplicates import BAND_FIELDS, find_duplicate, flag_duplicate, is_distinctive, photo_dhash, split_bands
+from .export import export_stream
+from .geo import METERS_PER_DEG, cover_ranges, nearest_ids, within_bbox
+from .hotspots import find_hotspots, load_points
+from .ingest import import_issues, read_rows
+from .jobs import _claim, claim_next_job, run_pending_jobs
+from .llm import router as llm_router
+from .management.commands.analyze_existing_issues import Command as AnalyzeExistingIssues, TokenBucket
+from .management.commands.check_import_time import parse_importtime
+from .management.commands.check_query_plans import (
+    HOT_ENDPOINTS, api_clients, endpoint_plans, seed_dataset, table_scans,
+)
+from .media import derivative_name, store_derivatives
+from .models import BackgroundJob, CachedVisionAnalysis, Department, DepartmentProfile, Issue, IssueRollup
+from .pagination import IssueCursorPagination
+from .ratelimit import SlidingWindowLimiter, client_ip
+from .rollups import record_created
+from .routing import DepartmentRouter, department_router
+from .stats import compute_department_stats, get_department_stats, stats_cache_key
+from .serializers import IssueSerializer
+from .tasks import enqueue_issue_analysis, enqueue_photo_derivatives
+from .uploads import LimitedUploadHandler
+
+AI_RESULT = {
+    "detected_category": "Garbage", "confidence": 88, "matches_report": True,
+    "description": "Overflowing bin.", "severity_assessment": "Moderate",
+}
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def photo_bytes(seed, size=(320, 240), image=None):
+    """JPEG bytes of a random-noise photo (distinct per seed), or of `image`."""
+    import numpy as np
+
+    if image is None:
+        pixels = np.random.default_rng(seed).integers(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+        image  = Image.fromarray(pixels).resize(size, Image.NEAREST)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def photo_upload(seed=0, name="photo.jpg", **kwargs):
+    return SimpleUploadedFile(name, photo_bytes(seed, **kwargs), content_type="image/jpeg")
+
+
+class TempMediaMixin:
+    """Point MEDIA_ROOT at a temporary directory for the test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp(prefix="civicsense-test-media-")
+        cls.addClassCleanup(shutil.rmtree, cls._media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls._media_root)
+        media_override.enable()
+        # Class cleanups run last-in first-out, after tearDownClass(): a
+        # class-level @override_settings (enabled by super()) is undone
+        # before this one, so the original settings are restored.
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+
+# ---------------------------------------------------------------------------
+# Query plans
+# ---------------------------------------------------------------------------
+
+class QueryPlanTests(TestCase):
+    """Every hot endpoint query is index-backed (no full scan of a watched table)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen, cls.officer = seed_dataset(2000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def test_hot_endpoints_use_indexes(self):
+        clients = api_clients(self.citizen, self.officer)
+        for label, who, path in HOT_ENDPOINTS:
+            with self.subTest(label):
+                status, plans = endpoint_plans(connection, clients[who], path)
+                self.assertEqual(status, 200)
+                self.assertTrue(plans, "no watched-table queries recorded")
+                scans = {sql: scans for sql, _, scans in plans if scans}
+                self.assertEqual(scans, {}, f"table scans for {path}")
+
+    def test_unindexed_filter_is_reported(self):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN SELECT id FROM core_issue WHERE title = %s", ["x"])
+            plan = [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+        self.assertTrue(table_scans(connection.vendor, plan))
+
+
+# ---------------------------------------------------------------------------
+# Query counts
+# ---------------------------------------------------------------------------
+
+class QueryCountTests(APITestCase):
+    """Issue list and detail endpoints run a constant number of queries at 10, 100 and 1000 issues."""
+
+    SIZES = (10, 100, 1000)
+
+    def setUp(self):
+        self.department = Department.objects.create(
+            name="Sanitation", slug="sanitation", assigned_category="sanitation", email="dept@example.com",
+        )
+        self.citizen = User.objects.create(username="citizen")
+        self.officer = User.objects.create(username="officer")
+        DepartmentProfile.objects.create(user=self.officer, department=self.department)
+
+    def _grow_to(self, size):
+        missing = size - Issue.objects.count()
+        Issue.objects.bulk_create([
+            Issue(
+                user=self.citizen, title=f"Issue {i}", description="Seeded for query counts",
+                category="sanitation", assigned_department=self.department,
+            )
+            for i in range(missing)
+        ])
+        return Issue.objects.order_by("id").values_list("pk", flat=True).first()
+
+    def _assert_constant(self, user, path_template):
+        self.client.force_authenticate(user)
+        for size in self.SIZES:
+            pk = self._grow_to(size)
+            path = path_template.format(pk=pk)
+            with self.subTest(size=size):
+                self.client.get(path)  # warm per-user caches (e.g. department_profile)
+                with self.assertNumQueries(1):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_citizen_list(self):
+        self._assert_constant(self.citizen, f"/api/issues/?page_size={IssueCursorPagination.max_page_size}")
+
+    def test_citizen_detail(self):
+        self._assert_constant(self.citizen, "/api/issues/{pk}/")
+
+    def test_department_list(self):
+        self._assert_constant(
+            self.officer, f"/api/department/issues/?page_size={IssueCursorPagination.max_page_size}",
+        )
+
+    def test_department_detail(self):
+        self._assert_constant(self.officer, "/api/department/issues/{pk}/")
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+class SlidingWindowLimiterTests(SimpleTestCase):
+    """The limiter never admits more than its limit, however many threads hit it at once."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_hits_never_over_admit(self):
+        limiter  = SlidingWindowLimiter("test-concurrency", limit=50, window=3600)
+        start    = threading.Barrier(16)
+        admitted = []
+
+        def hammer():
+            start.wait()
+            admitted.extend(allowed for allowed, _ in (limiter.hit("ip:10.0.0.1") for _ in range(25)))
+
+        threads = [threading.Thread(target=hammer) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(admitted), 16 * 25)
+        self.assertLessEqual(sum(admitted), limiter.limit)
+        self.assertGreater(sum(admitted), 0)
+
+    def test_rejected_hits_are_rolled_back(self):
+        limiter = SlidingWindowLimiter("test-rollback", limit=3, window=3600)
+        results = [limiter.hit("ip:10.0.0.2")[0] for _ in range(10)]
+        self.assertEqual(results, [True] * 3 + [False] * 7)
+        current_key, _ = limiter._keys("ip:10.0.0.2", time.time())
+        self.assertEqual(cache.get(current_key), 3)
+
+
+class ClientIpTests(SimpleTestCase):
+    """X-Forwarded-For is only trusted behind configured proxies."""
+
+    def _request(self, forwarded=None):
+        extra = {"HTTP_X_FORWARDED_FOR": forwarded} if forwarded else {}
+        return RequestFactory().get("/", REMOTE_ADDR="10.0.0.9", **extra)
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_header_ignored_without_trusted_proxies(self):
+        self.assertEqual(client_ip(self._request("1.2.3.4")), "10.0.0.9")
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_uses_entry_appended_by_trusted_proxy(self):
+        # The client forged "1.2.3.4"; the proxy appended the real address.
+        self.assertEqual(client_ip(self._request("1.2.3.4, 203.0.113.7")), "203.0.113.7")
+        self.assertEqual(client_ip(self._request()), "10.0.0.9")
+
+
+@override_settings(TRUSTED_PROXY_COUNT=0)
+class LoginThrottleTests(APITestCase):
+    """Rotating X-Forwarded-For does not reset the login limit."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rotating_forwarded_for_is_still_throttled(self):
+        statuses = [
+            self.client.post(
+                "/api/auth/login/", {"email": "nobody@example.com", "password": "wrong"},
+                HTTP_X_FORWARDED_FOR=f"198.51.100.{i}",
+            ).status_code
+            for i in range(12)
+        ]
+        self.assertNotIn(429, statuses[:10])
+        self.assertEqual(statuses[10:], [429, 429])
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+@override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_BASE_DELAY=30, JOB_RETRY_MAX_DELAY=3600)
+@mock.patch("core.tasks.analyze_issue_image")
+class JobQueueTests(TempMediaMixin, TestCase):
+    """Gemini Vision analysis runs through the queue with an in-process worker (Gemini stubbed)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="citizen")
+
+    def _enqueue(self, seed=1):
+        issue = Issue.objects.create(
+            user=self.user, title="Bin overflowing", description="Near the park",
+            category="sanitation", photos=photo_upload(seed),
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            enqueue_issue_analysis(issue)
+        self.assertEqual(len(callbacks), 1)
+        return issue
+
+    def _make_due(self):
+        BackgroundJob.objects.filter(status="queued").update(run_after=timezone.now())
+
+    def test_enqueue_then_worker_marks_done(self, analyze):
+        analyze.return_value = dict(AI_RESULT)
+        issue = self._enqueue()
+        self.assertEqual(Issue.objects.get(pk=issue.pk).ai_status, "queued")
+        self.assertEqual(BackgroundJob.objects.get(issue=issue).status, "queued")
+
+        self.assertEqual(run_pending_jobs(), 1)
+
+        issue.refresh_from_db()
+        self.assertEqual(issue.ai_status, "done")
+        self.assertEqual(issue.ai_detected_category, "Garbage")
+        self.assertEqual(issue.ai_confidence, 88)
+        self.assertEqual(BackgroundJob.objects.get(issue=issue).status, "done")
+        analyze.assert_called_once()
+        self.assertEqual(run_pending_jobs(), 0)
+
+    def test_enqueue_is_deferred_until_commit(self, analyze):
+        issue = Issue.objects.create(user=self.user, title="t", category="sanitation", photos=photo_upload(2))
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            enqueue_issue_analysis(issue)
+            self.assertFalse(BackgroundJob.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_failures_retry_with_backoff_then_fail(self, analyze):
+        analyze.return_value = None
+        issue = self._enqueue()
+
+        delays = []
+        for attempt in (1, 2):
+            before = timezone.now()
+            with self.assertLogs("core.jobs", "WARNING"):
+                self.assertEqual(run_pending_jobs(), 1)
+            job = BackgroundJob.objects.get(issue=issue)
+            self.assertEqual((job.status, job.attempts), ("queued", attempt))
+            self.assertIn("RuntimeError", job.last_error)
+            self.assertEqual(Issue.objects.get(pk=issue.pk).ai_status, "queued")
+            delays.append((job.run_after - before).total_seconds())
+            # Not due yet: the worker leaves it alone until the backoff passes
+            self.assertEqual(run_pending_jobs(), 0)
+            self._make_due()
+
+        self.assertGreaterEqual(delays[0], 30)
+        self.assertLessEqual(delays[0], 34)
+        self.assertGreaterEqual(delays[1], 60)
+        self.assertLessEqual(delays[1], 67)
+
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertEqual(run_pending_jobs(), 1)
+        job = BackgroundJob.objects.get(issue=issue)
+        self.assertEqual((job.status, job.attempts), ("failed", 3))
+        self.assertEqual(Issue.objects.get(pk=issue.pk).ai_status, "failed")
+        self._make_due()
+        self.assertEqual(run_pending_jobs(), 0)
+        self.assertEqual(analyze.call_count, 3)
+
+    def test_racing_workers_claim_a_job_once(self, analyze):
+        analyze.return_value = dict(AI_RESULT)
+        issue = self._enqueue()
+        job = BackgroundJob.objects.get(issue=issue)
+
+        # Both workers read the same candidate row before either claims it
+        observed = BackgroundJob.objects.values_list("status", "locked_at").get(pk=job.pk)
+        first  = _claim(job.pk, *observed)
+        second = _claim(job.pk, *observed)
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+
+        # While the first worker holds the lease, another worker finds nothing
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(run_pending_jobs(), 0)
+        self.assertEqual(BackgroundJob.objects.get(pk=job.pk).attempts, 1)
+        analyze.assert_not_called()
+
+    @override_settings(JOB_LEASE_SECONDS=300)
+    def test_expired_lease_is_reclaimed_once(self, analyze):
+        analyze.return_value = dict(AI_RESULT)
+        issue = self._enqueue()
+        job = claim_next_job()
+        self.assertEqual(job.issue_id, issue.pk)
+        # The first worker died: its lease runs out
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+
+        observed = BackgroundJob.objects.values_list("status", "locked_at").get(pk=job.pk)
+        self.assertIsNotNone(_claim(job.pk, *observed))
+        self.assertIsNone(_claim(job.pk, *observed))
+
+
+    @override_settings(JOB_LEASE_SECONDS=300)
+    def test_expired_lease_on_last_attempt_fails_the_job(self, analyze):
+        analyze.return_value = dict(AI_RESULT)
+        crashing = self._enqueue(1)
+        waiting  = self._enqueue(2)
+        job = claim_next_job()
+        self.assertEqual(job.issue_id, crashing.pk)
+        # Every attempt killed the worker; the lease of the last one runs out
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            attempts=job.max_attempts, locked_at=timezone.now() - timedelta(seconds=301),
+        )
+
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertEqual(run_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_at), ("failed", 3, None))
+        self.assertIn("Lease expired", job.last_error)
+        self.assertEqual(BackgroundJob.objects.get(issue=waiting).status, "done")
+        self.assertEqual(analyze.call_count, 1)
+        self.assertIsNone(claim_next_job())
+
+# ---------------------------------------------------------------------------
+# Upload limits
+# ---------------------------------------------------------------------------
+
+def pixel_bomb(padding=2 * 2**20):
+    """A small JPEG whose header claims 10000x10000 (100 MP), padded to `padding` extra bytes."""
+    data = bytearray(photo_bytes(0, size=(64, 64)))
+    sof  = data.index(b"\xff\xc0")
+    data[sof + 5:sof + 9] = (10000).to_bytes(2, "big") * 2
+    return bytes(data) + bytes(padding)
+
+
+@override_settings(MAX_UPLOAD_BYTES=256 * 2**10, MAX_UPLOAD_PIXELS=50_000_000)
+@mock.patch("civicsense_backend.ai_module.image_analyzer.get_inference_client")
+class UploadLimitTests(TempMediaMixin, TestCase):
+    """MAX_UPLOAD_BYTES / MAX_UPLOAD_PIXELS answer 413 while the body streams in."""
+
+    def _analyze(self, data, name="photo.jpg"):
+        from civicsense_backend.ai_module.image_analyzer import analyze_image
+
+        request = RequestFactory().post(
+            "/api/analyze-image/", {"image": SimpleUploadedFile(name, data, content_type="image/jpeg")},
+        )
+        return analyze_image(request)
+
+    def test_normal_upload_is_analysed(self, get_client):
+        get_client.return_value.classify.return_value = {"category": "garbage", "confidence": 0.91}
+        response = self._analyze(photo_bytes(3, size=(640, 480)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["ai_category"], "garbage")
+        self.assertEqual(response.data["image_metadata"]["width"], 640)
+        get_client.return_value.classify.assert_called_once()
+
+    def test_body_over_byte_limit_is_rejected(self, get_client):
+        response = self._analyze(photo_bytes(4, size=(640, 480)) + bytes(300 * 2**10))
+        self.assertEqual(response.status_code, 413)
+        get_client.return_value.classify.assert_not_called()
+
+    def test_pixel_bomb_is_rejected_after_first_chunk(self, get_client):
+        seen = []
+        original = LimitedUploadHandler.receive_data_chunk
+
+        def counting(handler, raw_data, start):
+            seen.append(len(raw_data))
+            return original(handler, raw_data, start)
+
+        with override_settings(MAX_UPLOAD_BYTES=15 * 2**20), \
+                mock.patch.object(LimitedUploadHandler, "receive_data_chunk", counting):
+            response = self._analyze(pixel_bomb())
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(len(seen), 1)
+        self.assertLessEqual(seen[0], 64 * 2**10)
+        get_client.return_value.classify.assert_not_called()
+
+    def test_issue_create_rejects_pixel_bomb(self, get_client):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="citizen"))
+        response = client.post("/api/issues/", {
+            "title": "Pothole", "description": "Deep", "location": "MG Road", "category": "infrastructure",
+            "photos": SimpleUploadedFile("bomb.jpg", pixel_bomb(), content_type="image/jpeg"),
+        })
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Issue.objects.exists())
+
+
+# ---------------------------------------------------------------------------
+# Issue rollups
+# ---------------------------------------------------------------------------
+
+class IssueRollupTests(TestCase):
+    """Signal-maintained IssueRollup counts always equal a fresh COUNT(*) of the issues."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="citizen")
+
+    def _issue(self, category="sanitation", status="pending", **kwargs):
+        return Issue.objects.create(user=self.user, title="t", category=category, status=status, **kwargs)
+
+    def assertRollupsMatch(self):
+        rolled = {
+            (row["category"], row["status"]): row["n"]
+            for row in IssueRollup.objects.values("category", "status").annotate(n=Sum("count"))
+            if row["n"]
+        }
+        counted = {
+            (row["category"], row["status"]): row["n"]
+            for row in Issue.objects.values("category", "status").annotate(n=Count("id"))
+        }
+        self.assertEqual(rolled, counted)
+
+    def test_create(self):
+        self._issue()
+        self._issue(latitude=12.97, longitude=77.59)
+        self._issue("infrastructure")
+        self.assertRollupsMatch()
+
+    def test_status_change(self):
+        issue = self._issue()
+        issue.status = "in_progress"
+        issue.save()
+        self.assertRollupsMatch()
+        # Loaded with only(): the old key is read back before moving the count
+        issue = Issue.objects.only("id", "status").get(pk=issue.pk)
+        issue.status = "resolved"
+        issue.save(update_fields=["status"])
+        self.assertRollupsMatch()
+
+    def test_category_change(self):
+        issue = self._issue()
+        issue.category = "infrastructure"
+        issue.save()
+        self.assertRollupsMatch()
+
+    def test_unrelated_update_leaves_rollups_alone(self):
+        issue = self._issue()
+        before = list(IssueRollup.objects.values_list("id", "count"))
+        issue.ai_status = "done"
+        issue.save(update_fields=["ai_status"])
+        self.assertEqual(list(IssueRollup.objects.values_list("id", "count")), before)
+
+    def test_delete(self):
+        keep, gone = self._issue(), self._issue("infrastructure", "resolved")
+        gone.delete()
+        self.assertRollupsMatch()
+        keep.delete()
+        self.assertRollupsMatch()
+
+    def test_bulk_create(self):
+        self._issue()
+        issues = Issue.objects.bulk_create([
+            Issue(user=self.user, title="t", category="sanitation", status="pending") for _ in range(5)
+        ])
+        record_created(issues)
+        self.assertRollupsMatch()
+
+    def test_weekly_report_groups_by_category_and_status(self):
+        from civicsense_backend.ai_module.report_generator import CityHealthReportGenerator
+
+        for i in range(6):
+            self._issue(latitude=12.9 + i * 0.05, longitude=77.5, status="resolved" if i % 3 == 0 else "pending")
+        self._issue("infrastructure", latitude=13.0, longitude=77.6)
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        cache.clear()
+        with connection.execute_wrapper(record):
+            report = CityHealthReportGenerator(Issue).build_weekly_report()
+
+        grouped = next(sql for sql in queries if "core_issuerollup" in sql and "GROUP BY" in sql)
+        self.assertNotIn("geo_cell", grouped)
+        self.assertEqual(report["summary"]["total_issues"], 7)
+        self.assertEqual(report["summary"]["resolved"], 2)
+        self.assertEqual(report["summary"]["pending"], 5)
+        self.assertEqual(
+            {row["category"]: row["count"] for row in report["category_breakdown"]},
+            {"sanitation": 6, "infrastructure": 1},
+        )
+
+
+# ---------------------------------------------------------------------------
+# Department routing
+# ---------------------------------------------------------------------------
+
+# Square around central Bengaluru, [[lat, lng], ...]
+CENTRAL_FENCE = [[12.95, 77.55], [12.95, 77.65], [13.00, 77.65], [13.00, 77.55]]
+
+
+class DepartmentRoutingTests(TestCase):
+    """Issue.save() routes through the in-memory table: geo-fences, round-robin and refresh."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="citizen")
+
+    def tearDown(self):
+        department_router.invalidate()
+
+    def _department(self, name, category="sanitation", service_area=None):
+        return Department.objects.create(
+            name=name, slug=name.lower().replace(" ", "-"), assigned_category=category,
+            email=f"{name.lower().replace(' ', '')}@example.com", service_area=service_area,
+        )
+
+    def _issue(self, category="sanitation", latitude=None, longitude=None):
+        return Issue.objects.create(
+            user=self.user, title="t", category=category, latitude=latitude, longitude=longitude,
+        )
+
+    def test_issue_inside_fence_goes_to_fenced_department(self):
+        central = self._department("Central Sanitation", service_area=CENTRAL_FENCE)
+        citywide = self._department("City Sanitation")
+        department_router.invalidate()
+
+        self.assertEqual(self._issue(latitude=12.97, longitude=77.60).assigned_department, central)
+        self.assertEqual(self._issue(latitude=12.80, longitude=77.40).assigned_department, citywide)
+        self.assertEqual(self._issue().assigned_department, citywide)
+
+    def test_departments_of_one_category_rotate(self):
+        first, second = self._department("A Sanitation"), self._department("B Sanitation")
+        department_router.invalidate()
+
+        assigned = [self._issue().assigned_department for _ in range(4)]
+        self.assertEqual(assigned, [first, second, first, second])
+
+    def test_routing_needs_no_query_once_loaded(self):
+        self._department("City Sanitation")
+        department_router.invalidate()
+        department_router.table()
+        with self.assertNumQueries(0):
+            department_router.route("sanitation", 12.97, 77.60)
+
+    def test_department_change_invalidates_after_commit(self):
+        department_router.table()
+        with self.captureOnCommitCallbacks(execute=True):
+            department = self._department("City Sanitation")
+        self.assertEqual(department_router.route("sanitation"), department.pk)
+
+    def test_other_process_picks_up_changes_after_refresh_interval(self):
+        # A router whose process never receives this process's signals
+        router = DepartmentRouter(refresh_seconds=60)
+        old_pk = self._department("Old Sanitation").pk
+        self.assertEqual(router.route("sanitation"), old_pk)
+
+        Department.objects.filter(pk=old_pk).delete()
+        new = self._department("New Sanitation")
+        self.assertEqual(router.route("sanitation"), old_pk)   # still the cached table
+
+        with mock.patch("core.routing.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(router.route("sanitation"), new.pk)
+
+    def test_invalid_service_area_is_rejected(self):
+        department = Department(
+            name="Bad", slug="bad", assigned_category="sanitation", email="bad@example.com",
+            service_area=[[12.9, 77.5], [95, 77.6]],
+        )
+        with self.assertRaises(ValidationError):
+            department.clean()
+
+
+# ---------------------------------------------------------------------------
+# Department stats
+# ---------------------------------------------------------------------------
+
+class DepartmentStatsTests(APITestCase):
+    """The stats payload is one aggregate query, cached until one of the department's issues changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(
+            name="City Sanitation", slug="city-sanitation", assigned_category="sanitation",
+            email="sanitation@example.com",
+        )
+        citizen = User.objects.create(username="citizen")
+        now = timezone.now()
+        for status, severity, hours in [
+            ("pending", "minor", None), ("pending", "high", None),
+            ("in_progress", "medium", None), ("resolved", "critical", 2), ("resolved", "minor", 30),
+        ]:
+            issue = Issue.objects.create(
+                user=citizen, title="t", category="sanitation", status=status, severity=severity,
+                assigned_department=self.department,
+            )
+            if hours is not None:
+                Issue.objects.filter(pk=issue.pk).update(
+                    created_at=now - timedelta(hours=hours), resolved_at=now,
+                )
+        self.officer = User.objects.create(username="officer")
+        DepartmentProfile.objects.create(user=self.officer, department=self.department)
+        cache.clear()
+
+    def tearDown(self):
+        department_router.invalidate()
+
+    def test_cold_cache_is_one_query(self):
+        with self.assertNumQueries(1):
+            stats = get_department_stats(self.department)
+
+        self.assertEqual((stats["total"], stats["pending"], stats["in_progress"], stats["resolved"]), (5, 2, 1, 2))
+        self.assertEqual(stats["by_severity"], {"minor": 2, "medium": 1, "high": 1, "critical": 1})
+        self.assertEqual(stats["by_status_severity"]["resolved"]["critical"], 1)
+        self.assertEqual(stats["resolution_hours"]["count"], 2)
+        self.assertEqual(stats["resolution_hours"]["avg"], 16.0)
+        self.assertEqual(sum(row["count"] for row in stats["pending_age"]), 2)
+
+    def test_warm_cache_needs_no_query(self):
+        get_department_stats(self.department)
+        with self.assertNumQueries(0):
+            get_department_stats(self.department)
+
+    def test_status_change_invalidates_cached_payload(self):
+        self.assertEqual(get_department_stats(self.department)["pending"], 2)
+        self.assertIsNotNone(cache.get(stats_cache_key(self.department.pk)))
+
+        issue = Issue.objects.filter(assigned_department=self.department, status="pending").first()
+        issue.status = "in_progress"
+        issue.save()
+
+        self.assertIsNone(cache.get(stats_cache_key(self.department.pk)))
+        stats = get_department_stats(self.department)
+        self.assertEqual((stats["pending"], stats["in_progress"]), (1, 2))
+
+    def test_reassignment_invalidates_both_departments(self):
+        other = Department.objects.create(
+            name="Ward Sanitation", slug="ward-sanitation", assigned_category="sanitation", email="ward@example.com",
+        )
+        self.assertEqual(get_department_stats(self.department)["total"], 5)
+        self.assertEqual(get_department_stats(other)["total"], 0)
+
+        issue = Issue.objects.filter(assigned_department=self.department).first()
+        issue.assigned_department = other
+        issue.save()
+
+        self.assertIsNone(cache.get(stats_cache_key(self.department.pk)))
+        self.assertIsNone(cache.get(stats_cache_key(other.pk)))
+        self.assertEqual(get_department_stats(self.department)["total"], 4)
+        self.assertEqual(get_department_stats(other)["total"], 1)
+
+        # Loaded without the department column: read back once before it is overwritten
+        issue = Issue.objects.only("id", "status").get(pk=issue.pk)
+        issue.assigned_department = self.department
+        issue.save(update_fields=["assigned_department"])
+        self.assertEqual(get_department_stats(self.department)["total"], 5)
+        self.assertEqual(get_department_stats(other)["total"], 0)
+
+    def test_status_endpoint_shows_up_on_next_dashboard_load(self):
+        self.client.force_authenticate(self.officer)
+        self.assertEqual(self.client.get("/api/department/stats/").json()["resolved"], 2)
+
+        issue = Issue.objects.filter(assigned_department=self.department, status="pending").first()
+        response = self.client.patch(f"/api/department/issues/{issue.pk}/status/", {"status": "resolved"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        stats = self.client.get("/api/department/stats/").json()
+        self.assertEqual((stats["pending"], stats["resolved"]), (1, 3))
+        self.assertEqual(stats, compute_department_stats(self.department) | {"generated_at": stats["generated_at"]})
+
+
+# ---------------------------------------------------------------------------
+# Duplicate detection
+# ---------------------------------------------------------------------------
+
+@mock.patch("core.tasks.analyze_issue_image")
+class DuplicateDetectionTests(TempMediaMixin, TestCase):
+    """Re-uploads are flagged and reuse the analysis; flat photos and one-band collisions are not."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="citizen")
+
+    def _issue(self, photo, latitude=12.9716, longitude=77.5946):
+        return Issue.objects.create(
+            user=self.user, title="Pothole", category="infrastructure",
+            latitude=latitude, longitude=longitude,
+            photos=SimpleUploadedFile("photo.jpg", photo, content_type="image/jpeg"),
+        )
+
+    def _analysed(self, photo):
+        issue = self._issue(photo)
+        flag_duplicate(issue)
+        Issue.objects.filter(pk=issue.pk).update(
+            ai_status="done", ai_detected_category="Pothole", ai_confidence=91,
+            ai_matches_report=True, ai_description="Deep pothole.", ai_severity="High",
+        )
+        return issue
+
+    def test_reupload_reuses_analysis_without_a_job(self, analyze):
+        photo    = photo_bytes(1)
+        original = self._analysed(photo)
+
+        # Same photo, reported again ~20 m away
+        repeat = self._issue(photo, latitude=12.9717, longitude=77.5947)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            enqueue_issue_analysis(repeat)
+
+        repeat.refresh_from_db()
+        self.assertEqual(repeat.duplicate_of_id, original.pk)
+        self.assertEqual(repeat.ai_status, "done")
+        self.assertEqual((repeat.ai_detected_category, repeat.ai_confidence), ("Pothole", 91))
+        self.assertEqual(callbacks, [])
+        self.assertFalse(BackgroundJob.objects.exists())
+        analyze.assert_not_called()
+
+    def test_reupload_of_unanalysed_report_is_flagged_and_queued(self, analyze):
+        photo    = photo_bytes(1)
+        original = self._issue(photo)
+        flag_duplicate(original)
+
+        repeat = self._issue(photo)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_issue_analysis(repeat)
+
+        repeat.refresh_from_db()
+        self.assertEqual(repeat.duplicate_of_id, original.pk)
+        self.assertEqual(repeat.ai_status, "queued")
+        self.assertEqual(BackgroundJob.objects.get().issue_id, repeat.pk)
+
+    def test_far_away_reupload_is_not_flagged(self, analyze):
+        photo = photo_bytes(1)
+        self._analysed(photo)
+        elsewhere = self._issue(photo, latitude=12.99, longitude=77.62)
+        self.assertIsNone(flag_duplicate(elsewhere))
+
+    def test_flat_photo_is_not_flagged(self, analyze):
+        flat = photo_bytes(0, image=Image.new("RGB", (320, 240), (128, 128, 128)))
+        self.assertFalse(is_distinctive(photo_dhash(io.BytesIO(flat))))
+        self._analysed(flat)
+
+        repeat = self._issue(flat)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_issue_analysis(repeat)
+
+        repeat.refresh_from_db()
+        self.assertIsNone(repeat.duplicate_of_id)
+        self.assertIsNotNone(repeat.photo_dhash0)   # still hashed and stored
+        self.assertEqual(repeat.ai_status, "queued")
+
+    def test_different_photo_sharing_one_band_is_not_flagged(self, analyze):
+        other = self._analysed(photo_bytes(1))
+        value = photo_dhash(io.BytesIO(photo_bytes(2)))
+        self.assertTrue(is_distinctive(value))
+
+        # Same top band as the new photo, every other bit flipped: a candidate, 48 bits away
+        far = value ^ 0x0000_FFFF_FFFF_FFFF
+        Issue.objects.filter(pk=other.pk).update(**dict(zip(BAND_FIELDS, split_bands(far))))
+
+        repeat = self._issue(photo_bytes(2))
+        self.assertIsNone(find_duplicate(repeat, value))
+        self.assertIsNone(flag_duplicate(repeat))
+        repeat.refresh_from_db()
+        self.assertIsNone(repeat.duplicate_of_id)
+
+        # Two bits away instead: flagged, but too different to reuse the analysis
+        near = value ^ 0b11
+        Issue.objects.filter(pk=other.pk).update(**dict(zip(BAND_FIELDS, split_bands(near))))
+        self.assertEqual(find_duplicate(repeat, value)[:3], (other.pk, None, 2))
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+class ExportTests(APITestCase):
+    """Department exports stream in every format, honour the list filters and stay flat in memory."""
+
+    def setUp(self):
+        self.department = Department.objects.create(
+            name="City Sanitation", slug="city-sanitation", assigned_category="sanitation",
+            email="sanitation@example.com",
+        )
+        self.citizen = User.objects.create(username="citizen")
+        officer = User.objects.create(username="officer")
+        DepartmentProfile.objects.create(user=officer, department=self.department)
+        self.client.force_authenticate(officer)
+
+    def tearDown(self):
+        department_router.invalidate()
+
+    def _seed(self, count, start=0, **kwargs):
+        Issue.objects.bulk_create([
+            Issue(
+                user=self.citizen, title=f"Synthetic issue {start + i}", description="Seeded for the export test",
+                location="Ward 12", category="sanitation", assigned_department=self.department,
+                latitude=12.9 + i * 1e-5, longitude=77.5, **kwargs,
+            )
+            for i in range(count)
+        ])
+
+    def _issue(self, title, created_at, **kwargs):
+        issue = Issue.objects.create(
+            user=self.citizen, title=title, category="sanitation", assigned_department=self.department, **kwargs,
+        )
+        Issue.objects.filter(pk=issue.pk).update(created_at=created_at)
+        return issue
+
+    def _export(self, query=""):
+        response = self.client.get(f"/api/department/issues/export/?output=ndjson{query}")
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        return [json.loads(line)["title"] for line in lines]
+
+    def _peak_memory(self, chunk_size):
+        """(bytes exported, peak traced allocation) for a CSV export of every issue."""
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in export_stream(Issue.objects.all(), "csv", chunk_size))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return size, peak
+
+    def test_csv(self):
+        self._seed(3)
+        response = self.client.get("/api/department/issues/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="issues-city-sanitation-', response["Content-Disposition"])
+
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["title"] for row in rows], [f"Synthetic issue {i}" for i in (2, 1, 0)])
+        self.assertEqual(rows[0]["department"], "City Sanitation")
+        self.assertEqual(rows[0]["reporter"], "citizen")
+        self.assertEqual(rows[0]["resolved_at"], "")
+
+    def test_ndjson(self):
+        self._seed(2)
+        response = self.client.get("/api/department/issues/export/?output=ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["latitude"], 12.90001)
+        self.assertIsNone(rows[0]["resolved_at"])
+
+    def test_parquet(self):
+        self._seed(5)
+        response = self.client.get("/api/department/issues/export/?output=parquet")
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.assertEqual(response.status_code, 501)
+            self.assertIn("pyarrow", response.json()["error"])
+            return
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet")
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(table.num_rows, 5)
+
+    def test_date_range(self):
+        now = timezone.now()
+        self._issue("old", now - timedelta(days=40))
+        self._issue("mid", now - timedelta(days=10))
+        self._issue("new", now)
+        after  = timezone.localdate(now - timedelta(days=20)).isoformat()
+        before = timezone.localdate(now - timedelta(days=10)).isoformat()
+
+        self.assertEqual(self._export(f"&created_after={after}"), ["new", "mid"])
+        self.assertEqual(self._export(f"&created_before={before}"), ["mid", "old"])   # whole day included
+        self.assertEqual(self._export(f"&created_after={after}&created_before={before}"), ["mid"])
+
+    def test_list_filters(self):
+        now = timezone.now()
+        original = self._issue("original", now - timedelta(hours=2))
+        self._issue("repeat", now - timedelta(hours=1), duplicate_of=original)
+        self._issue("resolved", now, status="resolved")
+
+        self.assertEqual(self._export("&status=RESOLVED"), ["resolved"])
+        self.assertEqual(self._export("&duplicates=hide"), ["resolved", "original"])
+        listed = self.client.get("/api/department/issues/?duplicates=hide&fields=title").json()["results"]
+        self.assertEqual([row["title"] for row in listed], ["resolved", "original"])
+
+    def test_bad_bound_and_format(self):
+        response = self.client.get("/api/department/issues/export/?created_after=last-tuesday")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("last-tuesday", response.json()["error"])
+        self.assertEqual(self.client.get("/api/department/issues/export/?output=xlsx").status_code, 400)
+
+    def test_peak_memory_stays_flat_as_rows_grow(self):
+        # Scaled-down version of `manage.py benchmark export` (1M rows, RSS)
+        self._seed(1000)
+        small, small_peak = self._peak_memory(chunk_size=200)
+        self._seed(7000, start=1000)
+        large, large_peak = self._peak_memory(chunk_size=200)
+
+        self.assertGreater(large, 7 * small)
+        self.assertLess(large_peak, small_peak * 1.5, f"peak {small_peak} -> {large_peak} bytes")
+
+
+# ---------------------------------------------------------------------------
+# Startup import time
+# ---------------------------------------------------------------------------
+
+IMPORTTIME_STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       210 |        210 |   _weakrefset
+import time:        95 |         95 |     encodings.aliases
+import time:       480 |        575 |   encodings
+import time:      1200 |       1985 | django
+Traceback lines and other output are ignored
+import time:        30 |         30 | core
+"""
+
+
+class ImportTimeTests(SimpleTestCase):
+    """`manage.py check_import_time` passes as shipped and fails on a slow or heavy startup."""
+
+    def test_parse_importtime(self):
+        self.assertEqual(parse_importtime(IMPORTTIME_STDERR), [
+            (1, "_weakrefset", 210, 210),
+            (2, "encodings.aliases", 95, 95),
+            (1, "encodings", 480, 575),
+            (0, "django", 1200, 1985),
+            (0, "core", 30, 30),
+        ])
+
+    def test_startup_is_within_budget(self):
+        out = io.StringIO()
+        call_command("check_import_time", "--top", "3", stdout=out)
+        self.assertIn("imports no heavy AI modules", out.getvalue())
+
+    def test_forbidden_module_imported_at_startup_fails(self):
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("check_import_time", "--forbid", "rest_framework.views", "--top", "0", stdout=out)
+        self.assertIn("'rest_framework.views' imported at startup (via ", out.getvalue())
+
+    def test_over_budget_fails(self):
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("check_import_time", "--max-ms", "1", "--top", "0", stdout=out)
+        self.assertIn("exceeds the 1 ms budget", out.getvalue())
+
+
+# ---------------------------------------------------------------------------
+# Bulk import
+# ---------------------------------------------------------------------------
+
+def ndjson_body(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n"
+
+
+def import_row(i, **kwargs):
+    return {
+        "title": f"Streetlight out {i}", "description": "Dark stretch near the bus stop",
+        "location": "MG Road", "category": "infrastructure", "latitude": 12.97, "longitude": 77.6, **kwargs,
+    }
+
+
+class BulkImportTests(APITestCase):
+    """POST /api/issues/bulk/ validates every row like the single-issue endpoint and inserts in routed chunks."""
+
+    URL = "/api/issues/bulk/"
+
+    def setUp(self):
+        self.department = Department.objects.create(
+            name="Roads", slug="roads", assigned_category="infrastructure", email="roads@example.com",
+        )
+        department_router.invalidate()
+        self.partner = User.objects.create(username="callcenter", is_staff=True)
+        self.client.force_authenticate(self.partner)
+
+    def tearDown(self):
+        department_router.invalidate()
+
+    def test_ndjson(self):
+        response = self.client.post(
+            self.URL, ndjson_body(import_row(1), "", import_row(2, severity="high")),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {
+            "received": 2, "valid": 2, "created": 2, "failed": 0, "errors": [], "errors_truncated": False,
+        })
+        issues = Issue.objects.order_by("id")
+        self.assertEqual([issue.title for issue in issues], ["Streetlight out 1", "Streetlight out 2"])
+        self.assertEqual({issue.user_id for issue in issues}, {self.partner.pk})
+        self.assertEqual({issue.assigned_department_id for issue in issues}, {self.department.pk})
+        self.assertTrue(all(issue.geohash for issue in issues))
+        self.assertEqual(IssueRollup.objects.aggregate(n=Sum("count"))["n"], 2)
+
+    def test_csv(self):
+        body = (
+            "title,description,location,category,severity,latitude,longitude\r\n"
+            "Streetlight out 1,Dark stretch near the bus stop,MG Road,infrastructure,,12.97,77.6\r\n"
+            "Streetlight out 2,Dark stretch near the bus stop,MG Road,infrastructure,high,,\r\n"
+        )
+        response = self.client.post(self.URL, body, content_type="text/csv; charset=utf-8")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 2)
+        second = Issue.objects.get(title="Streetlight out 2")
+        self.assertEqual(second.severity, "high")
+        self.assertIsNone(second.latitude)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        body = ndjson_body(
+            import_row(1), import_row(2, title="Hole"), "{not json", "[1, 2]", import_row(5),
+        )
+        response = self.client.post(self.URL, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        result = response.json()
+        self.assertEqual((result["received"], result["created"], result["failed"]), (5, 2, 3))
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 3, 4])
+        self.assertIn("title", result["errors"][0]["errors"])
+        self.assertIn("Invalid JSON", result["errors"][1]["errors"]["non_field_errors"][0])
+        self.assertEqual(Issue.objects.count(), 2)
+
+    def test_rows_are_inserted_in_routed_chunks(self):
+        lines, sizes = [ndjson_body(import_row(i)).encode() for i in range(5)], []
+        insert = Issue.objects.bulk_create_routed
+
+        def record(issues, **kwargs):
+            sizes.append(len(issues))   # the chunk list is reused, so measure it now
+            return insert(issues, **kwargs)
+
+        with mock.patch.object(Issue.objects, "bulk_create_routed", side_effect=record):
+            result = import_issues(read_rows(lines, "ndjson"), self.partner, chunk_size=2)
+
+        self.assertEqual(result["created"], 5)
+        self.assertEqual(sizes, [2, 2, 1])
+        self.assertEqual(Issue.objects.filter(assigned_department=self.department).count(), 5)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.client.post(
+            f"{self.URL}?dry_run=true", ndjson_body(import_row(1), import_row(2, title="")),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["valid"], response.json()["created"], response.json()["failed"]), (1, 0, 1))
+        self.assertFalse(Issue.objects.exists())
+
+    def test_wrong_content_type(self):
+        response = self.client.post(self.URL, [import_row(1)], format="json")
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Issue.objects.exists())
+
+    def test_malformed_or_empty_body(self):
+        response = self.client.post(self.URL, "{oops\n", content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["failed"], 1)
+        response = self.client.post(self.URL, "", content_type="text/csv")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["received"], 0)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create(username="citizen"))
+        response = self.client.post(self.URL, ndjson_body(import_row(1)), content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 403)
+
+
+# ---------------------------------------------------------------------------
+# Pagination and sparse fieldsets
+# ---------------------------------------------------------------------------
+
+class PaginationTests(APITestCase):
+    """Cursor pages are stable and bounded; ?fields= trims the output and the columns read."""
+
+    def setUp(self):
+        self.citizen = User.objects.create(username="citizen")
+        self.client.force_authenticate(self.citizen)
+
+    def _seed(self, count, created_at=None):
+        issues = Issue.objects.bulk_create([
+            Issue(user=self.citizen, title=f"Issue {i}", description="Seeded for pagination", category="sanitation")
+            for i in range(count)
+        ])
+        if created_at is not None:
+            Issue.objects.filter(pk__in=[issue.pk for issue in issues]).update(created_at=created_at)
+
+    def _pages(self, url):
+        ids = []
+        while url:
+            page = self.client.get(url).json()
+            ids.append([row["id"] for row in page["results"]])
+            url = page["next"]
+        return ids
+
+    def test_cursor_order_is_stable_across_pages(self):
+        now = timezone.now()
+        self._seed(4, created_at=now - timedelta(hours=1))
+        self._seed(5, created_at=now - timedelta(hours=2))   # created_at ties: id breaks them
+
+        first = self.client.get("/api/issues/?page_size=4").json()
+        # A report submitted between page loads does not shift the later pages
+        Issue.objects.create(
+            user=self.citizen, title="Newest issue", description="Arrives mid-scroll", category="sanitation",
+        )
+        ids = [row["id"] for row in first["results"]] + sum(self._pages(first["next"]), [])
+
+        expected = list(
+            Issue.objects.exclude(title="Newest issue").order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(page) for page in self._pages("/api/issues/?page_size=4")], [4, 4, 2])
+
+    def test_page_size_default_and_maximum(self):
+        self._seed(IssueCursorPagination.max_page_size + 10)
+        page = self.client.get("/api/issues/").json()
+        self.assertEqual(len(page["results"]), 50)
+        self.assertIsNotNone(page["next"])
+        self.assertIsNone(page["previous"])
+        self.assertEqual(len(self.client.get("/api/issues/?page_size=1000").json()["results"]), 200)
+
+    def test_fields_trims_the_output(self):
+        self._seed(2)
+        rows = self.client.get("/api/issues/?fields=title,status").json()["results"]
+        self.assertEqual([set(row) for row in rows], [{"id", "title", "status"}] * 2)
+
+        detail = self.client.get(f"/api/issues/{rows[0]['id']}/?fields=title").json()
+        self.assertEqual(set(detail), {"id", "title"})
+        self.assertIn("description", self.client.get("/api/issues/").json()["results"][0])
+
+    def test_unrequested_heavy_columns_are_deferred(self):
+        self._seed(3)
+        with self.assertNumQueries(1), CaptureQueriesContext(connection) as trimmed:
+            self.client.get("/api/issues/?fields=id,title")
+        with CaptureQueriesContext(connection) as full:
+            self.client.get("/api/issues/")
+        with CaptureQueriesContext(connection) as requested:
+            self.client.get("/api/issues/?fields=title,description")
+
+        for column in ('"core_issue"."description"', '"core_issue"."ai_analysis"', '"core_issue"."department_notes"'):
+            self.assertNotIn(column, trimmed[0]["sql"])
+            self.assertIn(column, full[0]["sql"])
+        self.assertIn('"core_issue"."description"', requested[0]["sql"])
+        self.assertNotIn('"core_issue"."ai_analysis"', requested[0]["sql"])
+
+
+# ---------------------------------------------------------------------------
+# Geohash map lookups
+# ---------------------------------------------------------------------------
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres (scalar reference implementation)."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6_371_008.8 * math.asin(math.sqrt(a))
+
+
+class GeoSearchTests(APITestCase):
+    """nearby and bbox return exactly what a brute-force scan over every issue returns."""
+
+    def setUp(self):
+        self.citizen = User.objects.create(username="citizen")
+        self.client.force_authenticate(self.citizen)
+        self.rng = random.Random(8)
+
+    def _scatter(self, latitude, longitude, spread, count):
+        Issue.objects.bulk_create_routed([
+            Issue(
+                user=self.citizen, title="t", category="sanitation",
+                latitude=round(latitude + self.rng.uniform(-spread, spread), 6),
+                longitude=round(longitude + self.rng.uniform(-spread, spread), 6),
+            )
+            for _ in range(count)
+        ])
+
+    def _point(self, latitude, longitude):
+        return Issue.objects.create(
+            user=self.citizen, title="t", category="sanitation",
+            latitude=round(latitude, 6), longitude=round(longitude, 6),
+        )
+
+    def _rows(self):
+        return [(pk, float(lat), float(lng)) for pk, lat, lng in Issue.objects.values_list("pk", "latitude", "longitude")]
+
+    def _brute_nearby(self, latitude, longitude, radius):
+        inside = [(haversine(latitude, longitude, lat, lng), pk) for pk, lat, lng in self._rows()]
+        return [pk for distance, pk in sorted(inside) if distance <= radius]
+
+    def _brute_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        def lng_inside(lng):
+            return min_lng <= lng <= max_lng if min_lng <= max_lng else lng >= min_lng or lng <= max_lng
+        return {pk for pk, lat, lng in self._rows() if min_lat <= lat <= max_lat and lng_inside(lng)}
+
+    def test_nearby_matches_brute_force(self):
+        lat, lng = 12.9716, 77.5946
+        self._scatter(lat, lng, 0.02, 400)
+        # Due north, just inside and just outside a 500 m radius
+        inside  = self._point(lat + 498 / METERS_PER_DEG, lng)
+        outside = self._point(lat + 502 / METERS_PER_DEG, lng)
+
+        response = self.client.get(f"/api/issues/nearby/?lat={lat}&lng={lng}&radius=500&limit=500")
+        self.assertEqual(response.status_code, 200)
+        ids = [row["id"] for row in response.json()]
+        self.assertEqual(ids, self._brute_nearby(lat, lng, 500))
+        self.assertIn(inside.pk, ids)
+        self.assertNotIn(outside.pk, ids)
+        distances = [row["distance_m"] for row in response.json()]
+        self.assertEqual(distances, sorted(distances))
+        self.assertLessEqual(distances[-1], 500)
+
+    def test_nearby_across_many_cells(self):
+        # The equator and the prime meridian are cell edges at every geohash precision
+        self._scatter(0.0, 0.0, 0.05, 300)
+        for radius in (100, 1500, 5000):
+            with self.subTest(radius=radius):
+                found = [pk for pk, _ in nearest_ids(Issue.objects.all(), 0.0, 0.0, radius, 1000)]
+                self.assertEqual(found, self._brute_nearby(0.0, 0.0, radius))
+
+    def test_bbox_matches_brute_force(self):
+        self._scatter(0.0, 0.0, 0.05, 300)
+        self._scatter(12.97, 77.59, 0.05, 100)
+        boxes = [
+            (-0.02, -0.03, 0.01, 0.02),        # straddles both cell-edge lines
+            (12.95, 77.57, 13.0, 77.6),
+            (-0.05, -0.05, 0.05, 0.05),
+        ]
+        for box in boxes:
+            with self.subTest(box=box):
+                self.assertGreater(len(cover_ranges(*box)), 1)
+                found = set(within_bbox(Issue.objects.all(), *box).values_list("pk", flat=True))
+                self.assertEqual(found, self._brute_bbox(*box))
+                response = self.client.get(
+                    "/api/issues/bbox/?min_lat={}&min_lng={}&max_lat={}&max_lng={}&limit=500".format(*box)
+                )
+                self.assertEqual({row["id"] for row in response.json()}, found)
+
+    def test_bbox_edges_are_inclusive(self):
+        corner = self._point(12.95, 77.57)
+        self._point(12.949999, 77.57)
+        found = set(within_bbox(Issue.objects.all(), 12.95, 77.57, 13.0, 77.6).values_list("pk", flat=True))
+        self.assertEqual(found, {corner.pk})
+
+    def test_bbox_across_the_antimeridian(self):
+        self._scatter(10.0, 179.985, 0.01, 60)
+        self._scatter(10.0, -179.985, 0.01, 60)
+        box = (9.995, 179.99, 10.005, -179.99)
+        found = set(within_bbox(Issue.objects.all(), *box).values_list("pk", flat=True))
+        self.assertEqual(found, self._brute_bbox(*box))
+        self.assertTrue(found)
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get("/api/issues/nearby/?lat=12.9").status_code, 400)
+        self.assertEqual(self.client.get("/api/issues/nearby/?lat=12.9&lng=77.5&radius=0").status_code, 400)
+        self.assertEqual(
+            self.client.get("/api/issues/bbox/?min_lat=13&min_lng=77&max_lat=12&max_lng=78").status_code, 400,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Chatbot response cache
+# ---------------------------------------------------------------------------
+
+def chat(*turns):
+    """Chat messages alternating user / assistant, starting with the user."""
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": text} for i, text in enumerate(turns)]
+
+
+TRACK_QUESTION = "How do I track the status of my report?"
+TRACK_REPLY    = "Open My Reports and pick the report to see its status."
+
+
+class ChatResponseCacheTests(SimpleTestCase):
+    """Exact and similar lookups, expiry, LRU eviction and counters of the chatbot cache."""
+
+    def test_exact_hit_ignores_case_punctuation_and_greeting(self):
+        replies = ChatResponseCache(similarity=0.99)
+        replies.put(chat(TRACK_QUESTION), TRACK_REPLY)
+
+        greeting = [{"role": "assistant", "content": "Hi! How can I help?"}]
+        self.assertEqual(replies.get(greeting + chat("how do i TRACK the status of my report")), TRACK_REPLY)
+        self.assertEqual(replies.stats()["exact_hits"], 1)
+
+    def test_similar_question_hits_above_threshold(self):
+        replies = ChatResponseCache(similarity=0.7)
+        replies.put(chat(TRACK_QUESTION), TRACK_REPLY)
+        self.assertEqual(replies.get(chat("How can I track the status of my report?")), TRACK_REPLY)
+        self.assertEqual(replies.stats()["similar_hits"], 1)
+
+    def test_similar_question_misses_below_threshold(self):
+        replies = ChatResponseCache(similarity=0.75)
+        replies.put(chat(TRACK_QUESTION), TRACK_REPLY)
+        self.assertIsNone(replies.get(chat("How can I track the status of my report?")))
+        self.assertIsNone(replies.get(chat("What does In Progress mean for a pothole report?")))
+        self.assertEqual(replies.stats()["misses"], 2)
+
+    def test_numbers_and_context_must_match(self):
+        replies = ChatResponseCache(similarity=0.5)
+        replies.put(chat("Why is report 12 still pending after 3 days?"), "Reply about #12")
+        self.assertIsNone(replies.get(chat("Why is report 13 still pending after 3 days?")))
+
+        replies.put(chat("Hi", "Hello! How can I help?", TRACK_QUESTION), "Follow-up reply")
+        self.assertIsNone(replies.get(chat(TRACK_QUESTION)))
+        self.assertEqual(replies.get(chat("Hi", "Hello! How can I help?", TRACK_QUESTION)), "Follow-up reply")
+
+    def test_long_conversations_are_not_cached(self):
+        replies = ChatResponseCache()
+        with override_settings(CHAT_CACHE_MAX_MESSAGES=3):
+            long = chat("Hi", "Hello!", "I have a question", "Sure.", TRACK_QUESTION)
+            replies.put(long, TRACK_REPLY)
+            self.assertIsNone(replies.get(long))
+        self.assertEqual(replies.stats()["entries"], 0)
+
+    def test_entries_expire(self):
+        replies = ChatResponseCache(ttl_seconds=60)
+        now = time.monotonic()
+        with mock.patch("core.chat_cache.time.monotonic", return_value=now):
+            replies.put(chat(TRACK_QUESTION), TRACK_REPLY)
+        with mock.patch("core.chat_cache.time.monotonic", return_value=now + 59):
+            self.assertEqual(replies.get(chat(TRACK_QUESTION)), TRACK_REPLY)
+        with mock.patch("core.chat_cache.time.monotonic", return_value=now + 61):
+            self.assertIsNone(replies.get(chat(TRACK_QUESTION)))
+        self.assertEqual(replies.stats()["entries"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        replies = ChatResponseCache(max_entries=2)
+        replies.put(chat("What is CivicSense?"), "a")
+        replies.put(chat("Who fixes potholes?"), "b")
+        self.assertEqual(replies.get(chat("What is CivicSense?")), "a")   # now most recently used
+        replies.put(chat("How long does a fix take?"), "c")
+
+        self.assertIsNone(replies.get(chat("Who fixes potholes?")))
+        self.assertEqual(replies.get(chat("What is CivicSense?")), "a")
+        self.assertEqual(replies.get(chat("How long does a fix take?")), "c")
+        self.assertEqual(replies.stats()["entries"], 2)
+
+    def test_counters(self):
+        replies = ChatResponseCache(similarity=0.7)
+        replies.put(chat(TRACK_QUESTION), TRACK_REPLY)
+        replies.put(chat("Who fixes potholes?"), "Roads department.")
+        replies.get(chat(TRACK_QUESTION))
+        replies.get(chat("How can I track the status of my report?"))
+        replies.get(chat("Who fixes potholes?"))
+        replies.get(chat("Can I report anonymously?"))
+
+        self.assertEqual(replies.stats(), {
+            "exact_hits": 2, "similar_hits": 1, "misses": 1, "hit_rate": 0.75, "saved_calls": 3, "entries": 2,
+        })
+        self.assertEqual(replies.top(), [("how do i track the status of my report", 2), ("who fixes potholes", 1)])
+        replies.reset_stats()
+        self.assertEqual(replies.stats()["misses"], 0)
+
+
+# ---------------------------------------------------------------------------
+# Streaming chat
+# ---------------------------------------------------------------------------
+
+def stub_astream(*texts, error=None):
+    """Stand-in for router.astream(): yields chunks with `texts`, then raises `error` if given."""
+    calls = []
+
+    async def astream(api_key, open_stream, client=None, log_prefix=""):
+        calls.append(api_key)
+        for text in texts:
+            yield SimpleNamespace(text=text)
+        if error is not None:
+            raise error
+
+    astream.calls = calls
+    return astream
+
+
+def sse_events(body):
+    """[(event, payload), ...] parsed from server-sent event text."""
+    events = []
+    for frame in body.split("\n\n"):
+        if frame:
+            event, data = frame.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@override_settings(GEMINI_API_KEY="test-key")
+class ChatStreamTests(SimpleTestCase):
+    """POST /api/chat/stream/ frames Gemini chunks as SSE, ending with `done` (and `error` on failure)."""
+
+    URL = "/api/chat/stream/"
+
+    def setUp(self):
+        cache.clear()
+        chat_cache.clear()
+
+    async def _post(self, *turns):
+        response = await self.async_client.post(
+            self.URL, {"messages": chat(*turns)}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        if response.streaming:
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        else:
+            body = response.content
+        return response, sse_events(body.decode())
+
+    async def test_chunks_are_framed_as_delta_events_then_done(self):
+        astream = stub_astream("Open My Reports ", "and pick the report.")
+        with mock.patch.object(llm_router, "astream", astream):
+            response, events = await self._post(TRACK_QUESTION)
+
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertEqual(events, [
+            ("delta", {"text": "Open My Reports "}),
+            ("delta", {"text": "and pick the report."}),
+            ("done", {"reply": "Open My Reports and pick the report."}),
+        ])
+        self.assertEqual(astream.calls, ["test-key"])
+        self.assertEqual(chat_cache.get(chat(TRACK_QUESTION)), "Open My Reports and pick the report.")
+
+    async def test_cached_reply_is_a_single_done_event(self):
+        chat_cache.put(chat(TRACK_QUESTION), TRACK_REPLY)
+        astream = stub_astream("unused")
+        with mock.patch.object(llm_router, "astream", astream):
+            _, events = await self._post(TRACK_QUESTION)
+        self.assertEqual(events, [("done", {"reply": TRACK_REPLY})])
+        self.assertEqual(astream.calls, [])
+
+    async def test_failure_part_way_is_logged_and_ends_with_error_then_done(self):
+        astream = stub_astream("Open My Reports ", error=ConnectionResetError("stream reset"))
+        with mock.patch.object(llm_router, "astream", astream), \
+                self.assertLogs("core.chat_views", "ERROR") as logs:
+            _, events = await self._post(TRACK_QUESTION)
+
+        self.assertEqual(events, [
+            ("delta", {"text": "Open My Reports "}),
+            ("error", {"error": ERROR_REPLY}),
+            ("done", {"reply": "Open My Reports "}),
+        ])
+        self.assertIn("stream reset", logs.output[0])
+        self.assertIsNone(chat_cache.get(chat(TRACK_QUESTION)))   # partial replies are not cached
+
+    async def test_failure_before_output_replies_with_the_error(self):
+        astream = stub_astream(error=RuntimeError("no connection"))
+        with mock.patch.object(llm_router, "astream", astream), self.assertLogs("core.chat_views", "ERROR"):
+            _, events = await self._post(TRACK_QUESTION)
+        self.assertEqual(events, [("error", {"error": ERROR_REPLY}), ("done", {"reply": ERROR_REPLY})])
+
+    async def test_empty_conversation(self):
+        _, events = await self._post()
+        self.assertEqual(events, [("done", {"reply": EMPTY_REPLY})])
+
+
+# ---------------------------------------------------------------------------
+# Gemini Vision result cache
+# ---------------------------------------------------------------------------
+
+class StubVisionModels:
+    """Stand-in for genai.Client().models answering every photo with a fixed analysis."""
+
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.calls = 0
+
+    def generate_content(self, model, contents, config):
+        self.calls += 1
+        if self.reply is not None:
+            return SimpleNamespace(text=self.reply)
+        images = sum(1 for part in contents[0].parts if part.inline_data is not None)
+        results = [
+            {"index": i + 1, **AI_RESULT, "detected_category": "Road Damage"} for i in range(images)
+        ]
+        return SimpleNamespace(text=json.dumps(results if config.response_schema else results[0]))
+
+
+@override_settings(GEMINI_API_KEY="")
+class VisionCacheTests(TestCase):
+    """A photo analysed once with the same prompt version and report text is never sent to Gemini again."""
+
+    REPORT = ("Pothole on 5th Main", "Large pothole near the bus stop", "infrastructure")
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp(prefix="civicsense-test-vision-")
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.photos = []
+        for seed in (1, 2):
+            path = f"{tmp}/{seed}.jpg"
+            with open(path, "wb") as fh:
+                fh.write(photo_bytes(seed))
+            self.photos.append(path)
+        self.models = StubVisionModels()
+        self.client = SimpleNamespace(models=self.models)
+        self.cache  = AnalysisCache()
+
+    def _analyze(self, report=REPORT, photo=0, cache=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return analyze_issue_image(self.photos[photo], *report, client=self.client, cache=cache or self.cache)
+
+    def test_second_call_makes_no_client_call(self):
+        first = self._analyze()
+        self.assertEqual(first["detected_category"], "Road Damage")
+        self.assertEqual(self._analyze(), first)
+        # Re-typed report: case and spacing are normalised
+        retyped = ("  POTHOLE on 5th main", "large   pothole near the bus stop", "Infrastructure")
+        self.assertEqual(self._analyze(retyped), first)
+        self.assertEqual(self.models.calls, 1)
+        self.assertEqual(self.cache.stats()["memory_hits"], 2)
+
+    def test_other_process_hits_the_database_tier(self):
+        self._analyze()
+        other = AnalysisCache()
+        self.assertEqual(self._analyze(cache=other)["detected_category"], "Road Damage")
+        self.assertEqual(self.models.calls, 1)
+        self.assertEqual(other.stats()["db_hits"], 1)
+        self.assertEqual(CachedVisionAnalysis.objects.get().hits, 1)
+
+    def test_changed_report_text_or_photo_misses(self):
+        self._analyze()
+        self._analyze(("Pothole on 5th Main", "It has grown much deeper since last week", "infrastructure"))
+        self._analyze(photo=1)
+        self.assertEqual(self.models.calls, 3)
+
+    def test_changed_prompt_version_misses(self):
+        self._analyze()
+        edited = prompt_version("an edited prompt")
+        self.assertNotEqual(edited, VISION_PROMPT_VERSION)
+        with mock.patch("core.ai_analysis.VISION_PROMPT_VERSION", edited):
+            self._analyze()
+            self._analyze()
+        self.assertEqual(self.models.calls, 2)
+        self.assertEqual(
+            set(CachedVisionAnalysis.objects.values_list("prompt_version", flat=True)),
+            {VISION_PROMPT_VERSION, edited},
+        )
+
+    def test_failed_analysis_is_not_cached(self):
+        self.models.reply = "not json"
+        with self.assertLogs("core.ai_analysis", "WARNING"):
+            self.assertIsNone(self._analyze())
+        self.models.reply = None
+        self.assertIsNotNone(self._analyze())
+        self.assertEqual(self.models.calls, 2)
+
+    def test_batch_requests_skip_cached_photos(self):
+        title, description, category = self.REPORT
+        items = [
+            {"image_path": path, "title": title, "description": description, "category": category}
+            for path in self.photos
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = analyze_issue_images_batch(items, client=self.client, cache=self.cache)
+            again = analyze_issue_images_batch(items, client=self.client, cache=self.cache)
+        self.assertEqual(again, first)
+        self.assertEqual(self.models.calls, 1)
+
+
+# ---------------------------------------------------------------------------
+# Photo storage and derivatives
+# ---------------------------------------------------------------------------
+
+@override_settings(
+    IMAGE_DERIVATIVE_FORMATS=["webp", "jpeg"],
+    IMAGE_RENDITIONS={"thumb": 320, "medium": 1024},
+)
+class PhotoDerivativeTests(TempMediaMixin, TestCase):
+    """Originals and renditions are content-addressed, recorded on the issue and exposed as srcsets."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="citizen")
+
+    def _issue(self, photo):
+        return Issue.objects.create(
+            user=self.user, title="t", category="sanitation",
+            photos=SimpleUploadedFile("IMG_0001.JPG", photo, content_type="image/jpeg"),
+        )
+
+    def _serialized(self, issue):
+        return IssueSerializer(issue, context={"request": Request(RequestFactory().get("/"))}).data
+
+    def test_identical_photos_share_one_file(self):
+        photo  = photo_bytes(1)
+        digest = hashlib.sha256(photo).hexdigest()
+        first, second = self._issue(photo), self._issue(photo)
+        other = self._issue(photo_bytes(2))
+
+        self.assertEqual(first.photos.name, f"issue_photos/{digest[:2]}/{digest}.jpg")
+        self.assertEqual(second.photos.name, first.photos.name)
+        self.assertNotEqual(other.photos.name, first.photos.name)
+        self.assertEqual(len(list(Path(self._media_root, "issue_photos").rglob("*.jpg"))), 2)
+
+    def test_renditions_are_written_and_recorded(self):
+        photo  = photo_bytes(1, size=(1600, 1200))
+        digest = hashlib.sha256(photo).hexdigest()
+        issue  = self._issue(photo)
+
+        self.assertEqual(store_derivatives(issue), 4)
+        issue.refresh_from_db()
+        self.assertEqual(issue.photo_sha256, digest)
+        self.assertEqual(issue.photo_renditions, {
+            "thumb":  {"width": 320,  "height": 240, "webp": derivative_name(digest, "thumb", "webp"),
+                       "jpeg": derivative_name(digest, "thumb", "jpeg")},
+            "medium": {"width": 1024, "height": 768, "webp": derivative_name(digest, "medium", "webp"),
+                       "jpeg": derivative_name(digest, "medium", "jpeg")},
+        })
+        for info in issue.photo_renditions.values():
+            for fmt, pil_format in [("webp", "WEBP"), ("jpeg", "JPEG")]:
+                with Image.open(Path(self._media_root, info[fmt])) as img:
+                    self.assertEqual((img.format, img.size), (pil_format, (info["width"], info["height"])))
+
+        # The same photo on another issue reuses every file
+        again = self._issue(photo)
+        self.assertEqual(store_derivatives(again), 0)
+        again.refresh_from_db()
+        self.assertEqual(again.photo_renditions, issue.photo_renditions)
+
+    def test_small_and_rotated_originals(self):
+        small = self._issue(photo_bytes(1, size=(200, 150)))
+        store_derivatives(small)
+        self.assertEqual(list(small.photo_renditions), ["thumb"])   # never upscaled, so no medium
+        thumb = small.photo_renditions["thumb"]
+        self.assertEqual((thumb["width"], thumb["height"]), (200, 150))
+
+        # EXIF orientation 6 (rotated 90°): renditions are portrait
+        buffer, exif = io.BytesIO(), Image.Exif()
+        exif[0x0112] = 6
+        Image.new("RGB", (800, 600), (200, 30, 30)).save(buffer, "JPEG", exif=exif)
+        rotated = self._issue(buffer.getvalue())
+        store_derivatives(rotated)
+        self.assertEqual(rotated.photo_renditions["thumb"]["width"], 240)
+        self.assertEqual(rotated.photo_renditions["thumb"]["height"], 320)
+
+    def test_serializer_srcset_and_thumb_url(self):
+        issue = self._issue(photo_bytes(1, size=(1600, 1200)))
+        data  = self._serialized(issue)
+        self.assertIsNone(data["photos_srcset"])
+        self.assertEqual(data["photos_thumb_url"], data["photos_url"])   # original until generated
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_photo_derivatives(issue)
+        self.assertEqual(run_pending_jobs(), 1)
+        issue.refresh_from_db()
+
+        digest = issue.photo_sha256
+        media  = "http://testserver/media/"
+        data   = self._serialized(issue)
+        self.assertEqual(data["photos_srcset"], {
+            "image/webp": f"{media}{derivative_name(digest, 'thumb', 'webp')} 320w, "
+                          f"{media}{derivative_name(digest, 'medium', 'webp')} 1024w",
+            "image/jpeg": f"{media}{derivative_name(digest, 'thumb', 'jpeg')} 320w, "
+                          f"{media}{derivative_name(digest, 'medium', 'jpeg')} 1024w",
+        })
+        self.assertEqual(data["photos_thumb_url"], f"{media}{derivative_name(digest, 'thumb', 'webp')}")
+
+
+# ---------------------------------------------------------------------------
+# Gemini Vision backfill (analyze_existing_issues)
+# ---------------------------------------------------------------------------
+
+class TokenBucketTests(SimpleTestCase):
+    """The backfill's requests-per-minute budget, on a fake clock."""
+
+    def setUp(self):
+        self.now   = 1000.0
+        self.slept = []
+        clock = mock.patch("core.management.commands.analyze_existing_issues.time")
+        fake  = clock.start()
+        self.addCleanup(clock.stop)
+        fake.monotonic.side_effect = lambda: self.now
+        fake.sleep.side_effect     = self._sleep
+
+    def _sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def test_bursts_to_capacity_then_paces_at_the_rate(self):
+        bucket = TokenBucket(rate_per_minute=30, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.slept, [])
+
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.slept, [2.0, 2.0])
+
+    def test_idle_time_refills_up_to_capacity_only(self):
+        bucket = TokenBucket(rate_per_minute=60, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.now += 3600
+        for _ in range(2):
+            bucket.acquire()
+        self.assertEqual(self.slept, [])
+        bucket.acquire()
+        self.assertEqual(self.slept, [1.0])
+
+
+class AnalyzeExistingIssuesTests(TempMediaMixin, TestCase):
+    """The backfill command with Gemini stubbed at analyze_issue_image(s_batch)."""
+
+    def setUp(self):
+        self.user   = User.objects.create(username="citizen")
+        self.issues = [
+            Issue.objects.create(
+                user=self.user, title=f"Report {i}", category="sanitation", photos=photo_upload(i),
+            )
+            for i in range(7)
+        ]
+        Issue.objects.create(user=self.user, title="No photo", category="sanitation")
+        Issue.objects.create(
+            user=self.user, title="Analysed", category="sanitation",
+            photos=photo_upload(99), ai_detected_category="Road",
+        )
+        self.checkpoint = Path(self._media_root, "backfill.json")
+        self.addCleanup(self.checkpoint.unlink, missing_ok=True)
+        self.batches = []
+        self.batch_lock = threading.Lock()
+
+    def _batch_stub(self, items):
+        with self.batch_lock:
+            self.batches.append([item["title"] for item in items])
+        return [dict(AI_RESULT) for _ in items]
+
+    def _single_stub(self, **item):
+        return self._batch_stub([item])[0]
+
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command("analyze_existing_issues", *args, "--rpm", "60000", stdout=out)
+        return out.getvalue()
+
+    def _with_stubs(self, *args, batch=None, single=None):
+        module = "core.management.commands.analyze_existing_issues"
+        with mock.patch(f"{module}.analyze_issue_images_batch", side_effect=batch or self._batch_stub), \
+                mock.patch(f"{module}.analyze_issue_image", side_effect=single or self._single_stub):
+            return self._run(*args)
+
+    def test_batches_are_sent_and_applied(self):
+        out = self._with_stubs("--batch-size", "3")
+
+        self.assertEqual(self.batches, [
+            ["Report 0", "Report 1", "Report 2"], ["Report 3", "Report 4", "Report 5"], ["Report 6"],
+        ])
+        self.assertIn("Found 7 issues with unanalyzed photos", out)
+        self.assertIn("Analyzed 7/7 issues", out)
+        for issue in Issue.objects.filter(pk__in=[issue.pk for issue in self.issues]):
+            self.assertEqual(
+                (issue.ai_status, issue.ai_detected_category, issue.ai_confidence), ("done", "Garbage", 88),
+            )
+        self.assertEqual(Issue.objects.get(title="Analysed").ai_detected_category, "Road")
+
+    def test_concurrent_requests(self):
+        # The first two requests must be in flight together for the barrier to release
+        barrier = threading.Barrier(2, timeout=5)
+
+        def batch(items):
+            if items[0]["title"] in ("Report 0", "Report 2"):
+                barrier.wait()
+            return self._batch_stub(items)
+
+        out = self._with_stubs("--batch-size", "2", "--concurrency", "2", batch=batch)
+        self.assertNotIn("Error", out)
+        self.assertEqual(sorted(len(titles) for titles in self.batches), [1, 2, 2, 2])
+        self.assertEqual(Issue.objects.filter(ai_status="done").count(), 7)
+
+    def test_missing_and_failed_results_are_skipped(self):
+        def batch(items):
+            if items[0]["title"] == "Report 3":
+                raise RuntimeError("quota exceeded")
+            return [None] + [dict(AI_RESULT) for _ in items[1:]]
+
+        out = self._with_stubs("--batch-size", "3", batch=batch, single=lambda **item: None)
+        self.assertIn("Issues #%d-#%d -> Error: quota exceeded" % (self.issues[3].id, self.issues[5].id), out)
+        self.assertIn("Issue #%d: no result returned, skipping." % self.issues[0].id, out)
+        done = set(Issue.objects.filter(ai_status="done").values_list("title", flat=True))
+        self.assertEqual(done, {"Report 1", "Report 2"})
+
+    def test_checkpoint_advances_past_contiguous_batches_only(self):
+        second_saved = threading.Event()
+        events       = []
+        save         = AnalyzeExistingIssues._save
+        write        = AnalyzeExistingIssues._write_checkpoint
+
+        def batch(items):
+            if items[0]["title"] == "Report 0":
+                self.assertTrue(second_saved.wait(5))   # batch 0 finishes after batch 1
+            return self._batch_stub(items)
+
+        def record_save(command, batch_issues, future):
+            saved = save(command, batch_issues, future)
+            events.append(("save", batch_issues[-1].id))
+            if batch_issues[0] == self.issues[2]:
+                second_saved.set()
+            return saved
+
+        def record_write(path, last_id):
+            events.append(("checkpoint", last_id))
+            write(path, last_id)
+
+        with mock.patch.object(AnalyzeExistingIssues, "_save", record_save), \
+                mock.patch.object(AnalyzeExistingIssues, "_write_checkpoint", staticmethod(record_write)):
+            self._with_stubs("--batch-size", "2", "--concurrency", "2", "--checkpoint", str(self.checkpoint),
+                             batch=batch)
+
+        ids         = [issue.id for issue in self.issues]
+        first_write = events.index(("checkpoint", ids[1]))
+        self.assertLess(events.index(("save", ids[3])), events.index(("save", ids[1])))
+        self.assertLess(events.index(("save", ids[1])), first_write)   # nothing written while batch 0 ran
+        written = [last_id for kind, last_id in events if kind == "checkpoint"]
+        self.assertEqual(written, [ids[1], ids[3], ids[5], ids[6]])
+        self.assertEqual(json.loads(self.checkpoint.read_text()), {"last_id": ids[6]})
+
+    def test_resume_from_checkpoint(self):
+        self.checkpoint.write_text(json.dumps({"last_id": self.issues[3].id}))
+        out = self._with_stubs("--batch-size", "8", "--checkpoint", str(self.checkpoint))
+
+        self.assertIn(f"Found 3 issues with unanalyzed photos after #{self.issues[3].id}", out)
+        self.assertEqual(self.batches, [["Report 4", "Report 5", "Report 6"]])
+        self.assertEqual(json.loads(self.checkpoint.read_text()), {"last_id": self.issues[6].id})
+
+        # Issues before the checkpoint are not revisited, even though they are still unanalysed
+        self.batches.clear()
+        out = self._with_stubs("--checkpoint", str(self.checkpoint))
+        self.assertIn("Found 0 issues", out)
+        self.assertEqual(self.batches, [])
+
+    def test_corrupt_checkpoint_starts_over(self):
+        self.checkpoint.write_text("{not json")
+        self.assertIn("Found 7 issues with unanalyzed photos (", self._with_stubs("--checkpoint", str(self.checkpoint)))
+
+
+# ---------------------------------------------------------------------------
+# Hotspots
+# ---------------------------------------------------------------------------
+
+def scatter(rng, lat, lng, n, spread_m):
+    """`n` points normally scattered `spread_m` around (lat, lng)."""
+    north, east = rng.normal(0, spread_m, (2, n))
+    return lat + north / METERS_PER_DEG, lng + east / (METERS_PER_DEG * math.cos(math.radians(lat)))
+
+
+class FindHotspotsTests(SimpleTestCase):
+    """find_hotspots() on synthetic clusters with known centroids and categories."""
+
+    CITY = (12.9716, 77.5946)
+
+    def setUp(self):
+        import numpy as np
+
+        self.np  = np
+        self.rng = np.random.default_rng(7)
+
+    def _clusters(self):
+        np, (lat0, lng0) = self.np, self.CITY
+        a_lat, a_lng = scatter(self.rng, lat0, lng0, 40, 40)
+        b_lat, b_lng = scatter(self.rng, lat0 + 0.03, lng0 + 0.03, 25, 40)   # ~4.6 km away
+        # Isolated reports, each kilometres from everything else
+        n_lat = lat0 + np.array([-0.05, -0.05, 0.08, 0.08])
+        n_lng = lng0 + np.array([-0.05, 0.08, -0.05, 0.08])
+        lat = np.concatenate([a_lat, b_lat, n_lat])
+        lng = np.concatenate([a_lng, b_lng, n_lng])
+        categories = ["pothole"] * 30 + ["garbage"] * 10 + ["water"] * 25 + ["pothole"] * 4
+        return lat, lng, categories
+
+    def test_separated_clusters(self):
+        lat, lng, categories = self._clusters()
+        first, second = find_hotspots(lat, lng, categories, radius_m=300, min_issues=5)
+
+        self.assertEqual(first["issue_count"], 40)
+        self.assertEqual(first["category_counts"], {"pothole": 30, "garbage": 10})
+        self.assertEqual(first["categories"], ["pothole", "garbage"])
+        self.assertEqual(second["issue_count"], 25)
+        self.assertEqual(second["category_counts"], {"water": 25})
+
+        for hotspot, members in ((first, slice(0, 40)), (second, slice(40, 65))):
+            centroid = hotspot["location"]
+            self.assertLess(haversine(centroid["lat"], centroid["lng"], lat[members].mean(), lng[members].mean()), 0.2)
+            farthest = max(
+                haversine(centroid["lat"], centroid["lng"], a, b) for a, b in zip(lat[members], lng[members])
+            )
+            self.assertGreaterEqual(hotspot["radius_m"], farthest)
+
+    def test_points_below_min_issues_are_noise(self):
+        np, (lat0, lng0) = self.np, self.CITY
+        pair_lat, pair_lng = scatter(self.rng, lat0, lng0, 2, 20)
+        self.assertEqual(find_hotspots(pair_lat, pair_lng, radius_m=200, min_issues=3), [])
+        self.assertEqual(find_hotspots(pair_lat, pair_lng, radius_m=200, min_issues=2)[0]["issue_count"], 2)
+
+        # A dense cluster plus a pair 2 km off: the pair is noise, not a second hotspot
+        lat, lng = scatter(self.rng, lat0, lng0, 10, 30)
+        lat = np.concatenate([lat, pair_lat + 0.018])
+        lng = np.concatenate([lng, pair_lng])
+        hotspots = find_hotspots(lat, lng, ["road"] * 10 + ["light"] * 2, radius_m=200, min_issues=3)
+        self.assertEqual(len(hotspots), 1)
+        self.assertEqual(hotspots[0]["category_counts"], {"road": 10})
+
+    def test_border_points_join_their_cluster(self):
+        np, (lat0, lng0) = self.np, self.CITY
+        lat, lng = scatter(self.rng, lat0, lng0, 20, 10)
+        near_lat = lat0 + 150 / METERS_PER_DEG     # within the radius of the core: a border point
+        far_lat  = lat0 + 2000 / METERS_PER_DEG    # nowhere near: noise
+        hotspots = find_hotspots(
+            np.append(lat, [near_lat, far_lat]), np.append(lng, [lng0, lng0]), radius_m=300, min_issues=5,
+        )
+        self.assertEqual([hotspot["issue_count"] for hotspot in hotspots], [21])
+
+    def test_weights_count_like_repeated_points(self):
+        np, (lat0, lng0) = self.np, self.CITY
+        lat, lng = scatter(self.rng, lat0, lng0, 4, 20)
+        repeated = find_hotspots(np.repeat(lat, 3), np.repeat(lng, 3), ["road"] * 12, radius_m=200, min_issues=10)
+        weighted = find_hotspots(lat, lng, ["road"] * 4, weights=[3] * 4, radius_m=200, min_issues=10)
+        self.assertEqual(weighted, repeated)
+        self.assertEqual(weighted[0]["category_counts"], {"road": 12})
+
+    def test_limit_invalid_points_and_empty_input(self):
+        lat, lng, categories = self._clusters()
+        self.assertEqual(
+            [h["issue_count"] for h in find_hotspots(lat, lng, radius_m=300, min_issues=5, limit=1)], [40],
+        )
+        lat, lng = self.np.append(lat, [float("nan")]), self.np.append(lng, [0.0])
+        self.assertEqual(len(find_hotspots(lat, lng, categories + ["x"], radius_m=300, min_issues=5)), 2)
+        self.assertEqual(find_hotspots([], []), [])
+
+
+class HotspotEndpointTests(APITestCase):
+    """GET /api/issues/hotspots/ clusters the recent geotagged issues read by load_points()."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="citizen")
+        lat0, lng0 = FindHotspotsTests.CITY
+        for i in range(4):
+            Issue.objects.create(
+                user=user, title=f"Pothole {i}", category="road",
+                latitude=f"{lat0 + i * 0.0002:.6f}", longitude=f"{lng0:.6f}",
+            )
+        Issue.objects.create(user=user, title="No location", category="road")
+        old = Issue.objects.create(
+            user=user, title="Old", category="garbage", latitude=f"{lat0:.6f}", longitude=f"{lng0:.6f}",
+        )
+        Issue.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_load_points(self):
+        lat, lng, categories = load_points(Issue.objects.all())
+        self.assertEqual(len(lat), 5)
+        self.assertEqual(lat.dtype.kind, "f")
+        self.assertEqual(sorted(categories), ["garbage"] + ["road"] * 4)
+
+    def test_recent_issues_are_clustered(self):
+        response = self.client.get("/api/issues/hotspots/", {"days": 7, "radius_m": 200, "min_issues": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["issue_count"], 4)
+        self.assertEqual(response.data[0]["category_counts"], {"road": 4})
+
+        response = self.client.get("/api/issues/hotspots/", {"days": 60, "radius_m": 200, "min_issues": 3})
+        self.assertEqual(response.data[0]["category_counts"], {"road": 4, "garbage": 1})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get("/api/issues/hotspots/", {"radius_m": 5}).status_code, 400)
+        self.assertEqual(self.client.get("/api/issues/hotspots/", {"days": "week"}).status_code, 400)
@@ -0,0 +1,161 @@
+"""
+Upload limits and zero-copy access to uploaded files.
+
+LimitedUploadHandler runs first in FILE_UPLOAD_HANDLERS. While Django
+streams a multipart body it:
+  - rejects a request whose Content-Length cannot fit one
+    MAX_UPLOAD_BYTES file plus the form fields, before reading any of it
+  - counts the bytes of every file and stops at MAX_UPLOAD_BYTES
+  - identifies images from their first chunks (headers only, nothing is
+    decoded) and stops one with more than MAX_UPLOAD_PIXELS pixels
+and passes every chunk on unchanged to the memory / temporary-file
+handlers behind it. Either limit raises UploadTooLarge, which DRF views
+render as 413 and plain Django views as 400.
+
+open_upload() then exposes an upload's bytes without copying them: the
+in-memory handler's BytesIO buffer, or the temporary file memory-mapped.
+
+Module: core
+Author: Ankitha
+"""
+
+# Standard library
+import io
+import mmap
+import os
+import warnings
+from contextlib import contextmanager
+
+# Third-party
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+DEFAULT_MAX_UPLOAD_BYTES  = 15 * 2**20
+DEFAULT_MAX_UPLOAD_PIXELS = 50_000_000
+
+# Bytes of a file kept for identifying it; enough for JPEG/PNG/WebP headers
+# behind a full EXIF block. Files not identified by then are left to the
+# decoder (and Pillow's own MAX_IMAGE_PIXELS).
+HEADER_PROBE_BYTES = 256 * 2**10
+
+
+def max_upload_bytes():
+    return getattr(settings, "MAX_UPLOAD_BYTES", DEFAULT_MAX_UPLOAD_BYTES)
+
+
+def max_upload_pixels():
+    return getattr(settings, "MAX_UPLOAD_PIXELS", DEFAULT_MAX_UPLOAD_PIXELS)
+
+
+class UploadTooLarge(RequestDataTooBig, APIException):
+    """An uploaded file is over MAX_UPLOAD_BYTES or MAX_UPLOAD_PIXELS."""
+
+    status_code    = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Uploaded file is too large."
+    default_code   = "upload_too_large"
+
+
+def image_size(header):
+    """
+    (width, height) of the image whose first bytes are `header`, or None if
+    they are not (yet) enough to identify one. Only headers are parsed;
+    Pillow's DecompressionBombError is let through.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        try:
+            with Image.open(io.BytesIO(header)) as img:
+                return img.size
+        except Image.DecompressionBombError:
+            raise
+        except Exception:
+            return None
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Enforce the upload byte and pixel limits while the body streams in."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes  = max_upload_bytes()
+        self.max_pixels = max_upload_pixels()
+        self.header     = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        form_limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if form_limit is not None and content_length > self.max_bytes + form_limit:
+            raise UploadTooLarge(f"Request body is larger than {self.max_bytes} bytes plus form fields.")
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = bytearray()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            raise UploadTooLarge(f"{self.file_name} is larger than {self.max_bytes} bytes.")
+        if self.header is not None:
+            self._probe(raw_data)
+        return raw_data
+
+    def _probe(self, raw_data):
+        self.header += raw_data[:HEADER_PROBE_BYTES - len(self.header)]
+        try:
+            size = image_size(self.header)
+        except Image.DecompressionBombError:
+            size = (self.max_pixels + 1, 1)
+        if size is not None and size[0] * size[1] > self.max_pixels:
+            raise UploadTooLarge(f"{self.file_name} has more than {self.max_pixels} pixels.")
+        if size is not None or len(self.header) >= HEADER_PROBE_BYTES:
+            self.header = None   # identified, or not an image we can size early
+
+    def file_complete(self, file_size):
+        self.header = None
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Zero-copy access
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def open_upload(uploaded):
+    """
+    Yield (view, file) over the bytes of an uploaded (or any Django) file.
+
+    `view` is a read-only memoryview for hashing or sending; `file` a
+    seekable binary file at offset 0 for decoders. In-memory uploads share
+    the handler's BytesIO buffer and temporary-file uploads are
+    memory-mapped, so neither is copied; other files are read once. Both
+    are only valid inside the block.
+    """
+    inner = getattr(uploaded, "file", None)
+    if hasattr(uploaded, "temporary_file_path"):
+        with open(uploaded.temporary_file_path(), "rb") as fh:
+            if not os.fstat(fh.fileno()).st_size:   # mmap cannot map an empty file
+                yield memoryview(b""), io.BytesIO()
+                return
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view, mapped
+        finally:
+            view.release()
+            mapped.close()
+    elif isinstance(inner, io.BytesIO):
+        inner.seek(0)
+        buffer = inner.getbuffer()
+        view   = buffer.toreadonly()
+        try:
+            yield view, inner
+        finally:
+            view.release()
+            buffer.release()
+    else:
+        uploaded.seek(0)
+        data = uploaded.read()
+        yield memoryview(data), io.BytesIO(data)
@@ -9,8 +9,9 @@ Key design decisions:
     is also valid as a Bearer token against DRF's JWTAuthentication.
   - Department officers use a separate login endpoint that verifies the
     presence of a DepartmentProfile on the user account.
-  - AI analysis (Gemini Vision) runs synchronously after issue save,
-    wrapped in try/except so a vision API failure never blocks submission.
+  - AI analysis (Gemini Vision) is queued as a background job once the
+    issue row commits, so submission returns 201 without waiting on the
+    vision API. Progress is reported through Issue.ai_status.
 
 Module: core
 Author: Ankitha
@@ -21,20 +22,32 @@ Author: Ankitha
 
 # Third-party — Django / DRF
 from rest_framework import viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny, BasePermission
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, BasePermission
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
 
 # Local
 from .models import Issue, Department
-from .serializers import IssueSerializer, DepartmentIssueSerializer, StatusUpdateSerializer
-from core.ai_analysis import analyze_issue_image as _gemini_analyze
-
+from .export import FORMATS as EXPORT_FORMATS, export_stream, filter_issues
+from .geo import nearest_ids, within_bbox
+from .ingest import CONTENT_TYPES, DEFAULT_CHUNK_SIZE, import_issues, read_rows
+from .pagination import IssueCursorPagination, defer_unrequested
+from .stats import get_department_stats
+from .serializers import IssueSerializer, IssueMapSerializer, DepartmentIssueSerializer, StatusUpdateSerializer
+from .tasks import enqueue_issue_analysis, enqueue_photo_derivatives
+from .ratelimit import IssueCreateThrottle, LoginThrottle, RegisterThrottle
+
+# Map lookups (nearby / bbox)
+MAP_DEFAULT_LIMIT = 100
+MAP_MAX_LIMIT     = 500
+MAP_MAX_RADIUS    = 50_000   # metres
 
 # ---------------------------------------------------------------------------
 # Custom permissions
@@ -62,6 +75,7 @@ class IsDepartmentOfficer(BasePermission):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterThrottle])
 def register_user(request):
     """
     Register a new citizen account.
@@ -105,6 +119,7 @@ def register_user(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LoginThrottle])
 def login_user(request):
     """
     Authenticate a citizen and return a JWT access/refresh pair.
@@ -224,24 +239,41 @@ class IssueViewSet(viewsets.ModelViewSet):
     CRUD ViewSet for citizen issue reports.
 
     Endpoints (all require citizen authentication):
-      GET    /api/issues/          — list the current user's issues (filterable)
+      GET    /api/issues/          — list the current user's issues (filterable,
+                                     cursor-paginated, optional ?fields=)
       POST   /api/issues/          — create a new issue
       GET    /api/issues/{id}/     — retrieve a single issue
       PATCH  /api/issues/{id}/     — update an issue
       DELETE /api/issues/{id}/     — delete an issue
       GET    /api/issues/weekly_report/ — anonymous; returns city-wide stats
-
-    After a successful create, Gemini Vision analysis runs on the uploaded
-    photo (if present). Analysis failure never blocks the response.
+      GET    /api/issues/hotspots/ — anonymous; clustered issue hotspots
+             (?days=7&radius_m=500&min_issues=3&limit=5)
+      GET    /api/issues/nearby/ — city-wide issues within ?radius (metres,
+             default 1000) of ?lat=&lng=, nearest first
+      GET    /api/issues/bbox/ — city-wide issues inside
+             ?min_lat=&min_lng=&max_lat=&max_lng=, newest first
+      POST   /api/issues/bulk/ — staff only; NDJSON or CSV body imported
+             in chunks (see core.ingest), ?dry_run=1 validates only
+
+    After a successful create, Gemini Vision analysis of the uploaded photo
+    (if present) is queued as a background job; the response returns
+    immediately with ai_status='queued'.
     """
 
     serializer_class = IssueSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = IssueCursorPagination
 
     def get_queryset(self):
         """Return issues belonging to the current user, with optional filters."""
-        qs = Issue.objects.filter(user=self.request.user).order_by("-created_at")
+        qs = (
+            Issue.objects.filter(user=self.request.user)
+            .select_related("user")
+            .annotate(dept_name=F("assigned_department__name"))
+            .order_by("-created_at", "-id")
+        )
+        qs = defer_unrequested(qs, self.request)
 
         category     = self.request.query_params.get("category")
         status_param = self.request.query_params.get("status")
@@ -250,14 +282,20 @@ class IssueViewSet(viewsets.ModelViewSet):
         if category:
             qs = qs.filter(category__iexact=category)
         if status_param:
-            qs = qs.filter(status__iexact=status_param)
+            qs = qs.filter(status=status_param.lower())  # exact match keeps the status index usable
         if severity:
             qs = qs.filter(severity__iexact=severity)
 
         return qs
 
+    def get_throttles(self):
+        """Rate-limit issue creation; reads are not throttled."""
+        if self.action == "create":
+            return [IssueCreateThrottle()]
+        return super().get_throttles()
+
     def create(self, request, *args, **kwargs):
-        """Save a new issue and trigger asynchronous AI vision analysis."""
+        """Save a new issue and queue background AI vision analysis."""
         serializer = self.get_serializer(data=request.data, context={"request": request})
         if not serializer.is_valid():
             first_error = next(iter(serializer.errors.values()))
@@ -265,7 +303,8 @@ class IssueViewSet(viewsets.ModelViewSet):
             return Response({"error": msg}, status=400)
 
         issue = serializer.save(user=request.user)
-        _run_ai_on_issue(issue)
+        enqueue_issue_analysis(issue)
+        enqueue_photo_derivatives(issue)
 
         return Response(serializer.data, status=201)
 
@@ -286,6 +325,92 @@ class IssueViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+    @action(detail=False, methods=["get"], permission_classes=[AllowAny])
+    def hotspots(self, request):
+        """Return density-clustered issue hotspots (public endpoint)."""
+        params = request.query_params
+        try:
+            days       = min(max(int(params.get("days", 7)), 1), 90)
+            radius_m   = float(params["radius_m"]) if params.get("radius_m") else None
+            min_issues = max(int(params.get("min_issues", 0)), 0) or None
+            limit      = min(max(int(params.get("limit", 5)), 1), 50)
+        except ValueError:
+            return Response({"error": "days, radius_m, min_issues and limit must be numbers."}, status=400)
+        if radius_m is not None and not 10 <= radius_m <= 5000:
+            return Response({"error": "radius_m must be between 10 and 5000."}, status=400)
+
+        from civicsense_backend.ai_module.report_generator import CityHealthReportGenerator
+        generator = CityHealthReportGenerator(Issue)
+        return Response(generator.get_hotspots(days, radius_m, min_issues, limit))
+
+    def _map_limit(self, request):
+        return min(max(int(request.query_params.get("limit", MAP_DEFAULT_LIMIT)), 1), MAP_MAX_LIMIT)
+
+    @action(detail=False, methods=["get"])
+    def nearby(self, request):
+        """Return issues within a radius of a point, nearest first (map summaries)."""
+        params = request.query_params
+        try:
+            lat    = float(params["lat"])
+            lng    = float(params["lng"])
+            radius = float(params.get("radius", 1000))
+            limit  = self._map_limit(request)
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required; lat, lng, radius and limit must be numbers."}, status=400)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"error": "lat/lng out of range."}, status=400)
+        if not 1 <= radius <= MAP_MAX_RADIUS:
+            return Response({"error": f"radius must be between 1 and {MAP_MAX_RADIUS} metres."}, status=400)
+
+        nearest   = nearest_ids(Issue.objects.all(), lat, lng, radius, limit)
+        distances = dict(nearest)
+        issues    = Issue.objects.in_bulk(list(distances))
+        ordered   = [issues[pk] for pk, _ in nearest if pk in issues]
+        serializer = IssueMapSerializer(ordered, many=True, context={"request": request, "distances": distances})
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["get"])
+    def bbox(self, request):
+        """Return issues inside a bounding box, newest first (map summaries)."""
+        params = request.query_params
+        try:
+            min_lat, min_lng = float(params["min_lat"]), float(params["min_lng"])
+            max_lat, max_lng = float(params["max_lat"]), float(params["max_lng"])
+            limit = self._map_limit(request)
+        except (KeyError, ValueError):
+            return Response({"error": "min_lat, min_lng, max_lat and max_lng are required numbers."}, status=400)
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            # min_lng > max_lng is allowed: the box crosses the antimeridian.
+            return Response({"error": "Bounding box out of range."}, status=400)
+
+        qs = within_bbox(Issue.objects.all(), min_lat, min_lng, max_lat, max_lng).order_by("-created_at")[:limit]
+        return Response(IssueMapSerializer(qs, many=True, context={"request": request}).data)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        Import many issues from an NDJSON or CSV request body (partner systems).
+
+        The body is read line by line from request.stream (request.data is
+        never touched), so uploads of any size are processed in bounded
+        memory. Imported issues are owned by the requesting (staff) account.
+        Returns the import summary: 201 if any rows were created, 400 if
+        none were.
+        """
+        content_type = request.content_type.split(";")[0].strip().lower()
+        fmt = CONTENT_TYPES.get(content_type)
+        if fmt is None:
+            return Response(
+                {"error": f"Content-Type must be one of: {', '.join(CONTENT_TYPES)}."}, status=415,
+            )
+        dry_run = request.query_params.get("dry_run", "").lower() in ("1", "true", "yes")
+
+        # request.stream is None for an empty body
+        result = import_issues(read_rows(request.stream or [], fmt), request.user, DEFAULT_CHUNK_SIZE, dry_run)
+        if dry_run:
+            return Response(result)
+        return Response(result, status=201 if result["created"] else 400)
+
 
 # ---------------------------------------------------------------------------
 # Department officer issue management
@@ -298,20 +423,34 @@ class DepartmentIssueViewSet(viewsets.ReadOnlyModelViewSet):
     Includes a custom PATCH action at /api/department/issues/{id}/status/
     that allows officers to update status and add department notes.
 
+    The list is cursor-paginated (newest first) and accepts ?status=,
+    ?duplicates=hide (leaves out reports flagged as repeats, see
+    core.duplicates) and ?fields= for a sparse fieldset.
+    GET /api/department/issues/export/ streams the whole (filtered) list
+    as CSV, NDJSON or Parquet.
+
     Auth: requires IsDepartmentOfficer permission (JWT Bearer token).
     """
 
     serializer_class   = DepartmentIssueSerializer
     permission_classes = [IsDepartmentOfficer]
+    pagination_class   = IssueCursorPagination
 
     def get_queryset(self):
         """Return issues assigned to the logged-in officer's department."""
-        dept = self.request.user.department_profile.department
-        qs   = Issue.objects.filter(assigned_department=dept).order_by("-created_at")
+        dept_id = self.request.user.department_profile.department_id
+        qs = (
+            Issue.objects.filter(assigned_department_id=dept_id)
+            .annotate(dept_name=F("assigned_department__name"), reporter_username=F("user__username"))
+            .order_by("-created_at", "-id")
+        )
+        qs = defer_unrequested(qs, self.request)
 
         status_param = self.request.query_params.get("status")
         if status_param:
-            qs = qs.filter(status__iexact=status_param)
+            qs = qs.filter(status=status_param.lower())  # exact match keeps the status index usable
+        if self.request.query_params.get("duplicates", "").lower() == "hide":
+            qs = qs.filter(duplicate_of__isnull=True)
 
         return qs
 
@@ -340,25 +479,60 @@ class DepartmentIssueViewSet(viewsets.ReadOnlyModelViewSet):
         issue.save()
         return Response(DepartmentIssueSerializer(issue, context={"request": request}).data)
 
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream the department's issues as a file download (see core.export).
+
+        Query params: ?output=csv|ndjson|parquet (default csv), ?status=,
+        ?duplicates=hide (as for the list), ?created_after= and
+        ?created_before= (ISO date or datetime; a bare created_before date
+        includes that whole day). `output` rather than `format`, which DRF
+        reserves for renderer selection.
+        """
+        params = request.query_params
+        fmt = params.get("output", "csv").lower()
+        if fmt not in EXPORT_FORMATS:
+            return Response({"error": f"output must be one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+
+        dept = request.user.department_profile.department
+        try:
+            qs = filter_issues(
+                Issue.objects.filter(assigned_department=dept),
+                status=params.get("status"),
+                duplicates=params.get("duplicates"),
+                created_after=params.get("created_after"),
+                created_before=params.get("created_before"),
+            )
+            chunks = export_stream(qs, fmt)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        except RuntimeError as exc:  # optional dependency missing (parquet)
+            return Response({"error": str(exc)}, status=501)
+
+        _, content_type, extension = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f"issues-{dept.slug}-{timezone.localdate():%Y%m%d}.{extension}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
 
 @api_view(["GET"])
 @permission_classes([IsDepartmentOfficer])
 def department_stats(request):
     """
-    Return aggregate issue counts for the logged-in officer's department.
+    Return aggregate issue statistics for the logged-in officer's department.
 
-    Returns: { department, total, pending, in_progress, resolved }
-    """
-    dept   = request.user.department_profile.department
-    issues = Issue.objects.filter(assigned_department=dept)
+    Returns: { department, total, pending, in_progress, resolved,
+               by_severity, by_category, by_status_severity,
+               resolution_hours: { count, avg, p50, p90, histogram },
+               pending_age, generated_at }
 
-    return Response({
-        "department":  dept.name,
-        "total":       issues.count(),
-        "pending":     issues.filter(status="pending").count(),
-        "in_progress": issues.filter(status="in_progress").count(),
-        "resolved":    issues.filter(status="resolved").count(),
-    })
+    Computed in one aggregate query and cached briefly per department
+    (see core.stats); any change to the department's issues invalidates it.
+    """
+    dept = request.user.department_profile.department
+    return Response(get_department_stats(dept))
 
 
 # ---------------------------------------------------------------------------
@@ -367,6 +541,7 @@ def department_stats(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([IssueCreateThrottle])
 def submit_issue(request):
     """
     Alternative issue submission endpoint that accepts raw form data.
@@ -378,13 +553,15 @@ def submit_issue(request):
     serializer = IssueSerializer(data=request.data, context={"request": request})
     if serializer.is_valid():
         issue = serializer.save(user=request.user)
-        _run_ai_on_issue(issue)
+        enqueue_issue_analysis(issue)
+        enqueue_photo_derivatives(issue)
         return Response({
             "message":      "Your report has been submitted successfully!",
             "issue_id":     issue.id,
             "category":     issue.category,
             "ai_category":  issue.ai_category,
             "ai_confidence": issue.ai_confidence,
+            "ai_status":    issue.ai_status,
         }, status=201)
 
     # Fallback: create the issue from raw request data if serializer validation fails.
@@ -401,7 +578,8 @@ def submit_issue(request):
         phone       = request.data.get("phone", ""),
         photos      = request.FILES.get("photos"),
     )
-    _run_ai_on_issue(issue)
+    enqueue_issue_analysis(issue)
+    enqueue_photo_derivatives(issue)
 
     return Response({
         "message":      "Your report has been submitted successfully!",
@@ -409,43 +587,6 @@ def submit_issue(request):
         "category":     issue.category,
         "ai_category":  issue.ai_category,
         "ai_confidence": issue.ai_confidence,
+        "ai_status":    issue.ai_status,
     }, status=201)
 
-
-# ---------------------------------------------------------------------------
-# Internal helper
-# ---------------------------------------------------------------------------
-
-def _run_ai_on_issue(issue):
-    """
-    Run Gemini Vision analysis on the issue photo and persist the results.
-
-    Called synchronously after issue creation. A failure at any point is
-    silently caught so that AI unavailability never blocks a submission.
-
-    Production note: this call blocks the HTTP response thread for the
-    duration of the Gemini API round-trip (~1-3 s). Move to a Celery
-    task for production deployments with higher traffic.
-    """
-    if not issue.photos:
-        return
-
-    try:
-        result = _gemini_analyze(
-            image_path  = issue.photos.path,
-            title       = issue.title,
-            description = issue.description,
-            category    = issue.category,
-        )
-        if result:
-            issue.ai_detected_category = result["detected_category"]
-            issue.ai_confidence        = result["confidence"]
-            issue.ai_matches_report    = result["matches_report"]
-            issue.ai_description       = result["description"]
-            issue.ai_severity          = result["severity_assessment"]
-            issue.save(update_fields=[
-                "ai_detected_category", "ai_confidence",
-                "ai_matches_report", "ai_description", "ai_severity",
-            ])
-    except Exception:
-        pass